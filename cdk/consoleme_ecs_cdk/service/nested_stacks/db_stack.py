@@ -59,6 +59,20 @@ def __init__(self, scope: cdk.Construct, id: str, **kwargs) -> None:
             projection_type=db.ProjectionType.ALL,
         )
 
+        for partition_key in ["status", "username", "principal_arn"]:
+            requests_table.add_global_secondary_index(
+                index_name=f"{partition_key}-request_time-index",
+                partition_key=db.Attribute(
+                    name=partition_key, type=db.AttributeType.STRING
+                ),
+                sort_key=db.Attribute(
+                    name="request_time", type=db.AttributeType.NUMBER
+                ),
+                read_capacity=123,
+                write_capacity=123,
+                projection_type=db.ProjectionType.ALL,
+            )
+
         cache_table = db.Table(
             self,
             "CacheTable",
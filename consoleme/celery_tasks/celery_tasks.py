@@ -12,6 +12,8 @@
 import json  # We use a separate SetEncoder here so we cannot use ujson
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Tuple, Union
 
@@ -40,6 +42,7 @@
 from cloudaux.aws.s3 import list_buckets
 from cloudaux.aws.sns import list_topics
 from cloudaux.aws.sts import boto3_cached_conn
+from redis.exceptions import WatchError
 from retrying import retry
 from sentry_sdk.integrations.aiohttp import AioHttpIntegration
 from sentry_sdk.integrations.celery import CeleryIntegration
@@ -65,22 +68,35 @@
     store_json_results_in_redis_and_s3,
 )
 from consoleme.lib.cloud_credential_authorization_mapping import (
+    apply_role_changes_to_credential_authorization_mapping,
+    generate_and_store_credential_authorization_index,
     generate_and_store_credential_authorization_mapping,
     generate_and_store_reverse_authorization_mapping,
 )
 from consoleme.lib.cloudtrail import CloudTrail
 from consoleme.lib.dynamo import IAMRoleDynamoHandler, UserDynamoHandler
+from consoleme.lib.errors_by_arn import (
+    cloudtrail_errors_keys,
+    get_error_counts_for_arns,
+    update_errors_by_arn,
+)
 from consoleme.lib.event_bridge.access_denies import (
     detect_cloudtrail_denies_and_update_cache,
 )
 from consoleme.lib.event_bridge.role_updates import detect_role_changes_and_update_cache
-from consoleme.lib.generic import un_wrap_json_and_dump_values
+from consoleme.lib.generic import un_wrap_json
 from consoleme.lib.git import store_iam_resources_in_git
 from consoleme.lib.plugins import get_plugin_by_name
-from consoleme.lib.policies import get_aws_config_history_url_for_resource
-from consoleme.lib.redis import RedisHandler
+from consoleme.lib.policies import (
+    add_policies_table_markdown_columns,
+    get_aws_config_history_urls_for_resources,
+)
+from consoleme.lib.redis import RedisHandler, iam_resource_expirations_key
+from consoleme.lib.region_fan_out import collect_across_regions
 from consoleme.lib.requests import cache_all_policy_requests
+from consoleme.lib.s3_chunked_json import StreamingJsonDictWriter
 from consoleme.lib.self_service.typeahead import cache_self_service_typeahead
+from consoleme.lib.table_index import arn_partitions, build_typeahead_document
 from consoleme.lib.templated_resources import cache_resource_templates
 from consoleme.lib.timeout import Timeout
 from consoleme.lib.v2.notifications import cache_notifications_to_redis_s3
@@ -456,7 +472,8 @@ def _add_role_to_redis(redis_key: str, role_entry: Dict) -> None:
     This function will add IAM role data to redis so that policy details can be quickly retrieved by the policies
     endpoint.
 
-    IAM role data is stored in the `redis_key` redis key by the role's ARN.
+    IAM role data is stored in the `redis_key` redis key by the role's ARN, and the role's TTL is tracked in a sorted
+    set so that expired roles can be found without decoding every role.
 
     Parameters
     ----------
@@ -468,7 +485,13 @@ def _add_role_to_redis(redis_key: str, role_entry: Dict) -> None:
         'templated': None, 'ttl': 1562510908, 'policy': '<json_formatted_policy>'}
     """
     try:
-        red.hset(redis_key, str(role_entry["arn"]), str(json.dumps(role_entry)))
+        pipeline = red.pipeline()
+        pipeline.hset(redis_key, str(role_entry["arn"]), str(json.dumps(role_entry)))
+        pipeline.zadd(
+            iam_resource_expirations_key(redis_key),
+            {str(role_entry["arn"]): int(role_entry["ttl"])},
+        )
+        pipeline.execute()
     except Exception as e:  # noqa
         stats.count(
             "_add_role_to_redis.error",
@@ -484,6 +507,205 @@ def _add_role_to_redis(redis_key: str, role_entry: Dict) -> None:
         raise
 
 
+def _iam_resource_cache_keys() -> Dict[str, Dict[str, str]]:
+    """Redis keys, and S3 locations of the combined copies, of the IAM resource caches"""
+    return {
+        "iam_roles": {
+            "cache_key": config.get("aws.iamroles_redis_key", "IAM_ROLE_CACHE"),
+            "s3_bucket": config.get(
+                "cache_iam_resources_across_accounts.all_roles_combined.s3.bucket"
+            ),
+            "s3_key": config.get(
+                "cache_iam_resources_across_accounts.all_roles_combined.s3.file",
+                "account_resource_cache/cache_all_roles_v1.json.gz",
+            ),
+        },
+        "iam_users": {
+            "cache_key": config.get("aws.iamusers_redis_key", "IAM_USER_CACHE"),
+            "s3_bucket": config.get(
+                "cache_iam_resources_across_accounts.all_users_combined.s3.bucket"
+            ),
+            "s3_key": config.get(
+                "cache_iam_resources_across_accounts.all_users_combined.s3.file",
+                "account_resource_cache/cache_all_users_v1.json.gz",
+            ),
+        },
+        "iam_groups": {
+            "cache_key": config.get("aws.iamgroups_redis_key", "IAM_GROUP_CACHE"),
+            "s3_bucket": config.get(
+                "cache_iam_resources_across_accounts.all_groups_combined.s3.bucket"
+            ),
+            "s3_key": config.get(
+                "cache_iam_resources_across_accounts.all_groups_combined.s3.file",
+                "account_resource_cache/cache_all_groups_v1.json.gz",
+            ),
+        },
+        "iam_policies": {
+            "cache_key": config.get("aws.iampolicies_redis_key", "IAM_POLICY_CACHE"),
+            "s3_bucket": config.get(
+                "cache_iam_resources_across_accounts.all_policies_combined.s3.bucket"
+            ),
+            "s3_key": config.get(
+                "cache_iam_resources_across_accounts.all_policies_combined.s3.file",
+                "account_resource_cache/cache_all_policies_v1.json.gz",
+            ),
+        },
+    }
+
+
+def _touch_redis_last_updated(redis_key: str) -> None:
+    """Record that data in `redis_key` changed, as store_json_results_in_redis_and_s3 does"""
+    red.hset(
+        config.get(
+            "store_json_results_in_redis_and_s3.last_updated_redis_key",
+            "STORE_JSON_RESULTS_IN_REDIS_AND_S3_LAST_UPDATED",
+        ),
+        redis_key,
+        int(time.time()),
+    )
+
+
+def _add_iam_resources_to_redis(cache_key: str, entries: List[Dict]) -> None:
+    """Add IAM resources of an account to their cache, and track the TTL of each entry"""
+    pipeline = red.pipeline()
+    for i in range(0, len(entries), 1000):
+        chunk = entries[i : i + 1000]
+        pipeline.hset(
+            cache_key,
+            mapping={str(entry["arn"]): str(json.dumps(entry)) for entry in chunk},
+        )
+        pipeline.zadd(
+            iam_resource_expirations_key(cache_key),
+            {str(entry["arn"]): entry["ttl"] for entry in chunk},
+        )
+    pipeline.execute()
+    _touch_redis_last_updated(cache_key)
+
+
+def _comparable_iam_role(role_entry: Dict, volatile_fields: List[str]) -> Dict:
+    """Returns a role cache entry without its TTL, and without fields of its policy that change on every refresh"""
+    comparable_entry = {**role_entry, "ttl": None}
+    policy = role_entry.get("policy")
+    if isinstance(policy, str):
+        try:
+            policy = json.loads(policy)
+        except ValueError:
+            return comparable_entry
+    if isinstance(policy, dict):
+        comparable_entry["policy"] = {
+            k: v for k, v in policy.items() if k not in volatile_fields
+        }
+    return comparable_entry
+
+
+def _get_changed_iam_roles(cache_key: str, role_entries: List[Dict]) -> List[Dict]:
+    """
+    Compare roles with their entries in the role cache. A role is changed if it isn't cached, if anything but the TTL
+    and the volatile fields of its policy, such as RoleLastUsed, differs from its cached entry, or if its cached TTL
+    runs out within `cache_iam_resources_for_account.ttl_refresh_seconds`.
+
+    :return: Roles to write to DynamoDB and Redis
+    """
+    refresh_before = int(
+        (
+            datetime.utcnow()
+            + timedelta(
+                seconds=config.get(
+                    "cache_iam_resources_for_account.ttl_refresh_seconds", 86400
+                )
+            )
+        ).timestamp()
+    )
+    volatile_fields = config.get(
+        "cache_iam_resources_for_account.volatile_role_fields", ["RoleLastUsed"]
+    )
+    changed_roles = []
+    for i in range(0, len(role_entries), 1000):
+        chunk = role_entries[i : i + 1000]
+        cached_entries = red.hmget(
+            cache_key, [role_entry["arn"] for role_entry in chunk]
+        )
+        for role_entry, cached_entry_j in zip(chunk, cached_entries):
+            cached_entry = json.loads(cached_entry_j) if cached_entry_j else {}
+            if cached_entry.get("ttl", 0) < refresh_before or _comparable_iam_role(
+                cached_entry, volatile_fields
+            ) != _comparable_iam_role(role_entry, volatile_fields):
+                changed_roles.append(role_entry)
+    return changed_roles
+
+
+def _get_account_authorization_details(client, entity_filter: List[str]) -> Dict:
+    """Page through get_account_authorization_details for the given entity types"""
+    iam_resources = {
+        "UserDetailList": [],
+        "GroupDetailList": [],
+        "RoleDetailList": [],
+        "Policies": [],
+    }
+    paginator = client.get_paginator("get_account_authorization_details")
+    for response in paginator.paginate(Filter=entity_filter):
+        for k, v in response.items():
+            if k in iam_resources:
+                iam_resources[k].extend(v)
+            elif k not in ["ResponseMetadata", "Marker", "IsTruncated"]:
+                # Fail hard if we find something unexpected
+                raise RuntimeError("Unexpected key {0} in response".format(k))
+    return iam_resources
+
+
+def _backfill_resource_expirations(cache_key: str) -> None:
+    """Track the TTL of entries that were cached before their TTLs were tracked in a sorted set"""
+    expirations_key = iam_resource_expirations_key(cache_key)
+    index = 0
+    while True:
+        index, entries = _scan_redis_iam_cache(cache_key, index, REDIS_IAM_COUNT)
+        expirations = {}
+        for arn, entry in entries.items():
+            ttl = json.loads(entry).get("ttl")
+            # Entries without a TTL never expire
+            if ttl is not None:
+                expirations[arn] = int(ttl)
+        if expirations:
+            red.zadd(expirations_key, expirations)
+        if not index:
+            break
+
+
+def _expire_cached_resources_from_redis(cache_key: str, max_ttl: int) -> List[str]:
+    """
+    Delete the entries of a resource cache, such as IAM_ROLE_CACHE or AWSCONFIG_RESOURCE_CACHE, whose TTL is at most
+    `max_ttl`. Entries are deleted in transactions that watch the sorted set of TTLs, so an entry that is refreshed
+    while it is being expired keeps its new value.
+
+    :return: ARNs of the deleted entries
+    """
+    expirations_key = iam_resource_expirations_key(cache_key)
+    if not red.exists(expirations_key) and red.exists(cache_key):
+        _backfill_resource_expirations(cache_key)
+    expired_arns = []
+    with red.pipeline() as pipeline:
+        while True:
+            try:
+                pipeline.watch(expirations_key)
+                arns = pipeline.zrangebyscore(
+                    expirations_key, "-inf", max_ttl, start=0, num=1000
+                )
+                if not arns:
+                    pipeline.unwatch()
+                    break
+                pipeline.multi()
+                pipeline.hdel(cache_key, *arns)
+                pipeline.zrem(expirations_key, *arns)
+                pipeline.execute()
+                expired_arns.extend(arns)
+            except WatchError:
+                # TTLs changed since they were read. Read them again.
+                continue
+    if expired_arns:
+        _touch_redis_last_updated(cache_key)
+    return expired_arns
+
+
 @app.task(soft_time_limit=7200)
 def cache_cloudtrail_errors_by_arn() -> Dict:
     function: str = f"{__name__}.{sys._getframe().f_code.co_name}"
@@ -497,13 +719,9 @@ def cache_cloudtrail_errors_by_arn() -> Dict:
         aws
     )
     cloudtrail_errors = process_cloudtrail_errors_res["error_count_by_role"]
-    red.setex(
-        config.get(
-            "celery.cache_cloudtrail_errors_by_arn.redis_key",
-            "CLOUDTRAIL_ERRORS_BY_ARN",
-        ),
-        86400,
-        json.dumps(cloudtrail_errors),
+    # Only principals whose errors changed or expired are updated
+    update_errors_by_arn(
+        cloudtrail_errors, expiration_seconds=86400, **cloudtrail_errors_keys()
     )
     if process_cloudtrail_errors_res["num_new_or_changed_notifications"] > 0:
         cache_notifications.delay()
@@ -513,155 +731,162 @@ def cache_cloudtrail_errors_by_arn() -> Dict:
     return log_data
 
 
+@contextmanager
+def _timed_stage(stage_durations: Dict[str, float], stage: str):
+    """Records how long a stage of a task took, in seconds"""
+    start = time.time()
+    try:
+        yield
+    finally:
+        stage_durations[stage] = time.time() - start
+
+
 @app.task(soft_time_limit=1800)
 def cache_policies_table_details() -> bool:
+    function = f"{__name__}.{sys._getframe().f_code.co_name}"
     items = []
-    accounts_d = async_to_sync(get_account_id_to_name_mapping)()
+    stage_durations: Dict[str, float] = {}
+    # Items that need an AWS Config history URL, and the resources to generate the URLs for
+    config_history_items = []
+    config_history_resources = []
 
-    cloudtrail_errors = {}
-    cloudtrail_errors_j = red.get(
-        config.get(
-            "celery.cache_cloudtrail_errors_by_arn.redis_key",
-            "CLOUDTRAIL_ERRORS_BY_ARN",
-        )
-    )
+    with _timed_stage(stage_durations, "load_shared_data"):
+        accounts_d = async_to_sync(get_account_id_to_name_mapping)()
 
-    if cloudtrail_errors_j:
-        cloudtrail_errors = json.loads(cloudtrail_errors_j)
-
-    s3_error_topic = config.get("redis.s3_errors", "S3_ERRORS")
-    all_s3_errors = red.get(s3_error_topic)
-    s3_errors = {}
-    if all_s3_errors:
-        s3_errors = json.loads(all_s3_errors)
+        # Fetch all templated roles at once instead of once per principal
+        templated_roles = red.hgetall(
+            config.get("templated_roles.redis_key", "TEMPLATED_ROLES_v2")
+        )
 
     # IAM Roles
+    all_iam_roles = {}
     skip_iam_roles = config.get("cache_policies_table_details.skip_iam_roles", False)
     if not skip_iam_roles:
-        all_iam_roles = async_to_sync(retrieve_json_data_from_redis_or_s3)(
-            redis_key=config.get("aws.iamroles_redis_key", "IAM_ROLE_CACHE"),
-            redis_data_type="hash",
-            s3_bucket=config.get(
-                "cache_iam_resources_across_accounts.all_roles_combined.s3.bucket"
-            ),
-            s3_key=config.get(
-                "cache_iam_resources_across_accounts.all_roles_combined.s3.file",
-                "account_resource_cache/cache_all_roles_v1.json.gz",
-            ),
-            default={},
-        )
+        with _timed_stage(stage_durations, "iam_roles"):
+            all_iam_roles = async_to_sync(retrieve_json_data_from_redis_or_s3)(
+                redis_key=config.get("aws.iamroles_redis_key", "IAM_ROLE_CACHE"),
+                redis_data_type="hash",
+                s3_bucket=config.get(
+                    "cache_iam_resources_across_accounts.all_roles_combined.s3.bucket"
+                ),
+                s3_key=config.get(
+                    "cache_iam_resources_across_accounts.all_roles_combined.s3.file",
+                    "account_resource_cache/cache_all_roles_v1.json.gz",
+                ),
+                default={},
+            )
 
-        for arn, role_details_j in all_iam_roles.items():
-            role_details = ujson.loads(role_details_j)
-            role_details_policy = ujson.loads(role_details.get("policy", {}))
-            role_tags = role_details_policy.get("Tags", {})
+            error_counts = get_error_counts_for_arns(all_iam_roles.keys())
+            for arn, role_details_j in all_iam_roles.items():
+                role_details = ujson.loads(role_details_j)
+                role_details_policy = ujson.loads(role_details.get("policy", {}))
+                role_tags = role_details_policy.get("Tags", {})
 
-            if not allowed_to_sync_role(arn, role_tags):
-                continue
-
-            error_count = cloudtrail_errors.get(arn, 0)
-            s3_errors_for_arn = s3_errors.get(arn, [])
-            for error in s3_errors_for_arn:
-                error_count += int(error.get("count"))
+                if not allowed_to_sync_role(arn, role_tags):
+                    continue
 
-            account_id = arn.split(":")[4]
-            account_name = accounts_d.get(str(account_id), "Unknown")
-            resource_id = role_details.get("resourceId")
-            items.append(
-                {
+                error_count = error_counts.get(arn, 0)
+                account_id = arn.split(":")[4]
+                account_name = accounts_d.get(str(account_id), "Unknown")
+                resource_id = role_details.get("resourceId")
+                item = {
                     "account_id": account_id,
                     "account_name": account_name,
                     "arn": arn,
                     "technology": "AWS::IAM::Role",
-                    "templated": red.hget(
-                        config.get("templated_roles.redis_key", "TEMPLATED_ROLES_v2"),
-                        arn.lower(),
-                    ),
+                    "templated": templated_roles.get(arn.lower()),
                     "errors": error_count,
-                    "config_history_url": async_to_sync(
-                        get_aws_config_history_url_for_resource
-                    )(account_id, resource_id, arn, "AWS::IAM::Role"),
                 }
-            )
+                items.append(item)
+                config_history_items.append(item)
+                config_history_resources.append(
+                    (account_id, resource_id, arn, "AWS::IAM::Role")
+                )
 
     # IAM Users
     skip_iam_users = config.get("cache_policies_table_details.skip_iam_users", False)
     if not skip_iam_users:
-        all_iam_users = async_to_sync(retrieve_json_data_from_redis_or_s3)(
-            redis_key=config.get("aws.iamusers_redis_key", "IAM_USER_CACHE"),
-            redis_data_type="hash",
-            s3_bucket=config.get(
-                "cache_iam_resources_across_accounts.all_users_combined.s3.bucket"
-            ),
-            s3_key=config.get(
-                "cache_iam_resources_across_accounts.all_users_combined.s3.file",
-                "account_resource_cache/cache_all_users_v1.json.gz",
-            ),
-            default={},
-        )
+        with _timed_stage(stage_durations, "iam_users"):
+            all_iam_users = async_to_sync(retrieve_json_data_from_redis_or_s3)(
+                redis_key=config.get("aws.iamusers_redis_key", "IAM_USER_CACHE"),
+                redis_data_type="hash",
+                s3_bucket=config.get(
+                    "cache_iam_resources_across_accounts.all_users_combined.s3.bucket"
+                ),
+                s3_key=config.get(
+                    "cache_iam_resources_across_accounts.all_users_combined.s3.file",
+                    "account_resource_cache/cache_all_users_v1.json.gz",
+                ),
+                default={},
+            )
 
-        for arn, details_j in all_iam_users.items():
-            details = ujson.loads(details_j)
-            error_count = cloudtrail_errors.get(arn, 0)
-            s3_errors_for_arn = s3_errors.get(arn, [])
-            for error in s3_errors_for_arn:
-                error_count += int(error.get("count"))
-            account_id = arn.split(":")[4]
-            account_name = accounts_d.get(str(account_id), "Unknown")
-            resource_id = details.get("resourceId")
-            items.append(
-                {
+            error_counts = get_error_counts_for_arns(all_iam_users.keys())
+            for arn, details_j in all_iam_users.items():
+                details = ujson.loads(details_j)
+                error_count = error_counts.get(arn, 0)
+                account_id = arn.split(":")[4]
+                account_name = accounts_d.get(str(account_id), "Unknown")
+                resource_id = details.get("resourceId")
+                item = {
                     "account_id": account_id,
                     "account_name": account_name,
                     "arn": arn,
                     "technology": "AWS::IAM::User",
-                    "templated": red.hget(
-                        config.get("templated_roles.redis_key", "TEMPLATED_ROLES_v2"),
-                        arn.lower(),
-                    ),
+                    "templated": templated_roles.get(arn.lower()),
                     "errors": error_count,
-                    "config_history_url": async_to_sync(
-                        get_aws_config_history_url_for_resource
-                    )(account_id, resource_id, arn, "AWS::IAM::User"),
                 }
-            )
+                items.append(item)
+                config_history_items.append(item)
+                config_history_resources.append(
+                    (account_id, resource_id, arn, "AWS::IAM::User")
+                )
+
+    # Generate all AWS Config history URLs in one call
+    with _timed_stage(stage_durations, "config_history_urls"):
+        config_history_urls = async_to_sync(get_aws_config_history_urls_for_resources)(
+            config_history_resources
+        )
+        for item, config_history_url in zip(config_history_items, config_history_urls):
+            item["config_history_url"] = config_history_url
+
     # S3 Buckets
     skip_s3_buckets = config.get("cache_policies_table_details.skip_s3_buckets", False)
     if not skip_s3_buckets:
-        s3_bucket_key: str = config.get("redis.s3_bucket_key", "S3_BUCKETS")
-        s3_accounts = red.hkeys(s3_bucket_key)
-        if s3_accounts:
-            for account in s3_accounts:
+        with _timed_stage(stage_durations, "s3_buckets"):
+            s3_bucket_key: str = config.get("redis.s3_bucket_key", "S3_BUCKETS")
+            buckets_by_account = {
+                account: json.loads(buckets_j)
+                for account, buckets_j in red.hgetall(s3_bucket_key).items()
+            }
+            error_counts = get_error_counts_for_arns(
+                f"arn:aws:s3:::{bucket}"
+                for buckets in buckets_by_account.values()
+                for bucket in buckets
+            )
+            for account, buckets in buckets_by_account.items():
                 account_name = accounts_d.get(str(account), "Unknown")
-                buckets = json.loads(red.hget(s3_bucket_key, account))
 
                 for bucket in buckets:
                     bucket_arn = f"arn:aws:s3:::{bucket}"
-                    s3_errors_for_arn = s3_errors.get(bucket_arn, [])
-
-                    error_count = 0
-                    for error in s3_errors_for_arn:
-                        error_count += int(error.get("count"))
                     items.append(
                         {
                             "account_id": account,
                             "account_name": account_name,
-                            "arn": f"arn:aws:s3:::{bucket}",
+                            "arn": bucket_arn,
                             "technology": "AWS::S3::Bucket",
                             "templated": None,
-                            "errors": error_count,
+                            "errors": error_counts.get(bucket_arn, 0),
                         }
                     )
 
     # SNS Topics
     skip_sns_topics = config.get("cache_policies_table_details.skip_sns_topics", False)
     if not skip_sns_topics:
-        sns_topic_key: str = config.get("redis.sns_topics_key", "SNS_TOPICS")
-        sns_accounts = red.hkeys(sns_topic_key)
-        if sns_accounts:
-            for account in sns_accounts:
+        with _timed_stage(stage_durations, "sns_topics"):
+            sns_topic_key: str = config.get("redis.sns_topics_key", "SNS_TOPICS")
+            for account, topics_j in red.hgetall(sns_topic_key).items():
                 account_name = accounts_d.get(str(account), "Unknown")
-                topics = json.loads(red.hget(sns_topic_key, account))
+                topics = json.loads(topics_j)
 
                 for topic in topics:
                     error_count = 0
@@ -679,12 +904,11 @@ def cache_policies_table_details() -> bool:
     # SQS Queues
     skip_sqs_queues = config.get("cache_policies_table_details.skip_sqs_queues", False)
     if not skip_sqs_queues:
-        sqs_queue_key: str = config.get("redis.sqs_queues_key", "SQS_QUEUES")
-        sqs_accounts = red.hkeys(sqs_queue_key)
-        if sqs_accounts:
-            for account in sqs_accounts:
+        with _timed_stage(stage_durations, "sqs_queues"):
+            sqs_queue_key: str = config.get("redis.sqs_queues_key", "SQS_QUEUES")
+            for account, queues_j in red.hgetall(sqs_queue_key).items():
                 account_name = accounts_d.get(str(account), "Unknown")
-                queues = json.loads(red.hget(sqs_queue_key, account))
+                queues = json.loads(queues_j)
 
                 for queue in queues:
                     error_count = 0
@@ -704,16 +928,15 @@ def cache_policies_table_details() -> bool:
         "cache_policies_table_details.skip_managed_policies", False
     )
     if not skip_managed_policies:
-        managed_policies_key: str = config.get(
-            "redis.iam_managed_policies_key", "IAM_MANAGED_POLICIES"
-        )
-        managed_policies_accounts = red.hkeys(managed_policies_key)
-        if managed_policies_accounts:
-            for managed_policies_account in managed_policies_accounts:
+        with _timed_stage(stage_durations, "managed_policies"):
+            managed_policies_key: str = config.get(
+                "redis.iam_managed_policies_key", "IAM_MANAGED_POLICIES"
+            )
+            for managed_policies_account, managed_policies_in_account_j in red.hgetall(
+                managed_policies_key
+            ).items():
                 account_name = accounts_d.get(str(managed_policies_account), "Unknown")
-                managed_policies_in_account = json.loads(
-                    red.hget(managed_policies_key, managed_policies_account)
-                )
+                managed_policies_in_account = json.loads(managed_policies_in_account_j)
 
                 for policy_arn in managed_policies_in_account:
                     # managed policies that are managed by AWS shouldn't be added to the policies table for 2 reasons:
@@ -739,11 +962,11 @@ def cache_policies_table_details() -> bool:
         "cache_policies_table_details.skip_aws_config_resources", False
     )
     if not skip_aws_config_resources:
-        resources_from_aws_config_redis_key: str = config.get(
-            "aws_config_cache.redis_key", "AWSCONFIG_RESOURCE_CACHE"
-        )
-        resources_from_aws_config = red.hgetall(resources_from_aws_config_redis_key)
-        if resources_from_aws_config:
+        with _timed_stage(stage_durations, "aws_config_resources"):
+            resources_from_aws_config_redis_key: str = config.get(
+                "aws_config_cache.redis_key", "AWSCONFIG_RESOURCE_CACHE"
+            )
+            resources_from_aws_config = red.hgetall(resources_from_aws_config_redis_key)
             for arn, value in resources_from_aws_config.items():
                 resource = json.loads(value)
                 technology = resource["resourceType"]
@@ -769,6 +992,10 @@ def cache_policies_table_details() -> bool:
                     }
                 )
 
+    # Render the markdown columns once per refresh, instead of on every request to the policies table
+    with _timed_stage(stage_durations, "markdown"):
+        async_to_sync(add_policies_table_markdown_columns)(items)
+
     s3_bucket = None
     s3_key = None
     if config.region == config.get("celery.active_region", config.region) or config.get(
@@ -779,11 +1006,22 @@ def cache_policies_table_details() -> bool:
             "cache_policies_table_details.s3.file",
             "policies_table/cache_policies_table_details_v1.json.gz",
         )
-    async_to_sync(store_json_results_in_redis_and_s3)(
-        items,
-        redis_key=config.get("policies.redis_policies_key", "ALL_POLICIES"),
-        s3_bucket=s3_bucket,
-        s3_key=s3_key,
+    with _timed_stage(stage_durations, "store"):
+        async_to_sync(store_json_results_in_redis_and_s3)(
+            items,
+            redis_key=config.get("policies.redis_policies_key", "ALL_POLICIES"),
+            s3_bucket=s3_bucket,
+            s3_key=s3_key,
+        )
+    for stage, duration in stage_durations.items():
+        stats.gauge(f"{function}.{stage}.duration", duration)
+    log.debug(
+        {
+            "function": function,
+            "message": "Cached policies table details",
+            "num_items": len(items),
+            "stage_durations": stage_durations,
+        }
     )
     stats.count(
         "cache_policies_table_details.success",
@@ -796,31 +1034,10 @@ def cache_policies_table_details() -> bool:
 def cache_iam_resources_for_account(account_id: str) -> Dict[str, Any]:
     function = f"{__name__}.{sys._getframe().f_code.co_name}"
     log_data = {"function": function, "account_id": account_id}
-    cache_keys = {
-        "iam_roles": {
-            "temp_cache_key": config.get(
-                "aws.iamroles_redis_key_temp", "IAM_ROLE_CACHE_TEMP"
-            )
-        },
-        "iam_users": {
-            "temp_cache_key": config.get(
-                "aws.iamusers_redis_key_temp", "IAM_USER_CACHE_TEMP"
-            )
-        },
-        "iam_groups": {
-            "temp_cache_key": config.get(
-                "aws.iamgroups_redis_key_temp", "IAM_GROUP_CACHE_TEMP"
-            )
-        },
-        "iam_policies": {
-            "temp_cache_key": config.get(
-                "aws.iampolicies_redis_key_temp", "IAM_POLICIES_CACHE_TEMP"
-            )
-        },
-    }
+    cache_keys = _iam_resource_cache_keys()
     # Get the DynamoDB handler:
     dynamo = IAMRoleDynamoHandler()
-    cache_key = config.get("aws.iamroles_redis_key", "IAM_ROLE_CACHE")
+    cache_key = cache_keys["iam_roles"]["cache_key"]
     # Only query IAM and put data in Dynamo if we're in the active region
     if config.region == config.get("celery.active_region", config.region) or config.get(
         "environment"
@@ -838,29 +1055,28 @@ def cache_iam_resources_for_account(account_id: str) -> Dict[str, Any]:
             ),
         )
         client = boto3_cached_conn("iam", **conn)
-        paginator = client.get_paginator("get_account_authorization_details")
-        response_iterator = paginator.paginate()
-        all_iam_resources = {}
-        for response in response_iterator:
-            if not all_iam_resources:
-                all_iam_resources = response
-            else:
-                all_iam_resources["UserDetailList"].extend(response["UserDetailList"])
-                all_iam_resources["GroupDetailList"].extend(response["GroupDetailList"])
-                all_iam_resources["RoleDetailList"].extend(response["RoleDetailList"])
-                all_iam_resources["Policies"].extend(response["Policies"])
-            for k in response.keys():
-                if k not in [
-                    "UserDetailList",
-                    "GroupDetailList",
-                    "RoleDetailList",
-                    "Policies",
-                    "ResponseMetadata",
-                    "Marker",
-                    "IsTruncated",
-                ]:
-                    # Fail hard if we find something unexpected
-                    raise RuntimeError("Unexpected key {0} in response".format(k))
+        # Each entity type is paginated on its own thread, so a large account's roles don't wait on its policies
+        entity_filters = [
+            ["Role"],
+            ["User"],
+            ["Group"],
+            ["LocalManagedPolicy", "AWSManagedPolicy"],
+        ]
+        all_iam_resources = {
+            "UserDetailList": [],
+            "GroupDetailList": [],
+            "RoleDetailList": [],
+            "Policies": [],
+        }
+        with ThreadPoolExecutor(max_workers=len(entity_filters)) as executor:
+            for iam_resources in executor.map(
+                lambda entity_filter: _get_account_authorization_details(
+                    client, entity_filter
+                ),
+                entity_filters,
+            ):
+                for k, v in iam_resources.items():
+                    all_iam_resources[k].extend(v)
 
         # Store entire response in S3
         async_to_sync(store_json_results_in_redis_and_s3)(
@@ -940,82 +1156,101 @@ def cache_iam_resources_for_account(account_id: str) -> Dict[str, Any]:
             log_data["num_iam_policies"] = len(iam_policies)
 
         ttl: int = int((datetime.utcnow() + timedelta(hours=36)).timestamp())
-        # Save them:
+        templated_roles_key = config.get(
+            "templated_roles.redis_key", "TEMPLATED_ROLES_v2"
+        )
+        role_entries = []
         for role in iam_roles:
             if remove_temp_policies(role, client):
                 role = aws.get_iam_role_sync(account_id, role.get("RoleName", conn))
                 async_to_sync(aws.cloudaux_to_aws)(role)
-            role_entry = {
-                "arn": role.get("Arn"),
-                "name": role.get("RoleName"),
-                "resourceId": role.get("RoleId"),
-                "accountId": account_id,
-                "ttl": ttl,
-                "owner": get_aws_principal_owner(role),
-                "policy": dynamo.convert_iam_resource_to_json(role),
-                "templated": red.hget(
-                    config.get("templated_roles.redis_key", "TEMPLATED_ROLES_v2"),
-                    role.get("Arn").lower(),
-                ),
-            }
-
-            # DynamoDB:
-            dynamo.sync_iam_role_for_account(role_entry)
-
-            # Redis:
-            _add_role_to_redis(cache_key, role_entry)
+            role_entries.append(
+                {
+                    "arn": role.get("Arn"),
+                    "name": role.get("RoleName"),
+                    "resourceId": role.get("RoleId"),
+                    "accountId": account_id,
+                    "ttl": ttl,
+                    "owner": get_aws_principal_owner(role),
+                    "policy": dynamo.convert_iam_resource_to_json(role),
+                    "templated": red.hget(templated_roles_key, role.get("Arn").lower()),
+                }
+            )
 
             # Run internal function on role. This can be used to inspect roles, add managed policies, or other actions
             aws().handle_detected_role(role)
 
+        # Only write roles that changed, or whose TTL is running out, to DynamoDB and Redis
+        changed_roles = _get_changed_iam_roles(cache_key, role_entries)
+        dynamo.sync_iam_roles_for_account(changed_roles)
+        _add_iam_resources_to_redis(cache_key, changed_roles)
+        log_data["num_iam_roles_changed"] = len(changed_roles)
+        stats.gauge(
+            f"{function}.roles_written",
+            len(changed_roles),
+            tags={"account_id": account_id},
+        )
+
+        # Users, groups and policies are visible as soon as this account is done, instead of once every account is
+        user_entries = []
         for user in iam_users:
-            user_entry = {
-                "arn": user.get("Arn"),
-                "name": user.get("UserName"),
-                "resourceId": user.get("UserId"),
-                "accountId": account_id,
-                "ttl": ttl,
-                "owner": get_aws_principal_owner(user),
-                "policy": dynamo.convert_iam_resource_to_json(user),
-                "templated": False,  # Templates not supported for IAM users at this time
-            }
-            red.hset(
-                cache_keys["iam_users"]["temp_cache_key"],
-                str(user_entry["arn"]),
-                str(json.dumps(user_entry)),
+            user_entries.append(
+                {
+                    "arn": user.get("Arn"),
+                    "name": user.get("UserName"),
+                    "resourceId": user.get("UserId"),
+                    "accountId": account_id,
+                    "ttl": ttl,
+                    "owner": get_aws_principal_owner(user),
+                    "policy": dynamo.convert_iam_resource_to_json(user),
+                    "templated": False,  # Templates not supported for IAM users at this time
+                }
             )
+        _add_iam_resources_to_redis(cache_keys["iam_users"]["cache_key"], user_entries)
 
+        group_entries = []
         for g in iam_groups:
-            group_entry = {
-                "arn": g.get("Arn"),
-                "name": g.get("GroupName"),
-                "resourceId": g.get("GroupId"),
-                "accountId": account_id,
-                "ttl": ttl,
-                "policy": dynamo.convert_iam_resource_to_json(g),
-                "templated": False,  # Templates not supported for IAM groups at this time
-            }
-            red.hset(
-                cache_keys["iam_groups"]["temp_cache_key"],
-                str(group_entry["arn"]),
-                str(json.dumps(group_entry)),
+            group_entries.append(
+                {
+                    "arn": g.get("Arn"),
+                    "name": g.get("GroupName"),
+                    "resourceId": g.get("GroupId"),
+                    "accountId": account_id,
+                    "ttl": ttl,
+                    "policy": dynamo.convert_iam_resource_to_json(g),
+                    "templated": False,  # Templates not supported for IAM groups at this time
+                }
             )
+        _add_iam_resources_to_redis(
+            cache_keys["iam_groups"]["cache_key"], group_entries
+        )
 
+        policy_entries = []
         for policy in iam_policies:
-            group_entry = {
-                "arn": policy.get("Arn"),
-                "name": policy.get("PolicyName"),
-                "resourceId": policy.get("PolicyId"),
-                "accountId": account_id,
-                "ttl": ttl,
-                "policy": dynamo.convert_iam_resource_to_json(policy),
-                "templated": False,  # Templates not supported for IAM policies at this time
-            }
-            red.hset(
-                cache_keys["iam_policies"]["temp_cache_key"],
-                str(group_entry["arn"]),
-                str(json.dumps(group_entry)),
+            policy_entries.append(
+                {
+                    "arn": policy.get("Arn"),
+                    "name": policy.get("PolicyName"),
+                    "resourceId": policy.get("PolicyId"),
+                    "accountId": account_id,
+                    "ttl": ttl,
+                    "policy": dynamo.convert_iam_resource_to_json(policy),
+                    "templated": False,  # Templates not supported for IAM policies at this time
+                }
             )
+        _add_iam_resources_to_redis(
+            cache_keys["iam_policies"]["cache_key"], policy_entries
+        )
+        _touch_redis_last_updated(cache_key)
+
+        # Let combine_iam_resources_across_accounts know that this account's resources changed
+        red.zadd(
+            config.get(
+                "cache_iam_resources_across_accounts.account_updates_redis_key",
+                "IAM_RESOURCES_ACCOUNT_UPDATES",
+            ),
+            {account_id: time.time()},
+        )
 
         # Maybe store all resources in git
         if config.get("cache_iam_resources_for_account.store_in_git.enabled"):
@@ -1030,36 +1265,15 @@ def cache_iam_resources_for_account(account_id: str) -> Dict[str, Any]:
 
 @app.task(soft_time_limit=3600)
 def cache_iam_resources_across_accounts(
-    run_subtasks: bool = True, wait_for_subtask_completion: bool = True
+    run_subtasks: bool = True, wait_for_subtask_completion: bool = False
 ) -> Dict:
+    """
+    Starts a task to cache the IAM resources of each account. Each account's resources are visible in Redis as soon
+    as its task finishes, so this task doesn't wait for the tasks unless `wait_for_subtask_completion` is set.
+    combine_iam_resources_across_accounts expires old resources and stores the combined resources in S3.
+    """
     function = f"{__name__}.{sys._getframe().f_code.co_name}"
-
-    cache_keys = {
-        "iam_roles": {
-            "cache_key": config.get("aws.iamroles_redis_key", "IAM_ROLE_CACHE"),
-            "temp_cache_key": config.get(
-                "aws.iamroles_redis_key_temp", "IAM_ROLE_CACHE_TEMP"
-            ),
-        },
-        "iam_users": {
-            "cache_key": config.get("aws.iamusers_redis_key", "IAM_USER_CACHE"),
-            "temp_cache_key": config.get(
-                "aws.iamusers_redis_key_temp", "IAM_USER_CACHE_TEMP"
-            ),
-        },
-        "iam_groups": {
-            "cache_key": config.get("aws.iamgroups_redis_key", "IAM_GROUP_CACHE"),
-            "temp_cache_key": config.get(
-                "aws.iamgroups_redis_key_temp", "IAM_GROUP_CACHE_TEMP"
-            ),
-        },
-        "iam_policies": {
-            "cache_key": config.get("aws.iampolicies_redis_key", "IAM_POLICY_CACHE"),
-            "temp_cache_key": config.get(
-                "aws.iampolicies_redis_key_temp", "IAM_POLICIES_CACHE_TEMP"
-            ),
-        },
-    }
+    cache_keys = _iam_resource_cache_keys()
 
     log_data = {"function": function, "cache_keys": cache_keys}
     if is_task_already_running(function, []):
@@ -1067,14 +1281,6 @@ def cache_iam_resources_across_accounts(
         log.debug(log_data)
         return log_data
 
-    # Remove stale temporary cache keys to ensure we receive fresh results. Don't remove stale cache keys if we're
-    # running this as a part of `make redis` (`scripts/initialize_redis_oss.py`) because these cache keys are already
-    # populated appropriately
-    if run_subtasks and wait_for_subtask_completion:
-        for k, v in cache_keys.items():
-            temp_cache_key = v["temp_cache_key"]
-            red.delete(temp_cache_key)
-
     accounts_d: Dict[str, str] = async_to_sync(get_account_id_to_name_mapping)()
     tasks = []
     if config.region == config.get("celery.active_region", config.region) or config.get(
@@ -1116,94 +1322,90 @@ def cache_iam_resources_across_accounts(
         roles = dynamo.fetch_all_roles()
         for role_entry in roles:
             _add_role_to_redis(cache_keys["iam_roles"]["cache_key"], role_entry)
+        _touch_redis_last_updated(cache_keys["iam_roles"]["cache_key"])
 
-    # Delete roles in Redis cache with expired TTL
-    all_roles = red.hgetall(cache_keys["iam_roles"]["cache_key"])
-    roles_to_delete_from_cache = []
-    for arn, role_entry_j in all_roles.items():
-        role_entry = json.loads(role_entry_j)
-        if datetime.fromtimestamp(role_entry["ttl"]) < datetime.utcnow():
-            roles_to_delete_from_cache.append(arn)
-    if roles_to_delete_from_cache:
-        red.hdel(cache_keys["iam_roles"]["cache_key"], *roles_to_delete_from_cache)
-        for arn in roles_to_delete_from_cache:
-            all_roles.pop(arn, None)
-    log_data["num_iam_roles"] = len(all_roles)
-    # Store full list of roles in a single place. This list will be ~30 minutes out of date.
-    if all_roles:
-        async_to_sync(store_json_results_in_redis_and_s3)(
-            all_roles,
-            redis_key=cache_keys["iam_roles"]["cache_key"],
-            redis_data_type="hash",
-            s3_bucket=config.get(
-                "cache_iam_resources_across_accounts.all_roles_combined.s3.bucket"
-            ),
-            s3_key=config.get(
-                "cache_iam_resources_across_accounts.all_roles_combined.s3.file",
-                "account_resource_cache/cache_all_roles_v1.json.gz",
-            ),
-        )
-
-    all_iam_users = red.hgetall(cache_keys["iam_users"]["temp_cache_key"])
-    log_data["num_iam_users"] = len(all_iam_users)
-
-    if all_iam_users:
-        async_to_sync(store_json_results_in_redis_and_s3)(
-            all_iam_users,
-            redis_key=cache_keys["iam_users"]["cache_key"],
-            redis_data_type="hash",
-            s3_bucket=config.get(
-                "cache_iam_resources_across_accounts.all_users_combined.s3.bucket"
-            ),
-            s3_key=config.get(
-                "cache_iam_resources_across_accounts.all_users_combined.s3.file",
-                "account_resource_cache/cache_all_users_v1.json.gz",
-            ),
-        )
-
-    # IAM Groups
-    all_iam_groups = red.hgetall(cache_keys["iam_groups"]["temp_cache_key"])
-    log_data["num_iam_groups"] = len(all_iam_groups)
+    # Without subtasks, the combined copies are rewritten from what is already in Redis
+    log_data.update(combine_iam_resources_across_accounts(force=not run_subtasks))
+    log_data["function"] = function
+    stats.count(f"{function}.success")
+    log_data["num_accounts"] = len(accounts_d)
+    log.debug(log_data)
+    return log_data
 
-    if all_iam_groups:
-        async_to_sync(store_json_results_in_redis_and_s3)(
-            all_iam_groups,
-            redis_key=cache_keys["iam_groups"]["cache_key"],
-            redis_data_type="hash",
-            s3_bucket=config.get(
-                "cache_iam_resources_across_accounts.all_groups_combined.s3.bucket"
-            ),
-            s3_key=config.get(
-                "cache_iam_resources_across_accounts.all_groups_combined.s3.file",
-                "account_resource_cache/cache_all_groups_v1.json.gz",
-            ),
-        )
 
-    # IAM Policies
-    all_iam_policies = red.hgetall(cache_keys["iam_policies"]["temp_cache_key"])
-    log_data["num_iam_policies"] = len(all_iam_groups)
+@app.task(soft_time_limit=1800)
+def combine_iam_resources_across_accounts(force: bool = False) -> Dict:
+    """
+    Deletes expired IAM resources from Redis with range queries on their TTLs, and stores each cache in S3 if any
+    account's resources changed since the last checkpoint.
 
-    if all_iam_policies:
-        async_to_sync(store_json_results_in_redis_and_s3)(
-            all_iam_policies,
-            redis_key=cache_keys["iam_policies"]["cache_key"],
-            redis_data_type="hash",
-            s3_bucket=config.get(
-                "cache_iam_resources_across_accounts.all_policies_combined.s3.bucket"
-            ),
-            s3_key=config.get(
-                "cache_iam_resources_across_accounts.all_policies_combined.s3.file",
-                "account_resource_cache/cache_all_policies_v1.json.gz",
-            ),
-        )
+    :param force: Store the caches in S3 even if no resources changed
+    """
+    function = f"{__name__}.{sys._getframe().f_code.co_name}"
+    log_data = {"function": function}
+    if is_task_already_running(function, []):
+        log_data["message"] = "Skipping task: An identical task is currently running"
+        log.debug(log_data)
+        return log_data
 
-    # Remove temporary cache keys that were populated by the `cache_iam_resources_for_account(account_id)` tasks
-    for k, v in cache_keys.items():
-        temp_cache_key = v["temp_cache_key"]
-        red.delete(temp_cache_key)
+    started = time.time()
+    checkpoint_key = config.get(
+        "cache_iam_resources_across_accounts.checkpoint_redis_key",
+        "IAM_RESOURCES_COMBINED_CHECKPOINT",
+    )
+    checkpoint = red.get(checkpoint_key) or 0
+    updated_accounts = red.zrangebyscore(
+        config.get(
+            "cache_iam_resources_across_accounts.account_updates_redis_key",
+            "IAM_RESOURCES_ACCOUNT_UPDATES",
+        ),
+        f"({checkpoint}",
+        "+inf",
+    )
+    log_data["updated_accounts"] = updated_accounts
+
+    cache_keys = _iam_resource_cache_keys()
+    now = int(datetime.utcnow().timestamp())
+    changed_resource_types = []
+    for resource_type, keys in cache_keys.items():
+        expired = _expire_cached_resources_from_redis(keys["cache_key"], now)
+        log_data[f"num_expired_{resource_type}"] = len(expired)
+        # Account updates don't say which resource types changed, so they rewrite every type
+        if force or updated_accounts or expired:
+            changed_resource_types.append(resource_type)
+
+    if not changed_resource_types:
+        log_data["message"] = "No IAM resources changed since the last checkpoint"
+        log.debug(log_data)
+        return log_data
 
+    # Store full list of resources in a single place. The combined objects are rewritten in full, but the resources
+    # are streamed from Redis to S3 a page at a time instead of being loaded with HGETALL.
+    s3_enabled = config.region == config.get(
+        "celery.active_region", config.region
+    ) or config.get("environment") in ["dev", "test"]
+    for resource_type in changed_resource_types:
+        keys = cache_keys[resource_type]
+        num_resources = red.hlen(keys["cache_key"])
+        log_data[f"num_{resource_type}"] = num_resources
+        if not (num_resources and s3_enabled):
+            continue
+        with StreamingJsonDictWriter(
+            keys["s3_bucket"] or config.get("consoleme_s3_bucket"),
+            keys["s3_key"],
+            int(time.time()),
+        ) as s3_writer:
+            index = 0
+            while True:
+                index, resources = _scan_redis_iam_cache(
+                    keys["cache_key"], index, REDIS_IAM_COUNT
+                )
+                for arn, resource_j in resources.items():
+                    s3_writer.add(arn, resource_j)
+                if not index:
+                    break
+    red.set(checkpoint_key, started)
     stats.count(f"{function}.success")
-    log_data["num_accounts"] = len(accounts_d)
     log.debug(log_data)
     return log_data
 
@@ -1448,43 +1650,41 @@ def cache_sqs_queues_for_account(account_id: str) -> Dict[str, Union[str, int]]:
         "function": f"{__name__}.{sys._getframe().f_code.co_name}",
         "account_id": account_id,
     }
-    all_queues: set = set()
     enabled_regions = async_to_sync(get_enabled_regions_for_account)(account_id)
-    for region in enabled_regions:
-        try:
-            client = boto3_cached_conn(
-                "sqs",
-                account_number=account_id,
-                assume_role=config.get("policies.role_name"),
-                region=region,
-                read_only=True,
-                sts_client_kwargs=dict(
-                    region_name=config.region,
-                    endpoint_url=config.get(
-                        "aws.sts_endpoint_url", "https://sts.{region}.amazonaws.com"
-                    ).format(region=config.region),
-                ),
-                client_kwargs=config.get("boto3.client_kwargs", {}),
-            )
 
-            paginator = client.get_paginator("list_queues")
+    def _list_queues(region: str) -> List[str]:
+        client = boto3_cached_conn(
+            "sqs",
+            account_number=account_id,
+            assume_role=config.get("policies.role_name"),
+            region=region,
+            read_only=True,
+            sts_client_kwargs=dict(
+                region_name=config.region,
+                endpoint_url=config.get(
+                    "aws.sts_endpoint_url", "https://sts.{region}.amazonaws.com"
+                ).format(region=config.region),
+            ),
+            client_kwargs=config.get("boto3.client_kwargs", {}),
+        )
 
-            response_iterator = paginator.paginate(PaginationConfig={"PageSize": 1000})
+        paginator = client.get_paginator("list_queues")
 
-            for res in response_iterator:
-                for queue in res.get("QueueUrls", []):
-                    arn = f"arn:aws:sqs:{region}:{account_id}:{queue.split('/')[4]}"
-                    all_queues.add(arn)
-        except Exception as e:
-            log.error(
-                {
-                    **log_data,
-                    "region": region,
-                    "message": "Unable to sync SQS queues from region",
-                    "error": str(e),
-                }
-            )
-            sentry_sdk.capture_exception()
+        response_iterator = paginator.paginate(PaginationConfig={"PageSize": 1000})
+
+        queues = []
+        for res in response_iterator:
+            for queue in res.get("QueueUrls", []):
+                queues.append(
+                    f"arn:aws:sqs:{region}:{account_id}:{queue.split('/')[4]}"
+                )
+        return queues
+
+    all_queues: set = set()
+    for queues in collect_across_regions(
+        _list_queues, enabled_regions, "sqs_queues", log_data=log_data
+    ).values():
+        all_queues.update(queues)
     sqs_queue_key: str = config.get("redis.sqs_queues_key", "SQS_QUEUES")
     red.hset(sqs_queue_key, account_id, json.dumps(list(all_queues)))
 
@@ -1517,35 +1717,29 @@ def cache_sns_topics_for_account(account_id: str) -> Dict[str, Union[str, int]]:
         "function": f"{__name__}.{sys._getframe().f_code.co_name}",
         "account_id": account_id,
     }
-    all_topics: set = set()
     enabled_regions = async_to_sync(get_enabled_regions_for_account)(account_id)
-    for region in enabled_regions:
-        try:
-            topics = list_topics(
-                account_number=account_id,
-                assume_role=config.get("policies.role_name"),
-                region=region,
-                read_only=True,
-                sts_client_kwargs=dict(
-                    region_name=config.region,
-                    endpoint_url=config.get(
-                        "aws.sts_endpoint_url", "https://sts.{region}.amazonaws.com"
-                    ).format(region=config.region),
-                ),
-                client_kwargs=config.get("boto3.client_kwargs", {}),
-            )
-            for topic in topics:
-                all_topics.add(topic["TopicArn"])
-        except Exception as e:
-            log.error(
-                {
-                    **log_data,
-                    "region": region,
-                    "message": "Unable to sync SNS topics from region",
-                    "error": str(e),
-                }
-            )
-            sentry_sdk.capture_exception()
+
+    def _list_topics(region: str) -> List[str]:
+        topics = list_topics(
+            account_number=account_id,
+            assume_role=config.get("policies.role_name"),
+            region=region,
+            read_only=True,
+            sts_client_kwargs=dict(
+                region_name=config.region,
+                endpoint_url=config.get(
+                    "aws.sts_endpoint_url", "https://sts.{region}.amazonaws.com"
+                ).format(region=config.region),
+            ),
+            client_kwargs=config.get("boto3.client_kwargs", {}),
+        )
+        return [topic["TopicArn"] for topic in topics]
+
+    all_topics: set = set()
+    for topics in collect_across_regions(
+        _list_topics, enabled_regions, "sns_topics", log_data=log_data
+    ).values():
+        all_topics.update(topics)
 
     sns_topic_key: str = config.get("redis.sns_topics_key", "SNS_TOPICS")
     red.hset(sns_topic_key, account_id, json.dumps(list(all_topics)))
@@ -1572,6 +1766,39 @@ def cache_sns_topics_for_account(account_id: str) -> Dict[str, Union[str, int]]:
     return log_data
 
 
+def _update_s3_bucket_account_index(
+    account_id: str, buckets: List[str], previous_buckets: List[str]
+) -> None:
+    """
+    Updates the bucket name -> account ID index used by `get_resource_account` with the buckets of an account. Only
+    buckets that aren't already indexed to the account are written, and buckets that were removed from the account
+    are removed from the index unless they've since been indexed to another account.
+    """
+    s3_bucket_accounts_key: str = config.get(
+        "redis.s3_bucket_accounts_key", "S3_BUCKET_ACCOUNTS"
+    )
+    if buckets:
+        indexed_accounts = red.hmget(s3_bucket_accounts_key, buckets)
+        new_buckets = {
+            bucket: account_id
+            for bucket, indexed_account in zip(buckets, indexed_accounts)
+            if indexed_account != account_id
+        }
+        if new_buckets:
+            red.hset(s3_bucket_accounts_key, mapping=new_buckets)
+
+    removed_buckets = list(set(previous_buckets) - set(buckets))
+    if removed_buckets:
+        indexed_accounts = red.hmget(s3_bucket_accounts_key, removed_buckets)
+        buckets_to_remove = [
+            bucket
+            for bucket, indexed_account in zip(removed_buckets, indexed_accounts)
+            if indexed_account == account_id
+        ]
+        if buckets_to_remove:
+            red.hdel(s3_bucket_accounts_key, *buckets_to_remove)
+
+
 @app.task(soft_time_limit=1800, **default_retry_kwargs)
 def cache_s3_buckets_for_account(account_id: str) -> Dict[str, Union[str, int]]:
     s3_buckets: List = list_buckets(
@@ -1585,7 +1812,9 @@ def cache_s3_buckets_for_account(account_id: str) -> Dict[str, Union[str, int]]:
     for bucket in s3_buckets["Buckets"]:
         buckets.append(bucket["Name"])
     s3_bucket_key: str = config.get("redis.s3_buckets_key", "S3_BUCKETS")
+    previous_buckets = json.loads(red.hget(s3_bucket_key, account_id) or "[]")
     red.hset(s3_bucket_key, account_id, json.dumps(buckets))
+    _update_s3_bucket_account_index(account_id, buckets, previous_buckets)
 
     log_data = {
         "function": f"{__name__}.{sys._getframe().f_code.co_name}",
@@ -1631,41 +1860,12 @@ def clear_old_redis_iam_cache() -> bool:
     if config.region != config.get("celery.active_region", config.region):
         return False
 
-    # Need to loop over all items in the set:
     cache_key: str = config.get("aws.iamroles_redis_key", "IAM_ROLE_CACHE")
-    index: int = 0
     expire_ttl: int = int((datetime.utcnow() - timedelta(hours=6)).timestamp())
-    roles_to_expire = []
 
-    # We will loop over REDIS_IAM_COUNT items at a time:
+    # Expired roles are found with a range query on their TTLs, instead of a scan of every role
     try:
-        while True:
-            results = _scan_redis_iam_cache(cache_key, index, REDIS_IAM_COUNT)
-            index = results[0]
-
-            # Verify if the role is too old:
-            for arn, role in results[1].items():
-                role = json.loads(role)
-
-                if role["ttl"] <= expire_ttl:
-                    roles_to_expire.append(arn)
-
-            # We will be complete if the next index is 0:
-            if not index:
-                break
-
-    except:  # noqa
-        log_data = {
-            "function": function,
-            "message": "Error retrieving roles from Redis for cache cleanup.",
-        }
-        log.error(log_data, exc_info=True)
-        raise
-
-    # Delete all the roles that we need to delete:
-    try:
-        if roles_to_expire:
-            red.hdel(cache_key, *roles_to_expire)
+        roles_to_expire = _expire_cached_resources_from_redis(cache_key, expire_ttl)
     except:  # noqa
         log_data = {
             "function": function,
@@ -1678,6 +1878,22 @@ def clear_old_redis_iam_cache() -> bool:
     return True
 
 
+def _add_aws_config_resources_to_redis(
+    cache_key: str, resources: Dict[str, str], ttls: Dict[str, int]
+) -> None:
+    """Add JSON encoded AWS Config resources to their cache by ARN, and track the TTL of each entry"""
+    arns = list(resources)
+    pipeline = red.pipeline()
+    for i in range(0, len(arns), 1000):
+        chunk = arns[i : i + 1000]
+        pipeline.hset(cache_key, mapping={arn: resources[arn] for arn in chunk})
+        pipeline.zadd(
+            iam_resource_expirations_key(cache_key),
+            {arn: ttls[arn] for arn in chunk},
+        )
+    pipeline.execute()
+
+
 @app.task(soft_time_limit=3600, **default_retry_kwargs)
 def cache_resources_from_aws_config_for_account(account_id) -> dict:
     function: str = f"{__name__}.{sys._getframe().f_code.co_name}"
@@ -1698,15 +1914,22 @@ def cache_resources_from_aws_config_for_account(account_id) -> dict:
         log.debug(log_data)
         return log_data
 
-    s3_bucket = config.get("aws_config_cache.s3.bucket")
+    resource_redis_cache_key = config.get(
+        "aws_config_cache.redis_key", "AWSCONFIG_RESOURCE_CACHE"
+    )
+    # Use the default bucket, as store_json_results_in_redis_and_s3 does when it's given a key without a bucket
+    s3_bucket = config.get("aws_config_cache.s3.bucket") or config.get(
+        "consoleme_s3_bucket"
+    )
     s3_key = config.get(
         "aws_config_cache.s3.file", "aws_config_cache/cache_{account_id}_v1.json.gz"
     ).format(account_id=account_id)
+    number_resources_synced = 0
     # Only query in active region, otherwise get data from DDB
     if config.region == config.get("celery.active_region", config.region) or config.get(
         "environment"
     ) in ["dev", "test"]:
-        results = aws_config.query(
+        pages = aws_config.query_pages(
             config.get(
                 "cache_all_resources_from_aws_config.aws_config.all_resources_query",
                 "select * where accountId = '{account_id}'",
@@ -1716,44 +1939,66 @@ def cache_resources_from_aws_config_for_account(account_id) -> dict:
         )
 
         ttl: int = int((datetime.utcnow() + timedelta(hours=36)).timestamp())
-        redis_result_set = {}
-        for result in results:
-            result["ttl"] = ttl
-            if result.get("arn"):
-                if redis_result_set.get(result["arn"]):
+        dynamo = None
+        if config.get(
+            "celery.cache_resources_from_aws_config_across_accounts.dynamo_enabled",
+            True,
+        ):
+            dynamo = UserDynamoHandler()
+        s3_writer = None
+        if s3_bucket:
+            s3_writer = StreamingJsonDictWriter(s3_bucket, s3_key, int(time.time()))
+        # Each page is written to Redis, S3 and DynamoDB as soon as it arrives, so only a page of results is held in
+        # memory at a time
+        try:
+            for results in pages:
+                redis_result_set = {}
+                for result in results:
+                    result["ttl"] = ttl
+                    if result.get("arn"):
+                        redis_result_set[result["arn"]] = json.dumps(
+                            un_wrap_json(result)
+                        )
+                if not redis_result_set:
                     continue
-                redis_result_set[result["arn"]] = json.dumps(result)
-        if redis_result_set:
-            async_to_sync(store_json_results_in_redis_and_s3)(
-                un_wrap_json_and_dump_values(redis_result_set),
-                redis_key=config.get(
-                    "aws_config_cache.redis_key", "AWSCONFIG_RESOURCE_CACHE"
-                ),
-                redis_data_type="hash",
-                s3_bucket=s3_bucket,
-                s3_key=s3_key,
-            )
-
-            if config.get(
-                "celery.cache_resources_from_aws_config_across_accounts.dynamo_enabled",
-                True,
-            ):
-                dynamo = UserDynamoHandler()
-                dynamo.write_resource_cache_data(results)
+                _add_aws_config_resources_to_redis(
+                    resource_redis_cache_key,
+                    redis_result_set,
+                    dict.fromkeys(redis_result_set, ttl),
+                )
+                if s3_writer:
+                    for arn, resource_j in redis_result_set.items():
+                        s3_writer.add(arn, resource_j)
+                if dynamo:
+                    dynamo.write_resource_cache_data(results)
+                number_resources_synced += len(redis_result_set)
+        except Exception:
+            if s3_writer:
+                s3_writer.abort()
+            raise
+        # Like store_json_results_in_redis_and_s3, the S3 copy is only written if something was found
+        if s3_writer and number_resources_synced:
+            s3_writer.close()
+        elif s3_writer:
+            s3_writer.abort()
     else:
         redis_result_set = async_to_sync(retrieve_json_data_from_redis_or_s3)(
             s3_bucket=s3_bucket, s3_key=s3_key
         )
-
-        async_to_sync(store_json_results_in_redis_and_s3)(
-            redis_result_set,
-            redis_key=config.get(
-                "aws_config_cache.redis_key", "AWSCONFIG_RESOURCE_CACHE"
-            ),
-            redis_data_type="hash",
-        )
+        if redis_result_set:
+            _add_aws_config_resources_to_redis(
+                resource_redis_cache_key,
+                redis_result_set,
+                {
+                    arn: ujson.loads(resource_j)["ttl"]
+                    for arn, resource_j in redis_result_set.items()
+                },
+            )
+        number_resources_synced = len(redis_result_set)
+    if number_resources_synced:
+        _touch_redis_last_updated(resource_redis_cache_key)
     log_data["message"] = "Successfully cached resources from AWS Config for account"
-    log_data["number_resources_synced"] = len(redis_result_set)
+    log_data["number_resources_synced"] = number_resources_synced
     log.debug(log_data)
     return log_data
 
@@ -1798,36 +2043,75 @@ def cache_resources_from_aws_config_across_accounts(
                 # results.join() forces function to wait until all tasks are complete
                 results.join(disable_sync_subtasks=False)
 
-    # Delete roles in Redis cache with expired TTL
-    all_resources = red.hgetall(resource_redis_cache_key)
-    if all_resources:
-        expired_arns = []
-        for arn, resource_entry_j in all_resources.items():
-            resource_entry = ujson.loads(resource_entry_j)
-            if datetime.fromtimestamp(resource_entry["ttl"]) < datetime.utcnow():
-                expired_arns.append(arn)
-        if expired_arns:
-            for expired_arn in expired_arns:
-                all_resources.pop(expired_arn, None)
-            red.hdel(resource_redis_cache_key, *expired_arns)
-
-        log_data["number_of_resources"] = len(all_resources)
-
-        # Cache all resource ARNs into a single file. Note: This runs synchronously with this task. This task triggers
-        # resource collection on all accounts to happen asynchronously. That means when we store or delete data within
-        # this task, we're always going to be caching the results from the previous task.
-        if config.region == config.get(
-            "celery.active_region", config.region
-        ) or config.get("environment") in ["dev"]:
-            # Refresh all resources after deletion of expired entries
-            all_resources = red.hgetall(resource_redis_cache_key)
-            s3_bucket = config.get("aws_config_cache_combined.s3.bucket")
-            s3_key = config.get(
-                "aws_config_cache_combined.s3.file",
-                "aws_config_cache_combined/aws_config_resource_cache_combined_v1.json.gz",
-            )
+    # Delete resources in Redis cache with expired TTL. Expired resources are found with a range query on their
+    # TTLs, instead of decoding every cached resource.
+    expired_arns = _expire_cached_resources_from_redis(
+        resource_redis_cache_key, int(datetime.utcnow().timestamp())
+    )
+    log_data["number_of_expired_resources"] = len(expired_arns)
+
+    # Cache all resource ARNs into a single file. Note: This runs synchronously with this task. This task triggers
+    # resource collection on all accounts to happen asynchronously. That means when we store or delete data within
+    # this task, we're always going to be caching the results from the previous task.
+    if config.region == config.get(
+        "celery.active_region", config.region
+    ) or config.get("environment") in ["dev"]:
+        # Use the default bucket, as store_json_results_in_redis_and_s3 does when it's given a key without a bucket
+        s3_bucket = config.get("aws_config_cache_combined.s3.bucket") or config.get(
+            "consoleme_s3_bucket"
+        )
+        s3_key = config.get(
+            "aws_config_cache_combined.s3.file",
+            "aws_config_cache_combined/aws_config_resource_cache_combined_v1.json.gz",
+        )
+        # The combined file is streamed from an HSCAN of the cache, so only the ARNs are held in memory. HSCAN may
+        # return an entry more than once.
+        resource_arns: Dict[str, None] = {}
+        s3_writer = None
+        if s3_bucket:
+            s3_writer = StreamingJsonDictWriter(s3_bucket, s3_key, int(time.time()))
+        try:
+            index = 0
+            while True:
+                index, resources = _scan_redis_iam_cache(
+                    resource_redis_cache_key, index, REDIS_IAM_COUNT
+                )
+                for arn, resource_j in resources.items():
+                    if arn in resource_arns:
+                        continue
+                    resource_arns[arn] = None
+                    if s3_writer:
+                        s3_writer.add(arn, resource_j)
+                if not index:
+                    break
+        except Exception:
+            if s3_writer:
+                s3_writer.abort()
+            raise
+        if s3_writer and resource_arns:
+            s3_writer.close()
+        elif s3_writer:
+            s3_writer.abort()
+        log_data["number_of_resources"] = len(resource_arns)
+
+        if resource_arns:
+            # Prebuilt search index for ResourceTypeAheadHandlerV2
+            resource_arns = list(resource_arns)
             async_to_sync(store_json_results_in_redis_and_s3)(
-                all_resources, s3_bucket=s3_bucket, s3_key=s3_key
+                build_typeahead_document(
+                    resource_arns,
+                    values=resource_arns,
+                    partitions=[arn_partitions(arn) for arn in resource_arns],
+                ),
+                redis_key=config.get(
+                    "aws_config_cache.typeahead_index.redis_key",
+                    "AWSCONFIG_RESOURCE_TYPEAHEAD_INDEX",
+                ),
+                s3_bucket=config.get("aws_config_cache.typeahead_index.s3.bucket"),
+                s3_key=config.get(
+                    "aws_config_cache.typeahead_index.s3.file",
+                    "aws_config_cache_combined/aws_config_resource_typeahead_index_v1.json.gz",
+                ),
             )
     stats.count(f"{function}.success")
     return log_data
@@ -1929,6 +2213,40 @@ def cache_policy_requests() -> Dict:
     return log_data
 
 
+@app.task(soft_time_limit=3600)
+def migrate_policy_requests_to_v3() -> Dict:
+    """
+    Converts stored policy requests to v3 and adds the attributes used by the listing indexes of the policy requests
+    table. This only needs to run once, so it does nothing after it has completed.
+    """
+    function = f"{__name__}.{sys._getframe().f_code.co_name}"
+    log_data = {"function": function}
+    completed_redis_key = config.get(
+        "migrate_policy_requests_to_v3.completed_redis_key",
+        "POLICY_REQUESTS_V3_MIGRATION_COMPLETED",
+    )
+    if red.get(completed_redis_key):
+        log_data["message"] = "Policy requests have already been migrated"
+        log.debug(log_data)
+        return log_data
+    if is_task_already_running(function, []):
+        log_data["message"] = "Skipping task: An identical task is currently running"
+        log.debug(log_data)
+        return log_data
+
+    num_migrated_requests = async_to_sync(
+        UserDynamoHandler().migrate_policy_requests_to_v3
+    )()
+    red.set(completed_redis_key, int(time.time()))
+    log_data["message"] = "Successfully migrated policy requests"
+    log_data["num_migrated_requests"] = num_migrated_requests
+    log.debug(log_data)
+    stats.count(
+        f"{function}.success", tags={"num_migrated_requests": num_migrated_requests}
+    )
+    return log_data
+
+
 @app.task(soft_time_limit=300)
 def cache_cloud_account_mapping() -> Dict:
     function = f"{__name__}.{sys._getframe().f_code.co_name}"
@@ -1956,6 +2274,12 @@ def cache_credential_authorization_mapping() -> Dict:
         log.debug(log_data)
         return log_data
 
+    index_version_redis_key = config.get(
+        "generate_and_store_credential_authorization_index.version_redis_key",
+        "CREDENTIAL_AUTHORIZATION_INDEX_VERSION_V1",
+    )
+    previous_index_version = red.get(index_version_redis_key)
+
     authorization_mapping = async_to_sync(
         generate_and_store_credential_authorization_mapping
     )()
@@ -1964,7 +2288,19 @@ def cache_credential_authorization_mapping() -> Dict:
         authorization_mapping
     )
 
+    authorization_index = async_to_sync(
+        generate_and_store_credential_authorization_index
+    )(authorization_mapping)
+
     log_data["num_group_authorizations"] = len(authorization_mapping)
+    log_data["authorization_index_version"] = authorization_index.version
+    # When role changes are applied incrementally, a changed index means that some changes were missed, or that
+    # dynamic config or the internal plugin changed since the last regeneration.
+    log_data["authorization_index_changed"] = (
+        previous_index_version != authorization_index.version
+    )
+    if log_data["authorization_index_changed"]:
+        stats.count(f"{function}.authorization_index_changed")
     log_data["num_identities"] = len(reverse_mapping)
     log.debug(
         {
@@ -2004,6 +2340,13 @@ def cache_organization_structure() -> Dict:
 @app.task(soft_time_limit=1800, **default_retry_kwargs)
 def cache_resource_templates_task() -> Dict:
     function = f"{__name__}.{sys._getframe().f_code.co_name}"
+    if is_task_already_running(function, []):
+        log_data = {
+            "function": function,
+            "message": "Skipping task: An identical task is currently running",
+        }
+        log.debug(log_data)
+        return log_data
     templated_file_array = async_to_sync(cache_resource_templates)()
     log_data = {
         "function": function,
@@ -2052,7 +2395,20 @@ def trigger_credential_mapping_refresh_from_role_changes():
         "message": "Successfully checked role changes",
         "num_roles_changed": len(roles_changed),
     }
-    if roles_changed:
+    if roles_changed and config.get(
+        "cloud_credential_authorization_mapping.incremental.enabled", False
+    ):
+        # Only apply the changed roles to the credential authorization mapping. The periodic
+        # cache_credential_authorization_mapping task still regenerates it from every role.
+        red.sadd(
+            config.get(
+                "cloud_credential_authorization_mapping.incremental.pending_roles_redis_key",
+                "CREDENTIAL_AUTHORIZATION_PENDING_ROLE_CHANGES",
+            ),
+            *roles_changed,
+        )
+        update_credential_authorization_mapping_for_changed_roles.delay()
+    elif roles_changed:
         # Trigger credential authorization mapping refresh. We don't want credential authorization mapping refreshes
         # running in parallel, so the cache_credential_authorization_mapping is protected to prevent parallel runs.
         # This task can run in parallel without negative impact.
@@ -2061,6 +2417,57 @@ def trigger_credential_mapping_refresh_from_role_changes():
     return log_data
 
 
+@app.task(soft_time_limit=600, **default_retry_kwargs)
+def update_credential_authorization_mapping_for_changed_roles() -> Dict:
+    """
+    This task refreshes the roles queued by trigger_credential_mapping_refresh_from_role_changes, and applies their
+    changes to the credential authorization mapping.
+    """
+    function = f"{__name__}.{sys._getframe().f_code.co_name}"
+    log_data = {"function": function, "num_roles_changed": 0, "full_rebuild": False}
+    if is_task_already_running(function, []):
+        log_data["message"] = "Skipping task: An identical task is currently running"
+        log.debug(log_data)
+        return log_data
+
+    pending_roles_redis_key = config.get(
+        "cloud_credential_authorization_mapping.incremental.pending_roles_redis_key",
+        "CREDENTIAL_AUTHORIZATION_PENDING_ROLE_CHANGES",
+    )
+    # Roles queued while changes are applied are picked up by the next iteration
+    role_arns = red.spop(pending_roles_redis_key, 1000)
+    while role_arns:
+        role_entries = {}
+        for role_arn in role_arns:
+            try:
+                role_entries[role_arn] = async_to_sync(aws().fetch_iam_role)(
+                    role_arn.split(":")[4], role_arn, force_refresh=True, run_sync=True
+                )
+            except Exception as e:
+                # The next full regeneration of the mapping will pick up this role's changes
+                log.error(
+                    {
+                        **log_data,
+                        "message": "Unable to refresh role",
+                        "role_arn": role_arn,
+                        "error": str(e),
+                    },
+                    exc_info=True,
+                )
+                sentry_sdk.capture_exception()
+        result = async_to_sync(apply_role_changes_to_credential_authorization_mapping)(
+            role_entries
+        )
+        log_data["num_roles_changed"] += result.get("num_roles_changed", 0)
+        log_data["full_rebuild"] = log_data["full_rebuild"] or result["full_rebuild"]
+        role_arns = red.spop(pending_roles_redis_key, 1000)
+    log_data[
+        "message"
+    ] = "Successfully applied role changes to credential authorization mapping"
+    log.debug(log_data)
+    return log_data
+
+
 @app.task(soft_time_limit=3600, **default_retry_kwargs)
 def cache_cloudtrail_denies():
     """
@@ -2141,6 +2548,11 @@ def cache_notifications() -> Dict[str, Any]:
         "options": {"expires": 1000},
         "schedule": schedule_45_minute,
     },
+    "combine_iam_resources_across_accounts": {
+        "task": "consoleme.celery_tasks.celery_tasks.combine_iam_resources_across_accounts",
+        "options": {"expires": 180},
+        "schedule": schedule_5_minutes,
+    },
     "clear_old_redis_iam_cache": {
         "task": "consoleme.celery_tasks.celery_tasks.clear_old_redis_iam_cache",
         "options": {"expires": 180},
@@ -2191,6 +2603,11 @@ def cache_notifications() -> Dict[str, Any]:
         "options": {"expires": 1000},
         "schedule": schedule_5_minutes,
     },
+    "migrate_policy_requests_to_v3": {
+        "task": "consoleme.celery_tasks.celery_tasks.migrate_policy_requests_to_v3",
+        "options": {"expires": 1000},
+        "schedule": schedule_6_hours,
+    },
     "cache_cloud_account_mapping": {
         "task": "consoleme.celery_tasks.celery_tasks.cache_cloud_account_mapping",
         "options": {"expires": 1000},
@@ -1,9 +1,14 @@
 import asyncio
 import copy
+import functools
+import hashlib
 import ssl
 import sys
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
 import bleach
 import boto3
@@ -30,12 +35,151 @@
 from consoleme.lib.dynamo import IAMRoleDynamoHandler
 from consoleme.lib.plugins import get_plugin_by_name
 from consoleme.lib.policies import send_communications_policy_change_request_v2
-from consoleme.lib.redis import RedisHandler
+from consoleme.lib.redis import RedisHandler, iam_resource_expirations_key
 
 stats = get_plugin_by_name(config.get("plugins.metrics", "default_metrics"))()
 
 log = config.get_logger(__name__)
 
+# boto3 clients are thread-safe, and creating one loads the service model, so STS clients are shared across requests
+_sts_clients: Dict[Tuple[str, str], Any] = {}
+_sts_clients_lock = threading.Lock()
+# Credentials recently returned by get_credentials, keyed by user, role and session policy
+_credential_cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+
+def get_sts_client(region: str) -> Any:
+    """Returns a pooled STS client for the region's STS endpoint."""
+    endpoint_url = config.get(
+        "aws.sts_endpoint_url", "https://sts.{region}.amazonaws.com"
+    ).format(region=region)
+    client_key = (region, endpoint_url)
+    client = _sts_clients.get(client_key)
+    if client:
+        return client
+    with _sts_clients_lock:
+        client = _sts_clients.get(client_key)
+        if not client:
+            client = boto3.Session().client(
+                "sts", region_name=region, endpoint_url=endpoint_url
+            )
+            _sts_clients[client_key] = client
+    return client
+
+
+@functools.lru_cache(maxsize=128)
+def ip_restriction_session_policy(ip_restrictions: Tuple[str, ...]) -> str:
+    """Returns the session policy denying requests from outside of `ip_restrictions`"""
+    return json.dumps(
+        dict(
+            Version="2012-10-17",
+            Statement=[
+                dict(
+                    Effect="Deny",
+                    Action="*",
+                    Resource="*",
+                    Condition=dict(
+                        NotIpAddress={"aws:SourceIP": list(ip_restrictions)},
+                        Null={
+                            "aws:ViaAWSService": "true",
+                            "aws:PrincipalTag/AWSServiceTrust": "true",
+                        },
+                        StringNotLike={
+                            "aws:PrincipalArn": ["arn:aws:iam::*:role/aws:*"]
+                        },
+                    ),
+                ),
+                dict(Effect="Allow", Action="*", Resource="*"),
+            ],
+        )
+    )
+
+
+def _credential_cache_key(
+    user: str, role: str, policy: Optional[str], duration_seconds: int
+) -> str:
+    return hashlib.sha256(
+        json.dumps([user.lower(), role, policy, duration_seconds]).encode()
+    ).hexdigest()
+
+
+def _credentials_are_fresh(cached_at: float, credentials: Dict[str, Any]) -> bool:
+    now = time.time()
+    return now - cached_at < config.get(
+        "aws.get_credentials.cache.ttl", 300
+    ) and credentials["Credentials"]["Expiration"] - now >= config.get(
+        "aws.get_credentials.cache.min_remaining_lifetime", 1800
+    )
+
+
+def _credential_cache_redis_key_prefix() -> str:
+    return config.get(
+        "aws.get_credentials.cache.redis.key_prefix", "GET_CREDENTIALS_CACHE"
+    )
+
+
+def _store_credentials_in_memory(
+    cache_key: str, cached_at: float, credentials: Dict[str, Any]
+) -> None:
+    _credential_cache[cache_key] = (cached_at, credentials)
+    _credential_cache.move_to_end(cache_key)
+    while len(_credential_cache) > config.get(
+        "aws.get_credentials.cache.max_size", 10000
+    ):
+        _credential_cache.popitem(last=False)
+
+
+async def _get_cached_credentials(
+    cache_key: str, role: str
+) -> Optional[Dict[str, Any]]:
+    """
+    Returns a copy of credentials cached for `cache_key` if they were cached recently and are valid for long enough,
+    from memory or, if `aws.get_credentials.cache.redis.enabled` is set, from Redis.
+    """
+    cached = _credential_cache.get(cache_key)
+    if cached:
+        if _credentials_are_fresh(*cached):
+            _credential_cache.move_to_end(cache_key)
+            stats.count(
+                "aws.get_credentials.cache.hit", tags={"role": role, "source": "memory"}
+            )
+            return copy.deepcopy(cached[1])
+        del _credential_cache[cache_key]
+
+    if config.get("aws.get_credentials.cache.redis.enabled"):
+        red = await RedisHandler().redis()
+        # Raw commands are used so that credentials are never backed up to S3
+        cached_j = await red.execute_command(
+            "GET", f"{_credential_cache_redis_key_prefix()}:{cache_key}"
+        )
+        if cached_j:
+            cached = tuple(json.loads(cached_j))
+            if _credentials_are_fresh(*cached):
+                _store_credentials_in_memory(cache_key, *cached)
+                stats.count(
+                    "aws.get_credentials.cache.hit",
+                    tags={"role": role, "source": "redis"},
+                )
+                return copy.deepcopy(cached[1])
+
+    stats.count("aws.get_credentials.cache.miss", tags={"role": role})
+    return None
+
+
+async def _cache_credentials(cache_key: str, credentials: Dict[str, Any]) -> None:
+    cached_at = time.time()
+    credentials = copy.deepcopy(credentials)
+    _store_credentials_in_memory(cache_key, cached_at, credentials)
+    if config.get("aws.get_credentials.cache.redis.enabled"):
+        red = await RedisHandler().redis()
+        await red.execute_command(
+            "SET",
+            f"{_credential_cache_redis_key_prefix()}:{cache_key}",
+            json.dumps([cached_at, credentials]),
+            "EX",
+            int(config.get("aws.get_credentials.cache.ttl", 300)),
+        )
+
 
 class Aws:
     """The AWS class handles interactions with AWS."""
@@ -56,7 +200,14 @@ def _add_role_to_redis(self, role_entry: dict):
         :param role_entry:
         :return:
         """
-        self.red.hset(self.redis_key, role_entry["arn"], json.dumps(role_entry))
+        pipeline = self.red.pipeline()
+        pipeline.hset(self.redis_key, role_entry["arn"], json.dumps(role_entry))
+        if role_entry.get("ttl"):
+            pipeline.zadd(
+                iam_resource_expirations_key(self.redis_key),
+                {role_entry["arn"]: int(role_entry["ttl"])},
+            )
+        pipeline.execute()
 
     @retry(
         stop_max_attempt_number=3,
@@ -474,14 +625,7 @@ async def get_credentials(
             "custom_ip_restrictions": custom_ip_restrictions,
             "message": "Generating credentials",
         }
-        session = boto3.Session()
-        client = session.client(
-            "sts",
-            region_name=config.region,
-            endpoint_url=config.get(
-                "aws.sts_endpoint_url", "https://sts.{region}.amazonaws.com"
-            ).format(region=config.region),
-        )
+        client = get_sts_client(config.region)
 
         ip_restrictions = config.get("aws.ip_restrictions")
         stats.count("aws.get_credentials", tags={"role": role, "user": user})
@@ -497,113 +641,51 @@ async def get_credentials(
 
         await raise_if_background_check_required_and_no_background_check(role, user)
 
-        try:
-            if enforce_ip_restrictions and ip_restrictions:
-                policy = json.dumps(
-                    dict(
-                        Version="2012-10-17",
-                        Statement=[
-                            dict(
-                                Effect="Deny",
-                                Action="*",
-                                Resource="*",
-                                Condition=dict(
-                                    NotIpAddress={"aws:SourceIP": ip_restrictions},
-                                    Null={
-                                        "aws:ViaAWSService": "true",
-                                        "aws:PrincipalTag/AWSServiceTrust": "true",
-                                    },
-                                    StringNotLike={
-                                        "aws:PrincipalArn": [
-                                            "arn:aws:iam::*:role/aws:*"
-                                        ]
-                                    },
-                                ),
-                            ),
-                            dict(Effect="Allow", Action="*", Resource="*"),
-                        ],
-                    )
-                )
-
-                credentials = await sync_to_async(client.assume_role)(
-                    RoleArn=role,
-                    RoleSessionName=user.lower(),
-                    Policy=policy,
-                    DurationSeconds=config.get("aws.session_duration", 3600),
-                )
-                credentials["Credentials"]["Expiration"] = int(
-                    credentials["Credentials"]["Expiration"].timestamp()
-                )
-                log.debug(
-                    {
-                        **log_data,
-                        "access_key_id": credentials["Credentials"]["AccessKeyId"],
-                    }
-                )
-                return credentials
-            if custom_ip_restrictions:
-                policy = json.dumps(
-                    dict(
-                        Version="2012-10-17",
-                        Statement=[
-                            dict(
-                                Effect="Deny",
-                                Action="*",
-                                Resource="*",
-                                Condition=dict(
-                                    NotIpAddress={
-                                        "aws:SourceIP": custom_ip_restrictions
-                                    },
-                                    Null={
-                                        "aws:ViaAWSService": "true",
-                                        "aws:PrincipalTag/AWSServiceTrust": "true",
-                                    },
-                                    StringNotLike={
-                                        "aws:PrincipalArn": [
-                                            "arn:aws:iam::*:role/aws:*"
-                                        ]
-                                    },
-                                ),
-                            ),
-                            dict(Effect="Allow", Action="*", Resource="*"),
-                        ],
-                    )
-                )
-
-                credentials = await sync_to_async(client.assume_role)(
-                    RoleArn=role,
-                    RoleSessionName=user.lower(),
-                    Policy=policy,
-                    DurationSeconds=config.get("aws.session_duration", 3600),
-                )
-                credentials["Credentials"]["Expiration"] = int(
-                    credentials["Credentials"]["Expiration"].timestamp()
-                )
+        policy = None
+        if enforce_ip_restrictions and ip_restrictions:
+            policy = ip_restriction_session_policy(tuple(ip_restrictions))
+        elif custom_ip_restrictions:
+            policy = ip_restriction_session_policy(tuple(custom_ip_restrictions))
+        duration_seconds = config.get("aws.session_duration", 3600)
+
+        # Credentials for newly created user roles aren't cached, since the role may not be assumable yet
+        use_cache = not user_role and config.get("aws.get_credentials.cache.enabled")
+        if use_cache:
+            cache_key = _credential_cache_key(user, role, policy, duration_seconds)
+            credentials = await _get_cached_credentials(cache_key, role)
+            if credentials:
                 log.debug(
                     {
                         **log_data,
+                        "message": "Returning cached credentials",
                         "access_key_id": credentials["Credentials"]["AccessKeyId"],
                     }
                 )
                 return credentials
 
-            credentials = await sync_to_async(client.assume_role)(
-                RoleArn=role,
-                RoleSessionName=user.lower(),
-                DurationSeconds=config.get("aws.session_duration", 3600),
-            )
-            credentials["Credentials"]["Expiration"] = int(
-                credentials["Credentials"]["Expiration"].timestamp()
-            )
-            log.debug(
-                {**log_data, "access_key_id": credentials["Credentials"]["AccessKeyId"]}
-            )
-            return credentials
+        assume_role_kwargs = dict(
+            RoleArn=role,
+            RoleSessionName=user.lower(),
+            DurationSeconds=duration_seconds,
+        )
+        if policy:
+            assume_role_kwargs["Policy"] = policy
+        try:
+            credentials = await sync_to_async(client.assume_role)(**assume_role_kwargs)
         except ClientError as e:
             # TODO(ccastrapel): Determine if user role was really just created, or if this is an older role.
             if user_role:
                 raise UserRoleNotAssumableYet(e.response["Error"])
             raise
+        credentials["Credentials"]["Expiration"] = int(
+            credentials["Credentials"]["Expiration"].timestamp()
+        )
+        log.debug(
+            {**log_data, "access_key_id": credentials["Credentials"]["AccessKeyId"]}
+        )
+        if use_cache:
+            await _cache_credentials(cache_key, credentials)
+        return credentials
 
     async def generate_url(
         self,
@@ -6,7 +6,6 @@
 import json
 from datetime import timedelta
 
-from asgiref.sync import async_to_sync
 from celery import Celery
 
 from consoleme.config import config
@@ -15,7 +14,7 @@
 from consoleme.lib.timeout import Timeout
 
 region = config.region
-red = async_to_sync(RedisHandler().redis)()
+red = RedisHandler().redis_sync()
 
 app = Celery(
     "tasks",
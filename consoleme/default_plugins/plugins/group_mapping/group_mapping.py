@@ -68,8 +68,7 @@ async def set_console_roles_in_cache(
     ):
         """Set roles in cache with a nominal expiration"""
         stats.count("set_console_roles_in_cache")
-        if not self.red:
-            self.red = await RedisHandler().redis()
+        red = await RedisHandler().redis()
         expiration = int(time.time()) + expiration
         role_blob = json.dumps({"user": user, "roles": roles, "expiration": expiration})
         crypto = Crypto()
@@ -83,8 +82,8 @@ async def set_console_roles_in_cache(
         ).format(user)
 
         try:
-            self.red.setex(key, expiration, role_blob)
-            self.red.setex(sig_key, expiration, sig)
+            await red.setex(key, expiration, role_blob)
+            await red.setex(sig_key, expiration, sig)
         except ConnectionError:
             log.error("Error connecting to Redis.", exc_info=True)
 
@@ -99,14 +98,13 @@ async def get_roles_from_cache(self, user):
             "group_mapping_config.role_cache_redis_sig_key", "ROLE_CACHE_SIG_{}"
         ).format(user)
 
-        if not self.red:
-            self.red = await RedisHandler().redis()
+        red = await RedisHandler().redis()
 
-        role_r = self.red.get(key)
+        role_r = await red.get(key)
         if not role_r:
             return []
 
-        role_sig = self.red.get(sig_key)
+        role_sig = await red.get(sig_key)
 
         if not role_sig:
             stats.count("get_roles_from_cache.no_role_sig")
@@ -401,7 +401,7 @@ async def authorization_flow(
 
         if config.get("auth.cache_user_info_server_side", True) and not refresh_cache:
             try:
-                cache_r = self.red.get(f"USER-{self.user}-CONSOLE-{console_only}")
+                cache_r = await self.red.get(f"USER-{self.user}-CONSOLE-{console_only}")
             except redis.exceptions.ConnectionError:
                 cache_r = None
             if cache_r:
@@ -467,7 +467,7 @@ async def authorization_flow(
             and not refreshed_user_roles_from_cache
         ):
             try:
-                self.red.setex(
+                await self.red.setex(
                     f"USER-{self.user}-CONSOLE-{console_only}",
                     config.get("dynamic_config.role_cache.cache_expiration", 60),
                     json.dumps(
@@ -5,7 +5,6 @@
 import pytz
 import tornado.escape
 import ujson as json
-from asgiref.sync import async_to_sync
 
 from consoleme.config import config
 from consoleme.exceptions.exceptions import MissingConfigurationValue
@@ -15,7 +14,6 @@
 from consoleme.lib.redis import RedisHandler
 
 log = config.get_logger()
-red = async_to_sync(RedisHandler().redis)()
 
 
 class ChallengeGeneratorHandler(TornadoRequestHandler):
@@ -40,6 +38,7 @@ async def get(self, user):
             raise MissingConfigurationValue(
                 "Challenge URL Authentication is not enabled in ConsoleMe's configuration"
             )
+        red = await RedisHandler().redis()
         ip = self.get_request_ip()
 
         token = str(uuid.uuid4())
@@ -53,7 +52,7 @@ async def get(self, user):
             "status": "pending",
             "user": user,
         }
-        red.hset(
+        await red.hset(
             config.get("challenge_url.redis_key", "TOKEN_CHALLENGES_TEMP"),
             token,
             json.dumps(entry),
@@ -91,6 +90,7 @@ async def get(self, requested_challenge_token):
             raise MissingConfigurationValue(
                 "Challenge URL Authentication is not enabled in ConsoleMe's configuration"
             )
+        red = await RedisHandler().redis()
         log_data = {
             "user": self.user,
             "function": f"{__name__}.{self.__class__.__name__}.{sys._getframe().f_code.co_name}",
@@ -100,7 +100,7 @@ async def get(self, requested_challenge_token):
         }
         log.debug(log_data)
 
-        all_challenges = red.hgetall(
+        all_challenges = await red.hgetall(
             config.get("challenge_url.redis_key", "TOKEN_CHALLENGES_TEMP")
         )
         if not all_challenges:
@@ -160,7 +160,7 @@ async def get(self, requested_challenge_token):
 
         valid_user_challenge["visited"] = True
         valid_user_challenge["nonce"] = str(uuid.uuid4())
-        red.hset(
+        await red.hset(
             config.get("challenge_url.redis_key", "TOKEN_CHALLENGES_TEMP"),
             requested_challenge_token,
             json.dumps(valid_user_challenge),
@@ -188,6 +188,7 @@ async def post(self, requested_challenge_token):
             raise MissingConfigurationValue(
                 "Challenge URL Authentication is not enabled in ConsoleMe's configuration"
             )
+        red = await RedisHandler().redis()
         data = tornado.escape.json_decode(self.request.body)
 
         log_data = {
@@ -199,7 +200,7 @@ async def post(self, requested_challenge_token):
         }
         log.debug(log_data)
 
-        all_challenges = red.hgetall(
+        all_challenges = await red.hgetall(
             config.get("challenge_url.redis_key", "TOKEN_CHALLENGES_TEMP")
         )
         if not all_challenges:
@@ -257,7 +258,7 @@ async def post(self, requested_challenge_token):
         valid_user_challenge["status"] = "success"
         valid_user_challenge["user"] = self.user
         valid_user_challenge["groups"] = self.groups
-        red.hset(
+        await red.hset(
             config.get("challenge_url.redis_key", "TOKEN_CHALLENGES_TEMP"),
             requested_challenge_token,
             json.dumps(valid_user_challenge),
@@ -279,7 +280,8 @@ async def get(self, requested_challenge_token):
             raise MissingConfigurationValue(
                 "Challenge URL Authentication is not enabled in ConsoleMe's configuration"
             )
-        challenge_j = red.hget(
+        red = await RedisHandler().redis()
+        challenge_j = await red.hget(
             config.get("challenge_url.redis_key", "TOKEN_CHALLENGES_TEMP"),
             requested_challenge_token,
         )
@@ -291,7 +293,7 @@ async def get(self, requested_challenge_token):
         # Delete the token if it has expired
         current_time = int(datetime.utcnow().replace(tzinfo=pytz.UTC).timestamp())
         if challenge.get("ttl", 0) < current_time:
-            red.hdel(
+            await red.hdel(
                 config.get("challenge_url.redis_key", "TOKEN_CHALLENGES_TEMP"),
                 requested_challenge_token,
             )
@@ -323,7 +325,7 @@ async def get(self, requested_challenge_token):
                 }
             )
             # Delete the token so that it cannot be re-used
-            red.hdel(
+            await red.hdel(
                 config.get("challenge_url.redis_key", "TOKEN_CHALLENGES_TEMP"),
                 requested_challenge_token,
             )
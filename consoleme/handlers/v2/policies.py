@@ -4,13 +4,13 @@
 import ujson as json
 
 from consoleme.config import config
-from consoleme.exceptions.exceptions import ResourceNotFound
 from consoleme.handlers.base import BaseAPIV2Handler, BaseHandler
 from consoleme.lib.aws import validate_iam_policy
 from consoleme.lib.cache import retrieve_json_data_from_redis_or_s3
-from consoleme.lib.generic import filter_table
+from consoleme.lib.generic import MARKDOWN_COLUMNS_KEY, filter_table, render_table_row
 from consoleme.lib.plugins import get_plugin_by_name
-from consoleme.lib.policies import get_url_for_resource
+from consoleme.lib.policies import get_policies_table_markdown_columns
+from consoleme.lib.table_index import get_table_index
 from consoleme.lib.timeout import Timeout
 from consoleme.models import DataTableResponse
 
@@ -96,6 +96,7 @@ async def post(self):
         arguments = json.loads(self.request.body)
         filters = arguments.get("filters")
         limit = arguments.get("limit", 1000)
+        sort = arguments.get("sort")
         tags = {"user": self.user}
         stats.count("PoliciesHandler.post", tags=tags)
         log_data = {
@@ -104,6 +105,7 @@ async def post(self):
             "message": "Writing policies",
             "limit": limit,
             "filters": filters,
+            "sort": sort,
             "user-agent": self.request.headers.get("User-Agent"),
             "request_id": self.request_uuid,
         }
@@ -116,50 +118,59 @@ async def post(self):
                 "policies_table/cache_policies_table_details_v1.json.gz",
             ),
             default=[],
+            use_local_cache=True,
         )
 
         total_count = len(policies)
 
-        if filters:
-            try:
-                with Timeout(seconds=5):
-                    for filter_key, filter_value in filters.items():
+        index = None
+        if config.get("policies.table_index.enabled", True):
+            index = await get_table_index(
+                "policies",
+                policies,
+                indexed_columns=config.get(
+                    "policies.table_index.indexed_columns",
+                    ["account_id", "account_name", "technology"],
+                ),
+                ngram_columns=config.get("policies.table_index.ngram_columns", ["arn"]),
+                sort_columns=config.get(
+                    "policies.table_index.sort_columns",
+                    ["account_id", "account_name", "arn", "technology"],
+                ),
+            )
+
+        try:
+            with Timeout(seconds=5):
+                if index:
+                    policies = index.query(filters, limit=limit, sort=sort)
+                else:
+                    for filter_key, filter_value in (filters or {}).items():
                         policies = await filter_table(
                             filter_key, filter_value, policies
                         )
-            except TimeoutError:
-                self.write("Query took too long to run. Check your filter.")
-                await self.finish()
-                raise
+                    if sort and sort.get("key"):
+                        policies = sorted(
+                            policies,
+                            key=lambda policy: str(policy.get(sort["key"])),
+                            reverse=sort.get("direction") == "descending",
+                        )
+        except TimeoutError:
+            self.write("Query took too long to run. Check your filter.")
+            await self.finish()
+            raise
 
         if markdown:
             policies_to_write = []
             for policy in policies[0:limit]:
-                resource_name = policy.get("arn").split(":")[5]
-                if "/" in resource_name:
-                    resource_name = resource_name.split("/")[-1]
-                region = policy["arn"].split(":")[3]
-                try:
-                    url = await get_url_for_resource(
-                        policy["arn"],
-                        policy["technology"],
-                        policy["account_id"],
-                        region,
-                        resource_name,
-                    )
-                except ResourceNotFound:
-                    url = ""
-                if url:
-                    policy["arn"] = f"[{policy['arn']}]({url})"
-                if not policy.get("templated"):
-                    policy["templated"] = "N/A"
-                else:
-                    if "/" in policy["templated"]:
-                        link_name = policy["templated"].split("/")[-1]
-                        policy["templated"] = f"[{link_name}]({policy['templated']})"
-                policies_to_write.append(policy)
+                markdown_columns = policy.get(MARKDOWN_COLUMNS_KEY)
+                if markdown_columns is None:
+                    # The table was cached before markdown columns were rendered by the cache task
+                    markdown_columns = await get_policies_table_markdown_columns(policy)
+                policies_to_write.append(render_table_row(policy, markdown_columns))
         else:
-            policies_to_write = policies[0:limit]
+            policies_to_write = [
+                render_table_row(policy) for policy in policies[0:limit]
+            ]
         filtered_count = len(policies_to_write)
         res = DataTableResponse(
             totalCount=total_count, filteredCount=filtered_count, data=policies_to_write
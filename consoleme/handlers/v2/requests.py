@@ -14,7 +14,6 @@
     InvalidRequestParameter,
     MustBeFte,
     NoMatchingRequest,
-    ResourceNotFound,
     Unauthorized,
 )
 from consoleme.handlers.base import BaseAPIV2Handler, BaseHandler
@@ -22,14 +21,19 @@
 from consoleme.lib.aws import get_resource_account
 from consoleme.lib.cache import retrieve_json_data_from_redis_or_s3
 from consoleme.lib.dynamo import UserDynamoHandler
-from consoleme.lib.generic import filter_table, write_json_error
+from consoleme.lib.generic import (
+    MARKDOWN_COLUMNS_KEY,
+    filter_table,
+    render_table_row,
+    write_json_error,
+)
 from consoleme.lib.plugins import get_plugin_by_name
 from consoleme.lib.policies import (
     can_move_back_to_pending_v2,
     can_update_cancel_requests_v2,
-    get_url_for_resource,
     should_auto_approve_policy_v2,
 )
+from consoleme.lib.requests import get_policy_requests_table_markdown_columns
 from consoleme.lib.slack import send_slack_notification_new_policy_request
 from consoleme.lib.timeout import Timeout
 from consoleme.lib.v2.requests import (
@@ -45,6 +49,7 @@
     CommentModel,
     DataTableResponse,
     ExtendedRequestModel,
+    PaginatedDataTableResponse,
     PolicyRequestModificationRequestModel,
     RequestCreationModel,
     RequestCreationResponse,
@@ -491,7 +496,7 @@ async def post(self):
         }
         log.debug(log_data)
         requests = await retrieve_json_data_from_redis_or_s3(
-            cache_key, s3_bucket=s3_bucket, s3_key=s3_key
+            cache_key, s3_bucket=s3_bucket, s3_key=s3_key, use_local_cache=True
         )
 
         total_count = len(requests)
@@ -511,42 +516,17 @@ async def post(self):
         if markdown:
             requests_to_write = []
             for request in requests[0:limit]:
-                principal_arn = request.get("principal", {}).get("principal_arn", "")
-                url = request.get("principal", {}).get("resource_url", "")
-                resource_name = principal_arn
-                if "/" in resource_name:
-                    resource_name = resource_name.split("/")[-1]
-                if not resource_name:
-                    resource_name = request.get("principal", {}).get(
-                        "resource_identifier"
+                markdown_columns = request.get(MARKDOWN_COLUMNS_KEY)
+                if markdown_columns is None:
+                    # The table was cached before markdown columns were rendered by the cache task
+                    markdown_columns = await get_policy_requests_table_markdown_columns(
+                        request
                     )
-
-                if principal_arn and principal_arn.count(":") == 5 and not url:
-
-                    region = principal_arn.split(":")[3]
-                    service_type = principal_arn.split(":")[2]
-                    account_id = principal_arn.split(":")[4]
-                    if request.get("principal", {}).get("principal_arn"):
-                        try:
-                            url = await get_url_for_resource(
-                                principal_arn,
-                                service_type,
-                                account_id,
-                                region,
-                                resource_name,
-                            )
-                        except ResourceNotFound:
-                            pass
-                # Convert request_id and role ARN to link
-                request_url = request.get("extended_request", {}).get("request_url")
-                if not request_url:
-                    request_url = f"/policies/request/{request['request_id']}"
-                request["request_id"] = f"[{request['request_id']}]({request_url})"
-                if url:
-                    request["arn"] = f"[{principal_arn or resource_name}]({url})"
-                requests_to_write.append(request)
+                requests_to_write.append(render_table_row(request, markdown_columns))
         else:
-            requests_to_write = requests[0:limit]
+            requests_to_write = [
+                render_table_row(request) for request in requests[0:limit]
+            ]
         filtered_count = len(requests_to_write)
         res = DataTableResponse(
             totalCount=total_count, filteredCount=filtered_count, data=requests_to_write
@@ -555,6 +535,83 @@ async def post(self):
         return
 
 
+class PaginatedRequestsHandler(BaseAPIV2Handler):
+    """Handler for /api/v2/paginated_requests
+
+    Api endpoint to list policy requests a page at a time, from the listing indexes of the policy requests table.
+    """
+
+    allowed_methods = ["POST"]
+
+    async def post(self):
+        """
+        POST /api/v2/paginated_requests
+
+        Body: {"filters": {"status": ..., "username": ..., "principal_arn": ..., "request_time": [start, end]},
+               "page_size": 50, "cursor": <nextCursor of the previous page>, "sort": {"direction": "ascending"}}
+        """
+        markdown = self.get_argument("markdown", None)
+        arguments = json.loads(self.request.body or "{}")
+        filters = arguments.get("filters") or {}
+        page_size = arguments.get("page_size", 50)
+        if (
+            isinstance(page_size, bool)
+            or not isinstance(page_size, int)
+            or page_size < 1
+        ):
+            self.set_status(400)
+            self.write(
+                {"status": "error", "message": "page_size must be a positive integer"}
+            )
+            return
+        page_size = min(page_size, config.get("paginated_requests.max_page_size", 1000))
+        cursor = arguments.get("cursor")
+        ascending = (arguments.get("sort") or {}).get("direction") == "ascending"
+        log_data = {
+            "function": f"{__name__}.{self.__class__.__name__}.{sys._getframe().f_code.co_name}",
+            "user": self.user,
+            "message": "Writing page of requests",
+            "page_size": page_size,
+            "filters": filters,
+            "user-agent": self.request.headers.get("User-Agent"),
+            "request_id": self.request_uuid,
+        }
+        log.debug(log_data)
+        stats.count("PaginatedRequestsHandler.post", tags={"user": self.user})
+
+        dynamo = UserDynamoHandler()
+        try:
+            requests, next_cursor = await dynamo.list_policy_requests(
+                filters={
+                    key: filters.get(key)
+                    for key in ["status", "username", "principal_arn", "request_time"]
+                },
+                page_size=page_size,
+                cursor=cursor,
+                ascending=ascending,
+            )
+        except InvalidRequestParameter as e:
+            self.set_status(400)
+            self.write({"status": "error", "message": str(e)})
+            return
+
+        if markdown:
+            requests_to_write = [
+                render_table_row(
+                    request, await get_policy_requests_table_markdown_columns(request)
+                )
+                for request in requests
+            ]
+        else:
+            requests_to_write = requests
+        res = PaginatedDataTableResponse(
+            filteredCount=len(requests_to_write),
+            data=requests_to_write,
+            nextCursor=next_cursor,
+        )
+        self.write(res.json())
+
+
 class RequestDetailHandler(BaseAPIV2Handler):
     """Handler for /api/v2/requests/{request_id}
 
@@ -2,7 +2,6 @@
 from datetime import datetime, timedelta
 
 import sentry_sdk
-import ujson as json
 from policy_sentry.util.arns import parse_arn
 
 from consoleme.config import config
@@ -12,6 +11,7 @@
 from consoleme.lib.auth import can_admin_policies
 from consoleme.lib.aws import fetch_resource_details
 from consoleme.lib.cache import retrieve_json_data_from_redis_or_s3
+from consoleme.lib.errors_by_arn import get_s3_errors_for_arn
 from consoleme.lib.plugins import get_plugin_by_name
 from consoleme.lib.policies import get_url_for_resource
 from consoleme.lib.redis import RedisHandler, redis_hget
@@ -100,17 +100,12 @@ async def get(self, account_id, resource_type, region=None, resource_name=None):
         s3_query_url = None
         if resource_type == "s3":
             s3_query_url = config.get("s3.bucket_query_url")
-        all_s3_errors = None
+        s3_errors = []
         if s3_query_url:
             s3_query_url = s3_query_url.format(
                 yesterday=yesterday, bucket_name=f"'{resource_name}'"
             )
-            s3_error_topic = config.get("redis.s3_errors", "S3_ERRORS")
-            all_s3_errors = self.red.get(s3_error_topic)
-
-        s3_errors = []
-        if all_s3_errors:
-            s3_errors = json.loads(all_s3_errors).get(arn, [])
+            s3_errors = await get_s3_errors_for_arn(arn)
 
         account_ids_to_name = await get_account_id_to_name_mapping()
         # TODO(ccastrapel/psanders): Make a Swagger spec for this
@@ -181,7 +176,8 @@ async def get(self):
                 # This will force a refresh of our redis cache if the data exists in S3
                 await retrieve_json_data_from_redis_or_s3(
                     redis_key=resources_from_aws_config_redis_key,
-                    s3_bucket=config.get("aws_config_cache_combined.s3.bucket"),
+                    s3_bucket=config.get("aws_config_cache_combined.s3.bucket")
+                    or config.get("consoleme_s3_bucket"),
                     s3_key=config.get(
                         "aws_config_cache_combined.s3.file",
                         "aws_config_cache_combined/aws_config_resource_cache_combined_v1.json.gz",
@@ -1,17 +1,18 @@
-from typing import Optional
+from typing import List, Optional
 
 import sentry_sdk
 import ujson as json
-from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.sync import sync_to_async
 
 from consoleme.config import config
 from consoleme.exceptions.exceptions import DataNotRetrievable
 from consoleme.handlers.base import BaseAPIV2Handler
 from consoleme.lib.cache import retrieve_json_data_from_redis_or_s3
 from consoleme.lib.redis import RedisHandler
+from consoleme.lib.table_index import TypeaheadIndex, get_table_index
 from consoleme.models import ArnArray
 
-red = async_to_sync(RedisHandler().redis)()
+red = RedisHandler().redis_sync()
 
 
 class ResourceTypeAheadHandlerV2(BaseAPIV2Handler):
@@ -58,13 +59,52 @@ async def get(self):
         except TypeError:
             ui_formatted = False
 
+        if config.get("aws_config_cache.typeahead_index.enabled", True):
+            typeahead_document = await retrieve_json_data_from_redis_or_s3(
+                redis_key=config.get(
+                    "aws_config_cache.typeahead_index.redis_key",
+                    "AWSCONFIG_RESOURCE_TYPEAHEAD_INDEX",
+                ),
+                s3_bucket=config.get("aws_config_cache.typeahead_index.s3.bucket"),
+                s3_key=config.get(
+                    "aws_config_cache.typeahead_index.s3.file",
+                    "aws_config_cache_combined/aws_config_resource_typeahead_index_v1.json.gz",
+                ),
+                default={},
+                use_local_cache=True,
+            )
+            index = None
+            if typeahead_document:
+                index = await get_table_index(
+                    "aws_config_typeahead",
+                    typeahead_document,
+                    index_class=TypeaheadIndex,
+                )
+            if index:
+                matching = [
+                    index.values[item_id]
+                    for item_id in index.search(
+                        type_ahead,
+                        limit=limit,
+                        partition_filters={
+                            "resource_type": resource_type,
+                            "region": region,
+                            "account_id": account_id,
+                        },
+                    )
+                ]
+                self._write_arns(matching, ui_formatted)
+                return
+
         resource_redis_cache_key = config.get(
             "aws_config_cache.redis_key", "AWSCONFIG_RESOURCE_CACHE"
         )
         all_resource_arns = await sync_to_async(red.hkeys)(resource_redis_cache_key)
         # Fall back to DynamoDB or S3?
         if not all_resource_arns:
-            s3_bucket = config.get("aws_config_cache_combined.s3.bucket")
+            s3_bucket = config.get("aws_config_cache_combined.s3.bucket") or config.get(
+                "consoleme_s3_bucket"
+            )
             s3_key = config.get(
                 "aws_config_cache_combined.s3.file",
                 "aws_config_cache_combined/aws_config_resource_cache_combined_v1.json.gz",
@@ -95,7 +135,10 @@ async def get(self):
             elif not type_ahead:
                 # Oh, you want all the things do you?
                 matching.add(arn)
-        arn_array = ArnArray.parse_obj((list(matching)))
+        self._write_arns(list(matching), ui_formatted)
+
+    def _write_arns(self, arns: List[str], ui_formatted: bool) -> None:
+        arn_array = ArnArray.parse_obj(arns)
         if ui_formatted:
             self.write(json.dumps([{"title": arn} for arn in arn_array.__root__]))
         else:
@@ -138,10 +181,29 @@ async def get(self):
                 "cache_self_service_typeahead.s3.file",
                 "cache_self_service_typeahead/cache_self_service_typeahead_v1.json.gz",
             ),
+            use_local_cache=True,
         )
+        typeahead_entries = typehead_data.get("typeahead_entries", [])
+        if typehead_data.get("search_index"):
+            index = await get_table_index(
+                "self_service_typeahead",
+                typehead_data,
+                index_class=lambda data: TypeaheadIndex(data["search_index"]),
+            )
+            if index:
+                self.write(
+                    json.dumps(
+                        [
+                            typeahead_entries[item_id]
+                            for item_id in index.search(type_ahead, limit=limit)
+                        ]
+                    )
+                )
+                return
+
         matching = []
 
-        for entry in typehead_data.get("typeahead_entries", []):
+        for entry in typeahead_entries:
             if len(matching) >= limit:
                 break
             if (
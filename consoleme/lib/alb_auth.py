@@ -20,6 +20,7 @@
     MissingConfigurationValue,
     UnableToAuthenticate,
 )
+from consoleme.lib.cpu_executor import run_in_thread_pool
 
 log = config.get_logger()
 
@@ -101,7 +102,9 @@ async def authenticate_user_by_alb_auth(request):
     req = requests.get(url)
     pub_key = req.text
     # Step 3: Get the payload
-    payload = jwt.decode(encoded_auth_jwt, pub_key, algorithms=["ES256"])
+    payload = await run_in_thread_pool(
+        jwt.decode, encoded_auth_jwt, pub_key, algorithms=["ES256"]
+    )
     email = payload.get(
         config.get("get_user_by_aws_alb_auth_settings.jwt_email_key", "email")
     )
@@ -128,7 +131,8 @@ async def authenticate_user_by_alb_auth(request):
                 )
             access_token_pub_key = oidc_config["jwt_keys"][key_id]
 
-        decoded_access_token = jwt.decode(
+        decoded_access_token = await run_in_thread_pool(
+            jwt.decode,
             access_token,
             access_token_pub_key,
             algorithms=[algorithm],
@@ -1,4 +1,3 @@
-import fnmatch
 import json
 import re
 import sys
@@ -44,9 +43,13 @@
     retrieve_json_data_from_redis_or_s3,
     store_json_results_in_redis_and_s3,
 )
-from consoleme.lib.generic import sort_dict
 from consoleme.lib.plugins import get_plugin_by_name
+from consoleme.lib.policy_normalization import (
+    minimize_policy_statements,
+    normalize_policy_statements,
+)
 from consoleme.lib.redis import RedisHandler, redis_hget, redis_hgetex, redis_hsetex
+from consoleme.lib.single_flight import single_flight
 from consoleme.models import (
     CloneRoleRequestModel,
     RoleCreationRequestModel,
@@ -185,7 +188,7 @@ async def get_all_iam_managed_policies_for_account(account_id):
     current_time = time.time()
     if current_time - ALL_IAM_MANAGED_POLICIES_LAST_UPDATE > 500:
         red = await RedisHandler().redis()
-        ALL_IAM_MANAGED_POLICIES = await sync_to_async(red.hgetall)(policy_key)
+        ALL_IAM_MANAGED_POLICIES = await red.hgetall(policy_key)
         ALL_IAM_MANAGED_POLICIES_LAST_UPDATE = current_time
 
     if ALL_IAM_MANAGED_POLICIES:
@@ -207,20 +210,21 @@ async def get_resource_account(arn: str) -> str:
     In most cases, this will pull the ID directly from the ARN.
     If we are unsuccessful in pulling the account from ARN, we try to grab it from our resources cache
     """
-    red = await RedisHandler().redis()
     resource_account: str = get_account_from_arn(arn)
     if resource_account:
         return resource_account
+    red = await RedisHandler().redis()
 
     resources_from_aws_config_redis_key: str = config.get(
         "aws_config_cache.redis_key", "AWSCONFIG_RESOURCE_CACHE"
     )
 
-    if not red.exists(resources_from_aws_config_redis_key):
+    if not await red.exists(resources_from_aws_config_redis_key):
         # This will force a refresh of our redis cache if the data exists in S3
         await retrieve_json_data_from_redis_or_s3(
             redis_key=resources_from_aws_config_redis_key,
-            s3_bucket=config.get("aws_config_cache_combined.s3.bucket"),
+            s3_bucket=config.get("aws_config_cache_combined.s3.bucket")
+            or config.get("consoleme_s3_bucket"),
             s3_key=config.get(
                 "aws_config_cache_combined.s3.file",
                 "aws_config_cache_combined/aws_config_resource_cache_combined_v1.json.gz",
@@ -232,18 +236,14 @@ async def get_resource_account(arn: str) -> str:
     if resource_info:
         return json.loads(resource_info).get("accountId", "")
     elif "arn:aws:s3:::" in arn:
-        # Try to retrieve S3 bucket information from S3 cache. This is inefficient and we should ideally have
-        # retrieved this info from our AWS Config cache, but we've encountered problems with AWS Config historically
-        # that have necessitated this code.
-        s3_cache = await retrieve_json_data_from_redis_or_s3(
-            redis_key=config.get("redis.s3_buckets_key", "S3_BUCKETS"),
-            redis_data_type="hash",
+        # S3 buckets are indexed by name when cache_s3_buckets_for_account caches the buckets of an account.
+        # ARNs of objects start with the name of their bucket.
+        bucket_name = arn.split(":")[-1].split("/")[0]
+        bucket_account = await redis_hget(
+            config.get("redis.s3_bucket_accounts_key", "S3_BUCKET_ACCOUNTS"),
+            bucket_name,
         )
-        search_bucket_name = arn.split(":")[-1]
-        for bucket_account_id, buckets in s3_cache.items():
-            buckets_j = json.loads(buckets)
-            if search_bucket_name in buckets_j:
-                return bucket_account_id
+        return bucket_account or ""
     return ""
 
 
@@ -398,6 +398,7 @@ async def fetch_assume_role_policy(role_arn: str) -> Optional[Dict]:
     return role.assume_role_policy_document
 
 
+@single_flight(copy_result=True, share_across_processes=True)
 async def fetch_sns_topic(account_id: str, region: str, resource_name: str) -> dict:
     from consoleme.lib.policies import get_aws_config_history_url_for_resource
 
@@ -453,6 +454,7 @@ async def fetch_sns_topic(account_id: str, region: str, resource_name: str) -> d
     return result
 
 
+@single_flight(copy_result=True, share_across_processes=True)
 async def fetch_sqs_queue(account_id: str, region: str, resource_name: str) -> dict:
     from consoleme.lib.policies import get_aws_config_history_url_for_resource
 
@@ -566,6 +568,7 @@ async def get_bucket_location_with_fallback(
     return bucket_location
 
 
+@single_flight(copy_result=True, share_across_processes=True)
 async def fetch_s3_bucket(account_id: str, bucket_name: str) -> dict:
     """Fetch S3 Bucket and applicable policies
 
@@ -835,6 +838,7 @@ async def delete_iam_role(account_id, role_name, username) -> bool:
     stats.count(f"{log_data['function']}.success", tags={"role_name": role_name})
 
 
+@single_flight()
 async def fetch_role_details(account_id, role_name):
     log_data = {
         "function": f"{__name__}.{sys._getframe().f_code.co_name}",
@@ -1410,7 +1414,8 @@ async def get_enabled_regions_for_account(account_id: str) -> Set[str]:
     """
     Returns a list of regions enabled for an account based on an EC2 Describe Regions call. Can be overridden with a
     global configuration of static regions (Configuration key: `celery.sync_regions`), or a configuration of specific
-    regions per account (Configuration key:  `get_enabled_regions_for_account.{account_id}`)
+    regions per account (Configuration key:  `get_enabled_regions_for_account.{account_id}`). The result of the
+    Describe Regions call is cached in Redis for `aws.enabled_regions_cache_seconds`.
     """
     enabled_regions_for_account = config.get(
         f"get_enabled_regions_for_account.{account_id}"
@@ -1422,6 +1427,11 @@ async def get_enabled_regions_for_account(account_id: str) -> Set[str]:
     if celery_sync_regions:
         return celery_sync_regions
 
+    redis_key = config.get("aws.enabled_regions_redis_key", "ENABLED_REGIONS")
+    cached_regions = await redis_hgetex(redis_key, account_id)
+    if cached_regions:
+        return set(cached_regions)
+
     client = await sync_to_async(boto3_cached_conn)(
         "ec2",
         account_number=account_id,
@@ -1432,7 +1442,14 @@ async def get_enabled_regions_for_account(account_id: str) -> Set[str]:
     )
 
     regions = await sync_to_async(client.describe_regions)()
-    return {r["RegionName"] for r in regions["Regions"]}
+    enabled_regions = {r["RegionName"] for r in regions["Regions"]}
+    await redis_hsetex(
+        redis_key,
+        account_id,
+        sorted(enabled_regions),
+        config.get("aws.enabled_regions_cache_seconds", 86400),
+    )
+    return enabled_regions
 
 
 async def access_analyzer_validate_policy(
@@ -1581,9 +1598,71 @@ async def cache_all_scps() -> Dict[str, Any]:
         s3_bucket=s3_bucket,
         s3_key=s3_key,
     )
+    await store_json_results_in_redis_and_s3(
+        build_scp_target_index(all_scps),
+        redis_key=config.get(
+            "cache_scps_across_organizations.redis.key.target_index_key",
+            "AWS_SCPS_BY_TARGET",
+        ),
+        s3_bucket=s3_bucket,
+        s3_key=config.get(
+            "cache_scps_across_organizations.s3.target_index_file",
+            "scps/cache_scps_by_target_v1.json.gz",
+        )
+        if s3_bucket
+        else None,
+    )
     return all_scps
 
 
+def build_scp_target_index(all_scps: Dict[str, List[Dict]]) -> Dict[str, Any]:
+    """Flatten the Service Control Policies of all organizations into a list, along with the positions in that list
+    of the policies that target each account, OU or root ID
+
+    Args:
+        all_scps: dictionary of SCPs by organization, as cached by cache_all_scps
+    """
+    scps = []
+    targets = {}
+    for org_scps in all_scps.values():
+        for scp in org_scps:
+            for target in scp.get("targets", []):
+                positions = targets.setdefault(target["target_id"], [])
+                if not positions or positions[-1] != len(scps):
+                    positions.append(len(scps))
+            scps.append(scp)
+    return {"scps": scps, "targets": targets}
+
+
+async def get_scp_target_index() -> Dict[str, Any]:
+    """Retrieve the index of Service Control Policies by target ID. The decoded index is kept in process until the
+    cached SCPs change."""
+    index = await retrieve_json_data_from_redis_or_s3(
+        config.get(
+            "cache_scps_across_organizations.redis.key.target_index_key",
+            "AWS_SCPS_BY_TARGET",
+        ),
+        s3_bucket=config.get("cache_scps_across_organizations.s3.bucket"),
+        s3_key=config.get(
+            "cache_scps_across_organizations.s3.target_index_file",
+            "scps/cache_scps_by_target_v1.json.gz",
+        ),
+        default={},
+        max_age=86400,
+        use_local_cache=True,
+    )
+    if not index:
+        # The index hasn't been cached yet
+        all_scps = await get_all_scps()
+        index = build_scp_target_index(
+            {
+                org_account_id: [scp.dict() for scp in scps]
+                for org_account_id, scps in all_scps.items()
+            }
+        )
+    return index
+
+
 async def get_org_structure(force_sync=False) -> Dict[str, Any]:
     """Retrieve a dictionary containing the organization structure
 
@@ -1650,29 +1729,65 @@ async def cache_org_structure() -> Dict[str, Any]:
         s3_bucket=s3_bucket,
         s3_key=s3_key,
     )
+    await store_json_results_in_redis_and_s3(
+        build_org_membership_index(all_org_structure),
+        redis_key=config.get(
+            "cache_organization_structure.redis.key.membership_index_key",
+            "AWS_ORG_MEMBERSHIP_INDEX",
+        ),
+        s3_bucket=s3_bucket,
+        s3_key=config.get(
+            "cache_organization_structure.s3.membership_index_file",
+            "scps/cache_org_membership_index_v1.json.gz",
+        )
+        if s3_bucket
+        else None,
+    )
     return all_org_structure
 
 
-async def _is_member_of_ou(
-    identifier: str, ou: Dict[str, Any]
-) -> Tuple[bool, Set[str]]:
-    """Recursively walk org structure to determine if the account or OU is in the org and, if so, return all OUs of which the account or OU is a member
+def build_org_membership_index(org_structure: Dict[str, Any]) -> Dict[str, List[str]]:
+    """Flatten the organization structure into a dictionary of the IDs of the OUs (and root) that each account or OU
+    is a member of
 
     Args:
-        identifier: AWS account or OU ID
-        ou: dictionary representing the organization/organizational unit structure to search
+        org_structure: dictionary of organization roots, as cached by cache_org_structure
     """
-    found = False
-    ou_path = set()
-    for child in ou.get("Children", []):
-        if child.get("Id") == identifier:
-            found = True
-        elif child.get("Type") == "ORGANIZATIONAL_UNIT":
-            found, ou_path = await _is_member_of_ou(identifier, child)
-        if found:
-            ou_path.add(ou.get("Id"))
-            break
-    return found, ou_path
+    membership_index = {}
+    for root in org_structure.values():
+        nodes_to_visit = [(root, [])]
+        while nodes_to_visit:
+            node, ancestors = nodes_to_visit.pop()
+            ancestors = ancestors + [node.get("Id")]
+            for child in node.get("Children", []):
+                # An ID that appears in multiple organizations belongs to the first one it was found in
+                if child.get("Id") not in membership_index:
+                    membership_index[child.get("Id")] = sorted(ancestors)
+                if child.get("Type") == "ORGANIZATIONAL_UNIT":
+                    nodes_to_visit.append((child, ancestors))
+    return membership_index
+
+
+async def get_org_membership_index() -> Dict[str, List[str]]:
+    """Retrieve the index of OU memberships by account or OU ID. The decoded index is kept in process until the cached
+    organization structure changes."""
+    membership_index = await retrieve_json_data_from_redis_or_s3(
+        config.get(
+            "cache_organization_structure.redis.key.membership_index_key",
+            "AWS_ORG_MEMBERSHIP_INDEX",
+        ),
+        s3_bucket=config.get("cache_organization_structure.s3.bucket"),
+        s3_key=config.get(
+            "cache_organization_structure.s3.membership_index_file",
+            "scps/cache_org_membership_index_v1.json.gz",
+        ),
+        default={},
+        use_local_cache=True,
+    )
+    if not membership_index:
+        # The index hasn't been cached yet
+        membership_index = build_org_membership_index(await get_org_structure())
+    return membership_index
 
 
 async def get_organizational_units_for_account(identifier: str) -> Set[str]:
@@ -1681,47 +1796,28 @@ async def get_organizational_units_for_account(identifier: str) -> Set[str]:
     Args:
         identifier: AWS account or OU ID
     """
-    all_orgs = await get_org_structure()
-    organizational_units = set()
-    for org_id, org_structure in all_orgs.items():
-        found, organizational_units = await _is_member_of_ou(identifier, org_structure)
-        if found:
-            break
+    membership_index = await get_org_membership_index()
+    organizational_units = set(membership_index.get(identifier, []))
     if not organizational_units:
         log.warning("could not find account in organization")
     return organizational_units
 
 
-async def _scp_targets_account_or_ou(
-    scp: ServiceControlPolicyModel, identifier: str, organizational_units: Set[str]
-) -> bool:
-    """Return True if the provided SCP targets the account or OU identifier provided
-
-    Args:
-        scp: Service Control Policy whose targets we check
-        identifier: AWS account or OU ID
-        organizational_units: set of IDs for OUs of which the identifier is a member
-    """
-    for target in scp.targets:
-        if target.target_id == identifier or target.target_id in organizational_units:
-            return True
-    return False
-
-
 async def get_scps_for_account_or_ou(identifier: str) -> ServiceControlPolicyArrayModel:
     """Retrieve a list of Service Control Policies for the account or OU specified by the identifier
 
     Args:
         identifier: AWS account or OU ID
     """
-    all_scps = await get_all_scps()
+    scp_target_index = await get_scp_target_index()
     account_ous = await get_organizational_units_for_account(identifier)
-    scps_for_account = []
-    for org_account_id, scps in all_scps.items():
-        # Iterate through each org's SCPs and see if the provided account_id is in the targets
-        for scp in scps:
-            if await _scp_targets_account_or_ou(scp, identifier, account_ous):
-                scps_for_account.append(scp)
+    positions = set()
+    for target_id in {identifier, *account_ous}:
+        positions.update(scp_target_index["targets"].get(target_id, []))
+    scps_for_account = [
+        ServiceControlPolicyModel(**scp_target_index["scps"][position])
+        for position in sorted(positions)
+    ]
     scps = ServiceControlPolicyArrayModel(__root__=scps_for_account)
     return scps
 
@@ -1740,68 +1836,10 @@ async def minimize_iam_policy_statements(
     :param inline_iam_policy_statements: A list of IAM policy statement dictionaries
     :return: A potentially more compact list of IAM policy statement dictionaries
     """
-    exclude_ids = []
-    minimized_statements = []
-
-    inline_iam_policy_statements = await normalize_policies(
-        inline_iam_policy_statements
-    )
-
-    for i in range(len(inline_iam_policy_statements)):
-        inline_iam_policy_statement = inline_iam_policy_statements[i]
-        if disregard_sid:
-            inline_iam_policy_statement.pop("Sid", None)
-        if i in exclude_ids:
-            # We've already combined this policy with another. Ignore it.
-            continue
-        for j in range(i + 1, len(inline_iam_policy_statements)):
-            if j in exclude_ids:
-                # We've already combined this policy with another. Ignore it.
-                continue
-            inline_iam_policy_statement_to_compare = inline_iam_policy_statements[j]
-            if disregard_sid:
-                inline_iam_policy_statement_to_compare.pop("Sid", None)
-            # Check to see if policy statements are identical except for a given element. Merge the policies
-            # if possible.
-            for element in [
-                "Resource",
-                "Action",
-                "NotAction",
-                "NotResource",
-                "NotPrincipal",
-            ]:
-                if not (
-                    inline_iam_policy_statement.get(element)
-                    or inline_iam_policy_statement_to_compare.get(element)
-                ):
-                    # This function won't handle `Condition`.
-                    continue
-                diff = DeepDiff(
-                    inline_iam_policy_statement,
-                    inline_iam_policy_statement_to_compare,
-                    ignore_order=True,
-                    exclude_paths=[f"root['{element}']"],
-                )
-                if not diff:
-                    exclude_ids.append(j)
-                    # Policy can be minimized
-                    inline_iam_policy_statement[element] = sorted(
-                        list(
-                            set(
-                                inline_iam_policy_statement[element]
-                                + inline_iam_policy_statement_to_compare[element]
-                            )
-                        )
-                    )
-                    break
-
-    for i in range(len(inline_iam_policy_statements)):
-        if i not in exclude_ids:
-            inline_iam_policy_statements[i] = sort_dict(inline_iam_policy_statements[i])
-            minimized_statements.append(inline_iam_policy_statements[i])
     # TODO(cccastrapel): Intelligently combine actions and/or resources if they include wildcards
-    minimized_statements = await normalize_policies(minimized_statements)
-    return minimized_statements
+    return minimize_policy_statements(
+        inline_iam_policy_statements, disregard_sid=disregard_sid
+    )
 
 
 async def normalize_policies(policies: List[Any]) -> List[Any]:
@@ -1809,37 +1847,7 @@ async def normalize_policies(policies: List[Any]) -> List[Any]:
     Normalizes policy statements to ensure appropriate AWS policy elements are lists (such as actions and resources),
     lowercase, and sorted. It will remove duplicate entries and entries that are superseded by other elements.
     """
-
-    for policy in policies:
-        for element in [
-            "Resource",
-            "Action",
-            "NotAction",
-            "NotResource",
-            "NotPrincipal",
-        ]:
-            if not policy.get(element):
-                continue
-            if isinstance(policy.get(element), str):
-                policy[element] = [policy[element]]
-            # Policy elements can be lowercased, except for resources. Some resources
-            # (such as IAM roles) are case sensitive
-            if element in ["Resource", "NotResource", "NotPrincipal"]:
-                policy[element] = list(set(policy[element]))
-            else:
-                policy[element] = list(set([x.lower() for x in policy[element]]))
-            modified_elements = set()
-            for i in range(len(policy[element])):
-                matched = False
-                # Sorry for the magic. this is iterating through all elements of a list that aren't the current element
-                for compare_value in policy[element][:i] + policy[element][(i + 1) :]:
-                    if fnmatch.fnmatch(policy[element][i], compare_value):
-                        matched = True
-                        break
-                if not matched:
-                    modified_elements.add(policy[element][i])
-            policy[element] = sorted(modified_elements)
-    return policies
+    return normalize_policy_statements(policies)
 
 
 def allowed_to_sync_role(
@@ -2005,6 +2013,7 @@ def get_aws_principal_owner(role_details: Dict[str, Any]) -> Optional[str]:
     return owner
 
 
+@single_flight(share_across_processes=True)
 async def resource_arn_known_in_aws_config(
     resource_arn: str,
     run_query: bool = True,
@@ -2074,6 +2083,7 @@ async def resource_arn_known_in_aws_config(
     return known_arn
 
 
+@single_flight(copy_result=True, share_across_processes=True)
 async def simulate_iam_principal_action(
     principal_arn,
     action,
@@ -2143,7 +2153,7 @@ async def simulate_iam_principal_action(
 
         await redis_hsetex(
             resource_arn_exists_temp_matches_redis_key,
-            resource_arn,
+            cache_key,
             response["EvaluationResults"],
             expiration_seconds=expiration_seconds,
         )
@@ -1,99 +1,191 @@
+import queue
 import sys
-from typing import List, Optional
+import threading
+from typing import Dict, Iterator, List, Optional
 
 import boto3
-import sentry_sdk
 import ujson as json
-from botocore.exceptions import ClientError
 from cloudaux.aws.sts import boto3_cached_conn
 
 from consoleme.config import config
 from consoleme.exceptions.exceptions import MissingConfigurationValue
 from consoleme.lib.plugins import get_plugin_by_name
+from consoleme.lib.region_fan_out import (
+    collect_across_regions,
+    exclude_from_region_timeout,
+)
 
 log = config.get_logger()
 stats = get_plugin_by_name(config.get("plugins.metrics", "default_metrics"))()
 
 
-def query(
-    query: str, use_aggregator: bool = True, account_id: Optional[str] = None
-) -> List:
-    resources = []
-    if use_aggregator:
-        config_client = boto3.client(
-            "config", region_name=config.region, **config.get("boto3.client_kwargs", {})
-        )
-        configuration_aggregator_name: str = config.get(
-            "aws_config.configuration_aggregator.name"
-        ).format(region=config.region)
-        if not configuration_aggregator_name:
-            raise MissingConfigurationValue("Invalid configuration for aws_config")
+def _select_aggregate_resource_config_pages(query: str) -> Iterator[List[Dict]]:
+    config_client = boto3.client(
+        "config", region_name=config.region, **config.get("boto3.client_kwargs", {})
+    )
+    configuration_aggregator_name: str = config.get(
+        "aws_config.configuration_aggregator.name"
+    ).format(region=config.region)
+    if not configuration_aggregator_name:
+        raise MissingConfigurationValue("Invalid configuration for aws_config")
+    kwargs = {}
+    while True:
         response = config_client.select_aggregate_resource_config(
             Expression=query,
             ConfigurationAggregatorName=configuration_aggregator_name,
             Limit=100,
+            **kwargs,
         )
-        for r in response.get("Results", []):
-            resources.append(json.loads(r))
-        while response.get("NextToken"):
-            response = config_client.select_aggregate_resource_config(
-                Expression=query,
-                ConfigurationAggregatorName=configuration_aggregator_name,
-                Limit=100,
-                NextToken=response["NextToken"],
-            )
-            for r in response.get("Results", []):
-                resources.append(json.loads(r))
+        yield [json.loads(r) for r in response.get("Results", [])]
+        if not response.get("NextToken"):
+            return
+        kwargs["NextToken"] = response["NextToken"]
+
+
+def _select_resource_config_pages(
+    query: str, account_id: str, region: str
+) -> Iterator[List[Dict]]:
+    config_client = boto3_cached_conn(
+        "config",
+        account_number=account_id,
+        assume_role=config.get("policies.role_name"),
+        region=region,
+        sts_client_kwargs=dict(
+            region_name=config.region,
+            endpoint_url=config.get(
+                "aws.sts_endpoint_url", "https://sts.{region}.amazonaws.com"
+            ).format(region=config.region),
+        ),
+        client_kwargs=config.get("boto3.client_kwargs", {}),
+    )
+    kwargs = {}
+    while True:
+        response = config_client.select_resource_config(
+            Expression=query, Limit=100, **kwargs
+        )
+        yield [json.loads(r) for r in response.get("Results", [])]
+        if not response.get("NextToken"):
+            return
+        kwargs["NextToken"] = response["NextToken"]
+
+
+def _get_query_regions() -> List[str]:
+    session = boto3.Session()
+    available_regions = config.get("aws_config.available_regions", [])
+    if not available_regions:
+        available_regions = session.get_available_regions("config")
+    excluded_regions = config.get(
+        "api_protect.exclude_regions",
+        ["af-south-1", "ap-east-1", "ap-northeast-3", "eu-south-1", "me-south-1"],
+    )
+    return [x for x in available_regions if x not in excluded_regions]
+
+
+def query(
+    query: str, use_aggregator: bool = True, account_id: Optional[str] = None
+) -> List:
+    resources = []
+    if use_aggregator:
+        for page in _select_aggregate_resource_config_pages(query):
+            resources.extend(page)
         return resources
     else:  # Don't use Config aggregator and instead query all the regions on an account
-        session = boto3.Session()
-        available_regions = config.get("aws_config.available_regions", [])
-        if not available_regions:
-            available_regions = session.get_available_regions("config")
-        excluded_regions = config.get(
-            "api_protect.exclude_regions",
-            ["af-south-1", "ap-east-1", "ap-northeast-3", "eu-south-1", "me-south-1"],
+        regions = _get_query_regions()
+
+        def _select_resource_config(region: str) -> List:
+            region_resources = []
+            # Query Config for a specific account in all regions we care about
+            for page in _select_resource_config_pages(query, account_id, region):
+                region_resources.extend(page)
+            return region_resources
+
+        # Regions that fail are logged and skipped, as they were when each region was queried in turn
+        results = collect_across_regions(
+            _select_resource_config,
+            regions,
+            "aws_config",
+            log_data={
+                "function": f"{__name__}.{sys._getframe().f_code.co_name}",
+                "query": query,
+                "use_aggregator": use_aggregator,
+                "account_id": account_id,
+            },
         )
-        regions = [x for x in available_regions if x not in excluded_regions]
         for region in regions:
-            config_client = boto3_cached_conn(
-                "config",
-                account_number=account_id,
-                assume_role=config.get("policies.role_name"),
-                region=region,
-                sts_client_kwargs=dict(
-                    region_name=config.region,
-                    endpoint_url=config.get(
-                        "aws.sts_endpoint_url", "https://sts.{region}.amazonaws.com"
-                    ).format(region=config.region),
-                ),
-                client_kwargs=config.get("boto3.client_kwargs", {}),
-            )
-            try:
-                response = config_client.select_resource_config(
-                    Expression=query, Limit=100
-                )
-                for r in response.get("Results", []):
-                    resources.append(json.loads(r))
-                # Query Config for a specific account in all regions we care about
-                while response.get("NextToken"):
-                    response = config_client.select_resource_config(
-                        Expression=query, Limit=100, NextToken=response["NextToken"]
-                    )
-                    for r in response.get("Results", []):
-                        resources.append(json.loads(r))
-            except ClientError as e:
-                log.error(
-                    {
-                        "function": f"{__name__}.{sys._getframe().f_code.co_name}",
-                        "message": "Failed to query AWS Config",
-                        "query": query,
-                        "use_aggregator": use_aggregator,
-                        "account_id": account_id,
-                        "region": region,
-                        "error": str(e),
-                    },
-                    exc_info=True,
-                )
-                sentry_sdk.capture_exception()
+            resources.extend(results.get(region, []))
         return resources
+
+
+def query_pages(
+    query: str, use_aggregator: bool = True, account_id: Optional[str] = None
+) -> Iterator[List[Dict]]:
+    """
+    Like `query`, but yields each page of results as soon as AWS Config returns it, instead of collecting every result
+    first.
+
+    Without the aggregator, regions are still queried concurrently. Their pages are handed over through a queue of at
+    most `aws_config.query_pages.max_buffered_pages` pages, so a slow consumer holds up the regions instead of letting
+    results pile up in memory. Time a region spends waiting for the consumer doesn't count toward its timeout. Pages
+    of different regions are interleaved, and a region that fails or times out part way through may already have
+    yielded some of its pages.
+    """
+    function = f"{__name__}.{sys._getframe().f_code.co_name}"
+    if use_aggregator:
+        yield from _select_aggregate_resource_config_pages(query)
+        return
+
+    pages: queue.Queue = queue.Queue(
+        maxsize=config.get("aws_config.query_pages.max_buffered_pages", 20)
+    )
+    done = object()
+    stopped = threading.Event()
+
+    def _put(page) -> bool:
+        # Waiting for the consumer doesn't count toward the region timeout, so a slow consumer doesn't make
+        # regions time out and lose their remaining pages
+        with exclude_from_region_timeout():
+            while not stopped.is_set():
+                try:
+                    pages.put(page, timeout=1)
+                    return True
+                except queue.Full:
+                    continue
+        return False
+
+    def _select_resource_config(region: str) -> int:
+        num_resources = 0
+        for page in _select_resource_config_pages(query, account_id, region):
+            # Stop querying once the consumer has gone away
+            if not _put(page):
+                break
+            num_resources += len(page)
+        return num_resources
+
+    def _produce() -> None:
+        try:
+            collect_across_regions(
+                _select_resource_config,
+                _get_query_regions(),
+                "aws_config",
+                log_data={
+                    "function": function,
+                    "query": query,
+                    "use_aggregator": use_aggregator,
+                    "account_id": account_id,
+                },
+            )
+        finally:
+            _put(done)
+
+    producer = threading.Thread(
+        target=_produce, name="aws_config_query_pages", daemon=True
+    )
+    producer.start()
+    try:
+        while True:
+            page = pages.get()
+            if page is done:
+                return
+            yield page
+    finally:
+        stopped.set()
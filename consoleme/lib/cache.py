@@ -1,10 +1,13 @@
 import gzip
 import json
 import sys
+import threading
 import time
+from collections import OrderedDict
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
+import redis
 from asgiref.sync import sync_to_async
 from botocore.exceptions import ClientError
 
@@ -18,12 +21,128 @@
 from consoleme.lib.json_encoder import SetEncoder
 from consoleme.lib.plugins import get_plugin_by_name
 from consoleme.lib.redis import RedisHandler
+from consoleme.lib.s3_chunked_json import (
+    StreamingJsonDictWriter,
+    is_chunked_json_manifest,
+    put_chunked_json_object,
+    read_chunked_json_object,
+)
 from consoleme.lib.s3_helpers import get_object, put_object
 
 red = RedisHandler().redis_sync()
 stats = get_plugin_by_name(config.get("plugins.metrics", "default_metrics"))()
 
 
+class LocalJsonCache:
+    """
+    In-process LRU cache for decoded data retrieved by `retrieve_json_data_from_redis_or_s3`.
+
+    Entries are stored alongside a version stamp. A lookup only succeeds if the caller presents the same version that
+    the entry was stored with, so a worker re-fetches and re-parses data only after a writer has updated it. The cache is
+    bounded by the serialized size of the data it holds, and least recently used entries are evicted first.
+
+    Cached objects are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries: "OrderedDict[Tuple, Tuple[Any, Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple, version: Any) -> Tuple[str, Any]:
+        """
+        Retrieve an entry from the cache.
+
+        :param key: Cache key
+        :param version: The current version of the data
+        :return: A tuple of ("hit", data), ("miss", None) or ("stale", None)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return "miss", None
+            cached_version, data, _ = entry
+            if cached_version != version:
+                self._remove(key)
+                return "stale", None
+            self._entries.move_to_end(key)
+            return "hit", data
+
+    def set(self, key: Tuple, version: Any, data: Any, size: int) -> int:
+        """
+        Store an entry in the cache, evicting least recently used entries if the cache is full.
+
+        :param key: Cache key
+        :param version: The version of the data being stored
+        :param data: Decoded data
+        :param size: Approximate size of the data in bytes
+        :return: Number of entries evicted
+        """
+        evicted = 0
+        with self._lock:
+            self._remove(key)
+            if size > self.max_bytes:
+                return evicted
+            while self._entries and self.current_bytes + size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                evicted += 1
+            self._entries[key] = (version, data, size)
+            self.current_bytes += size
+        return evicted
+
+    def invalidate(self, redis_key: str) -> None:
+        """Remove all entries for a Redis key."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == redis_key]:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def _remove(self, key: Tuple) -> None:
+        entry = self._entries.pop(key, None)
+        if entry:
+            self.current_bytes -= entry[2]
+
+
+local_cache = LocalJsonCache(
+    config.get(
+        "retrieve_json_data_from_redis_or_s3.local_cache.max_bytes", 256 * 1024 * 1024
+    )
+)
+
+
+def _get_redis_data_version(
+    redis_key: str, redis_data_type: str, last_updated_redis_key: str
+) -> Optional[Tuple[str, str, int]]:
+    """
+    Returns a cheap version stamp for data stored in Redis by `store_json_results_in_redis_and_s3`. The stamp is the
+    last updated time of the key, its write counter, and its length, which also catches most writes that bypass
+    `store_json_results_in_redis_and_s3`. Returns None if the data has no version and shouldn't be cached locally.
+    """
+    version_redis_key = config.get(
+        "store_json_results_in_redis_and_s3.version_redis_key",
+        "STORE_JSON_RESULTS_IN_REDIS_AND_S3_VERSIONS",
+    )
+    pipeline = red.pipeline()
+    pipeline.hget(last_updated_redis_key, redis_key)
+    pipeline.hget(version_redis_key, redis_key)
+    if redis_data_type == "str":
+        pipeline.strlen(redis_key)
+    else:
+        pipeline.hlen(redis_key)
+    try:
+        last_updated, version, length = pipeline.execute()
+    except redis.exceptions.RedisError:
+        return None
+    if not last_updated or not version:
+        return None
+    return last_updated, version, length
+
+
 async def store_json_results_in_redis_and_s3(
     data: Union[
         Dict[str, set],
@@ -60,6 +179,10 @@ async def store_json_results_in_redis_and_s3(
         "store_json_results_in_redis_and_s3.last_updated_redis_key",
         "STORE_JSON_RESULTS_IN_REDIS_AND_S3_LAST_UPDATED",
     )
+    version_redis_key = config.get(
+        "store_json_results_in_redis_and_s3.version_redis_key",
+        "STORE_JSON_RESULTS_IN_REDIS_AND_S3_VERSIONS",
+    )
 
     function = f"{__name__}.{sys._getframe().f_code.co_name}"
     last_updated = int(time.time())
@@ -86,12 +209,42 @@ async def store_json_results_in_redis_and_s3(
                 red.hmset(redis_key, data)
         else:
             raise UnsupportedRedisDataType("Unsupported redis_data_type passed")
-        red.hset(last_updated_redis_key, redis_key, last_updated)
+        pipeline = red.pipeline()
+        pipeline.hset(last_updated_redis_key, redis_key, last_updated)
+        # The last updated time only has a resolution of one second, so readers also compare a write counter
+        pipeline.hincrby(version_redis_key, redis_key, 1)
+        pipeline.execute()
+        local_cache.invalidate(redis_key)
 
     if s3_bucket and s3_key:
         s3_extra_kwargs = {}
         if isinstance(s3_expires, int):
             s3_extra_kwargs["Expires"] = datetime.utcfromtimestamp(s3_expires)
+        if isinstance(data, (dict, list)) and config.get(
+            "store_json_results_in_redis_and_s3.chunked_s3.enabled", False
+        ):
+            # Stream large datasets to S3 instead of serializing them in memory. Dictionaries are written item by
+            # item in the regular format, so their keys don't need to be collected and sorted first.
+            if isinstance(data, dict):
+                with StreamingJsonDictWriter(
+                    s3_bucket,
+                    s3_key,
+                    last_updated,
+                    json_encoder=json_encoder,
+                    **s3_extra_kwargs,
+                ) as s3_writer:
+                    for key, value in data.items():
+                        s3_writer.add(key, value)
+                return
+            put_chunked_json_object(
+                data,
+                s3_bucket,
+                s3_key,
+                last_updated,
+                json_encoder=json_encoder,
+                **s3_extra_kwargs,
+            )
+            return
         data_for_s3 = json.dumps(
             {"last_updated": last_updated, "data": data},
             cls=SetEncoder,
@@ -113,16 +266,22 @@ async def retrieve_json_data_from_redis_or_s3(
     default: Optional = None,
     json_object_hook: Optional = None,
     json_encoder: Optional = None,
+    use_local_cache: bool = False,
 ):
     """
     Retrieve data from Redis as a priority. If data is unavailable in Redis, fall back to S3 and attempt to store
     data in Redis for quicker retrieval later.
 
+    Callers that only read the data can opt in to an in-process cache, which only fetches and decodes the data again
+    once the writer has updated it. Data returned from the in-process cache is shared, so callers must not modify it.
+
     :param redis_data_type: "str" or "hash", depending on how the data is stored in Redis
     :param redis_key: Redis Key to retrieve data from
     :param s3_bucket: S3 bucket to retrieve data from
     :param s3_key: S3 key to retrieve data from
     :param cache_to_redis_if_data_in_s3: Cache the data in Redis if the data is in S3 but not Redis
+    :param use_local_cache: Serve data from the in-process cache if it is current. The returned data is shared and
+        must not be modified.
     :return:
     """
     function = f"{__name__}.{sys._getframe().f_code.co_name}"
@@ -139,14 +298,43 @@ async def retrieve_json_data_from_redis_or_s3(
     if s3_key and not s3_bucket:
         s3_bucket = config.get("consoleme_s3_bucket")
 
+    use_local_cache = (
+        use_local_cache
+        and redis_key
+        and config.get("retrieve_json_data_from_redis_or_s3.local_cache.enabled", True)
+    )
+
     data = None
+    data_size = 0
+    data_version = None
+    local_cache_key = (redis_key, redis_data_type, json_object_hook)
+    if use_local_cache:
+        data_version = _get_redis_data_version(
+            redis_key, redis_data_type, last_updated_redis_key
+        )
+        if data_version:
+            status, cached_data = local_cache.get(local_cache_key, data_version)
+            if status == "hit" and (
+                not max_age or int(time.time()) - int(data_version[0]) <= max_age
+            ):
+                stats.count(
+                    f"{function}.local_cache.hit", tags={"redis_key": redis_key}
+                )
+                return cached_data
+            stats.count(
+                f"{function}.local_cache.{status}", tags={"redis_key": redis_key}
+            )
+
     if redis_key:
         if redis_data_type == "str":
             data_s = red.get(redis_key)
             if data_s:
+                data_size = len(data_s)
                 data = json.loads(data_s, object_hook=json_object_hook)
         elif redis_data_type == "hash":
             data = red.hgetall(redis_key)
+            if data:
+                data_size = sum(len(k) + len(v) for k, v in data.items())
         else:
             raise UnsupportedRedisDataType("Unsupported redis_data_type passed")
         if data and max_age:
@@ -157,6 +345,13 @@ async def retrieve_json_data_from_redis_or_s3(
                 # Fall back to S3 if expired.
                 if not s3_bucket or not s3_key:
                     raise ExpiredData(f"Data in Redis is older than {max_age} seconds.")
+        if data and data_version:
+            evicted = local_cache.set(local_cache_key, data_version, data, data_size)
+            if evicted:
+                stats.count(
+                    f"{function}.local_cache.evicted", tags={"redis_key": redis_key}
+                )
+            stats.gauge(f"{function}.local_cache.bytes", local_cache.current_bytes)
 
     # Fall back to S3 if there's no data
     if not data and s3_bucket and s3_key:
@@ -174,7 +369,12 @@ async def retrieve_json_data_from_redis_or_s3(
         if s3_key.endswith(".gz"):
             s3_object_content = gzip.decompress(s3_object_content)
         data_object = json.loads(s3_object_content, object_hook=json_object_hook)
-        data = data_object["data"]
+        if is_chunked_json_manifest(data_object):
+            data = await sync_to_async(read_chunked_json_object)(
+                data_object, s3_bucket, json_object_hook=json_object_hook
+            )
+        else:
+            data = data_object["data"]
 
         if data and max_age:
             current_time = int(time.time())
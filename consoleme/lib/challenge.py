@@ -2,13 +2,11 @@
 
 import pytz
 import ujson as json
-from asgiref.sync import async_to_sync
 
 from consoleme.config import config
 from consoleme.lib.redis import RedisHandler
 
 log = config.get_logger()
-red = async_to_sync(RedisHandler().redis)()
 
 
 async def delete_expired_challenges(all_challenges):
@@ -19,7 +17,8 @@ async def delete_expired_challenges(all_challenges):
         if challenge.get("ttl", 0) < current_time:
             expired_challenge_tokens.append(token)
     if expired_challenge_tokens:
-        red.hdel(
+        red = await RedisHandler().redis()
+        await red.hdel(
             config.get("challenge_url.redis_key", "TOKEN_CHALLENGES_TEMP"),
             *expired_challenge_tokens,
         )
@@ -28,7 +27,8 @@ async def delete_expired_challenges(all_challenges):
 async def retrieve_user_challenge(request, requested_challenge_token, log_data):
     current_time = int(datetime.utcnow().replace(tzinfo=pytz.UTC).timestamp())
     # Get fresh challenge for user's request
-    user_challenge_j = red.hget(
+    red = await RedisHandler().redis()
+    user_challenge_j = await red.hget(
         config.get("challenge_url.redis_key", "TOKEN_CHALLENGES_TEMP"),
         requested_challenge_token,
     )
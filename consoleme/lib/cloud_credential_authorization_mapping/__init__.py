@@ -1,9 +1,10 @@
 import sys
 import time
 from collections import defaultdict
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 
 import sentry_sdk
+import ujson as json
 from pydantic.json import pydantic_encoder
 
 from consoleme.config import config
@@ -14,6 +15,9 @@
 from consoleme.lib.cloud_credential_authorization_mapping.dynamic_config import (
     DynamicConfigAuthorizationMappingGenerator,
 )
+from consoleme.lib.cloud_credential_authorization_mapping.index import (
+    CompiledAuthorizationIndex,
+)
 from consoleme.lib.cloud_credential_authorization_mapping.internal_plugin import (
     InternalPluginAuthorizationMappingGenerator,
 )
@@ -25,6 +29,7 @@
 from consoleme.lib.cloud_credential_authorization_mapping.role_tags import (
     RoleTagAuthorizationMappingGenerator,
 )
+from consoleme.lib.redis import RedisHandler
 from consoleme.lib.singleton import Singleton
 
 log = config.get_logger("consoleme")
@@ -39,6 +44,9 @@ def __init__(self) -> None:
         self.authorization_mapping_last_update = 0
         self.reverse_mapping = {}
         self.reverse_mapping_last_update = 0
+        self.authorization_index: Optional[CompiledAuthorizationIndex] = None
+        self.authorization_index_last_check = 0
+        self.authorization_index_last_update = 0
 
     async def retrieve_credential_authorization_mapping(
         self, max_age: Optional[int] = None
@@ -183,21 +191,87 @@ async def determine_role_authorized_groups(self, account_id: str, role_name: str
         groups = reverse_mapping.get(arn, [])
         return set(groups)
 
+    async def retrieve_authorization_index(self) -> CompiledAuthorizationIndex:
+        """
+        This function retrieves the compiled credential authorization index. Every `refresh_interval` seconds, it
+        checks the version published by `generate_and_store_credential_authorization_index`, and only loads the index
+        when the version has changed.
+        """
+        now = int(time.time())
+        if (
+            self.authorization_index
+            and now - self.authorization_index_last_check
+            < config.get(
+                "generate_and_store_credential_authorization_index.refresh_interval", 10
+            )
+        ):
+            return self.authorization_index
+        self.authorization_index_last_check = now
+
+        red = await RedisHandler().redis()
+        version = await red.get(
+            config.get(
+                "generate_and_store_credential_authorization_index.version_redis_key",
+                "CREDENTIAL_AUTHORIZATION_INDEX_VERSION_V1",
+            )
+        )
+        if self.authorization_index:
+            if version and version == self.authorization_index.version:
+                return self.authorization_index
+            # Without a published version, reload the index as often as the mapping used to be reloaded
+            if not version and now - self.authorization_index_last_update <= 60:
+                return self.authorization_index
+
+        redis_topic = config.get(
+            "generate_and_store_credential_authorization_index.redis_key",
+            "CREDENTIAL_AUTHORIZATION_INDEX_V1",
+        )
+        s3_bucket = config.get(
+            "generate_and_store_credential_authorization_index.s3.bucket"
+        )
+        s3_key = config.get(
+            "generate_and_store_credential_authorization_index.s3.file",
+            "credential_authorization_mapping/credential_authorization_index_v1.json.gz",
+        )
+        try:
+            index = CompiledAuthorizationIndex.from_dict(
+                await retrieve_json_data_from_redis_or_s3(
+                    redis_topic, s3_bucket=s3_bucket, s3_key=s3_key
+                ),
+                lookup_cache_size=config.get(
+                    "generate_and_store_credential_authorization_index.lookup_cache_size",
+                    10000,
+                ),
+            )
+        except Exception as e:
+            # The index may not have been published yet, ie: right after upgrading. Compile the mapping instead.
+            log.warning(
+                {
+                    "function": f"{self.__class__.__name__}.{sys._getframe().f_code.co_name}",
+                    "message": "Unable to load the credential authorization index. Compiling the mapping instead.",
+                    "error": str(e),
+                }
+            )
+            authorization_mapping = (
+                await self.retrieve_credential_authorization_mapping()
+            )
+            index = CompiledAuthorizationIndex.from_authorization_mapping(
+                authorization_mapping
+            )
+            if not authorization_mapping:
+                # Try again after `refresh_interval` seconds
+                self.authorization_index = index
+                self.authorization_index_last_update = 0
+                return index
+        self.authorization_index = index
+        self.authorization_index_last_update = now
+        return index
+
     async def determine_users_authorized_roles(self, user, groups, include_cli=False):
-        authorization_mapping = await self.retrieve_credential_authorization_mapping()
-        authorized_roles = set()
-        user_mapping = authorization_mapping.get(user, [])
-        if user_mapping:
-            authorized_roles.update(user_mapping.authorized_roles)
-            if include_cli:
-                authorized_roles.update(user_mapping.authorized_roles_cli_only)
-        for group in groups:
-            group_mapping = authorization_mapping.get(group, [])
-            if group_mapping:
-                authorized_roles.update(group_mapping.authorized_roles)
-                if include_cli:
-                    authorized_roles.update(group_mapping.authorized_roles_cli_only)
-        return sorted(authorized_roles)
+        authorization_index = await self.retrieve_authorization_index()
+        return authorization_index.authorized_roles_for(
+            [user, *groups], include_cli=include_cli
+        )
 
 
 async def generate_and_store_reverse_authorization_mapping(
@@ -210,6 +284,13 @@ async def generate_and_store_reverse_authorization_mapping(
         for role in roles.authorized_roles_cli_only:
             reverse_mapping[role.lower()].append(identity)
 
+    await store_reverse_authorization_mapping(reverse_mapping)
+    return reverse_mapping
+
+
+async def store_reverse_authorization_mapping(
+    reverse_mapping: Dict[str, List[user_or_group]]
+) -> None:
     # Store in S3 and Redis
     redis_topic = config.get(
         "generate_and_store_reverse_authorization_mapping.redis_key",
@@ -234,18 +315,55 @@ async def generate_and_store_reverse_authorization_mapping(
         s3_key=s3_key,
         json_encoder=pydantic_encoder,
     )
-    return reverse_mapping
 
 
-async def generate_and_store_credential_authorization_mapping() -> Dict[
-    user_or_group, RoleAuthorizations
-]:
-    authorization_mapping: Dict[user_or_group, RoleAuthorizations] = {}
+async def generate_and_store_credential_authorization_index(
+    authorization_mapping: Dict[user_or_group, RoleAuthorizations]
+) -> CompiledAuthorizationIndex:
+    """
+    Compiles the credential authorization mapping, stores it, and then publishes its version so that
+    `CredentialAuthorizationMapping` instances load it.
+    """
+    index = CompiledAuthorizationIndex.from_authorization_mapping(authorization_mapping)
 
-    if config.get("cloud_credential_authorization_mapping.role_tags.enabled", True):
-        authorization_mapping = await RoleTagAuthorizationMappingGenerator().generate_credential_authorization_mapping(
-            authorization_mapping
+    # Store in S3 and Redis
+    redis_topic = config.get(
+        "generate_and_store_credential_authorization_index.redis_key",
+        "CREDENTIAL_AUTHORIZATION_INDEX_V1",
+    )
+    s3_bucket = None
+    s3_key = None
+    if config.region == config.get("celery.active_region", config.region) or config.get(
+        "environment"
+    ) in ["dev", "test"]:
+        s3_bucket = config.get(
+            "generate_and_store_credential_authorization_index.s3.bucket"
         )
+        s3_key = config.get(
+            "generate_and_store_credential_authorization_index.s3.file",
+            "credential_authorization_mapping/credential_authorization_index_v1.json.gz",
+        )
+    await store_json_results_in_redis_and_s3(
+        index.to_dict(),
+        redis_topic,
+        s3_bucket=s3_bucket,
+        s3_key=s3_key,
+    )
+    red = await RedisHandler().redis()
+    await red.set(
+        config.get(
+            "generate_and_store_credential_authorization_index.version_redis_key",
+            "CREDENTIAL_AUTHORIZATION_INDEX_VERSION_V1",
+        ),
+        index.version,
+    )
+    return index
+
+
+async def generate_credential_authorization_mapping_from_other_sources(
+    authorization_mapping: Dict[user_or_group, RoleAuthorizations]
+) -> Dict[user_or_group, RoleAuthorizations]:
+    """Adds the authorizations from every source other than role tags to `authorization_mapping`"""
     if config.get(
         "cloud_credential_authorization_mapping.dynamic_config.enabled", True
     ):
@@ -258,7 +376,12 @@ async def generate_and_store_credential_authorization_mapping() -> Dict[
         authorization_mapping = await InternalPluginAuthorizationMappingGenerator().generate_credential_authorization_mapping(
             authorization_mapping
         )
+    return authorization_mapping
+
 
+async def store_credential_authorization_mapping(
+    authorization_mapping: Dict[user_or_group, RoleAuthorizations]
+) -> None:
     # Store in S3 and Redis
     redis_topic = config.get(
         "generate_and_store_credential_authorization_mapping.redis_key",
@@ -283,4 +406,159 @@ async def generate_and_store_credential_authorization_mapping() -> Dict[
         s3_key=s3_key,
         json_encoder=pydantic_encoder,
     )
+
+
+async def generate_and_store_credential_authorization_mapping() -> Dict[
+    user_or_group, RoleAuthorizations
+]:
+    authorization_mapping: Dict[user_or_group, RoleAuthorizations] = {}
+
+    if config.get("cloud_credential_authorization_mapping.role_tags.enabled", True):
+        authorization_mapping = await RoleTagAuthorizationMappingGenerator().generate_credential_authorization_mapping(
+            authorization_mapping
+        )
+    authorization_mapping = (
+        await generate_credential_authorization_mapping_from_other_sources(
+            authorization_mapping
+        )
+    )
+    await store_credential_authorization_mapping(authorization_mapping)
     return authorization_mapping
+
+
+async def _regenerate_and_store_all_authorization_mappings() -> Dict[str, Any]:
+    authorization_mapping = await generate_and_store_credential_authorization_mapping()
+    await generate_and_store_reverse_authorization_mapping(authorization_mapping)
+    await generate_and_store_credential_authorization_index(authorization_mapping)
+    return {
+        "full_rebuild": True,
+        "num_group_authorizations": len(authorization_mapping),
+    }
+
+
+async def apply_role_changes_to_credential_authorization_mapping(
+    role_entries: Dict[str, Optional[Dict[str, Any]]]
+) -> Dict[str, Any]:
+    """
+    Applies changes to roles to the stored credential authorization mapping, reverse mapping and index, instead of
+    generating them from every role again.
+
+    Only authorizations granted by role tags are changed. Authorizations from dynamic config or the internal plugin
+    are kept, and `generate_and_store_credential_authorization_mapping` still runs periodically to regenerate the
+    mappings from every source. If the mappings haven't been generated yet, they are generated from every role.
+
+    :param role_entries: Changed roles, as stored in the IAM role cache, or None for deleted roles
+    """
+    function = f"{__name__}.{sys._getframe().f_code.co_name}"
+    role_tags = RoleTagAuthorizationMappingGenerator()
+    red = await RedisHandler().redis()
+    if not config.get(
+        "cloud_credential_authorization_mapping.role_tags.enabled", True
+    ) or not await red.exists(role_tags.role_groups_redis_key):
+        return await _regenerate_and_store_all_authorization_mappings()
+
+    no_groups = {"authorized_roles": [], "authorized_roles_cli_only": []}
+    role_arns = list(role_entries.keys())
+    changed_roles = {}
+    for arn, previous_groups_j in zip(
+        role_arns, await red.hmget(role_tags.role_groups_redis_key, role_arns)
+    ):
+        previous_groups = (
+            json.loads(previous_groups_j) if previous_groups_j else no_groups
+        )
+        role_entry = role_entries[arn]
+        current_groups = (
+            role_tags.role_authorized_groups(role_entry) if role_entry else no_groups
+        )
+        if current_groups != previous_groups:
+            changed_roles[arn] = (previous_groups, current_groups)
+    if not changed_roles:
+        return {"full_rebuild": False, "num_roles_changed": 0}
+
+    try:
+        authorization_mapping = await retrieve_json_data_from_redis_or_s3(
+            config.get(
+                "generate_and_store_credential_authorization_mapping.redis_key",
+                "CREDENTIAL_AUTHORIZATION_MAPPING_V1",
+            ),
+            json_object_hook=RoleAuthorizationsDecoder,
+            json_encoder=pydantic_encoder,
+        )
+        reverse_mapping = await retrieve_json_data_from_redis_or_s3(
+            config.get(
+                "generate_and_store_reverse_authorization_mapping.redis_key",
+                "REVERSE_AUTHORIZATION_MAPPING_V1",
+            ),
+        )
+    except Exception as e:
+        log.warning(
+            {
+                "function": function,
+                "message": "Unable to retrieve the authorization mappings. Generating them from every role.",
+                "error": str(e),
+            }
+        )
+        return await _regenerate_and_store_all_authorization_mappings()
+
+    # Authorizations that don't come from role tags, and must be kept when a tag is removed
+    other_mapping = await generate_credential_authorization_mapping_from_other_sources(
+        {}
+    )
+    for arn, (previous_groups, current_groups) in changed_roles.items():
+        affected_identities = set(reverse_mapping.get(arn.lower(), []))
+        for attribute, groups in previous_groups.items():
+            for group in set(groups) - set(current_groups[attribute]):
+                affected_identities.add(group)
+                authorizations = authorization_mapping.get(group)
+                other_authorizations = other_mapping.get(group)
+                if authorizations and not (
+                    other_authorizations
+                    and arn in getattr(other_authorizations, attribute)
+                ):
+                    getattr(authorizations, attribute).discard(arn)
+        for groups in current_groups.values():
+            affected_identities.update(groups)
+        role_tags.add_role_to_mapping(authorization_mapping, arn, current_groups)
+
+        reverse_entry = []
+        for identity in sorted(affected_identities):
+            authorizations = authorization_mapping.get(identity)
+            if not authorizations:
+                continue
+            if arn in authorizations.authorized_roles:
+                reverse_entry.append(identity)
+            if arn in authorizations.authorized_roles_cli_only:
+                reverse_entry.append(identity)
+            if (
+                not authorizations.authorized_roles
+                and not authorizations.authorized_roles_cli_only
+                and identity not in other_mapping
+            ):
+                del authorization_mapping[identity]
+        if reverse_entry:
+            reverse_mapping[arn.lower()] = reverse_entry
+        else:
+            reverse_mapping.pop(arn.lower(), None)
+
+    await store_credential_authorization_mapping(authorization_mapping)
+    await store_reverse_authorization_mapping(reverse_mapping)
+    index = await generate_and_store_credential_authorization_index(
+        authorization_mapping
+    )
+
+    role_groups_to_store = {}
+    role_groups_to_delete = []
+    for arn, (_, current_groups) in changed_roles.items():
+        if any(current_groups.values()):
+            role_groups_to_store[arn] = json.dumps(current_groups)
+        else:
+            role_groups_to_delete.append(arn)
+    if role_groups_to_store:
+        await red.hmset(role_tags.role_groups_redis_key, role_groups_to_store)
+    if role_groups_to_delete:
+        await red.hdel(role_tags.role_groups_redis_key, *role_groups_to_delete)
+    return {
+        "full_rebuild": False,
+        "num_roles_changed": len(changed_roles),
+        "authorization_index_version": index.version,
+    }
@@ -0,0 +1,175 @@
+"""
+Compiled form of the credential authorization mapping, used to answer "which roles can this user access" lookups.
+
+Role ARNs are sorted and interned to integers, and each user or group stores the IDs of the roles it is authorized for
+in compact arrays. A lookup is the union of the arrays of a user and their groups, and since role IDs follow the
+order of the ARNs, sorting the IDs returns the ARNs sorted. Users make the same lookup on every page load and
+credential request, so recent results are cached until a new version of the index is loaded.
+"""
+import base64
+import hashlib
+import json
+import sys
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+from consoleme.lib.cloud_credential_authorization_mapping.models import (
+    RoleAuthorizations,
+    user_or_group,
+)
+
+COMPILED_INDEX_FORMAT = "credential_authorization_index_v1"
+# Role IDs are stored as unsigned 32 bit integers
+ROLE_ID_TYPECODE = "I" if array("I").itemsize == 4 else "L"
+
+
+def _encode_role_ids(role_ids: array) -> str:
+    if sys.byteorder != "little":
+        role_ids = array(ROLE_ID_TYPECODE, role_ids)
+        role_ids.byteswap()
+    return base64.b64encode(role_ids.tobytes()).decode()
+
+
+def _decode_role_ids(encoded: str) -> array:
+    role_ids = array(ROLE_ID_TYPECODE)
+    role_ids.frombytes(base64.b64decode(encoded))
+    if sys.byteorder != "little":
+        role_ids.byteswap()
+    return role_ids
+
+
+class CompiledAuthorizationIndex:
+    """
+    Maps users and groups to the roles they are authorized for.
+
+    :param roles: Sorted role ARNs. The position of an ARN is its role ID
+    :param identities: Users and groups, mapped to the position of their role IDs in `authorized_roles` and
+        `authorized_roles_cli_only`
+    :param authorized_roles: Sorted role IDs each identity can access through the web console and the CLI
+    :param authorized_roles_cli_only: Sorted role IDs each identity can access only through the CLI
+    :param version: Digest of the index contents, used by workers to determine if they need to load a new index
+    :param lookup_cache_size: Number of lookup results to keep
+    """
+
+    def __init__(
+        self,
+        roles: List[str],
+        identities: Dict[user_or_group, int],
+        authorized_roles: List[array],
+        authorized_roles_cli_only: List[array],
+        version: Optional[str] = None,
+        lookup_cache_size: int = 10000,
+    ) -> None:
+        self.roles = roles
+        self.identities = identities
+        self.authorized_roles = authorized_roles
+        self.authorized_roles_cli_only = authorized_roles_cli_only
+        self.version = version
+        self.lookup_cache_size = lookup_cache_size
+        self._lookup_cache: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.identities)
+
+    @classmethod
+    def from_authorization_mapping(
+        cls, authorization_mapping: Dict[user_or_group, RoleAuthorizations]
+    ) -> "CompiledAuthorizationIndex":
+        """Compiles a mapping of users and groups to RoleAuthorizations"""
+        all_roles = set()
+        for authorizations in authorization_mapping.values():
+            all_roles.update(authorizations.authorized_roles)
+            all_roles.update(authorizations.authorized_roles_cli_only)
+        roles = sorted(all_roles)
+        role_ids = {role: role_id for role_id, role in enumerate(roles)}
+
+        identities = {}
+        authorized_roles = []
+        authorized_roles_cli_only = []
+        for identity, authorizations in authorization_mapping.items():
+            identities[identity] = len(authorized_roles)
+            authorized_roles.append(
+                array(
+                    ROLE_ID_TYPECODE,
+                    sorted(role_ids[role] for role in authorizations.authorized_roles),
+                )
+            )
+            authorized_roles_cli_only.append(
+                array(
+                    ROLE_ID_TYPECODE,
+                    sorted(
+                        role_ids[role]
+                        for role in authorizations.authorized_roles_cli_only
+                    ),
+                )
+            )
+        index = cls(roles, identities, authorized_roles, authorized_roles_cli_only)
+        index.version = hashlib.sha256(
+            json.dumps(index.to_dict(), sort_keys=True).encode()
+        ).hexdigest()
+        return index
+
+    def to_dict(self) -> Dict[str, Any]:
+        identities = sorted(self.identities.items(), key=lambda item: item[1])
+        return {
+            "format": COMPILED_INDEX_FORMAT,
+            "version": self.version,
+            "roles": self.roles,
+            "identities": [identity for identity, _ in identities],
+            "authorized_roles": [
+                _encode_role_ids(self.authorized_roles[position])
+                for _, position in identities
+            ],
+            "authorized_roles_cli_only": [
+                _encode_role_ids(self.authorized_roles_cli_only[position])
+                for _, position in identities
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], **kwargs) -> "CompiledAuthorizationIndex":
+        if data.get("format") != COMPILED_INDEX_FORMAT:
+            raise ValueError(
+                f"Unsupported credential authorization index format: {data.get('format')}"
+            )
+        return cls(
+            data["roles"],
+            {
+                identity: position
+                for position, identity in enumerate(data["identities"])
+            },
+            [_decode_role_ids(encoded) for encoded in data["authorized_roles"]],
+            [
+                _decode_role_ids(encoded)
+                for encoded in data["authorized_roles_cli_only"]
+            ],
+            version=data.get("version"),
+            **kwargs,
+        )
+
+    def authorized_roles_for(
+        self, identities: Iterable[user_or_group], include_cli: bool = False
+    ) -> List[str]:
+        """Returns the sorted ARNs of the roles that any of `identities` are authorized for"""
+        cache_key = (frozenset(identities), include_cli)
+        cached = self._lookup_cache.get(cache_key)
+        if cached is not None:
+            self._lookup_cache.move_to_end(cache_key)
+            return list(cached)
+
+        role_ids = set()
+        for identity in cache_key[0]:
+            position = self.identities.get(identity)
+            if position is None:
+                continue
+            role_ids.update(self.authorized_roles[position])
+            if include_cli:
+                role_ids.update(self.authorized_roles_cli_only[position])
+        roles = self.roles
+        result = [roles[role_id] for role_id in sorted(role_ids)]
+        if self.lookup_cache_size:
+            self._lookup_cache[cache_key] = result
+            if len(self._lookup_cache) > self.lookup_cache_size:
+                self._lookup_cache.popitem(last=False)
+        return list(result)
@@ -1,4 +1,4 @@
-from typing import Dict
+from typing import Any, Dict, List
 
 import ujson as json
 
@@ -9,11 +9,99 @@
     RoleAuthorizations,
     user_or_group,
 )
+from consoleme.lib.redis import RedisHandler
+
+red = RedisHandler().redis_sync()
 
 
 class RoleTagAuthorizationMappingGenerator(CredentialAuthzMappingGenerator):
     """Generates an authorization mapping of groups -> roles based on IAM role tags."""
 
+    def __init__(self) -> None:
+        self.authorized_groups_tags = set(
+            config.get(
+                "cloud_credential_authorization_mapping.role_tags.authorized_groups_tags",
+                [],
+            )
+        )
+        self.authorized_groups_cli_only_tags = set(
+            config.get(
+                "cloud_credential_authorization_mapping.role_tags.authorized_groups_cli_only_tags",
+                [],
+            )
+        )
+        self.required_trust_policy_entity = (
+            config.get(
+                "cloud_credential_authorization_mapping.role_tags.required_trust_policy_entity"
+            )
+            or ""
+        ).lower()
+        self.force_groups_lowercase = config.get("auth.force_groups_lowercase", False)
+        # Groups authorized by the tags of each role are stored so that role changes can be applied incrementally
+        self.role_groups_redis_key = config.get(
+            "cloud_credential_authorization_mapping.role_tags.role_groups_redis_key",
+            "CREDENTIAL_AUTHORIZATION_ROLE_TAG_GROUPS_V1",
+        )
+
+    def _groups(self, tag_value: str) -> List[user_or_group]:
+        groups = tag_value.split(":")
+        if self.force_groups_lowercase:
+            return [group.lower() for group in groups]
+        return groups
+
+    def role_authorized_groups(
+        self, role_entry: Dict[str, Any]
+    ) -> Dict[str, List[user_or_group]]:
+        """
+        Returns the groups authorized for a role by its tags.
+
+        :param role_entry: Role, as stored in the IAM role cache or as returned by `fetch_iam_role`, whose policy is
+            already decoded
+        :return: Groups keyed by the RoleAuthorizations attribute they are authorized through
+        """
+        authorized_groups = {"authorized_roles": [], "authorized_roles_cli_only": []}
+        policy = role_entry["policy"]
+        if isinstance(policy, str):
+            policy = json.loads(policy)
+        tags = policy.get("Tags") or []
+        if not tags:
+            return authorized_groups
+
+        if (
+            self.required_trust_policy_entity
+            and self.required_trust_policy_entity
+            not in json.dumps(
+                policy["AssumeRolePolicyDocument"], escape_forward_slashes=False
+            ).lower()
+        ):
+            return authorized_groups
+
+        for tag in tags:
+            if tag["Key"] in self.authorized_groups_tags:
+                authorized_groups["authorized_roles"].extend(self._groups(tag["Value"]))
+            if tag["Key"] in self.authorized_groups_cli_only_tags:
+                authorized_groups["authorized_roles_cli_only"].extend(
+                    self._groups(tag["Value"])
+                )
+        return authorized_groups
+
+    @staticmethod
+    def add_role_to_mapping(
+        authorization_mapping: Dict[user_or_group, RoleAuthorizations],
+        arn: str,
+        authorized_groups: Dict[str, List[user_or_group]],
+    ) -> None:
+        for attribute, groups in authorized_groups.items():
+            for group in groups:
+                if not authorization_mapping.get(group):
+                    authorization_mapping[group] = RoleAuthorizations.parse_obj(
+                        {
+                            "authorized_roles": set(),
+                            "authorized_roles_cli_only": set(),
+                        }
+                    )
+                getattr(authorization_mapping[group], attribute).add(arn)
+
     async def generate_credential_authorization_mapping(
         self, authorization_mapping: Dict[user_or_group, RoleAuthorizations]
     ) -> Dict[user_or_group, RoleAuthorizations]:
@@ -32,55 +120,21 @@ async def generate_credential_authorization_mapping(
             ),
         )
 
-        required_trust_policy_entity = config.get(
-            "cloud_credential_authorization_mapping.role_tags.required_trust_policy_entity"
-        )
-
+        role_groups = {}
         for arn, role_entry_j in all_roles.items():
-            role_entry = json.loads(role_entry_j)
-            policy = json.loads(role_entry["policy"])
-            tags = policy.get("Tags")
-
-            if (
-                required_trust_policy_entity
-                and required_trust_policy_entity.lower()
-                not in json.dumps(
-                    policy["AssumeRolePolicyDocument"], escape_forward_slashes=False
-                ).lower()
-            ):
+            authorized_groups = self.role_authorized_groups(json.loads(role_entry_j))
+            if not any(authorized_groups.values()):
                 continue
+            role_groups[arn] = json.dumps(authorized_groups)
+            self.add_role_to_mapping(authorization_mapping, arn, authorized_groups)
 
-            for tag in tags:
-                if tag["Key"] in config.get(
-                    "cloud_credential_authorization_mapping.role_tags.authorized_groups_tags",
-                    [],
-                ):
-                    splitted_groups = tag["Value"].split(":")
-                    for group in splitted_groups:
-                        if config.get("auth.force_groups_lowercase", False):
-                            group = group.lower()
-                        if not authorization_mapping.get(group):
-                            authorization_mapping[group] = RoleAuthorizations.parse_obj(
-                                {
-                                    "authorized_roles": set(),
-                                    "authorized_roles_cli_only": set(),
-                                }
-                            )
-                        authorization_mapping[group].authorized_roles.add(arn)
-                if tag["Key"] in config.get(
-                    "cloud_credential_authorization_mapping.role_tags.authorized_groups_cli_only_tags",
-                    [],
-                ):
-                    splitted_groups = tag["Value"].split(":")
-                    for group in splitted_groups:
-                        if config.get("auth.force_groups_lowercase", False):
-                            group = group.lower()
-                        if not authorization_mapping.get(group):
-                            authorization_mapping[group] = RoleAuthorizations.parse_obj(
-                                {
-                                    "authorized_roles": set(),
-                                    "authorized_roles_cli_only": set(),
-                                }
-                            )
-                        authorization_mapping[group].authorized_roles_cli_only.add(arn)
+        pipeline = red.pipeline()
+        pipeline.delete(self.role_groups_redis_key)
+        role_groups_items = list(role_groups.items())
+        for i in range(0, len(role_groups_items), 1000):
+            pipeline.hset(
+                self.role_groups_redis_key,
+                mapping=dict(role_groups_items[i : i + 1000]),
+            )
+        pipeline.execute()
         return authorization_mapping
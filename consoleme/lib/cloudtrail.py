@@ -2,21 +2,59 @@
 import json as original_json
 import time
 from collections import defaultdict
+from typing import Any, Dict, Iterable
 
 import simplejson as json
+from asgiref.sync import sync_to_async
 from boto3.dynamodb.types import Binary  # noqa
 
 from consoleme.config import config
+from consoleme.lib.asyncio import run_in_parallel
 from consoleme.lib.aws import get_iam_principal_owner, simulate_iam_principal_action
 from consoleme.lib.cache import store_json_results_in_redis_and_s3
 from consoleme.lib.dynamo import UserDynamoHandler
+from consoleme.lib.errors_by_arn import cloudtrail_errors_keys
 from consoleme.lib.json_encoder import SetEncoder
 from consoleme.lib.notifications.models import (
     ConsoleMeUserNotification,
     ConsoleMeUserNotificationAction,
 )
+from consoleme.lib.redis import RedisHandler
 
 ddb = UserDynamoHandler()
+red = RedisHandler().redis_sync()
+
+
+def cloudtrail_denies_keys() -> Dict[str, str]:
+    return {
+        # Set of the [arn, request_id] keys of CloudTrail denies that changed since they were last processed
+        "changed_key": config.get(
+            "process_cloudtrail_errors.changed_denies_redis_key",
+            "CLOUDTRAIL_DENIES_CHANGED",
+        ),
+        # The changed denies are moved here while they are processed, and kept if processing fails
+        "processing_key": config.get(
+            "process_cloudtrail_errors.processing_denies_redis_key",
+            "CLOUDTRAIL_DENIES_PROCESSING",
+        ),
+        # Sorted set of principal ARNs, scored by the earliest TTL of their CloudTrail denies
+        "expirations_key": config.get(
+            "process_cloudtrail_errors.expirations_redis_key",
+            "CLOUDTRAIL_DENIES_EXPIRATIONS",
+        ),
+        # Set once every error in the table has been processed
+        "backfilled_key": config.get(
+            "process_cloudtrail_errors.backfilled_redis_key",
+            "CLOUDTRAIL_DENIES_BACKFILLED",
+        ),
+    }
+
+
+def record_changed_cloudtrail_denies(denies: Iterable[Dict[str, Any]]) -> None:
+    """Queue CloudTrail denies that were written to DynamoDB for `CloudTrail.process_cloudtrail_errors`"""
+    members = [json.dumps([deny["arn"], deny["request_id"]]) for deny in denies]
+    if members:
+        red.sadd(cloudtrail_denies_keys()["changed_key"], *members)
 
 
 class CloudTrail:
@@ -28,38 +66,124 @@ async def process_cloudtrail_errors(
         ),
     ) -> object:
         """
-        Processes Cloudtrail Errors that were cached by the `cache_cloudtrail_denies` celery task. Generates and returns
-        count data. If configured, generates notifications to end-users based on policies that can be generated
+        Processes Cloudtrail Errors that the `cache_cloudtrail_denies` celery task wrote since the last run. Generates
+        and returns count data for the principals whose errors changed or expired. A principal without errors has a
+        count of 0. If configured, generates notifications to end-users based on policies that can be generated for
+        the changed errors.
 
         :param notification_ttl_seconds:
         :return:
         """
         notification_type = "cloudtrail_generated_policy"
         expiration = int(time.time() + notification_ttl_seconds)
+        keys = cloudtrail_denies_keys()
 
-        # Get all existing cloudtrail_generated_policy notifications
-        all_notifications = {}
-        all_notifications_l = await ddb.parallel_scan_table_async(
-            ddb.notifications_table
+        # Denies recorded from here on are left for the next run
+        pipeline = red.pipeline()
+        pipeline.sunionstore(
+            keys["processing_key"], [keys["processing_key"], keys["changed_key"]]
+        )
+        pipeline.delete(keys["changed_key"])
+        pipeline.execute()
+        changed_members = red.smembers(keys["processing_key"])
+        changed_denies = {tuple(json.loads(member)) for member in changed_members}
+        # The error counts are rebuilt from every error if they expired, for example because this hasn't run for longer
+        # than their expiration
+        backfill = not red.exists(keys["backfilled_key"]) or not red.exists(
+            cloudtrail_errors_keys()["aggregate_key"]
+        )
+        if backfill:
+            # Errors haven't been processed incrementally, so every error in the table is processed once
+            for cloudtrail_error in await ddb.parallel_scan_table_async(
+                ddb.cloudtrail_table
+            ):
+                changed_denies.add(
+                    (cloudtrail_error["arn"], cloudtrail_error["request_id"])
+                )
+
+        # Only principals with changed errors, or with errors that expired since they were last processed, are queried
+        arns = {arn for arn, _ in changed_denies}
+        arns.update(red.zrangebyscore(keys["expirations_key"], "-inf", time.time()))
+        arns = list(arns)
+        max_concurrency = config.get("process_cloudtrail_errors.max_concurrency", 10)
+        get_cloudtrail_denies_for_arn = sync_to_async(
+            ddb.get_cloudtrail_denies_for_arn, thread_sensitive=False
+        )
+        errors_for_arns = [
+            task_result["result"]
+            for task_result in await run_in_parallel(
+                [
+                    {"fn": get_cloudtrail_denies_for_arn, "args": (arn,)}
+                    for arn in arns
+                ],
+                threads=max_concurrency,
+                sync=False,
+            )
+        ]
+
+        error_count = {}
+        cloudtrail_errors = []
+        pipeline = red.pipeline()
+        for arn, errors_for_arn in zip(arns, errors_for_arns):
+            error_count[arn] = 0
+            error_count = ddb.count_arn_errors(error_count, errors_for_arn)
+            if errors_for_arn:
+                pipeline.zadd(
+                    keys["expirations_key"],
+                    {arn: min(int(error["ttl"]) for error in errors_for_arn)},
+                )
+            else:
+                pipeline.zrem(keys["expirations_key"], arn)
+            cloudtrail_errors.extend(
+                error
+                for error in errors_for_arn
+                if (arn, error["request_id"]) in changed_denies
+            )
+
+        # Get the existing notifications of the changed errors. Owners are only needed for the principals that have
+        # changed errors to notify about.
+        notification_arns = list(
+            {cloudtrail_error.get("arn", "") for cloudtrail_error in cloudtrail_errors}
         )
-        for existing_notification in all_notifications_l:
+        principal_owners = {
+            task_result["args"][0]: task_result["result"]
+            for task_result in await run_in_parallel(
+                [
+                    {"fn": get_iam_principal_owner, "args": (arn, aws)}
+                    for arn in notification_arns
+                ],
+                threads=max_concurrency,
+                sync=False,
+            )
+        }
+        predictable_ids = {}
+        for cloudtrail_error in cloudtrail_errors:
+            arn = cloudtrail_error.get("arn", "")
+            # If a given IAM principal encounters an sts:AssumeRole AccessDeny error for a given role across multiple
+            # accounts (I.E. The role being assumed has the same name on multiple accounts), we only want to generate
+            # one notification for the issue. Therefore, resource_full_name might not accurately reflect the resource
+            # name, but it works for the purposes of creating a unique ID such that only one notification gets created
+            # for this set of CloudTrail Events
+            principal_owner = principal_owners[arn]
+            principal_name = arn.split("/")[-1]
+            event_call = cloudtrail_error.get("event_call", "")
+            resource_full_name = cloudtrail_error.get("resource", "").split(":")[-1]
+            predictable_id = f"{notification_type}-{principal_owner}-{principal_name}-{event_call}-{resource_full_name}"
+            predictable_ids[(arn, cloudtrail_error["request_id"])] = predictable_id
+        all_notifications = {}
+        for existing_notification in await sync_to_async(ddb.get_notifications)(
+            predictable_ids.values()
+        ):
             if existing_notification["type"] != notification_type:
                 continue
             all_notifications[
                 existing_notification["predictable_id"]
             ] = ConsoleMeUserNotification.parse_obj(existing_notification)
 
-        error_count = {}
-        # Get all existing Cloudtrail errors. This will be expensive if there are a large number of errors.
-        cloudtrail_errors = await ddb.parallel_scan_table_async(
-            ddb.cloudtrail_table,
-        )
-        cloudtrail_errors = ddb._data_from_dynamo_replace(cloudtrail_errors)
-        error_count = ddb.count_arn_errors(error_count, cloudtrail_errors)
         new_or_changed_notifications = {}
         for cloudtrail_error in cloudtrail_errors:
             arn = cloudtrail_error.get("arn", "")
-            principal_owner = await get_iam_principal_owner(arn, aws)
+            principal_owner = principal_owners[arn]
             session_name = cloudtrail_error.get("session_name", "")
             principal_type = "iam" + arn.split(":")[-1].split("/")[0]
             account_id = arn.split(":")[4]
@@ -69,13 +193,7 @@ async def process_cloudtrail_errors(
             )
             event_call = cloudtrail_error.get("event_call", "")
             resource = cloudtrail_error.get("resource", "")
-            # If a given IAM principal encounters an sts:AssumeRole AccessDeny error for a given role across multiple
-            # accounts (I.E. The role being assumed has the same name on multiple accounts), we only want to generate
-            # one notification for the issue. Therefore, resource_full_name might not accurately reflect the resource
-            # name, but it works for the purposes of creating a unique ID such that only one notification gets created
-            # for this set of CloudTrail Events
-            resource_full_name = resource.split(":")[-1]
-            predictable_id = f"{notification_type}-{principal_owner}-{principal_name}-{event_call}-{resource_full_name}"
+            predictable_id = predictable_ids[(arn, cloudtrail_error["request_id"])]
             generated_request = {
                 "role": {
                     "name": principal_name,
@@ -221,6 +339,10 @@ async def process_cloudtrail_errors(
                     "notifications.s3.key", "notifications/all_notifications_v1.json.gz"
                 ),
             )
+        if backfill:
+            pipeline.set(keys["backfilled_key"], int(time.time()))
+        pipeline.delete(keys["processing_key"])
+        pipeline.execute()
         return {
             "error_count_by_role": error_count,
             "num_new_or_changed_notifications": len(new_or_changed_notifications_l),
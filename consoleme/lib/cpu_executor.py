@@ -0,0 +1,111 @@
+"""
+Runs CPU-heavy work, such as checking password hashes, verifying token signatures and parsing resource templates,
+outside of the Tornado event loop.
+
+Password hashes are checked and resource templates are parsed in a process pool, so that work doesn't hold the event
+loop (or the GIL) of the process that serves other users. Token signatures are verified on a thread pool. Both pools
+are created on first use and are sized through `cpu_executor.process_pool.max_workers` and
+`cpu_executor.thread_pool.max_workers`. Work that is waiting for, or running on, each pool is reported in the
+`cpu_executor.queue_depth` metric.
+"""
+import asyncio
+import functools
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict
+
+from consoleme.config import config
+from consoleme.lib.plugins import get_plugin_by_name
+
+log = config.get_logger()
+stats = get_plugin_by_name(config.get("plugins.metrics", "default_metrics"))()
+
+PROCESS_POOL = "process"
+THREAD_POOL = "thread"
+
+_executors: Dict[str, Executor] = {}
+_queue_depth: Dict[str, int] = {PROCESS_POOL: 0, THREAD_POOL: 0}
+_lock = threading.Lock()
+
+
+def _create_executor(pool: str) -> Executor:
+    if pool == PROCESS_POOL:
+        # The platform's default start method is used unless one is configured
+        start_method = config.get("cpu_executor.process_pool.start_method")
+        return ProcessPoolExecutor(
+            max_workers=config.get(
+                "cpu_executor.process_pool.max_workers", min(4, os.cpu_count() or 1)
+            ),
+            mp_context=multiprocessing.get_context(start_method),
+        )
+    return ThreadPoolExecutor(
+        max_workers=config.get(
+            "cpu_executor.thread_pool.max_workers", min(8, (os.cpu_count() or 1) + 4)
+        ),
+        thread_name_prefix="cpu_executor",
+    )
+
+
+def get_executor(pool: str) -> Executor:
+    with _lock:
+        executor = _executors.get(pool)
+        if not executor:
+            executor = _create_executor(pool)
+            _executors[pool] = executor
+        return executor
+
+
+def _reset_executor(pool: str, broken_executor: Executor) -> None:
+    with _lock:
+        if _executors.get(pool) is broken_executor:
+            del _executors[pool]
+    broken_executor.shutdown(wait=False)
+
+
+def _update_queue_depth(pool: str, change: int) -> None:
+    with _lock:
+        _queue_depth[pool] += change
+        queue_depth = _queue_depth[pool]
+    stats.gauge("cpu_executor.queue_depth", queue_depth, tags={"pool": pool})
+
+
+async def _run(pool: str, function: Callable, *args, **kwargs) -> Any:
+    if not config.get(f"cpu_executor.{pool}_pool.enabled", True):
+        return function(*args, **kwargs)
+    loop = asyncio.get_running_loop()
+    call = functools.partial(function, *args, **kwargs)
+    _update_queue_depth(pool, 1)
+    try:
+        executor = get_executor(pool)
+        try:
+            return await loop.run_in_executor(executor, call)
+        except BrokenProcessPool:
+            # A worker process died, such as from the OOM killer. Replace the pool and try once more.
+            log.warning(
+                {
+                    "function": f"{__name__}.{sys._getframe().f_code.co_name}",
+                    "message": "CPU executor process pool is broken. Recreating it.",
+                }
+            )
+            stats.count("cpu_executor.broken_process_pool")
+            _reset_executor(pool, executor)
+            return await loop.run_in_executor(get_executor(pool), call)
+    finally:
+        _update_queue_depth(pool, -1)
+
+
+async def run_in_process_pool(function: Callable, *args, **kwargs) -> Any:
+    """
+    Run a CPU-heavy function, such as `bcrypt.checkpw`, in the process pool. The function and its arguments must be
+    picklable.
+    """
+    return await _run(PROCESS_POOL, function, *args, **kwargs)
+
+
+async def run_in_thread_pool(function: Callable, *args, **kwargs) -> Any:
+    """Run a CPU-heavy function that releases the GIL, such as token signature verification, on the thread pool."""
+    return await _run(THREAD_POOL, function, *args, **kwargs)
@@ -1,16 +1,30 @@
 import asyncio
+import base64
+import heapq
 import os
 import sys
+import threading
 import time
 import uuid
 import zlib
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # used as a placeholder for empty SID to work around this:
 # https://github.com/aws/aws-sdk-js/issues/833
 from decimal import Decimal
-from typing import Any, Dict, List, Optional, Union
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import bcrypt
 import boto3
@@ -18,8 +32,8 @@
 import simplejson as json
 import yaml
 from asgiref.sync import sync_to_async
-from boto3.dynamodb.conditions import Key
-from boto3.dynamodb.types import Binary  # noqa
+from boto3.dynamodb.conditions import Attr, Key
+from boto3.dynamodb.types import Binary, TypeDeserializer  # noqa
 from cloudaux import get_iso_string
 from cloudaux.aws.sts import boto3_cached_conn
 from retrying import retry
@@ -28,10 +42,12 @@
 from consoleme.config import config
 from consoleme.exceptions.exceptions import (
     DataNotRetrievable,
+    InvalidRequestParameter,
     NoExistingRequest,
     NoMatchingRequest,
     PendingRequestAlreadyExists,
 )
+from consoleme.lib.cpu_executor import run_in_process_pool
 from consoleme.lib.crypto import Crypto
 from consoleme.lib.password import wait_after_authentication_failure
 from consoleme.lib.plugins import get_plugin_by_name
@@ -49,6 +65,17 @@
     ["pending", "approved", "rejected", "cancelled", "expired", "removed"],
 )
 
+# Global secondary indexes of the policy requests table used to list requests, keyed by their partition key. Each
+# index is sorted by request_time.
+POLICY_REQUESTS_LISTING_INDEXES = config.get(
+    "aws.policy_requests_dynamo_table_listing_indexes",
+    {
+        "principal_arn": "principal_arn-request_time-index",
+        "username": "username-request_time-index",
+        "status": "status-request_time-index",
+    },
+)
+
 stats = get_plugin_by_name(config.get("plugins.metrics", "default_metrics"))()
 log = config.get_logger("consoleme")
 crypto = Crypto()
@@ -161,80 +188,141 @@ def parallel_write_table(self, table, data, overwrite_by_pkeys=None):
                     with attempt:
                         batch.put_item(Item=self._data_to_dynamo_replace(item))
 
+    def _scan_segment_pages(
+        self,
+        table,
+        segment: int,
+        total_segments: int,
+        dynamodb_kwargs: Dict[str, Any],
+        stop: Optional[threading.Event] = None,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Scans one segment of a table, and yields each page of items with Dynamo placeholders replaced."""
+        scan_kwargs = dict(
+            dynamodb_kwargs, Segment=segment, TotalSegments=total_segments
+        )
+        while not (stop and stop.is_set()):
+            response = table.scan(**scan_kwargs)
+            yield self._data_from_dynamo_replace(response.get("Items", []))
+            if "LastEvaluatedKey" not in response:
+                return
+            scan_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
     def parallel_scan_table(
         self,
         table,
-        total_threads=os.cpu_count(),
+        total_threads: Optional[int] = None,
         dynamodb_kwargs: Optional[Dict[str, Any]] = None,
-    ):
+    ) -> List[Dict[str, Any]]:
+        """Scans a table with one thread per segment, and returns all items."""
         if not dynamodb_kwargs:
             dynamodb_kwargs = {}
+        total_segments = total_threads or config.get(
+            "dynamodb.parallel_scan.total_segments", os.cpu_count()
+        )
 
-        async def _scan_segment(segment, total_segments):
-            response = table.scan(
-                Segment=segment, TotalSegments=total_segments, **dynamodb_kwargs
-            )
-            items = response.get("Items", [])
-
-            while "LastEvaluatedKey" in response:
-                response = table.scan(
-                    ExclusiveStartKey=response["LastEvaluatedKey"],
-                    Segment=segment,
-                    TotalSegments=total_segments,
-                    **dynamodb_kwargs,
-                )
-                items.extend(self._data_from_dynamo_replace(response["Items"]))
-
+        def _scan_segment(segment: int) -> List[Dict[str, Any]]:
+            items = []
+            for page in self._scan_segment_pages(
+                table, segment, total_segments, dynamodb_kwargs
+            ):
+                items.extend(page)
             return items
 
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        tasks = []
-        for i in range(total_threads):
-            task = asyncio.ensure_future(_scan_segment(i, total_threads))
-            tasks.append(task)
-
-        results = loop.run_until_complete(asyncio.gather(*tasks))
         items = []
-        for result in results:
-            items.extend(result)
+        with ThreadPoolExecutor(
+            max_workers=min(
+                total_segments,
+                config.get("dynamodb.parallel_scan.max_workers", 16),
+            )
+        ) as executor:
+            for segment_items in executor.map(_scan_segment, range(total_segments)):
+                items.extend(segment_items)
         return items
 
-    async def parallel_scan_table_async(
+    async def parallel_scan_table_pages(
         self,
         table,
-        total_threads=os.cpu_count(),
+        total_segments: Optional[int] = None,
         dynamodb_kwargs: Optional[Dict[str, Any]] = None,
-    ):
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Scans a table with one thread per segment, and yields pages of items as soon as any segment returns them.
+
+        Segments run on a bounded thread pool. Segments pause once `dynamodb.parallel_scan.max_pending_pages` pages are
+        waiting for the caller, and stop if the caller stops iterating.
+        """
         if not dynamodb_kwargs:
             dynamodb_kwargs = {}
+        total_segments = total_segments or config.get(
+            "dynamodb.parallel_scan.total_segments", os.cpu_count()
+        )
+        loop = asyncio.get_event_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        pending_pages = threading.Semaphore(
+            config.get("dynamodb.parallel_scan.max_pending_pages", 2 * total_segments)
+        )
 
-        async def _scan_segment(segment, total_segments):
-            response = table.scan(
-                Segment=segment, TotalSegments=total_segments, **dynamodb_kwargs
+        def _scan_segment(segment: int) -> None:
+            for page in self._scan_segment_pages(
+                table, segment, total_segments, dynamodb_kwargs, stop=stop
+            ):
+                while not pending_pages.acquire(timeout=1):
+                    if stop.is_set():
+                        return
+                loop.call_soon_threadsafe(queue.put_nowait, page)
+
+        executor = ThreadPoolExecutor(
+            max_workers=min(
+                total_segments,
+                config.get("dynamodb.parallel_scan.max_workers", 16),
             )
-            items = response.get("Items", [])
-
-            while "LastEvaluatedKey" in response:
-                response = table.scan(
-                    ExclusiveStartKey=response["LastEvaluatedKey"],
-                    Segment=segment,
-                    TotalSegments=total_segments,
-                    **dynamodb_kwargs,
-                )
-                items.extend(self._data_from_dynamo_replace(response["Items"]))
-
-            return items
+        )
+        try:
+            for segment in range(total_segments):
+                # Completed segments are queued as well, so that errors are raised to the caller
+                loop.run_in_executor(
+                    executor, _scan_segment, segment
+                ).add_done_callback(queue.put_nowait)
+            remaining_segments = total_segments
+            while remaining_segments:
+                page = await queue.get()
+                if isinstance(page, asyncio.Future):
+                    remaining_segments -= 1
+                    if page.exception():
+                        raise page.exception()
+                    continue
+                pending_pages.release()
+                yield page
+        finally:
+            stop.set()
+            executor.shutdown(wait=False)
 
-        tasks = []
-        for i in range(total_threads):
-            task = asyncio.ensure_future(_scan_segment(i, total_threads))
-            tasks.append(task)
+    async def parallel_scan_table_iter(
+        self,
+        table,
+        total_segments: Optional[int] = None,
+        dynamodb_kwargs: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Streams the items of a table. See `parallel_scan_table_pages`."""
+        async for page in self.parallel_scan_table_pages(
+            table, total_segments=total_segments, dynamodb_kwargs=dynamodb_kwargs
+        ):
+            for item in page:
+                yield item
 
-        results = await asyncio.gather(*tasks)
+    async def parallel_scan_table_async(
+        self,
+        table,
+        total_threads: Optional[int] = None,
+        dynamodb_kwargs: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Scans a table with one thread per segment, and returns all items."""
         items = []
-        for result in results:
-            items.extend(result)
+        async for page in self.parallel_scan_table_pages(
+            table, total_segments=total_threads, dynamodb_kwargs=dynamodb_kwargs
+        ):
+            items.extend(page)
         return items
 
 
@@ -484,6 +572,7 @@ async def write_policy_request(
             "cross_account_request": cross_account_request,
         }
 
+        self._add_policy_request_index_attributes(new_request)
         if not dry_run:
             try:
                 await sync_to_async(self.policy_requests_table.put_item)(
@@ -529,6 +618,8 @@ async def write_policy_request_v2(self, extended_request: ExtendedRequestModel):
         else:
             raise Exception("Invalid principal type")
 
+        self._add_policy_request_index_attributes(new_request)
+
         log_data = {
             "function": f"{__name__}.{self.__class__.__name__}.{sys._getframe().f_code.co_name}",
             "message": "Writing policy request v2 to Dynamo",
@@ -560,6 +651,7 @@ async def update_policy_request(self, updated_request):
         update_policy_request(policy_changes)
         """
         updated_request["last_updated"] = int(time.time())
+        self._add_policy_request_index_attributes(updated_request)
         try:
             await sync_to_async(self.policy_requests_table.put_item)(
                 Item=self._data_to_dynamo_replace(updated_request)
@@ -592,44 +684,89 @@ async def get_policy_requests(self, arn=None, request_id=None):
             matching_requests.extend(items)
         return matching_requests
 
-    async def convert_policy_requests_to_v3(self, requests):
-        # Remove this function and calls to this function after a grace period of
+    @staticmethod
+    def _convert_policy_request_to_v3(request: Dict[str, Any]) -> bool:
+        """Converts a v2 policy request to v3 in place, and returns True if it was changed"""
+        if not request.get("version") in ["2"]:
+            return False
         changed = False
-        for request in requests:
-            if not request.get("version") in ["2"]:
+        if request.get("extended_request") and not request.get("principal"):
+            principal_arn = request.pop("arn")
+            request["principal"] = {
+                "principal_arn": principal_arn,
+                "principal_type": "AwsResource",
+            }
+            request["extended_request"]["principal"] = {
+                "principal_arn": principal_arn,
+                "principal_type": "AwsResource",
+            }
+            changed = True
+        if request.pop("arn", None) is not None:
+            changed = True
+        changes = (
+            request.get("extended_request", {}).get("changes", {}).get("changes", [])
+        )
+        for change in changes:
+            if not change.get("principal_arn"):
                 continue
-            if request.get("extended_request") and not request.get("principal"):
-                principal_arn = request.pop("arn")
-                request["principal"] = {
-                    "principal_arn": principal_arn,
-                    "principal_type": "AwsResource",
-                }
-                request["extended_request"]["principal"] = {
-                    "principal_arn": principal_arn,
-                    "principal_type": "AwsResource",
-                }
-            request.pop("arn", None)
-            changes = (
-                request.get("extended_request", {})
-                .get("changes", {})
-                .get("changes", [])
-            )
-            for change in changes:
-                if not change.get("principal_arn"):
-                    continue
-                if not change.get("version") in ["2.0", "2", 2]:
-                    continue
-                change["principal"] = {
-                    "principal_arn": change["principal_arn"],
-                    "principal_type": "AwsResource",
-                }
-                change.pop("principal_arn")
-                change["version"] = "3.0"
-                changed = True
-        if changed:
-            self.parallel_write_table(self.policy_requests_table, requests)
+            if not change.get("version") in ["2.0", "2", 2]:
+                continue
+            change["principal"] = {
+                "principal_arn": change["principal_arn"],
+                "principal_type": "AwsResource",
+            }
+            change.pop("principal_arn")
+            change["version"] = "3.0"
+            changed = True
+        return changed
+
+    @staticmethod
+    def _add_policy_request_index_attributes(request: Dict[str, Any]) -> bool:
+        """
+        Adds the top level attributes that the listing indexes of the policy requests table are keyed on, and returns
+        True if the request was changed
+        """
+        if request.get("principal_arn"):
+            return False
+        principal_arn = (request.get("principal") or {}).get(
+            "principal_arn"
+        ) or request.get("arn")
+        if not principal_arn:
+            return False
+        request["principal_arn"] = principal_arn
+        return True
+
+    async def convert_policy_requests_to_v3(self, requests):
+        """
+        Converts v2 policy requests to v3 after they're read. Stored requests are converted once by
+        `migrate_policy_requests_to_v3`.
+        """
+        for request in requests:
+            self._convert_policy_request_to_v3(request)
         return requests
 
+    async def migrate_policy_requests_to_v3(self) -> int:
+        """
+        Converts stored v2 policy requests to v3, and adds the attributes used by the listing indexes to requests that
+        were written before the indexes existed. Only changed requests are written.
+
+        :return: Number of requests that were written
+        """
+        changed_requests = []
+        async for requests in self.parallel_scan_table_pages(
+            self.policy_requests_table
+        ):
+            for request in requests:
+                converted = self._convert_policy_request_to_v3(request)
+                indexed = self._add_policy_request_index_attributes(request)
+                if converted or indexed:
+                    changed_requests.append(request)
+        if changed_requests:
+            await sync_to_async(self.parallel_write_table)(
+                self.policy_requests_table, changed_requests
+            )
+        return len(changed_requests)
+
     async def get_all_policy_requests(
         self, status: Optional[str] = "pending"
     ) -> List[Dict[str, Union[int, List[str], str]]]:
@@ -639,21 +776,175 @@ async def get_all_policy_requests(
         :param status:
         :return:
         """
-        requests = await sync_to_async(self.parallel_scan_table)(
+        return_value = []
+        async for requests in self.parallel_scan_table_pages(
             self.policy_requests_table
+        ):
+            requests = await self.convert_policy_requests_to_v3(requests)
+            if status:
+                for item in requests:
+                    if item["status"] == status:
+                        return_value.append(item)
+            else:
+                return_value.extend(requests)
+
+        return return_value
+
+    async def _query_policy_requests_partition(
+        self,
+        index_attribute: str,
+        partition: str,
+        start_key: Dict[str, Any],
+        page_size: int,
+        query_kwargs: Dict[str, Any],
+    ) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Queries one partition of a listing index until `page_size` matching requests are found or the partition is
+        exhausted.
+
+        :return: The requests found, and the key to continue the query from after the last of them, or None if the
+            partition is exhausted
+        """
+        key_condition = Key(index_attribute).eq(partition)
+        if query_kwargs.get("request_time"):
+            key_condition = key_condition & Key("request_time").between(
+                *query_kwargs["request_time"]
+            )
+        kwargs = dict(
+            IndexName=POLICY_REQUESTS_LISTING_INDEXES[index_attribute],
+            KeyConditionExpression=key_condition,
+            ScanIndexForward=query_kwargs["ascending"],
+            Limit=page_size,
         )
+        if query_kwargs.get("filter_expression") is not None:
+            kwargs["FilterExpression"] = query_kwargs["filter_expression"]
+        if start_key:
+            kwargs["ExclusiveStartKey"] = start_key
 
-        requests = await self.convert_policy_requests_to_v3(requests)
+        requests = []
+        while True:
+            response = await sync_to_async(self.policy_requests_table.query)(**kwargs)
+            requests.extend(self._data_from_dynamo_replace(response.get("Items", [])))
+            last_evaluated_key = response.get("LastEvaluatedKey")
+            if not last_evaluated_key or len(requests) >= page_size:
+                return requests, last_evaluated_key
+            kwargs["ExclusiveStartKey"] = last_evaluated_key
+
+    async def list_policy_requests(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        page_size: int = 50,
+        cursor: Optional[str] = None,
+        ascending: bool = False,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Returns one page of policy requests, sorted by request_time, from the listing indexes of the policy requests
+        table. The cost of a page depends on the page size, rather than on the number of requests in the table.
+
+        Requests are queried from the index of the most selective filter: principal_arn, username, then status. Without
+        any of these filters, the status index is queried for every status, and the results are merged.
+
+        :param filters: Exact values for principal_arn, username and status, and a [start, end] epoch time range for
+            request_time
+        :param page_size: Number of requests to return
+        :param cursor: Cursor returned with the previous page, for the same filters and sort order
+        :param ascending: Return the oldest requests first
+        :return: The page of requests, and the cursor for the next page, or None if this is the last page
+        """
+        filters = {key: value for key, value in (filters or {}).items() if value}
+        for index_attribute in ["principal_arn", "username", "status"]:
+            if filters.get(index_attribute):
+                partitions = [filters[index_attribute]]
+                break
+        else:
+            index_attribute = "status"
+            partitions = POSSIBLE_STATUSES
 
-        return_value = []
-        if status:
-            for item in requests:
-                if status and item["status"] == status:
-                    return_value.append(item)
+        if cursor:
+            try:
+                cursor_d = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            except ValueError:
+                raise InvalidRequestParameter("Invalid cursor")
+            if cursor_d.get("index") != index_attribute or not set(
+                cursor_d.get("partitions", {})
+            ).issubset(partitions):
+                raise InvalidRequestParameter(
+                    "The cursor doesn't match the filters of the request"
+                )
+            start_keys = cursor_d["partitions"]
         else:
-            return_value = requests
+            # Partitions without a start key are exhausted, and an empty start key starts from the beginning
+            start_keys = {partition: {} for partition in partitions}
+
+        filter_expression = None
+        for attribute in ["principal_arn", "username", "status"]:
+            if attribute != index_attribute and filters.get(attribute):
+                condition = Attr(attribute).eq(filters[attribute])
+                filter_expression = (
+                    condition
+                    if filter_expression is None
+                    else filter_expression & condition
+                )
+        query_kwargs = {
+            "ascending": ascending,
+            "filter_expression": filter_expression,
+            "request_time": filters.get("request_time"),
+        }
+        results = await asyncio.gather(
+            *[
+                self._query_policy_requests_partition(
+                    index_attribute, partition, start_key, page_size, query_kwargs
+                )
+                for partition, start_key in start_keys.items()
+            ]
+        )
 
-        return return_value
+        # Every partition returned a full page or all of its remaining requests, so the first `page_size` requests of
+        # the merged partitions are the next page
+        def _sort_key(item: Tuple[str, Dict[str, Any]]) -> int:
+            return item[1]["request_time"] if ascending else -item[1]["request_time"]
+
+        merged = heapq.merge(
+            *[
+                [(partition, request) for request in requests]
+                for partition, (requests, _) in zip(start_keys, results)
+            ],
+            key=_sort_key,
+        )
+        page = []
+        last_request_per_partition = {}
+        for partition, request in merged:
+            if len(page) >= page_size:
+                break
+            page.append(request)
+            last_request_per_partition[partition] = request
+
+        next_start_keys = {}
+        for partition, (requests, last_evaluated_key) in zip(start_keys, results):
+            last_request = last_request_per_partition.get(partition)
+            if last_request is None:
+                # Nothing was returned from this partition, so it continues from the same position
+                if requests or last_evaluated_key:
+                    next_start_keys[partition] = start_keys[partition]
+            elif last_request is not requests[-1]:
+                next_start_keys[partition] = {
+                    "request_id": last_request["request_id"],
+                    index_attribute: partition,
+                    "request_time": last_request["request_time"],
+                }
+            elif last_evaluated_key:
+                next_start_keys[partition] = self._data_from_dynamo_replace(
+                    last_evaluated_key
+                )
+
+        next_cursor = None
+        if next_start_keys:
+            next_cursor = base64.urlsafe_b64encode(
+                json.dumps(
+                    {"index": index_attribute, "partitions": next_start_keys}
+                ).encode()
+            ).decode()
+        return await self.convert_policy_requests_to_v3(page), next_cursor
 
     async def update_dynamic_config(self, config: str, updated_by: str) -> None:
         """Take a YAML config and writes to DDB (The reason we use YAML instead of JSON is to preserve comments)."""
@@ -742,8 +1033,10 @@ async def authenticate_user(self, login_attempt) -> AuthenticationResponse:
                 authenticated=False, errors=generic_error + [delay_error]
             )
 
-        password_hash_matches = bcrypt.checkpw(
-            login_attempt.password.encode("utf-8"), user["password"].value
+        password_hash_matches = await run_in_process_pool(
+            bcrypt.checkpw,
+            login_attempt.password.encode("utf-8"),
+            user["password"].value,
         )
         if not password_hash_matches:
             delay_error = await wait_after_authentication_failure(
@@ -1020,11 +1313,9 @@ async def get_all_requests(self, status=None):
         :param status:
         :return:
         """
-        items = await sync_to_async(self.parallel_scan_table)(self.requests_table)
-
         return_value = []
-        if status:
-            for item in items:
+        async for item in self.parallel_scan_table_iter(self.requests_table):
+            if status:
                 new_json = []
                 for j in item["json"]:
                     if j["status"] == status:
@@ -1032,8 +1323,8 @@ async def get_all_requests(self, status=None):
                 item["json"] = new_json
                 if new_json:
                     return_value.append(item)
-        else:
-            return_value = items
+            else:
+                return_value.append(item)
 
         return return_value
 
@@ -1216,19 +1507,7 @@ async def create_group_log_entry(
         self.group_log.put_item(Item=self._data_to_dynamo_replace(log_entry))
 
     async def get_all_audit_logs(self) -> List[Dict[str, Union[int, None, str]]]:
-        response = await sync_to_async(self.group_log.scan)()
-        items = []
-
-        if response and "Items" in response:
-            items = self._data_from_dynamo_replace(response["Items"])
-
-        while "LastEvaluatedKey" in response:
-            response = await sync_to_async(self.group_log.scan)(
-                ExclusiveStartKey=response["LastEvaluatedKey"]
-            )
-            items.extend(self._data_from_dynamo_replace(response["Items"]))
-
-        return items
+        return await self.parallel_scan_table_async(self.group_log)
 
     async def get_all_pending_requests(self):
         return await self.get_all_requests(status="pending")
@@ -1241,6 +1520,86 @@ def batch_write_cloudtrail_events(self, items):
                 batch.put_item(Item=self._data_to_dynamo_replace(item))
         return True
 
+    def update_cloudtrail_denies(self, items: Iterable[Dict[str, Any]]) -> List[bool]:
+        """
+        Add the `count` of each CloudTrail deny to the count of its existing item with an atomic ADD, and replace the
+        rest of the item's attributes. Only the given denies are written.
+
+        :return: Whether each deny is new, in the order of `items`
+        """
+        new_denies = []
+        for item in items:
+            item = self._data_to_dynamo_replace(item)
+            attributes = [
+                k for k in item.keys() if k not in ["arn", "request_id", "count"]
+            ]
+            expression_attribute_names = {"#count": "count"}
+            expression_attribute_values = {":count": item.get("count", 1)}
+            set_expressions = []
+            for i, attribute in enumerate(attributes):
+                expression_attribute_names[f"#a{i}"] = attribute
+                expression_attribute_values[f":a{i}"] = item[attribute]
+                set_expressions.append(f"#a{i} = :a{i}")
+            update_expression = "ADD #count :count"
+            if set_expressions:
+                update_expression = (
+                    f"SET {', '.join(set_expressions)} {update_expression}"
+                )
+            response = self.cloudtrail_table.update_item(
+                Key={"arn": item["arn"], "request_id": item["request_id"]},
+                UpdateExpression=update_expression,
+                ExpressionAttributeNames=expression_attribute_names,
+                ExpressionAttributeValues=expression_attribute_values,
+                ReturnValues="UPDATED_OLD",
+            )
+            new_denies.append("count" not in response.get("Attributes", {}))
+        return new_denies
+
+    def get_cloudtrail_denies_for_arn(self, arn: str) -> List[Dict[str, Any]]:
+        """Return the CloudTrail denies of a principal that haven't expired yet"""
+        now = int(time.time())
+        query_kwargs = {"KeyConditionExpression": Key("arn").eq(arn)}
+        items = []
+        while True:
+            response = self.cloudtrail_table.query(**query_kwargs)
+            items.extend(
+                item
+                for item in self._data_from_dynamo_replace(response.get("Items", []))
+                if int(item.get("ttl", now)) >= now
+            )
+            if "LastEvaluatedKey" not in response:
+                return items
+            query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    def get_notifications(self, predictable_ids: Iterable[str]) -> List[Dict[str, Any]]:
+        """Return the notifications with the given IDs that exist"""
+        predictable_ids = list(dict.fromkeys(predictable_ids))
+        deserializer = TypeDeserializer()
+        notifications = []
+        for i in range(0, len(predictable_ids), 100):
+            request_items = {
+                self.notifications_table.name: {
+                    "Keys": [
+                        {"predictable_id": {"S": predictable_id}}
+                        for predictable_id in predictable_ids[i : i + 100]
+                    ]
+                }
+            }
+            while request_items:
+                response = self.notifications_table.meta.client.batch_get_item(
+                    RequestItems=request_items
+                )
+                notifications.extend(
+                    self._data_from_dynamo_replace(
+                        {k: deserializer.deserialize(v) for k, v in item.items()}
+                    )
+                    for item in response["Responses"].get(
+                        self.notifications_table.name, []
+                    )
+                )
+                request_items = response.get("UnprocessedKeys")
+        return notifications
+
     async def get_top_cloudtrail_errors_by_arn(self, arn, n=5):
         response: dict = await sync_to_async(self.cloudtrail_table.query)(
             KeyConditionExpression=Key("arn").eq(arn)
@@ -1338,15 +1697,23 @@ def sync_iam_role_for_account(self, role_ddb: dict) -> None:
             log.error(log_data, exc_info=True)
             raise
 
-    def fetch_all_roles(self):
-        response = self.role_table.scan()
-        items = []
-
-        if response and "Items" in response:
-            items = self._data_from_dynamo_replace(response["Items"])
-        while "LastEvaluatedKey" in response:
-            response = self.role_table.scan(
-                ExclusiveStartKey=response["LastEvaluatedKey"]
+    def sync_iam_roles_for_account(self, roles_ddb: List[dict]) -> None:
+        """Sync IAM roles to DynamoDB with batched writes. Unprocessed items are retried by the batch writer."""
+        if not roles_ddb:
+            return
+        try:
+            self.parallel_write_table(
+                self.role_table, roles_ddb, overwrite_by_pkeys=["arn", "accountId"]
             )
-            items.extend(self._data_from_dynamo_replace(response["Items"]))
-        return items
+        except Exception as e:
+            log_data = {
+                "message": "Error syncing Account's IAM roles to DynamoDB",
+                "account_id": roles_ddb[0]["accountId"],
+                "num_roles": len(roles_ddb),
+                "error": str(e),
+            }
+            log.error(log_data, exc_info=True)
+            raise
+
+    def fetch_all_roles(self):
+        return self.parallel_scan_table(self.role_table)
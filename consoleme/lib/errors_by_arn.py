@@ -0,0 +1,172 @@
+"""
+Stores S3 and CloudTrail errors by principal or resource ARN, so they can be looked up one ARN at a time.
+
+Producers write the aggregate JSON blob that has always been stored, along with a hash of the same errors keyed by ARN.
+Role and resource pages read one hash field, and the policies table builder reads the fields it needs in bulk, instead
+of loading and decoding the whole blob. If a producer hasn't written the hash yet, readers fall back to the blob.
+"""
+import json
+import sys
+from typing import Any, Dict, Iterable, List, Optional
+
+from consoleme.config import config
+from consoleme.lib.plugins import get_plugin_by_name
+from consoleme.lib.redis import RedisHandler
+
+stats = get_plugin_by_name(config.get("plugins.metrics", "default_metrics"))()
+red = RedisHandler().redis_sync()
+
+
+def s3_errors_keys() -> Dict[str, str]:
+    return {
+        "aggregate_key": config.get("redis.s3_errors", "S3_ERRORS"),
+        "hash_key": config.get("redis.s3_errors_by_arn", "S3_ERRORS_BY_ARN"),
+    }
+
+
+def cloudtrail_errors_keys() -> Dict[str, str]:
+    return {
+        "aggregate_key": config.get(
+            "celery.cache_cloudtrail_errors_by_arn.redis_key",
+            "CLOUDTRAIL_ERRORS_BY_ARN",
+        ),
+        "hash_key": config.get(
+            "celery.cache_cloudtrail_errors_by_arn.redis_hash_key",
+            "CLOUDTRAIL_ERRORS_BY_ARN_HASH",
+        ),
+    }
+
+
+def store_errors_by_arn(
+    errors_by_arn: Dict[str, Any],
+    aggregate_key: str,
+    hash_key: str,
+    expiration_seconds: Optional[int] = None,
+) -> None:
+    """
+    Store errors as an aggregate JSON blob and as a hash keyed by ARN. The hash is written to a temporary key and
+    renamed, so readers never see a partially written hash.
+
+    :param errors_by_arn: Errors for each ARN. Values must be JSON serializable.
+    :param expiration_seconds: Expire both keys after this many seconds
+    """
+    temporary_hash_key = f"{hash_key}.TEMP"
+    pipeline = red.pipeline()
+    if expiration_seconds:
+        pipeline.setex(aggregate_key, expiration_seconds, json.dumps(errors_by_arn))
+    else:
+        pipeline.set(aggregate_key, json.dumps(errors_by_arn))
+    pipeline.delete(temporary_hash_key)
+    items = [(arn, json.dumps(errors)) for arn, errors in errors_by_arn.items()]
+    for i in range(0, len(items), 1000):
+        pipeline.hset(temporary_hash_key, mapping=dict(items[i : i + 1000]))
+    if items:
+        if expiration_seconds:
+            pipeline.expire(temporary_hash_key, expiration_seconds)
+        pipeline.rename(temporary_hash_key, hash_key)
+    else:
+        pipeline.delete(hash_key)
+    pipeline.execute()
+
+
+def update_errors_by_arn(
+    errors_by_arn: Dict[str, Any],
+    aggregate_key: str,
+    hash_key: str,
+    expiration_seconds: Optional[int] = None,
+) -> None:
+    """
+    Update the stored errors of some ARNs, and keep the errors of every other ARN. ARNs whose errors are falsy, such as
+    a count of 0, are removed.
+
+    :param errors_by_arn: Errors for each ARN that changed. Values must be JSON serializable.
+    :param expiration_seconds: Expire both keys after this many seconds
+    """
+    all_errors_j = red.get(aggregate_key)
+    all_errors = json.loads(all_errors_j) if all_errors_j else {}
+    for arn, errors in errors_by_arn.items():
+        if errors:
+            all_errors[arn] = errors
+        else:
+            all_errors.pop(arn, None)
+    if not red.exists(hash_key) or not all_errors:
+        store_errors_by_arn(
+            all_errors, aggregate_key, hash_key, expiration_seconds=expiration_seconds
+        )
+        return
+    pipeline = red.pipeline()
+    if expiration_seconds:
+        pipeline.setex(aggregate_key, expiration_seconds, json.dumps(all_errors))
+    else:
+        pipeline.set(aggregate_key, json.dumps(all_errors))
+    changed = [(arn, errors) for arn, errors in errors_by_arn.items() if errors]
+    for i in range(0, len(changed), 1000):
+        pipeline.hset(
+            hash_key,
+            mapping={arn: json.dumps(errors) for arn, errors in changed[i : i + 1000]},
+        )
+    removed = [arn for arn, errors in errors_by_arn.items() if not errors]
+    for i in range(0, len(removed), 1000):
+        pipeline.hdel(hash_key, *removed[i : i + 1000])
+    if expiration_seconds:
+        pipeline.expire(hash_key, expiration_seconds)
+    pipeline.execute()
+
+
+def store_s3_errors_by_arn(s3_errors: Dict[str, List[Dict[str, Any]]]) -> None:
+    """Store S3 errors by principal or bucket ARN, for plugins that produce them"""
+    store_errors_by_arn(s3_errors, **s3_errors_keys())
+
+
+def _get_errors_for_arns(
+    arns: Iterable[str], aggregate_key: str, hash_key: str
+) -> Dict[str, Any]:
+    arns = list(arns)
+    errors = {}
+    if red.exists(hash_key):
+        for i in range(0, len(arns), 1000):
+            chunk = arns[i : i + 1000]
+            for arn, errors_j in zip(chunk, red.hmget(hash_key, chunk)):
+                if errors_j:
+                    errors[arn] = json.loads(errors_j)
+        return errors
+    # The producer only writes the aggregate
+    all_errors_j = red.get(aggregate_key)
+    if all_errors_j:
+        all_errors = json.loads(all_errors_j)
+        errors = {arn: all_errors[arn] for arn in arns if arn in all_errors}
+    return errors
+
+
+def get_error_counts_for_arns(arns: Iterable[str]) -> Dict[str, int]:
+    """
+    Return the number of CloudTrail and S3 errors of each ARN that has errors
+
+    :param arns: Principal or resource ARNs
+    """
+    arns = list(arns)
+    error_counts = _get_errors_for_arns(arns, **cloudtrail_errors_keys())
+    for arn, s3_errors in _get_errors_for_arns(arns, **s3_errors_keys()).items():
+        for error in s3_errors:
+            error_counts[arn] = error_counts.get(arn, 0) + int(error.get("count"))
+    return error_counts
+
+
+async def get_s3_errors_for_arn(arn: str) -> List[Dict[str, Any]]:
+    """Return the S3 errors of a principal or bucket ARN"""
+    keys = s3_errors_keys()
+    async_red = await RedisHandler().redis()
+    errors_j = await async_red.hget(keys["hash_key"], arn)
+    if errors_j:
+        return json.loads(errors_j)
+    # Like the other commands of the async client, EXISTS returns None when Redis is unavailable, which is treated
+    # as a missing hash
+    if await async_red.exists(keys["hash_key"]):
+        return []
+    stats.count(
+        f"{__name__}.{sys._getframe().f_code.co_name}.aggregate_fallback",
+    )
+    all_errors_j = await async_red.get(keys["aggregate_key"])
+    if not all_errors_j:
+        return []
+    return json.loads(all_errors_j).get(arn, [])
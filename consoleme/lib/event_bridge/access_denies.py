@@ -1,8 +1,9 @@
+import asyncio
 import re
 import sys
 import time
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 import sentry_sdk
 import ujson as json
@@ -14,6 +15,7 @@
     DataNotRetrievable,
     MissingConfigurationValue,
 )
+from consoleme.lib.cloudtrail import record_changed_cloudtrail_denies
 from consoleme.lib.dynamo import UserDynamoHandler
 from consoleme.lib.plugins import get_plugin_by_name
 
@@ -78,6 +80,80 @@ async def generate_policy_from_cloudtrail_deny(ct_event):
     return policy
 
 
+async def cloudtrail_deny_from_message(
+    message_body: Dict[str, Any], event_ttl: int, log_data: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """
+    Build the CloudTrail deny item for an SQS message. Returns None for messages that can't be parsed, events older
+    than a day, and events without a principal ARN.
+    """
+    try:
+        if "Message" in message_body:
+            decoded_message = json.loads(message_body["Message"])["detail"]
+        else:
+            decoded_message = message_body["detail"]
+    except Exception as e:
+        log.error(
+            {
+                **log_data,
+                "message": "Unable to process Cloudtrail message",
+                "message_body": message_body,
+                "error": str(e),
+            }
+        )
+        sentry_sdk.capture_exception()
+        return None
+    event_name = decoded_message.get("eventName")
+    event_source = decoded_message.get("eventSource")
+    for event_source_substitution in config.get(
+        "event_bridge.detect_cloudtrail_denies_and_update_cache.event_bridge_substitutions",
+        [".amazonaws.com"],
+    ):
+        event_source = event_source.replace(event_source_substitution, "")
+    event_time = decoded_message.get("eventTime")
+    utc_time = datetime.strptime(event_time, "%Y-%m-%dT%H:%M:%SZ")
+    epoch_event_time = int((utc_time - datetime(1970, 1, 1)).total_seconds())
+    # Skip entries older than a day
+    if int(time.time()) - 86400 > epoch_event_time:
+        return None
+    try:
+        session_name = decoded_message["userIdentity"]["arn"].split("/")[-1]
+    except (
+        IndexError,
+        KeyError,
+    ):  # If IAM user, there won't be a session name
+        session_name = ""
+    try:
+        principal_arn = decoded_message["userIdentity"]["sessionContext"][
+            "sessionIssuer"
+        ]["arn"]
+    except KeyError:  # Skip events without a parsable ARN
+        return None
+
+    event_call = f"{event_source}:{event_name}"
+
+    ct_event = dict(
+        error_code=decoded_message.get("errorCode"),
+        error_message=decoded_message.get("errorMessage"),
+        arn=principal_arn,
+        # principal_owner=owner,
+        session_name=session_name,
+        source_ip=decoded_message["sourceIPAddress"],
+        event_call=event_call,
+        epoch_event_time=epoch_event_time,
+        ttl=epoch_event_time + event_ttl,
+        count=1,
+    )
+    resource = await get_resource_from_cloudtrail_deny(ct_event, decoded_message)
+    ct_event["resource"] = resource
+    request_id = f"{principal_arn}-{session_name}-{event_call}-{resource}"
+    ct_event["request_id"] = request_id
+    generated_policy = await generate_policy_from_cloudtrail_deny(ct_event)
+    if generated_policy:
+        ct_event["generated_policy"] = generated_policy
+    return ct_event
+
+
 async def detect_cloudtrail_denies_and_update_cache(
     celery_app,
     event_ttl=config.get(
@@ -88,6 +164,13 @@ async def detect_cloudtrail_denies_and_update_cache(
         100,
     ),
 ) -> Dict[str, Any]:
+    """
+    Receive CloudTrail access denies from SQS and add them to the CloudTrail deny table.
+
+    Several receivers long poll the queue concurrently. Denies in a batch of messages are aggregated by request ID,
+    and only those denies are written, with an atomic ADD to their count. The denies that were written are queued for
+    `CloudTrail.process_cloudtrail_errors`.
+    """
     log_data = {"function": f"{__name__}.{sys._getframe().f_code.co_name}"}
     dynamo = UserDynamoHandler()
     queue_arn = config.get(
@@ -105,14 +188,12 @@ async def detect_cloudtrail_denies_and_update_cache(
     queue_assume_role = config.get(
         "event_bridge.detect_cloudtrail_denies_and_update_cache.assume_role"
     )
-
-    # Modify existing cloudtrail deny samples
-    all_cloudtrail_denies_l = await dynamo.parallel_scan_table_async(
-        dynamo.cloudtrail_table
+    num_receivers = config.get(
+        "event_bridge.detect_cloudtrail_denies_and_update_cache.num_receivers", 4
+    )
+    wait_time_seconds = config.get(
+        "event_bridge.detect_cloudtrail_denies_and_update_cache.wait_time_seconds", 2
     )
-    all_cloudtrail_denies = {}
-    for cloudtrail_deny in all_cloudtrail_denies_l:
-        all_cloudtrail_denies[cloudtrail_deny["request_id"]] = cloudtrail_deny
 
     sqs_client = await sync_to_async(boto3_cached_conn)(
         "sqs",
@@ -128,128 +209,72 @@ async def detect_cloudtrail_denies_and_update_cache(
     queue_url = queue_url_res.get("QueueUrl")
     if not queue_url:
         raise DataNotRetrievable(f"Unable to retrieve Queue URL for {queue_arn}")
-    messages_awaitable = await sync_to_async(sqs_client.receive_message)(
-        QueueUrl=queue_url, MaxNumberOfMessages=10
-    )
-    new_events = 0
-    messages = messages_awaitable.get("Messages", [])
-    num_events = 0
+    counts = {"num_events": 0, "new_events": 0}
     reached_limit_on_num_messages_to_process = False
 
-    while messages:
-        if num_events >= max_num_messages_to_process:
-            reached_limit_on_num_messages_to_process = True
-            break
-        processed_messages = []
-        for message in messages:
-            try:
-                message_body = json.loads(message["Body"])
+    async def _receive_and_process_messages() -> None:
+        nonlocal reached_limit_on_num_messages_to_process
+        while True:
+            if counts["num_events"] >= max_num_messages_to_process:
+                reached_limit_on_num_messages_to_process = True
+                return
+            response = await sync_to_async(
+                sqs_client.receive_message, thread_sensitive=False
+            )(
+                QueueUrl=queue_url,
+                MaxNumberOfMessages=10,
+                WaitTimeSeconds=wait_time_seconds,
+            )
+            messages = response.get("Messages", [])
+            if not messages:
+                return
+            cloudtrail_denies = {}
+            processed_messages = []
+            for message in messages:
                 try:
-                    if "Message" in message_body:
-                        decoded_message = json.loads(message_body["Message"])["detail"]
-                    else:
-                        decoded_message = message_body["detail"]
-                except Exception as e:
-                    log.error(
-                        {
-                            **log_data,
-                            "message": "Unable to process Cloudtrail message",
-                            "message_body": message_body,
-                            "error": str(e),
-                        }
+                    ct_event = await cloudtrail_deny_from_message(
+                        json.loads(message["Body"]), event_ttl, log_data
                     )
+                    if ct_event:
+                        request_id = ct_event["request_id"]
+                        if cloudtrail_denies.get(request_id):
+                            ct_event["count"] += cloudtrail_denies[request_id]["count"]
+                        cloudtrail_denies[request_id] = ct_event
+                        counts["num_events"] += 1
+                except Exception as e:
+                    log.error({**log_data, "error": str(e)}, exc_info=True)
                     sentry_sdk.capture_exception()
-                    continue
-                event_name = decoded_message.get("eventName")
-                event_source = decoded_message.get("eventSource")
-                for event_source_substitution in config.get(
-                    "event_bridge.detect_cloudtrail_denies_and_update_cache.event_bridge_substitutions",
-                    [".amazonaws.com"],
-                ):
-                    event_source = event_source.replace(event_source_substitution, "")
-                event_time = decoded_message.get("eventTime")
-                utc_time = datetime.strptime(event_time, "%Y-%m-%dT%H:%M:%SZ")
-                epoch_event_time = int(
-                    (utc_time - datetime(1970, 1, 1)).total_seconds()
+                processed_messages.append(
+                    {
+                        "Id": message["MessageId"],
+                        "ReceiptHandle": message["ReceiptHandle"],
+                    }
                 )
-                # Skip entries older than a day
-                if int(time.time()) - 86400 > epoch_event_time:
-                    continue
-                try:
-                    session_name = decoded_message["userIdentity"]["arn"].split("/")[-1]
-                except (
-                    IndexError,
-                    KeyError,
-                ):  # If IAM user, there won't be a session name
-                    session_name = ""
-                try:
-                    principal_arn = decoded_message["userIdentity"]["sessionContext"][
-                        "sessionIssuer"
-                    ]["arn"]
-                except KeyError:  # Skip events without a parsable ARN
-                    continue
-
-                event_call = f"{event_source}:{event_name}"
-
-                ct_event = dict(
-                    error_code=decoded_message.get("errorCode"),
-                    error_message=decoded_message.get("errorMessage"),
-                    arn=principal_arn,
-                    # principal_owner=owner,
-                    session_name=session_name,
-                    source_ip=decoded_message["sourceIPAddress"],
-                    event_call=event_call,
-                    epoch_event_time=epoch_event_time,
-                    ttl=epoch_event_time + event_ttl,
-                    count=1,
-                )
-                resource = await get_resource_from_cloudtrail_deny(
-                    ct_event, decoded_message
-                )
-                ct_event["resource"] = resource
-                request_id = f"{principal_arn}-{session_name}-{event_call}-{resource}"
-                ct_event["request_id"] = request_id
-                generated_policy = await generate_policy_from_cloudtrail_deny(ct_event)
-                if generated_policy:
-                    ct_event["generated_policy"] = generated_policy
-
-                if all_cloudtrail_denies.get(request_id):
-                    existing_count = all_cloudtrail_denies[request_id].get("count", 1)
-                    ct_event["count"] += existing_count
-                    all_cloudtrail_denies[request_id] = ct_event
-                else:
-                    all_cloudtrail_denies[request_id] = ct_event
-                    new_events += 1
-                num_events += 1
-            except Exception as e:
-                log.error({**log_data, "error": str(e)}, exc_info=True)
-                sentry_sdk.capture_exception()
-            processed_messages.append(
-                {
-                    "Id": message["MessageId"],
-                    "ReceiptHandle": message["ReceiptHandle"],
-                }
-            )
-        if processed_messages:
-            await sync_to_async(sqs_client.delete_message_batch)(
-                QueueUrl=queue_url, Entries=processed_messages
-            )
+            if cloudtrail_denies:
+                new_denies = await sync_to_async(
+                    dynamo.update_cloudtrail_denies, thread_sensitive=False
+                )(cloudtrail_denies.values())
+                counts["new_events"] += sum(new_denies)
+                await sync_to_async(
+                    record_changed_cloudtrail_denies, thread_sensitive=False
+                )(cloudtrail_denies.values())
+            # Messages are deleted once their denies are stored, so denies aren't lost if a write fails
+            if processed_messages:
+                await sync_to_async(
+                    sqs_client.delete_message_batch, thread_sensitive=False
+                )(QueueUrl=queue_url, Entries=processed_messages)
 
-        await sync_to_async(dynamo.batch_write_cloudtrail_events)(
-            all_cloudtrail_denies.values()
-        )
-        messages_awaitable = await sync_to_async(sqs_client.receive_message)(
-            QueueUrl=queue_url, MaxNumberOfMessages=10
-        )
-        messages = messages_awaitable.get("Messages", [])
+    await asyncio.gather(
+        *[_receive_and_process_messages() for _ in range(num_receivers)]
+    )
     if reached_limit_on_num_messages_to_process:
         # We hit our limit. Let's spawn another task immediately to process remaining messages
         celery_app.send_task(
             "consoleme.celery_tasks.celery_tasks.cache_cloudtrail_denies",
         )
     log_data["message"] = "Successfully cached Cloudtrail Access Denies"
-    log_data["num_events"] = num_events
-    log_data["new_events"] = new_events
+    log_data["num_events"] = counts["num_events"]
+    log_data["new_events"] = counts["new_events"]
     log.debug(log_data)
 
     return log_data
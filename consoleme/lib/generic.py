@@ -220,6 +220,21 @@ async def filter_table(filter_key, filter_value, data):
         return results
 
 
+# Cached tables store the markdown rendering of some columns of each row under this key, so that responses with
+# markdown=true don't need to render them
+MARKDOWN_COLUMNS_KEY = "markdown_columns"
+
+
+def render_table_row(
+    row: Dict[str, Any], markdown_columns: Optional[Dict[str, str]] = None
+) -> Dict[str, Any]:
+    """Returns a copy of a cached table row for a response, with `markdown_columns` replacing the plain columns"""
+    rendered = {key: value for key, value in row.items() if key != MARKDOWN_COLUMNS_KEY}
+    if markdown_columns:
+        rendered.update(markdown_columns)
+    return rendered
+
+
 async def iterate_and_format_dict(d: Dict, replacements: Dict):
     """
     Iterates through the values of a dictionary (with or without nested dictionaries), and formats values accordingly
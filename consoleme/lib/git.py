@@ -1,11 +1,15 @@
+import fcntl
 import os
 import shutil
+import sys
 import tempfile
+from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import Optional
 
 import sentry_sdk
 import yaml as builtin_yaml
-from asgiref.sync import async_to_sync
+from asgiref.sync import async_to_sync, sync_to_async
 from deepdiff import DeepDiff
 from ruamel.yaml import YAML
 
@@ -13,6 +17,8 @@
 from consoleme.lib.account_indexers import get_account_id_to_name_mapping
 from consoleme.lib.generic import sort_dict
 
+log = config.get_logger()
+
 
 def clone_repo(git_url: str, tempdir):
     import git
@@ -22,6 +28,58 @@ def clone_repo(git_url: str, tempdir):
     return git.Repo(os.path.join(tempdir, git_url.split("/")[-1].replace(".git", "")))
 
 
+@asynccontextmanager
+async def lock_working_copy(directory: str):
+    """
+    Hold an exclusive lock on the persistent working copies in `directory`, so that overlapping runs, including runs in
+    other worker processes on this host, don't update or remove a working copy while another run is using it.
+    """
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, ".lock"), "a") as lock_file:
+        await sync_to_async(fcntl.flock, thread_sensitive=False)(
+            lock_file, fcntl.LOCK_EX
+        )
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def clone_or_update_repo(git_url: str, directory: str, branch: Optional[str] = None):
+    """
+    Return a persistent working copy of a repository in `directory`. The repository is cloned on first use. After
+    that, the remote is fetched and the working copy is reset to `branch` (or the remote's default branch), instead of
+    cloning the repository again. A working copy that can't be updated is removed and cloned again.
+
+    Callers should hold `lock_working_copy(directory)` while they update and use the working copy.
+    """
+    import git
+
+    repo_path = os.path.join(directory, git_url.split("/")[-1].replace(".git", ""))
+    if os.path.isdir(os.path.join(repo_path, ".git")):
+        try:
+            repo = git.Repo(repo_path)
+            repo.remotes.origin.fetch()
+            repo.git.reset("--hard", f"origin/{branch}" if branch else "origin/HEAD")
+            return repo
+        except Exception as e:  # noqa
+            log.warning(
+                {
+                    "function": f"{__name__}.{sys._getframe().f_code.co_name}",
+                    "message": "Unable to update working copy. Cloning the repository again.",
+                    "git_url": git_url,
+                    "error": str(e),
+                }
+            )
+            sentry_sdk.capture_exception()
+            shutil.rmtree(repo_path, ignore_errors=True)
+    os.makedirs(directory, exist_ok=True)
+    repo = clone_repo(git_url, directory)
+    if branch:
+        repo.git.checkout(branch)
+    return repo
+
+
 def store_iam_resources_in_git(
     iam_resources,
     account_id,
@@ -2,9 +2,9 @@
 from secrets import token_urlsafe
 
 import jwt
-from asgiref.sync import sync_to_async
 
 from consoleme.config import config
+from consoleme.lib.cpu_executor import run_in_thread_pool
 
 log = config.get_logger()
 
@@ -33,8 +33,8 @@ async def generate_jwt_token(
         config.get("jwt.attributes.groups", "groups"): groups,
     }
 
-    encoded_cookie = await sync_to_async(jwt.encode)(
-        session, jwt_secret, algorithm="HS256"
+    encoded_cookie = await run_in_thread_pool(
+        jwt.encode, session, jwt_secret, algorithm="HS256"
     )
 
     return encoded_cookie
@@ -42,7 +42,9 @@ async def generate_jwt_token(
 
 async def validate_and_return_jwt_token(auth_cookie):
     try:
-        decoded_jwt = jwt.decode(auth_cookie, jwt_secret, algorithms="HS256")
+        decoded_jwt = await run_in_thread_pool(
+            jwt.decode, auth_cookie, jwt_secret, algorithms="HS256"
+        )
         email = decoded_jwt.get(config.get("jwt.attributes.email", "email"))
         groups = decoded_jwt.get(config.get("jwt.attributes.groups", "groups"), [])
         exp = decoded_jwt.get("exp")
@@ -16,6 +16,7 @@
     MissingConfigurationValue,
     UnableToAuthenticate,
 )
+from consoleme.lib.cpu_executor import run_in_thread_pool
 from consoleme.lib.generic import should_force_redirect
 from consoleme.lib.jwt import generate_jwt_token
 
@@ -199,7 +200,8 @@ async def authenticate_user_by_oidc(request):
                 )
             pub_key = oidc_config["jwt_keys"][key_id]
             # This will raises errors if the audience isn't right or if the token is expired or has other errors.
-            decoded_id_token = jwt.decode(
+            decoded_id_token = await run_in_thread_pool(
+                jwt.decode,
                 id_token,
                 pub_key,
                 audience=oidc_config["client_id"],
@@ -225,7 +227,8 @@ async def authenticate_user_by_oidc(request):
                     pub_key = oidc_config["jwt_keys"][key_id]
                     # This will raises errors if the audience isn't right or if the token is expired or has other
                     # errors.
-                    decoded_access_token = jwt.decode(
+                    decoded_access_token = await run_in_thread_pool(
+                        jwt.decode,
                         access_token,
                         pub_key,
                         audience=config.get(
@@ -1,10 +1,11 @@
 import base64
+import functools
 import re
 import sys
 import time
 import urllib
 from collections import defaultdict
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional, Tuple
 
 import ujson as json
 from deepdiff import DeepDiff
@@ -23,6 +24,7 @@
     get_resource_from_arn,
     get_service_from_arn,
 )
+from consoleme.lib.generic import MARKDOWN_COLUMNS_KEY
 from consoleme.lib.plugins import get_plugin_by_name
 from consoleme.lib.role_updater.handler import update_role
 from consoleme.lib.ses import (
@@ -564,6 +566,313 @@ async def get_resource_sub_type_for_arn(arn: str) -> str:
     return ""
 
 
+def _last_path_segment(arn: str, resource_name: str) -> str:
+    return arn.split("/")[-1]
+
+
+def _managed_policy_name_and_path(arn: str, resource_name: str) -> str:
+    # managed policies can have a path
+    return arn.split(":policy/")[-1]
+
+
+def _resource_after_resource_type(arn: str, resource_name: str) -> str:
+    return arn.split(":")[6]
+
+
+def _load_balancer_v2_name(arn: str, resource_name: str) -> str:
+    if "/" in resource_name:
+        return arn.split("/")[2]
+    return resource_name
+
+
+def _sub_type(*resource_sub_types: str) -> Callable[[str, str, str], bool]:
+    return lambda resource_sub_type, arn, account_id: (
+        resource_sub_type in resource_sub_types
+    )
+
+
+def _arn_resource_type(arn_resource_type: str) -> Callable[[str, str, str], bool]:
+    return lambda resource_sub_type, arn, account_id: (
+        arn.split(":")[5] == arn_resource_type
+    )
+
+
+def _arn_contains(value: str) -> Callable[[str, str, str], bool]:
+    return lambda resource_sub_type, arn, account_id: value in arn
+
+
+# A resource URL is a template formatted with the account_id, region, arn and resource_name of a resource, and
+# optionally a function returning the resource_name to use from the ARN and the given resource_name.
+ResourceUrl = Tuple[str, Optional[Callable[[str, str], str]]]
+
+_CONSOLE_REDIRECT = "/role/{account_id}?redirect=https://console.aws.amazon.com"
+_IAM_ROLE_URL: ResourceUrl = (
+    "/policies/edit/{account_id}/iamrole/{resource_name}",
+    _last_path_segment,
+)
+_S3_BUCKET_URL: ResourceUrl = ("/policies/edit/{account_id}/s3/{resource_name}", None)
+_SNS_TOPIC_URL: ResourceUrl = (
+    "/policies/edit/{account_id}/sns/{region}/{resource_name}",
+    None,
+)
+_SQS_QUEUE_URL: ResourceUrl = (
+    "/policies/edit/{account_id}/sqs/{region}/{resource_name}",
+    None,
+)
+_CLOUDFORMATION_STACK_URL: ResourceUrl = (
+    _CONSOLE_REDIRECT + "/cloudformation/home?region={region}#/stacks/",
+    None,
+)
+_CLOUDFRONT_DISTRIBUTION_URL: ResourceUrl = (
+    _CONSOLE_REDIRECT + "/cloudfront/home?%23distribution-settings:{resource_name}",
+    None,
+)
+_CLOUDTRAIL_TRAIL_URL: ResourceUrl = (
+    _CONSOLE_REDIRECT + "/cloudtrail/home?region={region}%23/configuration",
+    None,
+)
+_CLOUDWATCH_ALARM_URL: ResourceUrl = (
+    _CONSOLE_REDIRECT + "/cloudwatch/home?region={region}%23alarmsV2:",
+    None,
+)
+_CODEBUILD_PROJECT_URL: ResourceUrl = (
+    _CONSOLE_REDIRECT
+    + "/codesuite/codebuild/{account_id}/projects/{resource_name}/history?region={region}",
+    None,
+)
+_CODEPIPELINE_PIPELINE_URL: ResourceUrl = (
+    _CONSOLE_REDIRECT
+    + "/codesuite/codepipeline/pipelines/{resource_name}/view?region={region}",
+    None,
+)
+_DYNAMODB_TABLE_URL: ResourceUrl = (
+    _CONSOLE_REDIRECT
+    + "/dynamodb/home?region={region}%23tables:selected={resource_name}",
+    None,
+)
+_ELASTICBEANSTALK_APPLICATIONS_URL: ResourceUrl = (
+    _CONSOLE_REDIRECT + "/elasticbeanstalk/home?region={region}%23/applications",
+    None,
+)
+_ELASTICBEANSTALK_ENVIRONMENTS_URL: ResourceUrl = (
+    _CONSOLE_REDIRECT + "/elasticbeanstalk/home?region={region}%23/environments",
+    None,
+)
+_LOAD_BALANCER_URL: ResourceUrl = (
+    _CONSOLE_REDIRECT
+    + "/ec2/v2/home?region={region}%23LoadBalancers:search={resource_name}",
+    None,
+)
+_LOAD_BALANCER_V2_URL: ResourceUrl = (_LOAD_BALANCER_URL[0], _load_balancer_v2_name)
+_ELASTICSEARCH_DOMAIN_URL: ResourceUrl = (
+    _CONSOLE_REDIRECT
+    + "/es/home?region={region}%23domain:resource={resource_name};action=dashboard;tab=undefined",
+    None,
+)
+_LAMBDA_FUNCTION_URL: ResourceUrl = (
+    _CONSOLE_REDIRECT + "/lambda/home?region={region}%23/functions/{resource_name}",
+    _resource_after_resource_type,
+)
+_RDS_SNAPSHOT_URL: ResourceUrl = (
+    _CONSOLE_REDIRECT + "/rds/home?region={region}%23db-snapshot:id={resource_name}",
+    _resource_after_resource_type,
+)
+_IAM_POLICY_URL: ResourceUrl = (
+    _CONSOLE_REDIRECT + "/iam/home?%23/policies/{arn}$serviceLevelSummary",
+    None,
+)
+_IAM_USER_URL: ResourceUrl = (
+    "/policies/edit/{account_id}/iamuser/{resource_name}",
+    _last_path_segment,
+)
+_IAM_GROUP_URL: ResourceUrl = (
+    _CONSOLE_REDIRECT + "/iam/home?%23/groups/{resource_name}",
+    None,
+)
+_SHIELD_PROTECTION_URL: ResourceUrl = (
+    _CONSOLE_REDIRECT + "/wafv2/shield%23/tedx",
+    None,
+)
+_WAF_URL: ResourceUrl = (_CONSOLE_REDIRECT + "/wafv2/home", None)
+_WAF_RULE_GROUP_URL: ResourceUrl = (_CONSOLE_REDIRECT + "/wafv2/fms", None)
+
+
+def _vpc_console_url(fragment: str) -> ResourceUrl:
+    return (
+        _CONSOLE_REDIRECT
+        + "/vpc/home?region={region}%23"
+        + fragment
+        + ":search={resource_name}",
+        None,
+    )
+
+
+_EC2_URLS: Dict[str, ResourceUrl] = {
+    "customer-gateway": _vpc_console_url("CustomerGateways"),
+    "internet-gateway": _vpc_console_url("igws"),
+    "natgateway": _vpc_console_url("NatGateways"),
+    "network-acl": _vpc_console_url("acls"),
+    "route-table": _vpc_console_url("RouteTables"),
+    "security-group": (
+        _CONSOLE_REDIRECT
+        + "/ec2/v2/home?region={region}%23SecurityGroup:groupId={resource_name}",
+        None,
+    ),
+    "subnet": _vpc_console_url("subnets"),
+    "vpc": _vpc_console_url("vpcs"),
+    "vpc-endpoint": _vpc_console_url("Endpoints"),
+    "vpc-endpoint-service": _vpc_console_url("EndpointServices"),
+    "vpc-peering-connection": _vpc_console_url("PeeringConnections"),
+    "vpn-connection": _vpc_console_url("VpnConnections"),
+    "vpn-gateway": _vpc_console_url("VpnGateways"),
+}
+
+# Resource types reported by AWS Config
+_RESOURCE_URLS_BY_CONFIG_RESOURCE_TYPE: Dict[str, ResourceUrl] = {
+    "AWS::IAM::Role": _IAM_ROLE_URL,
+    "AWS::S3::Bucket": _S3_BUCKET_URL,
+    "AWS::SNS::Topic": _SNS_TOPIC_URL,
+    "AWS::SQS::Queue": _SQS_QUEUE_URL,
+    "AWS::CloudFormation::Stack": _CLOUDFORMATION_STACK_URL,
+    "AWS::CloudFront::Distribution": _CLOUDFRONT_DISTRIBUTION_URL,
+    "AWS::CloudTrail::Trail": _CLOUDTRAIL_TRAIL_URL,
+    "AWS::CloudWatch::Alarm": _CLOUDWATCH_ALARM_URL,
+    "AWS::CodeBuild::Project": _CODEBUILD_PROJECT_URL,
+    "AWS::CodePipeline::Pipeline": _CODEPIPELINE_PIPELINE_URL,
+    "AWS::DynamoDB::Table": _DYNAMODB_TABLE_URL,
+    "AWS::EC2::CustomerGateway": _EC2_URLS["customer-gateway"],
+    "AWS::EC2::InternetGateway": _EC2_URLS["internet-gateway"],
+    "AWS::EC2::NatGateway": _EC2_URLS["natgateway"],
+    "AWS::EC2::NetworkAcl": _EC2_URLS["network-acl"],
+    "AWS::EC2::RouteTable": _EC2_URLS["route-table"],
+    "AWS::EC2::SecurityGroup": _EC2_URLS["security-group"],
+    "AWS::EC2::Subnet": _EC2_URLS["subnet"],
+    "AWS::EC2::VPC": _EC2_URLS["vpc"],
+    "AWS::EC2::VPCEndpoint": _EC2_URLS["vpc-endpoint"],
+    "AWS::EC2::VPCEndpointService": _EC2_URLS["vpc-endpoint-service"],
+    "AWS::EC2::VPCPeeringConnection": _EC2_URLS["vpc-peering-connection"],
+    "AWS::EC2::VPNConnection": _EC2_URLS["vpn-connection"],
+    "AWS::EC2::VPNGateway": _EC2_URLS["vpn-gateway"],
+    "AWS::ElasticBeanstalk::Application": _ELASTICBEANSTALK_APPLICATIONS_URL,
+    "AWS::ElasticBeanstalk::ApplicationVersion": _ELASTICBEANSTALK_APPLICATIONS_URL,
+    "AWS::ElasticBeanstalk::Environment": _ELASTICBEANSTALK_ENVIRONMENTS_URL,
+    "AWS::ElasticLoadBalancing::LoadBalancer": _LOAD_BALANCER_URL,
+    "AWS::ElasticLoadBalancingV2::LoadBalancer": _LOAD_BALANCER_V2_URL,
+    "AWS::Elasticsearch::Domain": _ELASTICSEARCH_DOMAIN_URL,
+    "AWS::Lambda::Function": _LAMBDA_FUNCTION_URL,
+    "AWS::RDS::DBSnapshot": _RDS_SNAPSHOT_URL,
+    # TBD
+    "AWS::Redshift::Cluster": (_RDS_SNAPSHOT_URL[0], None),
+    "AWS::IAM::Policy": _IAM_POLICY_URL,
+    "AWS::IAM::User": _IAM_USER_URL,
+    "AWS::IAM::Group": _IAM_GROUP_URL,
+    "AWS::Shield::Protection": _SHIELD_PROTECTION_URL,
+    "AWS::ShieldRegional::Protection": _SHIELD_PROTECTION_URL,
+    "AWS::WAF::RateBasedRule": _WAF_URL,
+    "AWS::WAF::Rule": _WAF_URL,
+    "AWS::WAF::RuleGroup": _WAF_RULE_GROUP_URL,
+    "AWS::WAF::WebACL": _WAF_URL,
+}
+
+# Services, as they appear in ARNs, mapped to (condition, resource URL) rules that are checked in order. A condition
+# is called with the resource_sub_type, arn and account_id of the resource. Rules without a condition always match.
+_RESOURCE_URL_RULES_BY_SERVICE: Dict[
+    str, List[Tuple[Optional[Callable[[str, str, str], bool]], ResourceUrl]]
+] = {
+    "iam": [
+        (_sub_type("role"), _IAM_ROLE_URL),
+        (
+            lambda resource_sub_type, arn, account_id: (
+                resource_sub_type == "policy" and account_id != "aws"
+            ),
+            ("/policies/edit/{account_id}/managed_policy/{resource_name}", None),
+        ),
+        (_sub_type("policy"), _IAM_POLICY_URL),
+        (_sub_type("user"), _IAM_USER_URL),
+        (_sub_type("group"), _IAM_GROUP_URL),
+    ],
+    "s3": [(None, _S3_BUCKET_URL)],
+    "managed_policy": [
+        (
+            None,
+            (
+                "/policies/edit/{account_id}/managed_policy/{resource_name}",
+                _managed_policy_name_and_path,
+            ),
+        )
+    ],
+    "sns": [(None, _SNS_TOPIC_URL)],
+    "sqs": [(None, _SQS_QUEUE_URL)],
+    "cloudformation": [(_sub_type("stack"), _CLOUDFORMATION_STACK_URL)],
+    "cloudfront": [(_sub_type("distribution"), _CLOUDFRONT_DISTRIBUTION_URL)],
+    "cloudtrail": [(_sub_type("trail"), _CLOUDTRAIL_TRAIL_URL)],
+    "cloudwatch": [(_arn_resource_type("alarm"), _CLOUDWATCH_ALARM_URL)],
+    "codebuild": [(_sub_type("project"), _CODEBUILD_PROJECT_URL)],
+    "codepipeline": [(None, _CODEPIPELINE_PIPELINE_URL)],
+    "dynamodb": [(_sub_type("table"), _DYNAMODB_TABLE_URL)],
+    "ec2": [
+        (_sub_type(resource_sub_type), url)
+        for resource_sub_type, url in _EC2_URLS.items()
+    ],
+    "elasticbeanstalk": [
+        (
+            _sub_type("application", "applicationversion"),
+            _ELASTICBEANSTALK_APPLICATIONS_URL,
+        ),
+        (_sub_type("environment"), _ELASTICBEANSTALK_ENVIRONMENTS_URL),
+    ],
+    "elasticloadbalancing": [
+        (
+            lambda resource_sub_type, arn, account_id: (
+                resource_sub_type == "loadbalancer" and "/app/" not in arn
+            ),
+            _LOAD_BALANCER_URL,
+        ),
+        (_sub_type("loadbalancer"), _LOAD_BALANCER_V2_URL),
+    ],
+    "es": [(_sub_type("domain"), _ELASTICSEARCH_DOMAIN_URL)],
+    "lambda": [(_arn_resource_type("function"), _LAMBDA_FUNCTION_URL)],
+    "rds": [(_arn_resource_type("snapshot"), _RDS_SNAPSHOT_URL)],
+    "shield": [(_sub_type("protection"), _SHIELD_PROTECTION_URL)],
+    "waf": [
+        (_sub_type("rule", "ratebasedrule"), _WAF_URL),
+        (_arn_contains("rulegroup/"), _WAF_RULE_GROUP_URL),
+        (_arn_contains("webacl/"), _WAF_URL),
+    ],
+    "wafv2": [
+        (_arn_contains("rulegroup/"), _WAF_RULE_GROUP_URL),
+        (_arn_contains("webacl/"), _WAF_URL),
+    ],
+}
+
+
+@functools.lru_cache(maxsize=config.get("get_url_for_resource.cache_size", 50000))
+def _get_url_for_resource(
+    arn: str,
+    resource_type: str,
+    account_id: str,
+    region: str,
+    resource_name: str,
+    resource_sub_type: str,
+) -> str:
+    resource_url = _RESOURCE_URLS_BY_CONFIG_RESOURCE_TYPE.get(resource_type)
+    if not resource_url:
+        for condition, rule_url in _RESOURCE_URL_RULES_BY_SERVICE.get(
+            resource_type, []
+        ):
+            if not condition or condition(resource_sub_type, arn, account_id):
+                resource_url = rule_url
+                break
+        else:
+            return ""
+    template, resource_name_function = resource_url
+    if resource_name_function:
+        resource_name = resource_name_function(arn, resource_name)
+    return template.format(
+        account_id=account_id, region=region, arn=arn, resource_name=resource_name
+    )
+
+
 async def get_url_for_resource(
     arn,
     resource_type=None,
@@ -586,279 +895,42 @@ async def get_url_for_resource(
     # If account id is not found
     if not account_id:
         raise ResourceNotFound("The account for the given ARN could not be determined")
-    url = ""
-    if (
-        resource_type == "iam" and resource_sub_type == "role"
-    ) or resource_type == "AWS::IAM::Role":
-        resource_name = arn.split("/")[-1]
-        url = f"/policies/edit/{account_id}/iamrole/{resource_name}"
-    elif (
-        resource_type == "iam" and resource_sub_type == "policy" and account_id != "aws"
-    ):
-        url = f"/policies/edit/{account_id}/managed_policy/{resource_name}"
-    elif resource_type in ["s3", "AWS::S3::Bucket"]:
-        url = f"/policies/edit/{account_id}/s3/{resource_name}"
-    elif resource_type == "managed_policy":
-        # managed policies can have a path
-        resource_name_and_path = arn.split(":policy/")[-1]
-        url = f"/policies/edit/{account_id}/managed_policy/{resource_name_and_path}"
-    elif resource_type in ["sns", "AWS::SNS::Topic"]:
-        url = f"/policies/edit/{account_id}/sns/{region}/{resource_name}"
-    elif resource_type in ["sqs", "AWS::SQS::Queue"]:
-        url = f"/policies/edit/{account_id}/sqs/{region}/{resource_name}"
-    elif (resource_type == "AWS::CloudFormation::Stack") or (
-        resource_type == "cloudformation" and resource_sub_type == "stack"
-    ):
-        url = f"/role/{account_id}?redirect=https://console.aws.amazon.com/cloudformation/home?region={region}#/stacks/"
-    elif resource_type == "AWS::CloudFront::Distribution" or (
-        resource_type == "cloudfront" and resource_sub_type == "distribution"
-    ):
-        url = f"/role/{account_id}?redirect=https://console.aws.amazon.com/cloudfront/home?%23distribution-settings:{resource_name}"
-    elif resource_type == "AWS::CloudTrail::Trail" or (
-        resource_type == "cloudtrail" and resource_sub_type == "trail"
-    ):
-        url = f"/role/{account_id}?redirect=https://console.aws.amazon.com/cloudtrail/home?region={region}%23/configuration"
-    elif resource_type == "AWS::CloudWatch::Alarm" or (
-        resource_type == "cloudwatch" and arn.split(":")[5] == "alarm"
-    ):
-        url = (
-            f"/role/{account_id}?redirect=https://console.aws.amazon.com/cloudwatch/home"
-            f"?region={region}%23alarmsV2:"
-        )
-    elif resource_type == "AWS::CodeBuild::Project" or (
-        resource_type == "codebuild" and resource_sub_type == "project"
-    ):
-        url = (
-            f"/role/{account_id}?redirect=https://console.aws.amazon.com/codesuite/codebuild/"
-            f"{account_id}/projects/{resource_name}/history?region={region}"
-        )
-    elif (
-        resource_type == "AWS::CodePipeline::Pipeline"
-        or resource_type == "codepipeline"
-    ):
-        url = (
-            f"/role/{account_id}?redirect="
-            "https://console.aws.amazon.com/codesuite/codepipeline/pipelines/"
-            f"{resource_name}/view?region={region}"
-        )
-    elif resource_type == "AWS::DynamoDB::Table" or (
-        resource_type == "dynamodb" and resource_sub_type == "table"
-    ):
-        url = (
-            f"/role/{account_id}?redirect="
-            f"https://console.aws.amazon.com/dynamodb/home?region={region}%23tables:selected={resource_name}"
-        )
-    elif resource_type == "AWS::EC2::CustomerGateway" or (
-        resource_type == "ec2" and resource_sub_type == "customer-gateway"
-    ):
-        url = (
-            f"/role/{account_id}?redirect="
-            f"https://console.aws.amazon.com/vpc/home?region={region}%23CustomerGateways:search={resource_name}"
-        )
-    elif resource_type == "AWS::EC2::InternetGateway" or (
-        resource_type == "ec2" and resource_sub_type == "internet-gateway"
-    ):
-        url = (
-            f"/role/{account_id}?redirect="
-            f"https://console.aws.amazon.com/vpc/home?region={region}%23igws:search={resource_name}"
-        )
-    elif resource_type == "AWS::EC2::NatGateway" or (
-        resource_type == "ec2" and resource_sub_type == "natgateway"
-    ):
-        url = (
-            f"/role/{account_id}?redirect="
-            f"https://console.aws.amazon.com/vpc/home?region={region}%23NatGateways:search={resource_name}"
-        )
-    elif resource_type == "AWS::EC2::NetworkAcl" or (
-        resource_type == "ec2" and resource_sub_type == "network-acl"
-    ):
-        url = (
-            f"/role/{account_id}?redirect="
-            f"https://console.aws.amazon.com/vpc/home?region={region}%23acls:search={resource_name}"
-        )
-    elif resource_type == "AWS::EC2::RouteTable" or (
-        resource_type == "ec2" and resource_sub_type == "route-table"
-    ):
-        url = (
-            f"/role/{account_id}?redirect="
-            f"https://console.aws.amazon.com/vpc/home?region={region}%23RouteTables:search={resource_name}"
-        )
-    elif resource_type == "AWS::EC2::SecurityGroup" or (
-        resource_type == "ec2" and resource_sub_type == "security-group"
-    ):
-        url = (
-            f"/role/{account_id}?redirect="
-            f"https://console.aws.amazon.com/ec2/v2/home?region={region}%23SecurityGroup:groupId={resource_name}"
-        )
-    elif resource_type == "AWS::EC2::Subnet" or (
-        resource_type == "ec2" and resource_sub_type == "subnet"
-    ):
-        url = (
-            f"/role/{account_id}?redirect="
-            f"https://console.aws.amazon.com/vpc/home?region={region}%23subnets:search={resource_name}"
-        )
-    elif resource_type == "AWS::EC2::VPC" or (
-        resource_type == "ec2" and resource_sub_type == "vpc"
-    ):
-        url = (
-            f"/role/{account_id}?redirect="
-            f"https://console.aws.amazon.com/vpc/home?region={region}%23vpcs:search={resource_name}"
-        )
-    elif resource_type == "AWS::EC2::VPCEndpoint" or (
-        resource_type == "ec2" and resource_sub_type == "vpc-endpoint"
-    ):
-        url = (
-            f"/role/{account_id}?redirect="
-            f"https://console.aws.amazon.com/vpc/home?region={region}%23Endpoints:search={resource_name}"
-        )
-    elif resource_type == "AWS::EC2::VPCEndpointService" or (
-        resource_type == "ec2" and resource_sub_type == "vpc-endpoint-service"
-    ):
-        url = (
-            f"/role/{account_id}?redirect="
-            f"https://console.aws.amazon.com/vpc/home?region={region}%23EndpointServices:search={resource_name}"
-        )
-    elif resource_type == "AWS::EC2::VPCPeeringConnection" or (
-        resource_type == "ec2" and resource_sub_type == "vpc-peering-connection"
-    ):
-        url = (
-            f"/role/{account_id}?redirect="
-            f"https://console.aws.amazon.com/vpc/home?region={region}%23PeeringConnections:search={resource_name}"
-        )
-    elif resource_type == "AWS::EC2::VPNConnection" or (
-        resource_type == "ec2" and resource_sub_type == "vpn-connection"
-    ):
-        url = (
-            f"/role/{account_id}?redirect="
-            f"https://console.aws.amazon.com/vpc/home?region={region}%23VpnConnections:search={resource_name}"
-        )
-    elif resource_type == "AWS::EC2::VPNGateway" or (
-        resource_type == "ec2" and resource_sub_type == "vpn-gateway"
-    ):
-        url = (
-            f"/role/{account_id}?redirect="
-            f"https://console.aws.amazon.com/vpc/home?region={region}%23VpnGateways:search={resource_name}"
-        )
-    elif resource_type == "AWS::ElasticBeanstalk::Application" or (
-        resource_type == "elasticbeanstalk" and resource_sub_type == "application"
-    ):
-        url = (
-            f"/role/{account_id}?redirect="
-            f"https://console.aws.amazon.com/elasticbeanstalk/home?region={region}%23/applications"
-        )
-    elif resource_type == "AWS::ElasticBeanstalk::ApplicationVersion" or (
-        resource_type == "elasticbeanstalk"
-        and resource_sub_type == "applicationversion"
-    ):
-        url = (
-            f"/role/{account_id}?redirect="
-            f"https://console.aws.amazon.com/elasticbeanstalk/home?region={region}%23/applications"
-        )
-    elif resource_type == "AWS::ElasticBeanstalk::Environment" or (
-        resource_type == "elasticbeanstalk" and resource_sub_type == "environment"
-    ):
-        url = (
-            f"/role/{account_id}?redirect="
-            f"https://console.aws.amazon.com/elasticbeanstalk/home?region={region}%23/environments"
-        )
-    elif resource_type == "AWS::ElasticLoadBalancing::LoadBalancer" or (
-        resource_type == "elasticloadbalancing"
-        and resource_sub_type == "loadbalancer"
-        and "/app/" not in arn
-    ):
-        url = (
-            f"/role/{account_id}?redirect="
-            "https://console.aws.amazon.com"
-            f"/ec2/v2/home?region={region}%23LoadBalancers:search={resource_name}"
-        )
-    elif resource_type == "AWS::ElasticLoadBalancingV2::LoadBalancer" or (
-        resource_type == "elasticloadbalancing" and resource_sub_type == "loadbalancer"
-    ):
-        if "/" in resource_name:
-            resource_name = arn.split("/")[2]
-        url = (
-            f"/role/{account_id}?redirect="
-            "https://console.aws.amazon.com"
-            f"/ec2/v2/home?region={region}%23LoadBalancers:search={resource_name}"
-        )
-    elif resource_type == "AWS::Elasticsearch::Domain" or (
-        resource_type == "es" and resource_sub_type == "domain"
-    ):
-        url = (
-            f"/role/{account_id}?redirect="
-            "https://console.aws.amazon.com"
-            f"/es/home?region={region}%23domain:resource={resource_name};action=dashboard;tab=undefined"
-        )
-    elif resource_type == "AWS::Lambda::Function" or (
-        resource_type == "lambda" and arn.split(":")[5] == "function"
-    ):
-        resource_name = arn.split(":")[6]
-        url = (
-            f"/role/{account_id}?redirect="
-            f"https://console.aws.amazon.com/lambda/home?region={region}%23/functions/{resource_name}"
-        )
-    elif resource_type == "AWS::RDS::DBSnapshot" or (
-        resource_type == "rds" and arn.split(":")[5] == "snapshot"
-    ):
-        resource_name = arn.split(":")[6]
-        url = (
-            f"/role/{account_id}?redirect="
-            f"https://console.aws.amazon.com/rds/home?region={region}%23db-snapshot:id={resource_name}"
-        )
-    # TBD
-    elif resource_type == "AWS::Redshift::Cluster":
-        url = (
-            f"/role/{account_id}?redirect="
-            f"https://console.aws.amazon.com/rds/home?region={region}%23db-snapshot:id={resource_name}"
-        )
-    elif resource_type == "AWS::IAM::Policy" or (
-        resource_type == "iam" and resource_sub_type == "policy"
-    ):
-        url = (
-            f"/role/{account_id}?redirect="
-            f"https://console.aws.amazon.com/iam/home?%23/policies/{arn}$serviceLevelSummary"
-        )
-    elif resource_type == "AWS::IAM::User" or (
-        resource_type == "iam" and resource_sub_type == "user"
-    ):
-        resource_name = arn.split("/")[-1]
-        url = f"/policies/edit/{account_id}/iamuser/{resource_name}"
-    elif resource_type == "AWS::IAM::Group" or (
-        resource_type == "iam" and resource_sub_type == "group"
-    ):
-        url = f"/role/{account_id}?redirect=https://console.aws.amazon.com/iam/home?%23/groups/{resource_name}"
-    elif resource_type == "AWS::Shield::Protection":
-        url = (
-            f"/role/{account_id}?redirect="
-            f"https://console.aws.amazon.com/wafv2/shield%23/tedx"
-        )
-    elif resource_type == "AWS::ShieldRegional::Protection" or (
-        resource_type == "shield" and resource_sub_type == "protection"
-    ):
-        url = (
-            f"/role/{account_id}?redirect="
-            f"https://console.aws.amazon.com/wafv2/shield%23/tedx"
-        )
-    elif resource_type in ["AWS::WAF::RateBasedRule", "AWS::WAF::Rule"] or (
-        resource_type == "waf" and resource_sub_type in ["rule", "ratebasedrule"]
-    ):
-        url = (
-            f"/role/{account_id}?redirect=" f"https://console.aws.amazon.com/wafv2/home"
-        )
-    elif resource_type == "AWS::WAF::RuleGroup" or (
-        resource_type in ["waf", "wafv2"] and "rulegroup/" in arn
-    ):
-        url = (
-            f"/role/{account_id}?redirect=" f"https://console.aws.amazon.com/wafv2/fms"
-        )
-    elif resource_type == "AWS::WAF::WebACL" or (
-        resource_type in ["waf", "wafv2"] and "webacl/" in arn
-    ):
-        url = (
-            f"/role/{account_id}?redirect=" f"https://console.aws.amazon.com/wafv2/home"
-        )
+    return _get_url_for_resource(
+        arn, resource_type, account_id, region, resource_name, resource_sub_type
+    )
 
-    return url
+
+async def get_policies_table_markdown_columns(policy: Dict) -> Dict[str, str]:
+    """Renders the columns of a row of the policies table that are displayed as markdown"""
+    markdown_columns = {}
+    resource_name = policy["arn"].split(":")[5]
+    if "/" in resource_name:
+        resource_name = resource_name.split("/")[-1]
+    region = policy["arn"].split(":")[3]
+    try:
+        url = await get_url_for_resource(
+            policy["arn"],
+            policy["technology"],
+            policy["account_id"],
+            region,
+            resource_name,
+        )
+    except ResourceNotFound:
+        url = ""
+    if url:
+        markdown_columns["arn"] = f"[{policy['arn']}]({url})"
+    if not policy.get("templated"):
+        markdown_columns["templated"] = "N/A"
+    elif "/" in policy["templated"]:
+        link_name = policy["templated"].split("/")[-1]
+        markdown_columns["templated"] = f"[{link_name}]({policy['templated']})"
+    return markdown_columns
+
+
+async def add_policies_table_markdown_columns(policies: List[Dict]) -> None:
+    """Stores the markdown columns of each row of the policies table in the row"""
+    for policy in policies:
+        policy[MARKDOWN_COLUMNS_KEY] = await get_policies_table_markdown_columns(policy)
 
 
 async def get_aws_config_history_url_for_resource(
@@ -868,18 +940,38 @@ async def get_aws_config_history_url_for_resource(
     technology,
     region=config.get("aws.region", "us-east-1"),
 ):
-    if config.get("get_aws_config_history_url_for_resource.generate_conglomo_url"):
-        return await get_conglomo_url_for_resource(
-            account_id, resource_id, technology, region
-        )
-
-    encoded_redirect = urllib.parse.quote_plus(
-        f"https://{region}.console.aws.amazon.com/config/home?#/resources/timeline?"
-        f"resourceId={resource_id}&resourceName={resource_name}&resourceType={technology}"
+    urls = await get_aws_config_history_urls_for_resources(
+        [(account_id, resource_id, resource_name, technology)], region=region
     )
+    return urls[0]
+
+
+async def get_aws_config_history_urls_for_resources(
+    resources: List[Tuple[str, str, str, str]],
+    region=config.get("aws.region", "us-east-1"),
+) -> List[str]:
+    """
+    Generates AWS Config history URLs for many resources at once.
+
+    :param resources: List of (account_id, resource_id, resource_name, technology) tuples
+    :return: URLs in the same order as `resources`
+    """
+    if config.get("get_aws_config_history_url_for_resource.generate_conglomo_url"):
+        return [
+            await get_conglomo_url_for_resource(
+                account_id, resource_id, technology, region
+            )
+            for account_id, resource_id, _, technology in resources
+        ]
 
-    url = f"/role/{account_id}?redirect={encoded_redirect}"
-    return url
+    urls = []
+    for account_id, resource_id, resource_name, technology in resources:
+        encoded_redirect = urllib.parse.quote_plus(
+            f"https://{region}.console.aws.amazon.com/config/home?#/resources/timeline?"
+            f"resourceId={resource_id}&resourceName={resource_name}&resourceType={technology}"
+        )
+        urls.append(f"/role/{account_id}?redirect={encoded_redirect}")
+    return urls
 
 
 async def get_conglomo_url_for_resource(
@@ -0,0 +1,196 @@
+"""
+Normalizes and minimizes IAM policy statements in near-linear time, for large inline policies.
+
+Wildcard patterns are indexed by their literal prefix, so each action or resource is only matched against the
+patterns that could match it, instead of against every other value in the statement. Statements are compared by a
+canonical, hashable form that is equal whenever DeepDiff (with `ignore_order=True`) would find no difference, so
+statements that can be merged are found with dictionary lookups instead of comparing every pair of statements.
+"""
+import fnmatch
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, FrozenSet, Hashable, List, Set
+
+from consoleme.lib.generic import sort_dict
+
+POLICY_ELEMENTS = [
+    "Resource",
+    "Action",
+    "NotAction",
+    "NotResource",
+    "NotPrincipal",
+]
+# Policy elements can be lowercased, except for resources. Some resources (such as IAM roles) are case sensitive
+CASE_SENSITIVE_POLICY_ELEMENTS = {"Resource", "NotResource", "NotPrincipal"}
+WILDCARD_CHARACTERS = ("*", "?", "[")
+
+
+def _literal_prefix(pattern: str) -> str:
+    """Returns the part of a pattern before its first wildcard character"""
+    end = len(pattern)
+    for character in WILDCARD_CHARACTERS:
+        position = pattern.find(character, 0, end)
+        if position != -1:
+            end = position
+    return pattern[:end]
+
+
+def remove_superseded_values(values: Set[str]) -> List[str]:
+    """
+    Removes values that are matched by another (wildcard) value, such as `s3:getobject` when `s3:get*` is present.
+
+    Values without wildcards only match themselves, so only wildcard values are indexed, by the length and value of
+    their literal prefix. A value is only matched against the patterns whose literal prefix it starts with.
+
+    :param values: Unique actions or resources of a policy element
+    :return: Sorted values that aren't matched by any other value
+    """
+    patterns_by_prefix: Dict[int, Dict[str, List[str]]] = {}
+    for value in values:
+        if any(character in value for character in WILDCARD_CHARACTERS):
+            prefix = _literal_prefix(value)
+            patterns_by_prefix.setdefault(len(prefix), {}).setdefault(
+                prefix, []
+            ).append(value)
+
+    remaining = []
+    for value in values:
+        superseded = False
+        for prefix_length, patterns in patterns_by_prefix.items():
+            if prefix_length > len(value):
+                continue
+            for pattern in patterns.get(value[:prefix_length], []):
+                if pattern != value and fnmatch.fnmatch(value, pattern):
+                    superseded = True
+                    break
+            if superseded:
+                break
+        if not superseded:
+            remaining.append(value)
+    return sorted(remaining)
+
+
+def normalize_policy_statements(statements: List[Any]) -> List[Any]:
+    """
+    Normalizes policy statements in place to ensure appropriate AWS policy elements are lists (such as actions and
+    resources), lowercase, and sorted. It will remove duplicate entries and entries that are superseded by other
+    elements.
+    """
+    for statement in statements:
+        for element in POLICY_ELEMENTS:
+            if not statement.get(element):
+                continue
+            if isinstance(statement.get(element), str):
+                statement[element] = [statement[element]]
+            if element in CASE_SENSITIVE_POLICY_ELEMENTS:
+                values = set(statement[element])
+            else:
+                values = set([x.lower() for x in statement[element]])
+            statement[element] = remove_superseded_values(values)
+    return statements
+
+
+def canonical_form(value: Any) -> Hashable:
+    """
+    Returns a hashable form of a policy value. Lists are compared without regard to order or repetition, and values of
+    different types are never equal, as DeepDiff compares them with `ignore_order=True`.
+    """
+    if isinstance(value, dict):
+        return (
+            "dict",
+            frozenset((key, canonical_form(child)) for key, child in value.items()),
+        )
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return (
+            type(value).__name__,
+            frozenset(canonical_form(child) for child in value),
+        )
+    return type(value).__name__, value
+
+
+def _statement_key(
+    canonical_statement: Dict[str, Hashable], excluded_element: str
+) -> FrozenSet:
+    return frozenset(
+        item for item in canonical_statement.items() if item[0] != excluded_element
+    )
+
+
+def minimize_policy_statements(
+    statements: List[Dict], disregard_sid: bool = True
+) -> List[Dict]:
+    """
+    Merges statements that are identical except for one of their POLICY_ELEMENTS.
+
+    Statements are merged in the same order as comparing every pair of statements: each remaining statement absorbs
+    the later statements it can be merged with, in order, and is compared as it is after each merge.
+
+    :param statements: A list of IAM policy statement dictionaries
+    :param disregard_sid: Whether statements with different Sids can be merged
+    :return: A potentially more compact list of IAM policy statement dictionaries
+    """
+    statements = normalize_policy_statements(statements)
+    if disregard_sid:
+        for statement in statements:
+            statement.pop("Sid", None)
+
+    canonical_statements = [
+        {key: canonical_form(value) for key, value in statement.items()}
+        for statement in statements
+    ]
+    # Indexes of the statements that are identical except for each element, in ascending order
+    statements_by_key: Dict[str, Dict[FrozenSet, List[int]]] = {
+        element: {} for element in POLICY_ELEMENTS
+    }
+    for i, canonical_statement in enumerate(canonical_statements):
+        for element in POLICY_ELEMENTS:
+            statements_by_key[element].setdefault(
+                _statement_key(canonical_statement, element), []
+            ).append(i)
+
+    merged = set()
+    for i, statement in enumerate(statements):
+        if i in merged:
+            continue
+        last_compared = i
+        while True:
+            keys = {
+                element: _statement_key(canonical_statements[i], element)
+                for element in POLICY_ELEMENTS
+            }
+            # The next statement that is identical to this one, except for any of the elements
+            j = None
+            for element, key in keys.items():
+                candidates = statements_by_key[element].get(key, [])
+                position = bisect_right(candidates, last_compared)
+                if position < len(candidates) and (
+                    j is None or candidates[position] < j
+                ):
+                    j = candidates[position]
+            if j is None:
+                break
+            last_compared = j
+            statement_to_compare = statements[j]
+            for element in POLICY_ELEMENTS:
+                if not (statement.get(element) or statement_to_compare.get(element)):
+                    # This function won't handle `Condition`.
+                    continue
+                if keys[element] != _statement_key(canonical_statements[j], element):
+                    continue
+                statement[element] = sorted(
+                    list(set(statement[element] + statement_to_compare[element]))
+                )
+                canonical_statements[i][element] = canonical_form(statement[element])
+                merged.add(j)
+                for bucket_element in POLICY_ELEMENTS:
+                    candidates = statements_by_key[bucket_element][
+                        _statement_key(canonical_statements[j], bucket_element)
+                    ]
+                    del candidates[bisect_left(candidates, j)]
+                break
+
+    minimized_statements = []
+    for i in range(len(statements)):
+        if i not in merged:
+            statements[i] = sort_dict(statements[i])
+            minimized_statements.append(statements[i])
+    return normalize_policy_statements(minimized_statements)
@@ -1,10 +1,13 @@
+import asyncio
 import sys
 import threading
 import time
-from typing import Any, Optional
+import weakref
+from typing import Any, Dict, Optional
 
 import boto3
 import redis
+import redis.asyncio
 import ujson as json
 from asgiref.sync import sync_to_async
 from redis.client import Redis
@@ -27,7 +30,6 @@
 s3_folder = config.get("redis.automatically_backup_to_s3.folder")
 
 
-# ToDo - Switch to Aioredis
 class ConsoleMeRedis(redis.StrictRedis):
     """
     ConsoleMeRedis is a simple wrapper around redis.StrictRedis. It was created to allow Redis to be optional.
@@ -344,6 +346,283 @@ def hgetall(self, *args, **kwargs):
         return result
 
 
+def _log_redis_error(function: str, message: str, key: str, e: Exception) -> None:
+    log.error(
+        {
+            "function": function,
+            "message": message,
+            "key": key,
+            "error": e,
+        },
+        exc_info=True,
+    )
+    stats.count(f"{function}.error")
+
+
+def _s3_backup_object(key: str):
+    return s3.Object(s3_bucket, s3_folder + f"/{key}")
+
+
+def _restore_str_from_s3(key: str) -> Optional[str]:
+    try:
+        return _s3_backup_object(key).get()["Body"].read().decode("utf-8")
+    except s3.meta.client.exceptions.NoSuchKey:
+        return None
+
+
+def _restore_hash_from_s3(key: str) -> Optional[Dict[str, Any]]:
+    result_j = _restore_str_from_s3(key)
+    if not result_j:
+        return None
+    return json.loads(result_j)
+
+
+def _backup_hash_field_to_s3(key: str, field: str, value: Any) -> None:
+    obj = _s3_backup_object(key)
+    try:
+        current = json.loads(obj.get()["Body"].read().decode("utf-8"))
+        current[field] = value
+    except:  # noqa
+        current = {field: value}
+    obj.put(Body=json.dumps(current))
+
+
+class ConsoleMeAsyncRedis(redis.asyncio.StrictRedis):
+    """
+    ConsoleMeAsyncRedis is the asyncio counterpart of ConsoleMeRedis. Commands are sent to Redis natively from the
+    event loop over a shared connection pool instead of being moved to a thread pool with sync_to_async.
+
+    It preserves ConsoleMeRedis's behavior: if Redis is disabled or unreachable, wrapped calls fail silently, and data is
+    backed up to and restored from S3 when configured. S3 calls are made with boto3 in a worker thread.
+    """
+
+    def __init__(self, *args, enabled: bool = True, **kwargs):
+        self.enabled = enabled
+        super(ConsoleMeAsyncRedis, self).__init__(*args, **kwargs)
+
+    def _function_name(self, name: str) -> str:
+        return f"{__name__}.{self.__class__.__name__}.{name}"
+
+    async def get(self, *args, **kwargs):
+        if not self.enabled:
+            return None
+        function = self._function_name(sys._getframe().f_code.co_name)
+        try:
+            result = await super(ConsoleMeAsyncRedis, self).get(*args, **kwargs)
+        except redis.exceptions.ConnectionError as e:
+            _log_redis_error(function, "Unable to perform redis operation", args[0], e)
+            result = None
+        if not result and automatically_restore_from_s3:
+            try:
+                result = await sync_to_async(_restore_str_from_s3)(args[0])
+            except Exception as e:
+                _log_redis_error(function, "Unable to perform S3 operation", args[0], e)
+        return result
+
+    async def set(self, *args, **kwargs):
+        if not self.enabled:
+            return False
+        function = self._function_name(sys._getframe().f_code.co_name)
+        try:
+            result = await super(ConsoleMeAsyncRedis, self).set(*args, **kwargs)
+        except redis.exceptions.ConnectionError as e:
+            _log_redis_error(function, "Unable to perform redis operation", args[0], e)
+            result = None
+        if automatically_backup_to_s3:
+            try:
+                await sync_to_async(_s3_backup_object(args[0]).put)(Body=str(args[1]))
+            except Exception as e:
+                _log_redis_error(function, "Unable to perform S3 operation", args[0], e)
+        return result
+
+    async def setex(self, *args, **kwargs):
+        if not self.enabled:
+            return False
+        # We do not currently support caching data in S3 with expiration (SETEX)
+        function = self._function_name(sys._getframe().f_code.co_name)
+        try:
+            result = await super(ConsoleMeAsyncRedis, self).setex(*args, **kwargs)
+        except redis.exceptions.ConnectionError as e:
+            _log_redis_error(function, "Unable to perform redis operation", args[0], e)
+            result = None
+        return result
+
+    async def hmset(self, *args, **kwargs):
+        if not self.enabled:
+            return False
+        function = self._function_name(sys._getframe().f_code.co_name)
+        try:
+            result = await super(ConsoleMeAsyncRedis, self).hmset(*args, **kwargs)
+        except redis.exceptions.ConnectionError as e:
+            _log_redis_error(function, "Unable to perform redis operation", args[0], e)
+            result = None
+        if automatically_backup_to_s3:
+            try:
+                # Write to S3 in a separate thread
+                t = threading.Thread(
+                    target=_s3_backup_object(args[0]).put,
+                    kwargs={"Body": json.dumps(args[1])},
+                )
+                t.daemon = True
+                t.start()
+            except Exception as e:
+                _log_redis_error(function, "Unable to perform S3 operation", args[0], e)
+        return result
+
+    async def hset(self, *args, **kwargs):
+        if not self.enabled:
+            return False
+        function = self._function_name(sys._getframe().f_code.co_name)
+        try:
+            result = await super(ConsoleMeAsyncRedis, self).hset(*args, **kwargs)
+        except redis.exceptions.ConnectionError as e:
+            _log_redis_error(function, "Unable to perform redis operation", args[0], e)
+            result = None
+        if automatically_backup_to_s3:
+            try:
+                t = threading.Thread(
+                    target=_backup_hash_field_to_s3, args=(args[0], args[1], args[2])
+                )
+                t.daemon = True
+                t.start()
+            except Exception as e:
+                _log_redis_error(function, "Unable to perform S3 operation", args[0], e)
+        return result
+
+    async def hget(self, *args, **kwargs):
+        if not self.enabled:
+            return None
+        function = self._function_name(sys._getframe().f_code.co_name)
+        try:
+            result = await super(ConsoleMeAsyncRedis, self).hget(*args, **kwargs)
+        except redis.exceptions.ConnectionError as e:
+            _log_redis_error(function, "Unable to perform redis operation", args[0], e)
+            result = None
+        if not result and automatically_restore_from_s3:
+            try:
+                current = await sync_to_async(_restore_hash_from_s3)(args[0])
+                result = current.get(args[1]) if current else None
+                if result:
+                    await self.hset(args[0], args[1], result)
+            except Exception as e:
+                _log_redis_error(function, "Unable to perform S3 operation", args[0], e)
+        return result
+
+    async def hmget(self, *args, **kwargs):
+        if not self.enabled:
+            return None
+        function = self._function_name(sys._getframe().f_code.co_name)
+        try:
+            result = await super(ConsoleMeAsyncRedis, self).hmget(*args, **kwargs)
+        except redis.exceptions.ConnectionError as e:
+            _log_redis_error(function, "Unable to perform redis operation", args[0], e)
+            result = None
+        return result
+
+    async def exists(self, *args, **kwargs):
+        if not self.enabled:
+            return None
+        function = self._function_name(sys._getframe().f_code.co_name)
+        try:
+            result = await super(ConsoleMeAsyncRedis, self).exists(*args, **kwargs)
+        except redis.exceptions.ConnectionError as e:
+            _log_redis_error(function, "Unable to perform redis operation", args[0], e)
+            result = None
+        return result
+
+    async def hdel(self, *args, **kwargs):
+        if not self.enabled:
+            return None
+        function = self._function_name(sys._getframe().f_code.co_name)
+        try:
+            result = await super(ConsoleMeAsyncRedis, self).hdel(*args, **kwargs)
+        except redis.exceptions.ConnectionError as e:
+            _log_redis_error(function, "Unable to perform redis operation", args[0], e)
+            result = None
+        return result
+
+    async def execute_command(self, *args, **options):
+        """Commands without a wrapper above, such as zadd, fail silently too"""
+        if not self.enabled:
+            return None
+        function = self._function_name(sys._getframe().f_code.co_name)
+        try:
+            result = await super(ConsoleMeAsyncRedis, self).execute_command(
+                *args, **options
+            )
+        except redis.exceptions.ConnectionError as e:
+            _log_redis_error(function, "Unable to perform redis operation", args[0], e)
+            result = None
+        return result
+
+    async def hgetall(self, *args, **kwargs):
+        if not self.enabled:
+            return None
+        function = self._function_name(sys._getframe().f_code.co_name)
+        try:
+            result = await super(ConsoleMeAsyncRedis, self).hgetall(*args, **kwargs)
+        except redis.exceptions.ConnectionError as e:
+            _log_redis_error(function, "Unable to perform redis operation", args[0], e)
+            result = None
+        if not result and automatically_restore_from_s3:
+            try:
+                result = await sync_to_async(_restore_hash_from_s3)(args[0])
+                if result:
+                    await self.hmset(args[0], result)
+            except Exception as e:
+                _log_redis_error(function, "Unable to perform S3 operation", args[0], e)
+        return result
+
+
+# Asyncio connections belong to the event loop that created them, so connection pools are kept per event loop. Each
+# loop's pools are disconnected when the loop shuts down.
+_async_connection_pools = weakref.WeakKeyDictionary()
+
+
+async def _disconnect_pools_on_loop_shutdown(pools: Dict):
+    """
+    An async generator that's kept suspended for the life of an event loop. `asyncio.run` and asgiref's
+    `async_to_sync` call `loop.shutdown_asyncgens()` before closing their loop, which closes this generator and
+    disconnects the loop's pools. Without this, every `async_to_sync` call in a Celery task would leave its pool's
+    sockets open.
+    """
+    try:
+        yield
+    finally:
+        for pool in list(pools.values()):
+            await pool.disconnect()
+        pools.clear()
+
+
+async def _get_async_connection_pool(
+    host: str, port: int, db: int
+) -> redis.asyncio.BlockingConnectionPool:
+    loop = asyncio.get_running_loop()
+    loop_pools = _async_connection_pools.get(loop)
+    if loop_pools is None:
+        pools = {}
+        shutdown_hook = _disconnect_pools_on_loop_shutdown(pools)
+        await shutdown_hook.__anext__()
+        loop_pools = _async_connection_pools[loop] = {
+            "pools": pools,
+            "shutdown_hook": shutdown_hook,
+        }
+    pools = loop_pools["pools"]
+    pool = pools.get((host, port, db))
+    if not pool:
+        pool = redis.asyncio.BlockingConnectionPool(
+            host=host,
+            port=port,
+            db=db,
+            encoding="utf-8",
+            decode_responses=True,
+            max_connections=config.get("redis.async.max_connections", 50),
+            timeout=config.get("redis.async.pool_timeout", 20),
+        )
+        pools[(host, port, db)] = pool
+    return pool
+
+
 class RedisHandler:
     def __init__(
         self,
@@ -361,13 +640,26 @@ def __init__(
         if self.host is None or self.port is None or self.db is None:
             self.enabled = False
 
-    async def redis(self, db: int = 0) -> Redis:
-        self.red = await sync_to_async(ConsoleMeRedis)(
-            host=self.host,
-            port=self.port,
-            db=self.db,
-            charset="utf-8",
-            decode_responses=True,
+    async def redis(self, db: int = 0) -> ConsoleMeAsyncRedis:
+        """
+        Returns an asyncio Redis client. Clients share a connection pool per event loop, so this is cheap to call. The
+        pool is disconnected when its event loop shuts down.
+        """
+        if not self.enabled:
+            # Like ConsoleMeRedis, a disabled client keeps the configured host instead of defaulting to localhost
+            self.red = ConsoleMeAsyncRedis(
+                enabled=False,
+                host=self.host,
+                port=self.port,
+                db=self.db,
+                encoding="utf-8",
+                decode_responses=True,
+            )
+            return self.red
+        self.red = ConsoleMeAsyncRedis(
+            connection_pool=await _get_async_connection_pool(
+                self.host, self.port, self.db
+            )
         )
         return self.red
 
@@ -384,7 +676,7 @@ def redis_sync(self, db: int = 0) -> Redis:
 
 async def redis_get(key: str, default: Optional[str] = None) -> Optional[str]:
     red = await RedisHandler().redis()
-    v = await sync_to_async(red.get)(key)
+    v = await red.get(key)
     if not v:
         return default
     return v
@@ -392,7 +684,7 @@ async def redis_get(key: str, default: Optional[str] = None) -> Optional[str]:
 
 async def redis_hgetall(key: str, default=None):
     red = await RedisHandler().redis()
-    v = await sync_to_async(red.hgetall)(key)
+    v = await red.hgetall(key)
     if not v:
         return default
     return v
@@ -400,7 +692,7 @@ async def redis_hgetall(key: str, default=None):
 
 async def redis_hget(name: str, key: str, default=None):
     red = await RedisHandler().redis()
-    v = await sync_to_async(red.hget)(name, key)
+    v = await red.hget(name, key)
     if not v:
         return default
     return v
@@ -417,6 +709,15 @@ def redis_get_sync(key: str, default: None = None) -> Optional[str]:
     return v
 
 
+def iam_resource_expirations_key(cache_key: str) -> str:
+    """
+    Returns the key of the sorted set that tracks when the entries of a resource cache hash, such as IAM_ROLE_CACHE
+    or AWSCONFIG_RESOURCE_CACHE, expire. Members are ARNs scored by the `ttl` of their entry, so expired entries are
+    found with a range query instead of decoding every entry.
+    """
+    return f"{cache_key}_EXPIRATIONS"
+
+
 async def redis_hsetex(name: str, key: str, value: Any, expiration_seconds: int):
     """
     Lazy way to set Redis hash keys with an expiration. Warning: Entries set here only get deleted when redis_hgetex
@@ -430,9 +731,7 @@ async def redis_hsetex(name: str, key: str, value: Any, expiration_seconds: int)
     """
     expiration = int(time.time()) + expiration_seconds
     red = await RedisHandler().redis()
-    v = await sync_to_async(red.hset)(
-        name, key, json.dumps({"value": value, "ttl": expiration})
-    )
+    v = await red.hset(name, key, json.dumps({"value": value, "ttl": expiration}))
     return v
 
 
@@ -446,13 +745,16 @@ async def redis_hgetex(name: str, key: str, default=None):
     :return:
     """
     red = await RedisHandler().redis()
-    if not red.exists(name):
+    try:
+        if not await red.exists(name):
+            return default
+    except redis.exceptions.ConnectionError:
         return default
-    result_j = await sync_to_async(red.hget)(name, key)
+    result_j = await red.hget(name, key)
     if not result_j:
         return default
     result = json.loads(result_j)
     if int(time.time()) > result["ttl"]:
-        red.hdel(name, key)
+        await red.hdel(name, key)
         return default
     return result["value"]
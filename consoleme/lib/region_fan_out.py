@@ -0,0 +1,184 @@
+"""
+Runs a per-region collector, such as a function that lists the SQS queues of an account in one region, across many
+regions at once.
+
+Regions are collected on a bounded thread pool (`region_fan_out.max_workers`). A region that is still running after
+`region_fan_out.region_timeout_seconds` is given up on, so one slow or unreachable region doesn't hold up the rest.
+Time a collector spends in `exclude_from_region_timeout`, such as waiting for a slow consumer, doesn't count toward
+that timeout.
+The latency of each region is reported in the `region_fan_out.region_latency` metric, tagged by collector and region,
+so slow regions are visible.
+"""
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import sentry_sdk
+
+from consoleme.config import config
+from consoleme.lib.plugins import get_plugin_by_name
+
+log = config.get_logger()
+stats = get_plugin_by_name(config.get("plugins.metrics", "default_metrics"))()
+_collector_state = threading.local()
+
+
+class _RegionClock:
+    """Measures how long a region has been collecting, leaving out the time its collector spent paused"""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.paused_since: Optional[float] = None
+        self.paused_seconds = 0.0
+
+    def pause(self) -> None:
+        self.paused_since = time.perf_counter()
+
+    def resume(self) -> None:
+        # Add the paused time before clearing paused_since, so the region is never seen as active with its paused
+        # time left out
+        self.paused_seconds += time.perf_counter() - self.paused_since
+        self.paused_since = None
+
+    def is_timed_out(self, now: float, timeout_seconds: float) -> bool:
+        if self.paused_since is not None:
+            return False
+        return now - self.started - self.paused_seconds > timeout_seconds
+
+
+@contextmanager
+def exclude_from_region_timeout():
+    """
+    Time spent in this block doesn't count toward the region timeout of the collector that runs it. Use it around
+    waits that depend on the caller rather than on AWS, such as handing results to a slow consumer.
+    """
+    clock = getattr(_collector_state, "clock", None)
+    if clock is None:
+        yield
+        return
+    clock.pause()
+    try:
+        yield
+    finally:
+        clock.resume()
+
+
+def collect_across_regions(
+    collector: Callable[[str], Any],
+    regions: Iterable[str],
+    collector_name: str,
+    log_data: Optional[Dict[str, Any]] = None,
+    max_workers: Optional[int] = None,
+    region_timeout_seconds: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Call `collector(region)` for each region concurrently.
+
+    Errors and timeouts are logged, reported to Sentry, and counted per region. Those regions are left out of the
+    results, so a collector is expected to return everything it found in a region or raise.
+
+    :param collector: Function that collects resources from one region
+    :param regions: Regions to collect from
+    :param collector_name: Name of the collector, used in logs and metric tags
+    :param log_data: Context to include in log messages, such as the account ID
+    :return: Result of the collector in each region that succeeded
+    """
+    function = f"{__name__}.{sys._getframe().f_code.co_name}"
+    log_data = {**(log_data or {}), "function": function, "collector": collector_name}
+    regions = list(regions)
+    if not regions:
+        return {}
+    max_workers = max_workers or config.get("region_fan_out.max_workers", 8)
+    region_timeout_seconds = region_timeout_seconds or config.get(
+        "region_fan_out.region_timeout_seconds", 300
+    )
+
+    clocks: Dict[str, _RegionClock] = {}
+    latencies: Dict[str, float] = {}
+
+    def _collect(region: str) -> Any:
+        clocks[region] = _collector_state.clock = _RegionClock()
+        try:
+            return collector(region)
+        finally:
+            _collector_state.clock = None
+            latencies[region] = time.perf_counter() - clocks[region].started
+            stats.gauge(
+                "region_fan_out.region_latency",
+                latencies[region] * 1000,
+                tags={"collector": collector_name, "region": region},
+            )
+
+    results: Dict[str, Any] = {}
+    executor = ThreadPoolExecutor(
+        max_workers=min(max_workers, len(regions)),
+        thread_name_prefix="region_fan_out",
+    )
+    futures: Dict[Future, str] = {
+        executor.submit(_collect, region): region for region in regions
+    }
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(
+                pending,
+                timeout=min(1, region_timeout_seconds),
+                return_when=FIRST_COMPLETED,
+            )
+            for future in done:
+                region = futures[future]
+                try:
+                    results[region] = future.result()
+                except Exception as e:
+                    log.error(
+                        {
+                            **log_data,
+                            "region": region,
+                            "message": "Unable to collect resources from region",
+                            "error": str(e),
+                        }
+                    )
+                    sentry_sdk.capture_exception()
+                    stats.count(
+                        f"{function}.error",
+                        tags={"collector": collector_name, "region": region},
+                    )
+            now = time.perf_counter()
+            for future in list(pending):
+                region = futures[future]
+                if region in clocks and clocks[region].is_timed_out(
+                    now, region_timeout_seconds
+                ):
+                    # The collector's thread can't be interrupted. It finishes in the background, and its result is
+                    # discarded.
+                    pending.remove(future)
+                    log.error(
+                        {
+                            **log_data,
+                            "region": region,
+                            "message": "Timed out collecting resources from region",
+                            "region_timeout_seconds": region_timeout_seconds,
+                        }
+                    )
+                    stats.count(
+                        f"{function}.timeout",
+                        tags={"collector": collector_name, "region": region},
+                    )
+    finally:
+        executor.shutdown(wait=False)
+
+    log.debug(
+        {
+            **log_data,
+            "message": "Collected resources across regions",
+            "num_regions": len(regions),
+            "num_successful_regions": len(results),
+            "region_latency_seconds": {
+                region: round(latency, 3) for region, latency in latencies.items()
+            },
+        }
+    )
+    return results
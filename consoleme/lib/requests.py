@@ -1,15 +1,17 @@
 import asyncio
 import time
-from typing import Any
+from typing import Any, Dict
 
 from asgiref.sync import sync_to_async
 
 from consoleme.config import config
-from consoleme.exceptions.exceptions import NoMatchingRequest
+from consoleme.exceptions.exceptions import NoMatchingRequest, ResourceNotFound
 from consoleme.lib.auth import can_admin_all
 from consoleme.lib.cache import store_json_results_in_redis_and_s3
 from consoleme.lib.dynamo import UserDynamoHandler
+from consoleme.lib.generic import MARKDOWN_COLUMNS_KEY
 from consoleme.lib.plugins import get_plugin_by_name
+from consoleme.lib.policies import get_url_for_resource
 
 auth = get_plugin_by_name(config.get("plugins.auth", "default_auth"))()
 
@@ -113,6 +115,41 @@ async def get_all_policy_requests(user, status=None):
     return all_policy_requests
 
 
+async def get_policy_requests_table_markdown_columns(request: Dict) -> Dict[str, str]:
+    """Renders the columns of a row of the policy requests table that are displayed as markdown"""
+    markdown_columns = {}
+    principal_arn = request.get("principal", {}).get("principal_arn", "")
+    url = request.get("principal", {}).get("resource_url", "")
+    resource_name = principal_arn
+    if "/" in resource_name:
+        resource_name = resource_name.split("/")[-1]
+    if not resource_name:
+        resource_name = request.get("principal", {}).get("resource_identifier")
+
+    if principal_arn and principal_arn.count(":") == 5 and not url:
+        region = principal_arn.split(":")[3]
+        service_type = principal_arn.split(":")[2]
+        account_id = principal_arn.split(":")[4]
+        try:
+            url = await get_url_for_resource(
+                principal_arn,
+                service_type,
+                account_id,
+                region,
+                resource_name,
+            )
+        except ResourceNotFound:
+            pass
+    # Convert request_id and role ARN to link
+    request_url = request.get("extended_request", {}).get("request_url")
+    if not request_url:
+        request_url = f"/policies/request/{request['request_id']}"
+    markdown_columns["request_id"] = f"[{request['request_id']}]({request_url})"
+    if url:
+        markdown_columns["arn"] = f"[{principal_arn or resource_name}]({url})"
+    return markdown_columns
+
+
 async def cache_all_policy_requests(
     user="consoleme", redis_key=None, s3_bucket=None, s3_key=None
 ):
@@ -131,6 +168,9 @@ async def cache_all_policy_requests(
     requests = await get_all_policy_requests(user)
     requests_to_cache = []
     for request in requests:
+        request[
+            MARKDOWN_COLUMNS_KEY
+        ] = await get_policy_requests_table_markdown_columns(request)
         requests_to_cache.append(request)
     requests_to_cache = sorted(
         requests_to_cache, key=lambda i: i.get("request_time", 0), reverse=True
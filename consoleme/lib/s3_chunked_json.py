@@ -0,0 +1,389 @@
+"""
+Chunked storage format for large JSON datasets in S3, used by `store_json_results_in_redis_and_s3` for lists.
+
+A dataset is stored as two objects:
+
+* A data object with one JSON record per line. Lines are grouped into chunks that are gzip compressed separately and
+  concatenated, so the data object is also a valid gzip file. Dictionaries are stored as `[key, value]` records,
+  sorted by key.
+* A small manifest at the configured S3 key, which lists the byte range, number of records and key range of every
+  chunk.
+
+Writers stream chunks to a multipart upload, and readers stream the data object or download only the chunks that
+contain the keys they need, so neither side holds more than a few chunks in memory beyond the decoded data.
+
+`StreamingJsonDictWriter` also streams a dictionary to a multipart upload, one item at a time, but in the regular
+`{"last_updated": ..., "data": {...}}` format, without collecting or sorting its keys first.
+`store_json_results_in_redis_and_s3` writes dictionaries with it.
+"""
+import gzip
+import json
+import uuid
+import zlib
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+import boto3
+from botocore.exceptions import ClientError
+
+from consoleme.config import config
+from consoleme.lib.json_encoder import SetEncoder
+
+CHUNKED_JSON_FORMAT = "ndjson_gzip_chunks_v1"
+# S3 rejects multipart uploads with parts smaller than this, except for the last part
+MIN_PART_SIZE = 5 * 1024 * 1024
+# Decompress concatenated gzip members
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+log = config.get_logger()
+
+
+def _s3_client():
+    return boto3.client("s3", **config.get("boto3.client_kwargs", {}))
+
+
+def is_chunked_json_manifest(data_object: Any) -> bool:
+    return (
+        isinstance(data_object, dict)
+        and data_object.get("format") == CHUNKED_JSON_FORMAT
+    )
+
+
+class MultipartUploadWriter:
+    """
+    Buffers writes to an S3 object and uploads them as parts of a multipart upload once there is enough data for a
+    part. Objects that fit in a single part are uploaded with one PutObject call instead.
+    """
+
+    def __init__(
+        self,
+        client,
+        bucket: str,
+        key: str,
+        part_size: int = MIN_PART_SIZE,
+        **s3_extra_kwargs,
+    ) -> None:
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.s3_extra_kwargs = s3_extra_kwargs
+        self.buffer = bytearray()
+        self.upload_id: Optional[str] = None
+        self.parts: List[Dict[str, Union[str, int]]] = []
+
+    def write(self, data: bytes) -> None:
+        self.buffer += data
+        if len(self.buffer) >= self.part_size:
+            self._upload_part()
+
+    def _upload_part(self) -> None:
+        if not self.upload_id:
+            self.upload_id = self.client.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key, **self.s3_extra_kwargs
+            )["UploadId"]
+        part_number = len(self.parts) + 1
+        response = self.client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=bytes(self.buffer),
+        )
+        self.parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+        self.buffer = bytearray()
+
+    def close(self) -> None:
+        if not self.upload_id:
+            self.client.put_object(
+                Bucket=self.bucket,
+                Key=self.key,
+                Body=bytes(self.buffer),
+                **self.s3_extra_kwargs,
+            )
+            return
+        if self.buffer:
+            self._upload_part()
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            MultipartUpload={"Parts": self.parts},
+        )
+
+    def abort(self) -> None:
+        if self.upload_id:
+            self.client.abort_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self.upload_id
+            )
+
+
+class StreamingJsonDictWriter:
+    """
+    Writes a dictionary to S3 in the format of `store_json_results_in_redis_and_s3`, one item at a time. Keys ending
+    in `.gz` are gzip compressed as they are written. Only the part being uploaded is held in memory.
+
+    Items are written in the order they are added. If a key is added twice, readers see the last value.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        key: str,
+        last_updated: int,
+        json_encoder: Optional[Callable] = None,
+        part_size: Optional[int] = None,
+        client=None,
+        **s3_extra_kwargs,
+    ) -> None:
+        if not part_size:
+            part_size = config.get(
+                "store_json_results_in_redis_and_s3.chunked_s3.part_size",
+                8 * 1024 * 1024,
+            )
+        self.json_encoder = json_encoder
+        self.writer = MultipartUploadWriter(
+            client or _s3_client(), bucket, key, part_size=part_size, **s3_extra_kwargs
+        )
+        self.compressor = (
+            zlib.compressobj(wbits=GZIP_WBITS) if key.endswith(".gz") else None
+        )
+        self.num_items = 0
+        self._write(f'{{"last_updated": {int(last_updated)}, "data": {{'.encode())
+
+    def _write(self, data: bytes) -> None:
+        if self.compressor:
+            data = self.compressor.compress(data)
+        if data:
+            self.writer.write(data)
+
+    def add(self, key: str, value: Any) -> None:
+        item = json.dumps(str(key)) + ": "
+        item += json.dumps(value, cls=SetEncoder, default=self.json_encoder)
+        self._write(((", " if self.num_items else "") + item).encode())
+        self.num_items += 1
+
+    def close(self) -> None:
+        self._write(b"}}")
+        if self.compressor:
+            self.writer.write(self.compressor.flush())
+        self.writer.close()
+
+    def abort(self) -> None:
+        self.writer.abort()
+
+    def __enter__(self) -> "StreamingJsonDictWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type:
+            self.abort()
+        else:
+            self.close()
+
+
+def _get_manifest(client, bucket: str, key: str) -> Optional[Dict[str, Any]]:
+    try:
+        body = client.get_object(Bucket=bucket, Key=key)["Body"].read()
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ["NoSuchKey", "404"]:
+            return None
+        raise
+    if key.endswith(".gz"):
+        body = gzip.decompress(body)
+    try:
+        data_object = json.loads(body)
+    except ValueError:
+        return None
+    if is_chunked_json_manifest(data_object):
+        return data_object
+    return None
+
+
+def put_chunked_json_object(
+    data: Union[Dict[str, Any], List[Any]],
+    bucket: str,
+    key: str,
+    last_updated: int,
+    json_encoder: Optional[Callable] = None,
+    chunk_size: Optional[int] = None,
+    part_size: Optional[int] = None,
+    client=None,
+    **s3_extra_kwargs,
+) -> Dict[str, Any]:
+    """
+    Stores `data` in the chunked format, and writes its manifest to `key`.
+
+    Each write goes to a new data object, so readers holding the previous manifest can still read the previous data
+    object. The data object before that one is deleted.
+
+    :param data: Dictionary or list to store
+    :param last_updated: Epoch time stored in the manifest, like the `last_updated` of regular objects
+    :param chunk_size: Uncompressed size of a chunk, in bytes
+    :param part_size: Size of a multipart upload part, in bytes
+    :param s3_extra_kwargs: Extra arguments for PutObject and CreateMultipartUpload, ie: Expires
+    :return: The manifest
+    """
+    if not client:
+        client = _s3_client()
+    if not chunk_size:
+        chunk_size = config.get(
+            "store_json_results_in_redis_and_s3.chunked_s3.chunk_size", 4 * 1024 * 1024
+        )
+    if not part_size:
+        part_size = config.get(
+            "store_json_results_in_redis_and_s3.chunked_s3.part_size", 8 * 1024 * 1024
+        )
+    data_type = "dict" if isinstance(data, dict) else "list"
+    data_key = f"{key}.{last_updated}.{uuid.uuid4().hex}.ndjson.gz"
+    writer = MultipartUploadWriter(
+        client, bucket, data_key, part_size=part_size, **s3_extra_kwargs
+    )
+    chunks = []
+    lines: List[bytes] = []
+    lines_size = 0
+    first_key = last_key = None
+    offset = 0
+
+    def flush_chunk() -> None:
+        nonlocal lines, lines_size, offset
+        if not lines:
+            return
+        compressed = gzip.compress(b"".join(lines))
+        writer.write(compressed)
+        chunk = {"offset": offset, "length": len(compressed), "records": len(lines)}
+        if data_type == "dict":
+            chunk["first_key"] = first_key
+            chunk["last_key"] = last_key
+        chunks.append(chunk)
+        offset += len(compressed)
+        lines = []
+        lines_size = 0
+
+    if data_type == "dict":
+        records = (
+            (record_key, [record_key, data[original_key]])
+            for record_key, original_key in sorted(
+                (str(original_key), original_key) for original_key in data
+            )
+        )
+    else:
+        records = ((None, item) for item in data)
+
+    try:
+        for record_key, record in records:
+            line = (
+                json.dumps(record, cls=SetEncoder, default=json_encoder).encode()
+                + b"\n"
+            )
+            if not lines:
+                first_key = record_key
+            last_key = record_key
+            lines.append(line)
+            lines_size += len(line)
+            if lines_size >= chunk_size:
+                flush_chunk()
+        flush_chunk()
+        writer.close()
+    except Exception:
+        writer.abort()
+        raise
+
+    previous_manifest = _get_manifest(client, bucket, key)
+    manifest = {
+        "last_updated": last_updated,
+        "format": CHUNKED_JSON_FORMAT,
+        "data_type": data_type,
+        "data_key": data_key,
+        "previous_data_key": previous_manifest["data_key"]
+        if previous_manifest
+        else None,
+        "records": sum(chunk["records"] for chunk in chunks),
+        "chunks": chunks,
+    }
+    manifest_body = json.dumps(manifest).encode()
+    if key.endswith(".gz"):
+        manifest_body = gzip.compress(manifest_body)
+    client.put_object(Bucket=bucket, Key=key, Body=manifest_body, **s3_extra_kwargs)
+
+    if previous_manifest and previous_manifest.get("previous_data_key"):
+        try:
+            client.delete_object(
+                Bucket=bucket, Key=previous_manifest["previous_data_key"]
+            )
+        except ClientError as e:
+            log.warning(
+                {
+                    "message": "Unable to delete old chunked data object",
+                    "bucket": bucket,
+                    "key": previous_manifest["previous_data_key"],
+                    "error": str(e),
+                }
+            )
+    return manifest
+
+
+def iter_gzip_lines(compressed_chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Decompresses a stream of concatenated gzip members, and yields its lines"""
+    decompressor = zlib.decompressobj(GZIP_WBITS)
+    pending = b""
+    for compressed in compressed_chunks:
+        while compressed:
+            pending += decompressor.decompress(compressed)
+            if decompressor.eof:
+                compressed = decompressor.unused_data
+                decompressor = zlib.decompressobj(GZIP_WBITS)
+            else:
+                compressed = b""
+            *lines, pending = pending.split(b"\n")
+            yield from lines
+    if pending:
+        yield pending
+
+
+def read_chunked_json_object(
+    manifest: Dict[str, Any],
+    bucket: str,
+    keys: Optional[Iterable[str]] = None,
+    json_object_hook: Optional[Callable] = None,
+    client=None,
+) -> Union[Dict[str, Any], List[Any]]:
+    """
+    Reads the data described by a chunked JSON manifest.
+
+    :param keys: Only return these keys of a dictionary, and only download the chunks that may contain them
+    """
+    if not client:
+        client = _s3_client()
+    stream_chunk_size = config.get(
+        "store_json_results_in_redis_and_s3.chunked_s3.stream_chunk_size", 1024 * 1024
+    )
+    data_type = manifest["data_type"]
+
+    if keys is None:
+        body = client.get_object(Bucket=bucket, Key=manifest["data_key"])["Body"]
+        lines = iter_gzip_lines(body.iter_chunks(stream_chunk_size))
+        if data_type == "list":
+            return [json.loads(line, object_hook=json_object_hook) for line in lines]
+        data = {}
+        for line in lines:
+            record_key, value = json.loads(line, object_hook=json_object_hook)
+            data[record_key] = value
+        return data
+
+    if data_type != "dict":
+        raise ValueError("Only dictionaries can be read by key")
+    wanted = {str(key) for key in keys}
+    data = {}
+    for chunk in manifest["chunks"]:
+        if not any(chunk["first_key"] <= key <= chunk["last_key"] for key in wanted):
+            continue
+        body = client.get_object(
+            Bucket=bucket,
+            Key=manifest["data_key"],
+            Range=f"bytes={chunk['offset']}-{chunk['offset'] + chunk['length'] - 1}",
+        )["Body"]
+        for line in iter_gzip_lines(body.iter_chunks(stream_chunk_size)):
+            record_key, value = json.loads(line, object_hook=json_object_hook)
+            if record_key in wanted:
+                data[record_key] = value
+    return data
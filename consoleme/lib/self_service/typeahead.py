@@ -1,3 +1,5 @@
+from typing import Any, Dict
+
 import ujson as json
 
 from consoleme.config import config
@@ -10,12 +12,28 @@
     SelfServiceTypeaheadModel,
     SelfServiceTypeaheadModelArray,
 )
+from consoleme.lib.table_index import build_typeahead_document
 from consoleme.models import (
     AwsResourcePrincipalModel,
     HoneybeeAwsResourceTemplatePrincipalModel,
 )
 
 
+def self_service_typeahead_search_key(entry: Dict[str, Any]) -> str:
+    """The text that SelfServiceStep1ResourceTypeahead searches for a typeahead entry"""
+    principal = entry.get("principal") or {}
+    return "\x00".join(
+        value
+        for value in (
+            entry.get("display_text"),
+            principal.get("resource_identifier"),
+            principal.get("principal_arn"),
+            entry.get("application_name"),
+        )
+        if value
+    )
+
+
 async def cache_self_service_typeahead() -> SelfServiceTypeaheadModelArray:
     from consoleme.lib.templated_resources import retrieve_cached_resource_templates
 
@@ -138,8 +156,15 @@ async def cache_self_service_typeahead() -> SelfServiceTypeaheadModelArray:
         )
 
     typeahead_data = SelfServiceTypeaheadModelArray(typeahead_entries=typeahead_entries)
+    typeahead_data_d = json.loads(typeahead_data.json())
+    typeahead_data_d["search_index"] = build_typeahead_document(
+        [
+            self_service_typeahead_search_key(entry)
+            for entry in typeahead_data_d["typeahead_entries"]
+        ]
+    )
     await store_json_results_in_redis_and_s3(
-        json.loads(typeahead_data.json()),
+        typeahead_data_d,
         redis_key=config.get(
             "cache_self_service_typeahead.redis.key", "cache_self_service_typeahead_v1"
         ),
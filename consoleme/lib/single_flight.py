@@ -0,0 +1,175 @@
+"""
+Coalesces concurrent identical calls to expensive functions, such as cross-account AWS lookups, into one call.
+
+Concurrent calls with the same arguments in one process await the same in-flight call. Optionally, processes
+coordinate through a short Redis lock: the process holding the lock makes the call and briefly stores its result in
+Redis, and the other processes wait for that result instead of making the call themselves.
+"""
+import asyncio
+import copy
+import functools
+import json
+import sys
+import time
+import uuid
+import weakref
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from consoleme.config import config
+from consoleme.lib.json_encoder import SetEncoder
+from consoleme.lib.plugins import get_plugin_by_name
+from consoleme.lib.redis import RedisHandler
+
+log = config.get_logger()
+stats = get_plugin_by_name(config.get("plugins.metrics", "default_metrics"))()
+
+# Tasks belong to the event loop that created them, so in-flight calls are kept per event loop.
+_in_flight_calls = weakref.WeakKeyDictionary()
+
+
+def _retrieve_exception(task: asyncio.Task) -> None:
+    # Callers may have been cancelled, so nothing else may retrieve the exception of the shared call
+    if not task.cancelled():
+        task.exception()
+
+
+async def _wait_for_result_from_other_process(
+    red, lock_key: str, result_key: str, lock_timeout: float
+) -> Optional[str]:
+    poll_interval = config.get("single_flight.redis_lock.poll_interval", 0.05)
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        await asyncio.sleep(poll_interval)
+        result = await red.execute_command("GET", result_key)
+        if result is not None:
+            return result
+        if not await red.exists(lock_key):
+            return await red.execute_command("GET", result_key)
+    return None
+
+
+async def _call_across_processes(
+    function_name: str, key: Hashable, call: Callable
+) -> Any:
+    """
+    Makes `call` in one process at a time, and shares its result with other processes that are waiting for it.
+    Redis keys are accessed with raw commands, so the S3 backup and restore of ConsoleMeAsyncRedis doesn't apply to
+    these short-lived keys.
+    """
+    red = await RedisHandler().redis()
+    key_prefix = config.get("single_flight.redis_lock.key_prefix", "SINGLE_FLIGHT")
+    key_string = f"{function_name}:{json.dumps(key, cls=SetEncoder, default=str)}"
+    lock_key = f"{key_prefix}:LOCK:{key_string}"
+    result_key = f"{key_prefix}:RESULT:{key_string}"
+    lock_timeout = config.get("single_flight.redis_lock.timeout", 10)
+
+    result = await red.execute_command("GET", result_key)
+    if result is None:
+        token = str(uuid.uuid4())
+        if not await red.execute_command(
+            "SET", lock_key, token, "NX", "PX", int(lock_timeout * 1000)
+        ):
+            result = await _wait_for_result_from_other_process(
+                red, lock_key, result_key, lock_timeout
+            )
+        else:
+            try:
+                value = await call()
+                try:
+                    await red.execute_command(
+                        "SET",
+                        result_key,
+                        json.dumps(value, cls=SetEncoder),
+                        "PX",
+                        int(
+                            config.get("single_flight.redis_lock.result_ttl", 2) * 1000
+                        ),
+                    )
+                except TypeError as e:
+                    log.warning(
+                        {
+                            "function": f"{__name__}.{sys._getframe().f_code.co_name}",
+                            "message": "Unable to share result with other processes",
+                            "single_flight_function": function_name,
+                            "error": str(e),
+                        }
+                    )
+                return value
+            finally:
+                if await red.execute_command("GET", lock_key) == token:
+                    await red.delete(lock_key)
+
+    if result is None:
+        # The other process failed, or is taking too long
+        return await call()
+    stats.count(
+        "single_flight.coalesced_across_processes", tags={"function": function_name}
+    )
+    return json.loads(result)
+
+
+def single_flight(
+    copy_result: bool = False,
+    share_across_processes: bool = False,
+    key_function: Optional[Callable[..., Hashable]] = None,
+):
+    """
+    Decorates a coroutine function so that concurrent calls with the same arguments share one call.
+
+    :param copy_result: Give each caller a deep copy of the result, for callers that modify it
+    :param share_across_processes: Coordinate with other processes through a Redis lock if
+        `single_flight.redis_lock.enabled` is set. The result must be JSON serializable.
+    :param key_function: Returns the key identifying identical calls from the arguments. Defaults to all of the
+        arguments.
+    """
+
+    def decorator(function: Callable) -> Callable:
+        function_name = f"{function.__module__}.{function.__qualname__}"
+
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            if not config.get("single_flight.enabled", True):
+                return await function(*args, **kwargs)
+            if key_function:
+                key = key_function(*args, **kwargs)
+            else:
+                key = (args, tuple(sorted(kwargs.items())))
+            try:
+                hash(key)
+            except TypeError:
+                return await function(*args, **kwargs)
+
+            in_flight: Dict[Hashable, asyncio.Task] = _in_flight_calls.setdefault(
+                asyncio.get_running_loop(), {}
+            )
+            in_flight_key = (function_name, key)
+            task = in_flight.get(in_flight_key)
+            if task:
+                stats.count("single_flight.coalesced", tags={"function": function_name})
+                result = await asyncio.shield(task)
+                return copy.deepcopy(result) if copy_result else result
+
+            stats.count("single_flight.call", tags={"function": function_name})
+            if share_across_processes and config.get(
+                "single_flight.redis_lock.enabled", False
+            ):
+                coroutine = _call_across_processes(
+                    function_name, key, lambda: function(*args, **kwargs)
+                )
+            else:
+                coroutine = function(*args, **kwargs)
+            task = asyncio.ensure_future(coroutine)
+            in_flight[in_flight_key] = task
+
+            def remove_in_flight_call(finished_task: asyncio.Task) -> None:
+                if in_flight.get(in_flight_key) is finished_task:
+                    del in_flight[in_flight_key]
+                _retrieve_exception(finished_task)
+
+            task.add_done_callback(remove_in_flight_call)
+            result = await asyncio.shield(task)
+            return copy.deepcopy(result) if copy_result else result
+
+        return wrapper
+
+    return decorator
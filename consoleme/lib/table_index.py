@@ -0,0 +1,535 @@
+"""
+In-memory indexes over cached tables.
+
+* `TableIndex` answers the same regex filters as `consoleme.lib.generic.filter_table` over tables such as the
+  ALL_POLICIES list served by /api/v2/policies, but only evaluates the rows that can possibly match.
+* `TypeaheadIndex` answers ranked substring queries for the typeahead endpoints, from documents prebuilt by Celery.
+"""
+import asyncio
+import heapq
+import re
+import sys
+import time
+from array import array
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from asgiref.sync import sync_to_async
+
+from consoleme.config import config
+from consoleme.lib.plugins import get_plugin_by_name
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+log = config.get_logger()
+stats = get_plugin_by_name(config.get("plugins.metrics", "default_metrics"))()
+
+# A filter is compiled into a set of candidate row IDs (None means every row) and a check that each candidate must
+# pass (None means every candidate is already an exact match).
+CompiledFilter = Tuple[Optional[Set[int]], Optional[Callable[[int], bool]]]
+
+
+def required_literals(pattern: str) -> List[str]:
+    """
+    Returns the runs of literal characters that every match of `pattern` must contain, lowercased. Only literals at
+    the top level of the pattern are mandatory; anything inside groups, repeats or alternations is ignored.
+
+    `required_literals("arn:aws:s3:::bucket-.*-logs")` returns `["arn:aws:s3:::bucket-", "-logs"]`
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return []
+    literals = []
+    current = []
+    for op, value in parsed:
+        if op == sre_parse.LITERAL and value < 128:
+            current.append(chr(value).lower())
+            continue
+        if current:
+            literals.append("".join(current))
+            current = []
+    if current:
+        literals.append("".join(current))
+    return literals
+
+
+def build_ngram_postings(
+    values: Iterable[str], ngram_size: int, max_postings: int
+) -> Tuple[Dict[str, array], Set[str]]:
+    """
+    Maps each n-gram of `values` to the positions of the values that contain it. N-grams that occur in more than
+    `max_postings` values don't narrow anything down, so they're returned separately instead.
+    """
+    postings = defaultdict(lambda: array("I"))
+    for row_id, value in enumerate(values):
+        for ngram in {
+            value[i : i + ngram_size] for i in range(len(value) - ngram_size + 1)
+        }:
+            postings[ngram].append(row_id)
+    index = {}
+    common = set()
+    for ngram, row_ids in postings.items():
+        if len(row_ids) > max_postings:
+            common.add(ngram)
+        else:
+            index[ngram] = row_ids
+    return index, common
+
+
+def ngram_postings(
+    index: Dict[str, array],
+    common: Set[str],
+    literals: Iterable[str],
+    ngram_size: int,
+) -> Optional[List[array]]:
+    """
+    Returns the postings of every indexed n-gram of `literals`, shortest first. Returns None if an n-gram doesn't
+    occur anywhere, which means that nothing can match.
+    """
+    ngrams = set()
+    for literal in literals:
+        for i in range(len(literal) - ngram_size + 1):
+            ngrams.add(literal[i : i + ngram_size])
+    postings = []
+    for ngram in ngrams:
+        if ngram in common:
+            continue
+        row_ids = index.get(ngram)
+        if row_ids is None:
+            return None
+        postings.append(row_ids)
+    postings.sort(key=len)
+    return postings
+
+
+def intersect_postings(postings: List[array]) -> Set[int]:
+    """
+    Intersects postings sorted shortest first. The result may contain false positives, since postings that are much
+    longer than the current candidates cost more to intersect than verifying the candidates does.
+    """
+    candidates = set(postings[0])
+    for row_ids in postings[1:]:
+        if not candidates or len(row_ids) > 16 * len(candidates):
+            break
+        candidates.intersection_update(row_ids)
+    return candidates
+
+
+def ngram_candidates(
+    index: Dict[str, array],
+    common: Set[str],
+    literals: Iterable[str],
+    ngram_size: int,
+) -> Optional[Set[int]]:
+    """
+    Returns a superset of the positions that contain every n-gram of `literals`, or None if the literals are too
+    short or too common to narrow anything down.
+    """
+    postings = ngram_postings(index, common, literals, ngram_size)
+    if postings is None:
+        # Nothing contains one of the n-grams, so nothing can match
+        return set()
+    if not postings:
+        return None
+    return intersect_postings(postings)
+
+
+class TableIndex:
+    """
+    A read-only columnar index over a list of dictionaries.
+
+    * `indexed_columns` are low cardinality columns (account ID, technology, ...). Each distinct value maps to the
+      rows that contain it, so a regex filter is evaluated once per distinct value instead of once per row.
+    * `ngram_columns` are high cardinality columns (ARNs). Each lowercased n-gram maps to the rows that contain it.
+      The literal parts of a filter are used to narrow down candidate rows, which are then checked with the regex.
+      N-grams that occur in more than `max_ngram_frequency` of all rows don't narrow anything down and are dropped.
+    * `sort_columns` are the columns that results can be sorted by. Each column's sort order is computed once, when
+      the index is built, and queries merge it with their candidate rows instead of sorting the matches.
+    """
+
+    def __init__(
+        self,
+        rows: List[Dict[str, Any]],
+        indexed_columns: Iterable[str] = (),
+        ngram_columns: Iterable[str] = (),
+        sort_columns: Iterable[str] = (),
+        ngram_size: int = 3,
+        max_ngram_frequency: float = 0.25,
+    ) -> None:
+        self.rows = rows
+        self.ngram_size = ngram_size
+        self.column_values: Dict[str, List[str]] = {}
+        self.value_index: Dict[str, Dict[str, array]] = {}
+        self.ngram_index: Dict[str, Dict[str, array]] = {}
+        self.common_ngrams: Dict[str, Set[str]] = {}
+        # Row IDs in ascending order of each sort column, and the position of each row in that order
+        self.sort_orders: Dict[str, array] = {}
+        self.sort_positions: Dict[str, array] = {}
+
+        for column in indexed_columns:
+            values = self._values_for_column(column)
+            index = defaultdict(lambda: array("I"))
+            for row_id, value in enumerate(values):
+                index[value].append(row_id)
+            self.value_index[column] = dict(index)
+
+        for column in ngram_columns:
+            (
+                self.ngram_index[column],
+                self.common_ngrams[column],
+            ) = build_ngram_postings(
+                (value.lower() for value in self._values_for_column(column)),
+                ngram_size,
+                max(int(len(rows) * max_ngram_frequency), 1),
+            )
+
+        for column in sort_columns:
+            values = self._values_for_column(column)
+            order = array("I", sorted(range(len(values)), key=values.__getitem__))
+            positions = array("I", [0]) * len(order)
+            for position, row_id in enumerate(order):
+                positions[row_id] = position
+            self.sort_orders[column] = order
+            self.sort_positions[column] = positions
+
+    def _values_for_column(self, column: str) -> List[str]:
+        if column not in self.column_values:
+            self.column_values[column] = [str(row.get(column)) for row in self.rows]
+        return self.column_values[column]
+
+    def _compile_filter(self, column: str, value: Any) -> Optional[CompiledFilter]:
+        if isinstance(value, str):
+            pattern = value.strip()
+            try:
+                regexp = re.compile(r"{}".format(pattern), re.IGNORECASE)
+            except re.error:
+                # Regex is incorrect. Don't filter
+                return None
+            if column in self.value_index:
+                candidates = set()
+                for column_value, row_ids in self.value_index[column].items():
+                    if regexp.search(column_value):
+                        candidates.update(row_ids)
+                return candidates, None
+            values = self._values_for_column(column)
+            candidates = None
+            if column in self.ngram_index:
+                candidates = ngram_candidates(
+                    self.ngram_index[column],
+                    self.common_ngrams[column],
+                    required_literals(pattern),
+                    self.ngram_size,
+                )
+            return candidates, lambda row_id: bool(regexp.search(values[row_id]))
+        if (
+            isinstance(value, list)
+            and len(value) == 2
+            and isinstance(value[0], int)
+            and isinstance(value[1], int)
+        ):
+            # Handles epoch time filters, where we expect a start_time and an end_time
+            def in_range(row_id: int) -> bool:
+                try:
+                    return value[0] < int(self.rows[row_id].get(column)) < value[1]
+                except (TypeError, ValueError):
+                    return False
+
+            return None, in_range
+        return None
+
+    def _sorted_row_ids(
+        self, candidates: Optional[Set[int]], column: str, descending: bool
+    ) -> Iterable[int]:
+        """
+        Yields the candidate row IDs in the precomputed order of `column`. Few candidates are ordered with a heap
+        keyed by their sort position, so only the rows that are consumed are ordered. Otherwise, the sort order is
+        scanned and rows that aren't candidates are skipped.
+        """
+        order = self.sort_orders[column]
+        if candidates is None or len(candidates) * 8 >= len(order):
+            ordered = reversed(order) if descending else order
+            if candidates is None:
+                yield from ordered
+            else:
+                yield from (row_id for row_id in ordered if row_id in candidates)
+            return
+        positions = self.sort_positions[column]
+        sign = -1 if descending else 1
+        heap = [(sign * positions[row_id], row_id) for row_id in candidates]
+        heapq.heapify(heap)
+        while heap:
+            yield heapq.heappop(heap)[1]
+
+    def query(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        sort: Optional[Dict[str, str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns the rows matching all `filters`, in table order or sorted by `sort`, up to `limit` rows.
+
+        :param filters: Mapping of column name to a case-insensitive regex, or to a [start, end] epoch time range
+        :param limit: Maximum number of rows to return
+        :param sort: {"key": <column>, "direction": "ascending" | "descending"}. Columns that aren't sort columns
+            of the index are sorted after every match is found.
+        """
+        candidates: Optional[Set[int]] = None
+        checks: List[Callable[[int], bool]] = []
+        for column, value in (filters or {}).items():
+            if not (column and value):
+                continue
+            compiled = self._compile_filter(column, value)
+            if not compiled:
+                continue
+            row_ids, check = compiled
+            if row_ids is not None:
+                candidates = row_ids if candidates is None else candidates & row_ids
+            if check:
+                checks.append(check)
+
+        sort_column = (sort or {}).get("key")
+        descending = (sort or {}).get("direction") == "descending"
+        unindexed_sort = sort_column and sort_column not in self.sort_orders
+        if sort_column and not unindexed_sort:
+            order = self._sorted_row_ids(candidates, sort_column, descending)
+        elif candidates is not None:
+            order = sorted(candidates)
+        else:
+            order = range(len(self.rows))
+        row_limit = None if unindexed_sort else limit
+
+        results = []
+        for row_id in order:
+            if row_limit is not None and len(results) >= row_limit:
+                break
+            if all(check(row_id) for check in checks):
+                results.append(self.rows[row_id])
+        if unindexed_sort:
+            results.sort(key=lambda row: str(row.get(sort_column)), reverse=descending)
+            results = results[0:limit]
+        return results
+
+
+TYPEAHEAD_TOKEN_SEPARATORS = frozenset(":/-_. @\x00")
+
+
+def build_typeahead_document(
+    search_keys: List[str],
+    values: Optional[List[str]] = None,
+    partitions: Optional[List[Dict[str, str]]] = None,
+) -> Dict[str, Any]:
+    """
+    Builds the serializable part of a `TypeaheadIndex`, so that Celery tasks can do the preprocessing once per cache
+    refresh instead of the web servers doing it on every keystroke.
+
+    :param search_keys: The text to search for each item. Keys are lowercased here.
+    :param values: Optional values to return for each item, such as the original ARNs
+    :param partitions: Optional exact-match attributes for each item, ie: {"account_id": "123456789012"}
+    :return: {"keys": [...], "values": [...], "partitions": {<attribute>: {<value>: [<item positions>]}}}
+    """
+    partition_index = defaultdict(lambda: defaultdict(list))
+    for item_id, item_partitions in enumerate(partitions or []):
+        for attribute, value in item_partitions.items():
+            partition_index[attribute][value].append(item_id)
+    document = {
+        "keys": [key.lower() for key in search_keys],
+        "partitions": {
+            attribute: dict(values_to_items)
+            for attribute, values_to_items in partition_index.items()
+        },
+    }
+    if values is not None:
+        document["values"] = values
+    return document
+
+
+def arn_partitions(arn: str) -> Dict[str, str]:
+    """Typeahead partitions of an ARN, ie: `arn:aws:sqs:us-east-1:123456789012:resource_name`"""
+    parts = arn.split(":", 5)
+    parts += [""] * (5 - len(parts))
+    return {"resource_type": parts[2], "region": parts[3], "account_id": parts[4]}
+
+
+class TypeaheadIndex:
+    """
+    Case-insensitive substring search over a document made by `build_typeahead_document`.
+
+    Candidates are narrowed down with n-grams of the query and with exact-match partitions, verified with a substring
+    check, and ranked: exact matches of a token first, then matches at the start of a token, then any other match,
+    with shorter keys first. Only the first `rank_window` matches are ranked, which bounds the cost of broad queries.
+    """
+
+    def __init__(
+        self,
+        document: Dict[str, Any],
+        ngram_size: int = 3,
+        max_ngram_frequency: float = 0.25,
+        rank_window: int = 200,
+    ) -> None:
+        self.keys: List[str] = document.get("keys", [])
+        self.values: Optional[List[Any]] = document.get("values")
+        self.ngram_size = ngram_size
+        self.rank_window = rank_window
+        self.partitions: Dict[str, Dict[str, List[int]]] = document.get(
+            "partitions", {}
+        )
+        # Partition value of every item, so that candidates can be checked without set lookups
+        self.partition_codes: Dict[str, array] = {}
+        self.partition_value_codes: Dict[str, Dict[str, int]] = {}
+        for attribute, values_to_items in self.partitions.items():
+            codes = array("I", [0]) * len(self.keys)
+            value_codes = {}
+            for code, (value, item_ids) in enumerate(values_to_items.items(), 1):
+                value_codes[value] = code
+                for item_id in item_ids:
+                    codes[item_id] = code
+            self.partition_codes[attribute] = codes
+            self.partition_value_codes[attribute] = value_codes
+        self.ngram_index, self.common_ngrams = build_ngram_postings(
+            self.keys,
+            ngram_size,
+            max(int(len(self.keys) * max_ngram_frequency), 1),
+        )
+
+    def _rank(self, key: str, query: str) -> Tuple[int, int]:
+        rank = 2
+        position = key.find(query)
+        while position != -1:
+            end = position + len(query)
+            if position == 0 or key[position - 1] in TYPEAHEAD_TOKEN_SEPARATORS:
+                if end == len(key) or key[end] in TYPEAHEAD_TOKEN_SEPARATORS:
+                    rank = 0
+                    break
+                rank = 1
+            position = key.find(query, position + 1)
+        return rank, len(key)
+
+    def search(
+        self,
+        query: Optional[str],
+        limit: int = 20,
+        partition_filters: Optional[Dict[str, Optional[str]]] = None,
+    ) -> List[int]:
+        """
+        Returns the positions of up to `limit` items whose key contains `query`, best matches first.
+
+        :param query: Text to search for. Every item matches an empty query.
+        :param limit: Maximum number of results
+        :param partition_filters: Exact partition values to filter by, ie: {"region": "us-east-1"}. Empty values are
+            ignored.
+        """
+        query = (query or "").lower()
+        window = max(limit, self.rank_window)
+        drivers: List[Iterable[int]] = []
+        code_checks: List[Tuple[array, int]] = []
+        for attribute, value in (partition_filters or {}).items():
+            if not value:
+                continue
+            code = self.partition_value_codes.get(attribute, {}).get(value)
+            if code is None:
+                return []
+            drivers.append(self.partitions[attribute][value])
+            code_checks.append((self.partition_codes[attribute], code))
+        postings = ngram_postings(
+            self.ngram_index, self.common_ngrams, [query], self.ngram_size
+        )
+        if postings is None:
+            return []
+        driver = min(drivers, key=len) if drivers else range(len(self.keys))
+        # Scanning the driver in order stops once `window` matches are found, which is cheap for broad queries. The
+        # n-gram postings are used when they're rare enough to cost less than that scan.
+        if postings and len(postings[0]) ** 2 < window * len(driver):
+            candidates = intersect_postings(postings)
+            if len(candidates) < len(driver):
+                driver = sorted(candidates)
+
+        matches = []
+        for item_id in driver:
+            if any(codes[item_id] != code for codes, code in code_checks):
+                continue
+            if query in self.keys[item_id]:
+                matches.append(item_id)
+                if len(matches) >= window:
+                    break
+        if query:
+            matches.sort(key=lambda item_id: self._rank(self.keys[item_id], query))
+        return matches[0:limit]
+
+
+_table_indexes: Dict[str, Tuple[Any, Any]] = {}
+# Only the identity of the last table seen is kept, so replaced tables can be garbage collected
+_last_seen_tables: Dict[str, int] = {}
+_pending_builds: Dict[str, asyncio.Future] = {}
+
+
+async def _build_table_index(
+    name: str, rows: Any, index_class: Callable, index_kwargs: Dict[str, Any]
+) -> None:
+    function = f"{__name__}.{sys._getframe().f_code.co_name}"
+    start = time.time()
+    try:
+        index = await sync_to_async(index_class, thread_sensitive=False)(
+            rows, **index_kwargs
+        )
+        if _last_seen_tables.get(name) != id(rows):
+            # The table was replaced while its index was being built
+            return
+        _table_indexes[name] = (rows, index)
+        log.debug(
+            {
+                "function": function,
+                "message": "Built table index",
+                "table": name,
+                "rows": len(rows),
+                "duration": time.time() - start,
+            }
+        )
+        stats.count(f"{function}.success", tags={"table": name})
+    except Exception as e:
+        log.error(
+            {
+                "function": function,
+                "message": "Unable to build table index",
+                "table": name,
+                "error": str(e),
+            },
+            exc_info=True,
+        )
+        stats.count(f"{function}.error", tags={"table": name})
+    finally:
+        _pending_builds.pop(name, None)
+
+
+async def get_table_index(
+    name: str, rows: Any, index_class: Callable = TableIndex, **index_kwargs
+) -> Optional[Any]:
+    """
+    Returns the index for the current version of a cached table, or None if it isn't available yet.
+
+    The data returned by `retrieve_json_data_from_redis_or_s3` is the same object until the writer updates it, so a
+    table is identified by its identity. The index is built in the background once the same table has been seen
+    twice, which avoids building indexes for data that isn't served from the in-process cache. Callers should fall
+    back to a linear scan while no index is available.
+
+    :param name: Name of the table
+    :param rows: The cached table
+    :param index_class: `TableIndex`, `TypeaheadIndex`, or another class that takes the table as its first argument
+    :param index_kwargs: Keyword arguments for `index_class`
+    """
+    indexed_rows, index = _table_indexes.get(name, (None, None))
+    if index and indexed_rows is rows:
+        return index
+    if index:
+        # Release the replaced table and its index before the next index is built
+        del _table_indexes[name]
+    if _last_seen_tables.get(name) == id(rows) and name not in _pending_builds:
+        _pending_builds[name] = asyncio.ensure_future(
+            _build_table_index(name, rows, index_class, index_kwargs)
+        )
+    _last_seen_tables[name] = id(rows)
+    return None
@@ -1,11 +1,15 @@
+import asyncio
 import fnmatch
+import json
 import os
 import sys
 import tempfile
-from typing import Optional, Union
+from typing import Any, Dict, Optional, Union
 
 import sentry_sdk
+from asgiref.sync import sync_to_async
 from ruamel.yaml import YAML
+from ruamel.yaml.error import YAMLError
 
 from consoleme.config import config
 from consoleme.lib.account_indexers import get_account_id_to_name_mapping
@@ -13,7 +17,8 @@
     retrieve_json_data_from_redis_or_s3,
     store_json_results_in_redis_and_s3,
 )
-from consoleme.lib.git import clone_repo
+from consoleme.lib.cpu_executor import run_in_process_pool
+from consoleme.lib.git import clone_or_update_repo, lock_working_copy
 from consoleme.lib.templated_resources.models import (
     TemplatedFileModelArray,
     TemplateFile,
@@ -86,9 +91,77 @@ async def retrieve_cached_resource_templates(
     return TemplatedFileModelArray(templated_resources=matching_templates)
 
 
+def summarize_template(file_path: str) -> Dict[str, Any]:
+    """
+    Parse a honeybee template, and return the parts of it that template discovery needs. Runs in the process pool, so
+    the summary only contains plain, picklable types. Errors other than invalid template content, such as a file that
+    can't be read, are raised.
+
+    :return: The template's name fields, owner, account patterns and top-level keys, or the parsing error
+    """
+    with open(file_path, "r") as f:
+        try:
+            file_content = yaml.load(f)
+        except YAMLError as e:
+            return {"error": str(e)}
+    if not isinstance(file_content, dict):
+        return {"error": "Template is not a mapping"}
+    return {
+        "name": file_content.get("TemplateName", file_content.get("Name")),
+        "owner": file_content.get("Owner"),
+        "include_accounts": [
+            str(account) for account in file_content.get("IncludeAccounts") or []
+        ],
+        "exclude_accounts": [
+            str(account) for account in file_content.get("ExcludeAccounts") or []
+        ],
+        "keys": [str(key) for key in file_content.keys()],
+    }
+
+
+def _list_repository_files(repo) -> Dict[str, str]:
+    """Return the blob SHA of every file in the working copy's HEAD, by path relative to the repository root"""
+    files = {}
+    # Without -z, git quotes paths with special or non-ASCII characters
+    for line in repo.git.ls_tree("-r", "-z", "HEAD").split("\0"):
+        if not line:
+            continue
+        metadata, path = line.split("\t", 1)
+        _, object_type, blob_sha = metadata.split()
+        if object_type == "blob":
+            files[path] = blob_sha
+    return files
+
+
+def _load_template_summaries(summaries_path: str) -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(summaries_path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _store_template_summaries(
+    summaries_path: str, summaries: Dict[str, Dict[str, Any]]
+) -> None:
+    temporary_path = f"{summaries_path}.tmp"
+    with open(temporary_path, "w") as f:
+        json.dump(summaries, f)
+    os.replace(temporary_path, summaries_path)
+
+
 async def cache_resource_templates_for_repository(
     repository,
 ) -> TemplatedFileModelArray:
+    """
+    Discover the templates in a repository.
+
+    The repository is kept in a persistent working copy under `cache_resource_templates.working_directory`, which is
+    updated with a fetch on each run, under a lock that's shared by the worker processes on a host. Templates are
+    summarized once per blob SHA, and the summaries are stored next to the working copy, so only new or changed
+    templates are parsed. Those are parsed in the process pool. A template that can't be read isn't summarized, and
+    is parsed again on the next run.
+    """
     function = f"{__name__}.{sys._getframe().f_code.co_name}"
     log_data = {
         "function": function,
@@ -96,113 +169,185 @@ async def cache_resource_templates_for_repository(
     }
     if repository["type"] not in ["git"]:
         raise Exception("Unsupported repository type")
-    tempdir = tempfile.mkdtemp()
+    directory = os.path.join(
+        config.get(
+            "cache_resource_templates.working_directory",
+            os.path.join(tempfile.gettempdir(), "consoleme_resource_templates"),
+        ),
+        repository["name"],
+    )
     repo_url = repository["repo_url"]
-    repo = clone_repo(repo_url, tempdir)
-    repo.config_writer().set_value("user", "name", "ConsoleMe").release()
     email = repository["authentication_settings"]["email"]
     resource_formats = repository["resource_formats"]
     discovered_templates = []
     accounts_d = await get_account_id_to_name_mapping()
     accounts_set = set(accounts_d.values())
-    if email:
-        repo.config_writer().set_value("user", "email", email).release()
-    for subdir, dirs, files in os.walk(repo.working_dir):
-        for filename in files:
-            template_matched = False
-            subdir = subdir.replace(tempdir + os.sep, "")
-            filepath = subdir + os.sep + filename
-            relative_path = "/".join(subdir.split("/")[1:]) + os.sep + filename
-            web_path = repository.get("web_path", "").format(
-                relative_path=relative_path
+    if "honeybee" not in resource_formats:
+        return TemplatedFileModelArray(templated_resources=discovered_templates)
+    resource_type_parser = repository["resource_type_parser"]["honeybee"]
+
+    def _path_matches(filepath: str, condition: Dict[str, Any]) -> bool:
+        if condition.get("path_prefix") and not filepath.startswith(
+            condition["path_prefix"]
+        ):
+            return False
+        if condition.get("path_suffix") and not filepath.endswith(
+            condition["path_suffix"]
+        ):
+            return False
+        return True
+
+    # Overlapping runs must not update the working copy while it's being read
+    async with lock_working_copy(directory):
+        repo = await sync_to_async(clone_or_update_repo)(
+            repo_url, directory, repository.get("main_branch_name")
+        )
+        repo.config_writer().set_value("user", "name", "ConsoleMe").release()
+        if email:
+            repo.config_writer().set_value("user", "email", email).release()
+        repo_directory_name = os.path.basename(repo.working_dir)
+
+        # Only files that match a condition's path are templates
+        template_blobs = {}
+        for path, blob_sha in (
+            await sync_to_async(_list_repository_files)(repo)
+        ).items():
+            filepath = repo_directory_name + "/" + path
+            if any(
+                _path_matches(filepath, condition)
+                for conditions in resource_type_parser.values()
+                for condition in conditions
+            ):
+                template_blobs[path] = blob_sha
+
+        summaries_path = os.path.join(directory, "template_summaries.json")
+        cached_summaries = _load_template_summaries(summaries_path)
+        summaries = {
+            blob_sha: cached_summaries[blob_sha]
+            for blob_sha in template_blobs.values()
+            if blob_sha in cached_summaries
+        }
+        paths_to_parse = {
+            blob_sha: path
+            for path, blob_sha in template_blobs.items()
+            if blob_sha not in summaries
+        }
+        # Only a few templates are queued for the process pool at a time, so a large repository doesn't hold every
+        # pending parse in the pool's queue
+        parse_semaphore = asyncio.Semaphore(
+            config.get("cache_resource_templates.max_concurrent_parses", 16)
+        )
+
+        async def parse_template(path: str) -> Dict[str, Any]:
+            async with parse_semaphore:
+                return await run_in_process_pool(
+                    summarize_template, os.path.join(repo.working_dir, path)
+                )
+
+        parsed_summaries = await asyncio.gather(
+            *[parse_template(path) for path in paths_to_parse.values()],
+            return_exceptions=True,
+        )
+        for (blob_sha, path), summary in zip(paths_to_parse.items(), parsed_summaries):
+            if isinstance(summary, Exception):
+                # Only template content is cached, so the template is parsed again on the next run
+                log.error(
+                    {
+                        **log_data,
+                        "Message": "Error trying to read template",
+                        "file_path": os.path.join(repo.working_dir, path),
+                        "error": str(summary),
+                    }
+                )
+                sentry_sdk.capture_exception(summary)
+                continue
+            summaries[blob_sha] = summary
+        if paths_to_parse or len(summaries) != len(cached_summaries):
+            await sync_to_async(_store_template_summaries)(summaries_path, summaries)
+    log_data["num_templates"] = len(template_blobs)
+    log_data["num_templates_parsed"] = len(paths_to_parse)
+
+    for path, blob_sha in sorted(template_blobs.items()):
+        summary = summaries.get(blob_sha)
+        if not summary:
+            continue
+        filename = path.split("/")[-1]
+        filepath = repo_directory_name + "/" + path
+        relative_path = "/".join(path.split("/")[:-1]) + os.sep + filename
+        web_path = repository.get("web_path", "").format(relative_path=relative_path)
+        if summary.get("error"):
+            log.error(
+                {
+                    **log_data,
+                    "Message": "Error trying to parse template",
+                    "file_path": os.path.join(repo.working_dir, path),
+                    "error": summary["error"],
+                }
             )
-            full_temporary_file_path = tempdir + "/" + filepath
-            if "honeybee" in resource_formats:
-                for resource_type, conditions in repository["resource_type_parser"][
-                    "honeybee"
-                ].items():
-                    if template_matched:
-                        continue
-                    for condition in conditions:
-                        if condition.get("path_prefix") and not filepath.startswith(
-                            condition["path_prefix"]
-                        ):
-                            continue
-                        if condition.get("path_suffix") and not filepath.endswith(
-                            condition["path_suffix"]
-                        ):
-                            continue
-                        with open(full_temporary_file_path, "r") as f:
-                            try:
-                                file_content = yaml.load(f)
-                            except Exception as e:
-                                sentry_sdk.capture_exception()
-                                log.error(
-                                    {
-                                        **log_data,
-                                        "Message": "Error trying to parse template",
-                                        "file_path": full_temporary_file_path,
-                                        "error": str(e),
-                                    },
-                                    exc_info=True,
-                                )
-                                continue
-                        name = file_content.get(
-                            "TemplateName", file_content.get("Name", filename)
-                        )
-                        owner = file_content.get("Owner")
-
-                        # Generate a set of accounts the template applies to. This is used to get the number of accounts
-                        # affected by a resource template.
-                        included_accounts_set = set()
-                        include_accounts = file_content.get("IncludeAccounts", [])
-                        if include_accounts:
-                            for include_account in include_accounts:
-                                for account in accounts_set:
-                                    if fnmatch.fnmatch(account, include_account):
-                                        included_accounts_set.add(account)
-                        exclude_accounts = file_content.get("ExcludeAccounts", [])
-                        if exclude_accounts:
-                            for exclude_account in exclude_accounts:
-                                for account in accounts_set:
-                                    if fnmatch.fnmatch(account, exclude_account):
-                                        if account not in included_accounts_set:
-                                            continue
-                                        included_accounts_set.remove(account)
-
-                        if condition.get("file_content"):
-                            should_ignore_file = False
-                            body_should_include = condition["file_content"].get(
-                                "includes", []
-                            )
-                            body_should_exclude = condition["file_content"].get(
-                                "excludes", []
-                            )
-                            for include in body_should_include:
-                                if include not in file_content:
-                                    should_ignore_file = True
-                                    break
-                            for exclude in body_should_exclude:
-                                if exclude in file_content:
-                                    should_ignore_file = True
-                            if should_ignore_file:
-                                continue
-
-                        discovered_templates.append(
-                            TemplateFile(
-                                name=name,
-                                repository_name=repository["name"],
-                                owner=owner,
-                                include_accounts=include_accounts,
-                                exclude_accounts=exclude_accounts,
-                                number_of_accounts=len(included_accounts_set),
-                                resource=relative_path,
-                                file_path=filepath,
-                                web_path=web_path,
-                                resource_type=resource_type,
-                                template_language="honeybee",
-                            )
-                        )
-                        template_matched = True
-                        break
+            sentry_sdk.capture_message(
+                f"Error trying to parse template {filepath}: {summary['error']}",
+                "error",
+            )
+            continue
+        for resource_type, conditions in resource_type_parser.items():
+            condition = next(
+                (
+                    condition
+                    for condition in conditions
+                    if _path_matches(filepath, condition)
+                    and _content_matches(summary, condition)
+                ),
+                None,
+            )
+            if not condition:
+                continue
+            name = summary["name"] or filename
+            include_accounts = summary["include_accounts"]
+            exclude_accounts = summary["exclude_accounts"]
+
+            # Generate a set of accounts the template applies to. This is used to get the number of accounts
+            # affected by a resource template.
+            included_accounts_set = set()
+            for include_account in include_accounts:
+                for account in accounts_set:
+                    if fnmatch.fnmatch(account, include_account):
+                        included_accounts_set.add(account)
+            for exclude_account in exclude_accounts:
+                for account in accounts_set:
+                    if fnmatch.fnmatch(account, exclude_account):
+                        included_accounts_set.discard(account)
+
+            discovered_templates.append(
+                TemplateFile(
+                    name=name,
+                    repository_name=repository["name"],
+                    owner=summary["owner"],
+                    include_accounts=include_accounts,
+                    exclude_accounts=exclude_accounts,
+                    number_of_accounts=len(included_accounts_set),
+                    resource=relative_path,
+                    file_path=filepath,
+                    web_path=web_path,
+                    resource_type=resource_type,
+                    template_language="honeybee",
+                )
+            )
+            break
+    log.debug(log_data)
     return TemplatedFileModelArray(templated_resources=discovered_templates)
+
+
+def _content_matches(summary: Dict[str, Any], condition: Dict[str, Any]) -> bool:
+    """Check a condition's required and forbidden top-level keys against a template summary"""
+    if not condition.get("file_content"):
+        return True
+    keys = set(summary["keys"])
+    if any(
+        include not in keys for include in condition["file_content"].get("includes", [])
+    ):
+        return False
+    if any(
+        exclude in keys for exclude in condition["file_content"].get("excludes", [])
+    ):
+        return False
+    return True
@@ -1,15 +1,15 @@
 from datetime import datetime, timedelta
 from typing import List, Optional, Union
 
-import ujson as json
 from asgiref.sync import sync_to_async
 from policy_sentry.util.arns import parse_arn
 
 from consoleme.config import config
 from consoleme.lib.account_indexers import get_account_id_to_name_mapping
+from consoleme.lib.errors_by_arn import get_s3_errors_for_arn
 from consoleme.lib.plugins import get_plugin_by_name
 from consoleme.lib.policies import get_aws_config_history_url_for_resource
-from consoleme.lib.redis import RedisHandler, redis_get
+from consoleme.lib.redis import RedisHandler
 from consoleme.models import (
     AwsPrincipalModel,
     CloudTrailDetailsModel,
@@ -94,11 +94,7 @@ async def get_s3_details_for_role(account_id: str, role_name: str) -> S3DetailsM
         yesterday=yesterday, role_name=f"'{role_name}'", account_id=f"'{account_id}'"
     )
 
-    s3_error_topic = config.get("redis.s3_errors", "S3_ERRORS")
-    all_s3_errors = await redis_get(s3_error_topic)
-    s3_errors_unformatted = []
-    if all_s3_errors:
-        s3_errors_unformatted = json.loads(all_s3_errors).get(arn, [])
+    s3_errors_unformatted = await get_s3_errors_for_arn(arn)
     s3_errors_formatted = []
     for error in s3_errors_unformatted:
         s3_errors_formatted.append(
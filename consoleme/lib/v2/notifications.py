@@ -1,3 +1,4 @@
+import heapq
 import json as original_json
 import sys
 import time
@@ -25,9 +26,17 @@
 
 
 class RetrieveNotifications(metaclass=Singleton):
+    """
+    Keeps the notifications in ALL_NOTIFICATIONS parsed in memory, indexed by user or group and then by predictable
+    ID. The notifications of a user or group are only parsed again when their entry in ALL_NOTIFICATIONS changes.
+    """
+
     def __init__(self):
         self.last_update = 0
-        self.all_notifications = []
+        self.all_notifications = {}
+        self.notifications_by_user_or_group: Dict[
+            str, Dict[str, ConsoleMeUserNotification]
+        ] = {}
 
     async def retrieve_all_notifications(self, force_refresh=False):
         if force_refresh or (
@@ -36,7 +45,7 @@ async def retrieve_all_notifications(self, force_refresh=False):
                 "get_notifications_for_user.notification_retrieval_interval", 20
             )
         ):
-            self.all_notifications = await retrieve_json_data_from_redis_or_s3(
+            all_notifications = await retrieve_json_data_from_redis_or_s3(
                 redis_key=config.get("notifications.redis_key", "ALL_NOTIFICATIONS"),
                 redis_data_type="hash",
                 s3_bucket=config.get("notifications.s3.bucket"),
@@ -45,9 +54,58 @@ async def retrieve_all_notifications(self, force_refresh=False):
                 ),
                 default={},
             )
+            self._update_index(all_notifications)
+            self.all_notifications = all_notifications
             self.last_update = int(time.time())
         return self.all_notifications
 
+    async def retrieve_notifications_by_user_or_group(
+        self, force_refresh=False
+    ) -> Dict[str, Dict[str, ConsoleMeUserNotification]]:
+        """
+        Returns supported notifications by user or group, and then by predictable ID. The notifications are shared
+        between requests, and must not be modified.
+        """
+        await self.retrieve_all_notifications(force_refresh)
+        return self.notifications_by_user_or_group
+
+    def _update_index(self, all_notifications: Dict[str, str]) -> None:
+        function = (
+            f"{__name__}.{self.__class__.__name__}.{sys._getframe().f_code.co_name}"
+        )
+        notifications_by_user_or_group = {}
+        for user_or_group, notifications_j in all_notifications.items():
+            if self.all_notifications.get(user_or_group) == notifications_j:
+                notifications_by_user_or_group[
+                    user_or_group
+                ] = self.notifications_by_user_or_group.get(user_or_group, {})
+                continue
+            notifications = {}
+            for notification_raw in json.loads(notifications_j):
+                try:
+                    # We parse ConsoleMeUserNotification individually instead of as an array
+                    # to account for future changes to the model that may invalidate older
+                    # notifications
+                    notification = ConsoleMeUserNotification.parse_obj(
+                        notification_raw
+                    )
+                except Exception as e:
+                    log.error(
+                        {
+                            "function": function,
+                            "user_or_group": user_or_group,
+                            "error": str(e),
+                        }
+                    )
+                    sentry_sdk.capture_exception()
+                    continue
+                if notification.version != 1:
+                    # Skip unsupported versions of the notification model
+                    continue
+                notifications.setdefault(notification.predictable_id, notification)
+            notifications_by_user_or_group[user_or_group] = notifications
+        self.notifications_by_user_or_group = notifications_by_user_or_group
+
 
 async def get_notifications_for_user(
     user,
@@ -55,19 +113,14 @@ async def get_notifications_for_user(
     max_notifications=config.get("get_notifications_for_user.max_notifications", 5),
     force_refresh=False,
 ) -> GetNotificationsForUserResponse:
-    function = f"{__name__}.{sys._getframe().f_code.co_name}"
-    log_data = {
-        "function": function,
-        "user": user,
-        "max_notifications": max_notifications,
-        "force_refresh": force_refresh,
-    }
-
     current_time = int(time.time())
-    all_notifications = await RetrieveNotifications().retrieve_all_notifications(
-        force_refresh
+    notifications_by_user_or_group = (
+        await RetrieveNotifications().retrieve_notifications_by_user_or_group(
+            force_refresh
+        )
     )
     unread_count = 0
+    seen_predictable_ids = set()
     notifications_for_user = []
     for user_or_group in [user, *groups]:
         # Filter out identical notifications that were already captured via user-specific attribution. IE: "UserA"
@@ -75,50 +128,28 @@ async def get_notifications_for_user(
         # notification is tied to the user. However, "UserA" is a member of "GroupA", which owns RoleA. We want
         # to show the notification to members of "GroupA", as well as "UserA" but we don't want "UserA" to see 2
         # notifications.
-        notifications = all_notifications.get(user_or_group)
-        if not notifications:
-            continue
-        notifications = json.loads(notifications)
-        for notification_raw in notifications:
-            try:
-                # We parse ConsoleMeUserNotification individually instead of as an array
-                # to account for future changes to the model that may invalidate older
-                # notifications
-                notification = ConsoleMeUserNotification.parse_obj(notification_raw)
-            except Exception as e:
-                log.error({**log_data, "error": str(e)})
-                sentry_sdk.capture_exception()
-                continue
-            if notification.version != 1:
-                # Skip unsupported versions of the notification model
-                continue
+        for predictable_id, notification in notifications_by_user_or_group.get(
+            user_or_group, {}
+        ).items():
             if user in notification.hidden_for_users:
                 # Skip this notification if it isn't hidden for the user
                 continue
-            seen = False
-            for existing_user_notification_raw in notifications_for_user:
-                existing_user_notification = ConsoleMeUserNotification.parse_obj(
-                    existing_user_notification_raw
-                )
-                if (
-                    notification.predictable_id
-                    == existing_user_notification.predictable_id
-                ):
-                    seen = True
-            if not seen:
-                notifications_for_user.append(notification)
-    # Filter out "expired" notifications
-    notifications_for_user = [
-        v for v in notifications_for_user if v.expiration > current_time
-    ]
-
-    # Show newest notifications first
-    notifications_for_user = sorted(
-        notifications_for_user, key=lambda i: i.event_time, reverse=True
+            if predictable_id in seen_predictable_ids:
+                continue
+            seen_predictable_ids.add(predictable_id)
+            notifications_for_user.append(notification)
+
+    # Filter out "expired" notifications, and show the newest notifications first
+    notifications_to_return = heapq.nlargest(
+        max_notifications,
+        (v for v in notifications_for_user if v.expiration > current_time),
+        key=lambda i: i.event_time,
     )
 
-    # Increment Unread Count
-    notifications_to_return = notifications_for_user[0:max_notifications]
+    # Increment Unread Count. Notifications are copied, because the parsed notifications are shared between requests.
+    notifications_to_return = [
+        notification.copy() for notification in notifications_to_return
+    ]
     for notification in notifications_to_return:
         if user in notification.read_by_users or notification.read_by_all:
             notification.read_for_current_user = True
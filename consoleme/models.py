@@ -527,6 +527,14 @@ class DataTableResponse(BaseModel):
     data: List[Dict[str, Any]]
 
 
+class PaginatedDataTableResponse(BaseModel):
+    filteredCount: int
+    data: List[Dict[str, Any]]
+    nextCursor: Optional[str] = Field(
+        None, description="Cursor for the next page, if there is one"
+    )
+
+
 class PolicyCheckModelItem(BaseModel):
     issue: Optional[str] = None
     detail: Optional[str] = None
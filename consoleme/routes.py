@@ -52,6 +52,7 @@
     PoliciesPageConfigHandler,
 )
 from consoleme.handlers.v2.requests import (
+    PaginatedRequestsHandler,
     RequestDetailHandler,
     RequestHandler,
     RequestsHandler,
@@ -169,6 +170,7 @@ def make_app(jwt_validator=None):
         (r"/api/v2/policies", PoliciesHandler),
         (r"/api/v2/request", RequestHandler),
         (r"/api/v2/requests", RequestsHandler),
+        (r"/api/v2/paginated_requests", PaginatedRequestsHandler),
         (r"/api/v2/requests/([a-zA-Z0-9_-]+)", RequestDetailHandler),
         (r"/api/v2/roles/?", RolesHandler),
         (r"/api/v2/roles/(\d{12})", AccountRolesHandler),
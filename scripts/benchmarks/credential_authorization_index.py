@@ -0,0 +1,89 @@
+"""
+Compares user role lookups against the credential authorization mapping, as `determine_users_authorized_roles` used
+to perform them, with first and repeated lookups against a CompiledAuthorizationIndex. Also measures the time to
+compile, serialize and load the index.
+
+Usage: CONFIG_LOCATION=example_config/example_config_test.yaml \
+    python scripts/benchmarks/credential_authorization_index.py --groups 50000 --roles 200000
+"""
+import argparse
+import json
+import random
+import time
+
+from consoleme.lib.cloud_credential_authorization_mapping.index import (
+    CompiledAuthorizationIndex,
+)
+from consoleme.lib.cloud_credential_authorization_mapping.models import (
+    RoleAuthorizations,
+)
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--groups", default=50000, type=int)
+parser.add_argument("--roles", default=200000, type=int)
+parser.add_argument("--roles-per-group", default=20, type=int)
+parser.add_argument("--lookups", default=20, type=int)
+args = parser.parse_args()
+
+random.seed(0)
+roles = [
+    f"arn:aws:iam::{100000000000 + i % 2000}:role/role{i}" for i in range(args.roles)
+]
+authorization_mapping = {}
+for i in range(args.groups):
+    # A few groups, like administrators, are authorized for a large share of the roles
+    roles_in_group = args.roles // 10 if i % 5000 == 0 else args.roles_per_group
+    authorization_mapping[f"group{i}@example.com"] = RoleAuthorizations(
+        authorized_roles=set(random.sample(roles, roles_in_group)),
+        authorized_roles_cli_only=set(random.sample(roles, roles_in_group // 4)),
+    )
+
+
+def legacy_lookup(user, groups, include_cli):
+    authorized_roles = set()
+    for identity in [user, *groups]:
+        mapping = authorization_mapping.get(identity, [])
+        if mapping:
+            authorized_roles.update(mapping.authorized_roles)
+            if include_cli:
+                authorized_roles.update(mapping.authorized_roles_cli_only)
+    return sorted(authorized_roles)
+
+
+start = time.time()
+index = CompiledAuthorizationIndex.from_authorization_mapping(authorization_mapping)
+print(f"Compiled index of {len(index)} identities in {time.time() - start:.2f}s")
+start = time.time()
+serialized = json.dumps(index.to_dict())
+print(
+    f"Serialized index to {len(serialized) / 1024 / 1024:.1f}MB in {time.time() - start:.2f}s"
+)
+start = time.time()
+index = CompiledAuthorizationIndex.from_dict(json.loads(serialized))
+print(f"Loaded index in {time.time() - start:.2f}s")
+
+all_groups = list(authorization_mapping)
+for group_count in [10, 100, 1000, 5000]:
+    lookups = [random.sample(all_groups[1:], group_count) for _ in range(args.lookups)]
+    for include_cli in [False, True]:
+        start = time.time()
+        expected = [legacy_lookup("user", groups, include_cli) for groups in lookups]
+        legacy_time = (time.time() - start) / args.lookups
+        start = time.time()
+        results = [
+            index.authorized_roles_for(["user", *groups], include_cli=include_cli)
+            for groups in lookups
+        ]
+        index_time = (time.time() - start) / args.lookups
+        assert results == expected
+        # Users repeat the same lookup on every page load and credential request
+        start = time.time()
+        for groups in lookups:
+            index.authorized_roles_for(["user", *groups], include_cli=include_cli)
+        cached_time = (time.time() - start) / args.lookups
+        print(
+            f"groups={group_count:<5} include_cli={include_cli!s:<5} "
+            f"roles={sum(len(r) for r in results) // args.lookups:<6} "
+            f"legacy={legacy_time * 1000:7.2f}ms index={index_time * 1000:7.2f}ms "
+            f"cached={cached_time * 1000:6.2f}ms"
+        )
@@ -0,0 +1,74 @@
+"""
+Measures the latency of requests from other users while a storm of password logins is being handled, with bcrypt
+hashes checked inline on the event loop, as `UserDynamoHandler.authenticate_user` used to check them, and in the
+consoleme.lib.cpu_executor process pool.
+
+Requests from other users are simulated by a coroutine that wakes up every few milliseconds and validates a JWT. Its
+latency is how late it completes.
+
+Usage: CONFIG_LOCATION=example_config/example_config_test.yaml \
+    python scripts/benchmarks/login_storm.py --logins 40 --rounds 12
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import bcrypt
+
+from consoleme.lib.cpu_executor import run_in_process_pool
+from consoleme.lib.jwt import generate_jwt_token, validate_and_return_jwt_token
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--logins", default=40, type=int)
+parser.add_argument("--rounds", default=12, type=int, help="bcrypt cost factor")
+parser.add_argument("--interval", default=0.01, type=float)
+args = parser.parse_args()
+
+password_hash = bcrypt.hashpw(b"password", bcrypt.gensalt(rounds=args.rounds))
+
+
+async def inline_login():
+    # Yield once, as the DynamoDB query before the hash check would
+    await asyncio.sleep(0)
+    return bcrypt.checkpw(b"password", password_hash)
+
+
+async def offloaded_login():
+    await asyncio.sleep(0)
+    return await run_in_process_pool(bcrypt.checkpw, b"password", password_hash)
+
+
+async def other_users(token, stop, latencies):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(args.interval)
+        assert await validate_and_return_jwt_token(token)
+        latencies.append(time.perf_counter() - start - args.interval)
+
+
+async def run(login):
+    token = await generate_jwt_token("user@example.com", ["group"])
+    stop = asyncio.Event()
+    latencies = []
+    requests = asyncio.ensure_future(other_users(token, stop, latencies))
+    start = time.perf_counter()
+    assert all(await asyncio.gather(*[login() for _ in range(args.logins)]))
+    login_time = time.perf_counter() - start
+    stop.set()
+    await requests
+    return login_time, latencies
+
+
+# Start the process pool's workers before measuring
+asyncio.run(run(offloaded_login))
+for name, login in [("inline", inline_login), ("process_pool", offloaded_login)]:
+    login_time, latencies = asyncio.run(run(login))
+    latencies = sorted(latency * 1000 for latency in latencies)
+    print(
+        f"{name:<12} logins={args.logins} in {login_time:.2f}s "
+        f"other_requests={len(latencies):<5} "
+        f"p50={statistics.median(latencies):7.2f}ms "
+        f"p99={latencies[int(len(latencies) * 0.99)]:7.2f}ms "
+        f"max={latencies[-1]:7.2f}ms"
+    )
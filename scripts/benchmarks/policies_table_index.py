@@ -0,0 +1,86 @@
+"""
+Compares the latency of /api/v2/policies style queries answered with a linear filter_table scan, and with a
+TableIndex over the same rows.
+
+Usage: CONFIG_LOCATION=example_config/example_config_test.yaml \
+    python scripts/benchmarks/policies_table_index.py --rows 500000
+"""
+import argparse
+import random
+import time
+
+from asgiref.sync import async_to_sync
+
+from consoleme.lib.generic import filter_table
+from consoleme.lib.table_index import TableIndex
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--rows", default=500000, type=int)
+parser.add_argument("--accounts", default=2000, type=int)
+parser.add_argument("--limit", default=1000, type=int)
+args = parser.parse_args()
+
+TECHNOLOGIES = {
+    "AWS::IAM::Role": "arn:aws:iam::{account_id}:role/{name}",
+    "AWS::S3::Bucket": "arn:aws:s3:::{name}",
+    "AWS::SQS::Queue": "arn:aws:sqs:us-east-1:{account_id}:{name}",
+    "AWS::SNS::Topic": "arn:aws:sns:us-east-1:{account_id}:{name}",
+    "managed_policy": "arn:aws:iam::{account_id}:policy/{name}",
+}
+WORDS = ["app", "service", "logs", "data", "prod", "test", "build", "deploy", "web"]
+
+random.seed(0)
+rows = []
+for i in range(args.rows):
+    account = random.randrange(args.accounts)
+    account_id = str(100000000000 + account)
+    technology = random.choice(list(TECHNOLOGIES))
+    name = f"{random.choice(WORDS)}-{random.choice(WORDS)}-{i}"
+    rows.append(
+        {
+            "account_id": account_id,
+            "account_name": f"account-{account}",
+            "arn": TECHNOLOGIES[technology].format(account_id=account_id, name=name),
+            "technology": technology,
+            "templated": False,
+            "errors": 0,
+        }
+    )
+
+QUERIES = [
+    {"arn": "logs-data-12"},
+    {"arn": "role/prod-.*-4242"},
+    {"account_id": "100000000042"},
+    {"account_name": "account-42$", "technology": "s3"},
+    {"technology": "sqs", "arn": "deploy"},
+    {"arn": "does-not-exist"},
+]
+
+
+def linear(filters):
+    results = rows
+    for filter_key, filter_value in filters.items():
+        results = async_to_sync(filter_table)(filter_key, filter_value, results)
+    return results[0 : args.limit]
+
+
+start = time.time()
+index = TableIndex(
+    rows,
+    indexed_columns=["account_id", "account_name", "technology"],
+    ngram_columns=["arn"],
+)
+print(f"Built index over {len(rows)} rows in {time.time() - start:.2f}s")
+
+for filters in QUERIES:
+    start = time.time()
+    expected = linear(filters)
+    linear_time = time.time() - start
+    start = time.time()
+    results = index.query(filters, limit=args.limit)
+    index_time = time.time() - start
+    assert results == expected, filters
+    print(
+        f"{str(filters):<55} rows={len(results):<5} "
+        f"filter_table={linear_time * 1000:8.1f}ms index={index_time * 1000:8.1f}ms"
+    )
@@ -0,0 +1,163 @@
+"""
+Compares normalizing and minimizing synthetic inline policies with the pairwise fnmatch and DeepDiff comparisons that
+`normalize_policies` and `minimize_iam_policy_statements` used to perform, and with consoleme.lib.policy_normalization.
+Asserts that both produce the same statements.
+
+Usage: CONFIG_LOCATION=example_config/example_config_test.yaml \
+    python scripts/benchmarks/policy_normalization.py --statements 1000
+"""
+import argparse
+import copy
+import fnmatch
+import random
+import time
+
+from deepdiff import DeepDiff
+
+from consoleme.lib.generic import sort_dict
+from consoleme.lib.policy_normalization import (
+    POLICY_ELEMENTS,
+    minimize_policy_statements,
+    normalize_policy_statements,
+)
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--statements", default=1000, type=int)
+parser.add_argument("--buckets", default=200, type=int)
+parser.add_argument("--values-per-element", default=20, type=int)
+parser.add_argument(
+    "--skip-legacy-minimize",
+    action="store_true",
+    help="Pairwise DeepDiff comparisons take minutes for large policies",
+)
+args = parser.parse_args()
+
+
+def legacy_normalize(policies):
+    for policy in policies:
+        for element in POLICY_ELEMENTS:
+            if not policy.get(element):
+                continue
+            if isinstance(policy.get(element), str):
+                policy[element] = [policy[element]]
+            if element in ["Resource", "NotResource", "NotPrincipal"]:
+                policy[element] = list(set(policy[element]))
+            else:
+                policy[element] = list(set([x.lower() for x in policy[element]]))
+            modified_elements = set()
+            for i in range(len(policy[element])):
+                matched = False
+                for compare_value in policy[element][:i] + policy[element][(i + 1) :]:
+                    if fnmatch.fnmatch(policy[element][i], compare_value):
+                        matched = True
+                        break
+                if not matched:
+                    modified_elements.add(policy[element][i])
+            policy[element] = sorted(modified_elements)
+    return policies
+
+
+def legacy_minimize(statements):
+    exclude_ids = []
+    minimized_statements = []
+    statements = legacy_normalize(statements)
+    for i in range(len(statements)):
+        statement = statements[i]
+        statement.pop("Sid", None)
+        if i in exclude_ids:
+            continue
+        for j in range(i + 1, len(statements)):
+            if j in exclude_ids:
+                continue
+            statement_to_compare = statements[j]
+            statement_to_compare.pop("Sid", None)
+            for element in POLICY_ELEMENTS:
+                if not (statement.get(element) or statement_to_compare.get(element)):
+                    continue
+                diff = DeepDiff(
+                    statement,
+                    statement_to_compare,
+                    ignore_order=True,
+                    exclude_paths=[f"root['{element}']"],
+                )
+                if not diff:
+                    exclude_ids.append(j)
+                    statement[element] = sorted(
+                        list(set(statement[element] + statement_to_compare[element]))
+                    )
+                    break
+    for i in range(len(statements)):
+        if i not in exclude_ids:
+            statements[i] = sort_dict(statements[i])
+            minimized_statements.append(statements[i])
+    return legacy_normalize(minimized_statements)
+
+
+random.seed(0)
+services = {
+    "s3": ["GetObject", "PutObject", "ListBucket", "DeleteObject", "GetBucketPolicy"],
+    "sqs": ["SendMessage", "ReceiveMessage", "DeleteMessage", "GetQueueUrl"],
+    "sns": ["Publish", "Subscribe", "ListTopics"],
+    "dynamodb": ["GetItem", "PutItem", "Query", "Scan", "UpdateItem"],
+    "ec2": ["DescribeInstances", "DescribeVolumes", "DescribeTags"],
+}
+actions = [
+    f"{service}:{action}" for service, names in services.items() for action in names
+]
+# Wildcards that supersede some of the actions, such as s3:get* and sqs:*
+actions += [f"{service}:*" for service in services] + ["s3:Get*", "ec2:Describe*"]
+buckets = [f"bucket-{i}" for i in range(args.buckets)]
+conditions = [
+    None,
+    {"StringEquals": {"aws:PrincipalOrgID": ["o-1234567890"]}},
+    {"Bool": {"aws:SecureTransport": "true"}},
+]
+
+statements = []
+for i in range(args.statements):
+    bucket = random.choice(buckets)
+    statement = {
+        "Sid": f"statement{i}",
+        "Effect": random.choice(["Allow", "Allow", "Allow", "Deny"]),
+        "Action": random.sample(actions, random.randint(1, 5)),
+        "Resource": [
+            random.choice(
+                [f"arn:aws:s3:::{bucket}", f"arn:aws:s3:::{bucket}/*"]
+                + [f"arn:aws:s3:::{bucket}/prefix-{k}/*" for k in range(5)]
+            )
+            for _ in range(args.values_per_element)
+        ],
+    }
+    condition = random.choice(conditions)
+    if condition:
+        statement["Condition"] = copy.deepcopy(condition)
+    statements.append(statement)
+
+start = time.time()
+expected = legacy_normalize(copy.deepcopy(statements))
+legacy_time = time.time() - start
+start = time.time()
+result = normalize_policy_statements(copy.deepcopy(statements))
+normalize_time = time.time() - start
+assert result == expected
+print(
+    f"Normalized {len(statements)} statements: "
+    f"legacy={legacy_time:.2f}s new={normalize_time:.2f}s"
+)
+
+start = time.time()
+result = minimize_policy_statements(copy.deepcopy(statements))
+minimize_time = time.time() - start
+if args.skip_legacy_minimize:
+    print(
+        f"Minimized {len(statements)} statements to {len(result)}: new={minimize_time:.2f}s"
+    )
+else:
+    start = time.time()
+    expected = legacy_minimize(copy.deepcopy(statements))
+    legacy_time = time.time() - start
+    assert result == expected
+    print(
+        f"Minimized {len(statements)} statements to {len(result)}: "
+        f"legacy={legacy_time:.2f}s new={minimize_time:.2f}s"
+    )
@@ -0,0 +1,73 @@
+"""
+Compares the throughput of the Redis calls made on the authorization path (BaseHandler.authorization_flow) when they are
+made through the synchronous client wrapped in sync_to_async, and through the native asyncio client.
+
+Requires a running Redis server, configured through ConsoleMe's configuration (redis.host.global / redis.port).
+
+Usage: CONFIG_LOCATION=example_config/example_config_development.yaml \
+    python scripts/benchmarks/redis_auth_path.py --requests 20000 --concurrency 200
+"""
+import argparse
+import asyncio
+import time
+
+import ujson as json
+from asgiref.sync import sync_to_async
+
+from consoleme.lib.redis import RedisHandler
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--requests", default=20000, type=int)
+parser.add_argument("--concurrency", default=200, type=int)
+parser.add_argument("--users", default=1000, type=int)
+args = parser.parse_args()
+
+USER_CACHE_ENTRY = json.dumps(
+    {
+        "groups": [f"group-{i}@example.com" for i in range(50)],
+        "eligible_roles": [
+            f"arn:aws:iam::123456789012:role/role-{i}" for i in range(100)
+        ],
+        "eligible_accounts": ["123456789012"],
+        "user_role_name": None,
+    }
+)
+
+
+async def sync_client_auth_path(red, user: str) -> None:
+    key = f"USER-{user}-CONSOLE-True"
+    if not await sync_to_async(red.get)(key):
+        await sync_to_async(red.setex)(key, 60, USER_CACHE_ENTRY)
+
+
+async def async_client_auth_path(red, user: str) -> None:
+    key = f"USER-{user}-CONSOLE-True"
+    if not await red.get(key):
+        await red.setex(key, 60, USER_CACHE_ENTRY)
+
+
+async def run(name: str, fn, get_client) -> None:
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one_request(i: int) -> None:
+        async with semaphore:
+            await fn(await get_client(), f"user-{i % args.users}@example.com")
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one_request(i) for i in range(args.requests)])
+    elapsed = time.perf_counter() - start
+    print(f"{name}: {args.requests / elapsed:,.0f} requests/sec ({elapsed:.2f}s)")
+
+
+async def main() -> None:
+    sync_red = RedisHandler().redis_sync()
+
+    async def get_sync_client():
+        return sync_red
+
+    await run("sync client + sync_to_async", sync_client_auth_path, get_sync_client)
+    await run("asyncio client", async_client_auth_path, RedisHandler().redis)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+"""
+Compares the peak memory allocated while writing a synthetic IAM role cache to S3 in the original single-object
+format, and in the chunked format. Uploads are sent to a client that discards them, so only the memory used by
+serialization and compression is measured.
+
+Usage: CONFIG_LOCATION=example_config/example_config_test.yaml \
+    python scripts/benchmarks/s3_chunked_json.py --roles 20000 50000 100000
+"""
+import argparse
+import gzip
+import json
+import time
+import tracemalloc
+
+from botocore.exceptions import ClientError
+
+from consoleme.lib.json_encoder import SetEncoder
+from consoleme.lib.s3_chunked_json import put_chunked_json_object
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--roles", default=[20000, 50000, 100000], nargs="+", type=int)
+args = parser.parse_args()
+
+
+class DiscardingS3Client:
+    def put_object(self, **kwargs):
+        return {}
+
+    def get_object(self, **kwargs):
+        raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+
+    def create_multipart_upload(self, **kwargs):
+        return {"UploadId": "upload"}
+
+    def upload_part(self, **kwargs):
+        return {"ETag": str(kwargs["PartNumber"])}
+
+    def complete_multipart_upload(self, **kwargs):
+        return {}
+
+
+def role_cache(roles: int):
+    policy = {
+        "Version": "2012-10-17",
+        "Statement": [
+            {"Effect": "Allow", "Action": ["s3:GetObject"], "Resource": ["*"]}
+        ]
+        * 10,
+    }
+    return {
+        f"arn:aws:iam::123456789012:role/role{i}": json.dumps(
+            {
+                "name": f"role{i}",
+                "accountId": "123456789012",
+                "policy": json.dumps({"RolePolicyList": [policy] * 3}),
+                "ttl": 1600000000,
+            }
+        )
+        for i in range(roles)
+    }
+
+
+def original_format(data):
+    data_for_s3 = json.dumps(
+        {"last_updated": int(time.time()), "data": data},
+        cls=SetEncoder,
+        indent=2,
+    ).encode()
+    DiscardingS3Client().put_object(Body=gzip.compress(data_for_s3))
+
+
+def chunked_format(data):
+    put_chunked_json_object(
+        data,
+        "bucket",
+        "key.json.gz",
+        int(time.time()),
+        client=DiscardingS3Client(),
+    )
+
+
+def measure(function, data):
+    tracemalloc.start()
+    start = time.time()
+    function(data)
+    duration = time.time() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024 / 1024, duration
+
+
+for roles in args.roles:
+    data = role_cache(roles)
+    size = sum(len(k) + len(v) for k, v in data.items()) / 1024 / 1024
+    original_peak, original_time = measure(original_format, data)
+    chunked_peak, chunked_time = measure(chunked_format, data)
+    print(
+        f"roles={roles:<7} data={size:7.1f}MB "
+        f"original: peak={original_peak:7.1f}MB {original_time:5.1f}s  "
+        f"chunked: peak={chunked_peak:6.1f}MB {chunked_time:5.1f}s"
+    )
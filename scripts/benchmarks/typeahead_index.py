@@ -0,0 +1,97 @@
+"""
+Measures /api/v2/typeahead/resources style queries against a TypeaheadIndex over synthetic ARNs, and compares them
+with the linear scan that ResourceTypeAheadHandlerV2 falls back to.
+
+Usage: CONFIG_LOCATION=example_config/example_config_test.yaml \
+    python scripts/benchmarks/typeahead_index.py --arns 1000000
+"""
+import argparse
+import random
+import time
+
+from consoleme.lib.table_index import (
+    TypeaheadIndex,
+    arn_partitions,
+    build_typeahead_document,
+)
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--arns", default=1000000, type=int)
+parser.add_argument("--accounts", default=2000, type=int)
+parser.add_argument("--limit", default=20, type=int)
+args = parser.parse_args()
+
+FORMATS = [
+    "arn:aws:iam::{account_id}:role/{name}",
+    "arn:aws:s3:::{name}",
+    "arn:aws:sqs:{region}:{account_id}:{name}",
+    "arn:aws:sns:{region}:{account_id}:{name}",
+    "arn:aws:ec2:{region}:{account_id}:security-group/sg-{number:08x}",
+]
+REGIONS = ["us-east-1", "us-west-2", "eu-west-1"]
+WORDS = ["app", "service", "logs", "data", "prod", "test", "build", "deploy", "web"]
+
+random.seed(0)
+arns = []
+for i in range(args.arns):
+    arns.append(
+        random.choice(FORMATS).format(
+            account_id=str(100000000000 + random.randrange(args.accounts)),
+            region=random.choice(REGIONS),
+            name=f"{random.choice(WORDS)}-{random.choice(WORDS)}-{i}",
+            number=i,
+        )
+    )
+
+start = time.time()
+document = build_typeahead_document(
+    arns, values=arns, partitions=[arn_partitions(arn) for arn in arns]
+)
+print(f"Built typeahead document for {len(arns)} ARNs in {time.time() - start:.2f}s")
+start = time.time()
+index = TypeaheadIndex(document)
+print(f"Built typeahead index in {time.time() - start:.2f}s")
+
+QUERIES = [
+    ("prod", {}),
+    ("deploy-web-4242", {}),
+    ("logs", {"resource_type": "sqs", "region": "us-east-1"}),
+    ("role/app", {"account_id": "100000000042"}),
+    ("", {"account_id": "100000000042", "resource_type": "sns"}),
+    ("sg-0000beef", {}),
+    ("does-not-exist", {}),
+]
+
+
+def linear(query, partition_filters):
+    matching = set()
+    for arn in arns:
+        if len(matching) >= args.limit:
+            break
+        parts = arn.split(":")
+        if any(
+            value and value != parts[position]
+            for position, value in (
+                (2, partition_filters.get("resource_type")),
+                (3, partition_filters.get("region")),
+                (4, partition_filters.get("account_id")),
+            )
+        ):
+            continue
+        if query in arn.lower():
+            matching.add(arn)
+    return matching
+
+
+for query, partition_filters in QUERIES:
+    start = time.time()
+    expected = linear(query, partition_filters)
+    linear_time = time.time() - start
+    start = time.time()
+    results = index.search(query, limit=args.limit, partition_filters=partition_filters)
+    index_time = time.time() - start
+    assert len(results) == len(expected), query
+    print(
+        f"{query!r:<20} {str(partition_filters):<55} results={len(results):<3} "
+        f"linear={linear_time * 1000:8.1f}ms index={index_time * 1000:6.2f}ms"
+    )
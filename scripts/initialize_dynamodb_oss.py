@@ -88,6 +88,10 @@
         AttributeDefinitions=[
             {"AttributeName": "request_id", "AttributeType": "S"},
             {"AttributeName": "arn", "AttributeType": "S"},
+            {"AttributeName": "status", "AttributeType": "S"},
+            {"AttributeName": "username", "AttributeType": "S"},
+            {"AttributeName": "principal_arn", "AttributeType": "S"},
+            {"AttributeName": "request_time", "AttributeType": "N"},
         ],
         GlobalSecondaryIndexes=[
             {
@@ -98,7 +102,43 @@
                     "ReadCapacityUnits": 123,
                     "WriteCapacityUnits": 123,
                 },
-            }
+            },
+            {
+                "IndexName": "status-request_time-index",
+                "KeySchema": [
+                    {"AttributeName": "status", "KeyType": "HASH"},
+                    {"AttributeName": "request_time", "KeyType": "RANGE"},
+                ],
+                "Projection": {"ProjectionType": "ALL"},
+                "ProvisionedThroughput": {
+                    "ReadCapacityUnits": 123,
+                    "WriteCapacityUnits": 123,
+                },
+            },
+            {
+                "IndexName": "username-request_time-index",
+                "KeySchema": [
+                    {"AttributeName": "username", "KeyType": "HASH"},
+                    {"AttributeName": "request_time", "KeyType": "RANGE"},
+                ],
+                "Projection": {"ProjectionType": "ALL"},
+                "ProvisionedThroughput": {
+                    "ReadCapacityUnits": 123,
+                    "WriteCapacityUnits": 123,
+                },
+            },
+            {
+                "IndexName": "principal_arn-request_time-index",
+                "KeySchema": [
+                    {"AttributeName": "principal_arn", "KeyType": "HASH"},
+                    {"AttributeName": "request_time", "KeyType": "RANGE"},
+                ],
+                "Projection": {"ProjectionType": "ALL"},
+                "ProvisionedThroughput": {
+                    "ReadCapacityUnits": 123,
+                    "WriteCapacityUnits": 123,
+                },
+            },
         ],
         ProvisionedThroughput={"ReadCapacityUnits": 10, "WriteCapacityUnits": 10},
         StreamSpecification={
@@ -102,6 +102,53 @@ resource "aws_dynamodb_table" "consoleme_policy_requests" {
     type = "S"
   }
 
+  attribute {
+    name = "status"
+    type = "S"
+  }
+
+  attribute {
+    name = "username"
+    type = "S"
+  }
+
+  attribute {
+    name = "principal_arn"
+    type = "S"
+  }
+
+  attribute {
+    name = "request_time"
+    type = "N"
+  }
+
+  global_secondary_index {
+    name            = "status-request_time-index"
+    hash_key        = "status"
+    range_key       = "request_time"
+    read_capacity   = 5
+    write_capacity  = 5
+    projection_type = "ALL"
+  }
+
+  global_secondary_index {
+    name            = "username-request_time-index"
+    hash_key        = "username"
+    range_key       = "request_time"
+    read_capacity   = 5
+    write_capacity  = 5
+    projection_type = "ALL"
+  }
+
+  global_secondary_index {
+    name            = "principal_arn-request_time-index"
+    hash_key        = "principal_arn"
+    range_key       = "request_time"
+    read_capacity   = 5
+    write_capacity  = 5
+    projection_type = "ALL"
+  }
+
   ttl {
     attribute_name = ""
     enabled        = false
@@ -175,7 +175,10 @@ def test_clear_old_redis_iam_cache(self):
         )
 
         # Clear out the existing cache from Redis:
-        red.delete("cache_iam_resources_for_account_expiration")
+        red.delete(
+            "cache_iam_resources_for_account_expiration",
+            "cache_iam_resources_for_account_expiration_EXPIRATIONS",
+        )
 
         # Reset the config values:
         self.celery.config.region = old_conf_region
@@ -185,6 +188,191 @@ def test_clear_old_redis_iam_cache(self):
         else:
             CONFIG.config["aws"]["iamroles_redis_key"] = old_value
 
+    def test_cache_iam_resources_for_account_writes_changed_roles(self):
+        from consoleme.config import config
+        from consoleme.lib.redis import RedisHandler
+
+        red = RedisHandler().redis_sync()
+        cache_key = config.get("aws.iamroles_redis_key", "IAM_ROLE_CACHE")
+        self.celery.cache_iam_resources_for_account("123456789012")
+        arn = "arn:aws:iam::123456789012:role/RoleNumber5"
+
+        # Nothing changed since the last run
+        res = self.celery.cache_iam_resources_for_account("123456789012")
+        self.assertEqual(res["num_iam_roles_changed"], 0)
+
+        # Roles whose only change is when they were last used aren't rewritten
+        cached_entry = json.loads(red.hget(cache_key, arn))
+        policy = json.loads(cached_entry["policy"])
+        policy["RoleLastUsed"] = {
+            "LastUsedDate": "2021-01-01T00:00:00Z",
+            "Region": "us-east-1",
+        }
+        red.hset(
+            cache_key, arn, json.dumps({**cached_entry, "policy": json.dumps(policy)})
+        )
+        res = self.celery.cache_iam_resources_for_account("123456789012")
+        self.assertEqual(res["num_iam_roles_changed"], 0)
+        red.hset(cache_key, arn, json.dumps(cached_entry))
+
+        # Roles are rewritten when they differ from the cache, or when their TTL is about to run out
+        red.hset(cache_key, arn, json.dumps({**cached_entry, "policy": "{}"}))
+        res = self.celery.cache_iam_resources_for_account("123456789012")
+        self.assertEqual(res["num_iam_roles_changed"], 1)
+        self.assertEqual(
+            json.loads(red.hget(cache_key, arn))["policy"], cached_entry["policy"]
+        )
+
+        red.hset(
+            cache_key,
+            arn,
+            json.dumps({**cached_entry, "ttl": int(datetime.utcnow().timestamp())}),
+        )
+        res = self.celery.cache_iam_resources_for_account("123456789012")
+        self.assertEqual(res["num_iam_roles_changed"], 1)
+
+        red.hdel(cache_key, arn)
+        res = self.celery.cache_iam_resources_for_account("123456789012")
+        self.assertEqual(res["num_iam_roles_changed"], 1)
+        self.assertIsNotNone(red.hget(cache_key, arn))
+
+    def test_combine_iam_resources_across_accounts(self):
+        from consoleme.config.config import CONFIG
+        from consoleme.lib.redis import RedisHandler
+
+        red = RedisHandler().redis_sync()
+        old_config = copy.deepcopy(CONFIG.config)
+        CONFIG.config = {
+            **CONFIG.config,
+            "aws": {
+                **CONFIG.config.get("aws", {}),
+                "iamusers_redis_key": "combine_iam_users",
+            },
+            "cache_iam_resources_across_accounts": {
+                "account_updates_redis_key": "combine_account_updates",
+                "checkpoint_redis_key": "combine_checkpoint",
+            },
+        }
+        keys = [
+            "combine_iam_users",
+            "combine_iam_users_EXPIRATIONS",
+            "combine_account_updates",
+            "combine_checkpoint",
+        ]
+        red.delete(*keys)
+        now = int(datetime.utcnow().timestamp())
+        try:
+            self.celery._add_iam_resources_to_redis(
+                "combine_iam_users",
+                [
+                    {"arn": "arn:aws:iam::123456789012:user/old", "ttl": now - 60},
+                    {"arn": "arn:aws:iam::123456789012:user/new", "ttl": now + 60},
+                ],
+            )
+            red.zadd("combine_account_updates", {"123456789012": now})
+
+            res = self.celery.combine_iam_resources_across_accounts()
+            self.assertEqual(res["updated_accounts"], ["123456789012"])
+            self.assertEqual(res["num_expired_iam_users"], 1)
+            self.assertEqual(
+                red.hkeys("combine_iam_users"), ["arn:aws:iam::123456789012:user/new"]
+            )
+            self.assertEqual(
+                red.zrange("combine_iam_users_EXPIRATIONS", 0, -1),
+                ["arn:aws:iam::123456789012:user/new"],
+            )
+
+            # Nothing changed since the checkpoint
+            res = self.celery.combine_iam_resources_across_accounts()
+            self.assertEqual(res["updated_accounts"], [])
+            self.assertEqual(
+                res["message"], "No IAM resources changed since the last checkpoint"
+            )
+        finally:
+            red.delete(*keys)
+            CONFIG.config = old_config
+
+    def test_expire_cached_resources_backfills_ttls(self):
+        from consoleme.lib.redis import RedisHandler
+
+        red = RedisHandler().redis_sync()
+        keys = ["backfill_iam_users", "backfill_iam_users_EXPIRATIONS"]
+        red.delete(*keys)
+        now = int(datetime.utcnow().timestamp())
+        # Entries cached before their TTLs were tracked, including one without a TTL
+        red.hset(
+            "backfill_iam_users",
+            mapping={
+                "arn:aws:iam::123456789012:user/old": json.dumps({"ttl": now - 60}),
+                "arn:aws:iam::123456789012:user/new": json.dumps({"ttl": now + 60}),
+                "arn:aws:iam::123456789012:user/no_ttl": json.dumps({}),
+            },
+        )
+        try:
+            expired = self.celery._expire_cached_resources_from_redis(
+                "backfill_iam_users", now
+            )
+            self.assertEqual(expired, ["arn:aws:iam::123456789012:user/old"])
+            self.assertEqual(
+                sorted(red.hkeys("backfill_iam_users")),
+                [
+                    "arn:aws:iam::123456789012:user/new",
+                    "arn:aws:iam::123456789012:user/no_ttl",
+                ],
+            )
+        finally:
+            red.delete(*keys)
+
+    def test_cache_resources_from_aws_config_across_accounts(self):
+        from asgiref.sync import async_to_sync
+
+        from consoleme.config.config import CONFIG
+        from consoleme.lib.cache import retrieve_json_data_from_redis_or_s3
+        from consoleme.lib.redis import RedisHandler
+
+        red = RedisHandler().redis_sync()
+        old_config = copy.deepcopy(CONFIG.config)
+        CONFIG.config = {
+            **CONFIG.config,
+            "aws_config_cache": {"redis_key": "cache_aws_config_resources"},
+            "aws_config_cache_combined": {
+                "s3": {"file": "cache_aws_config_resources_combined.json.gz"}
+            },
+        }
+        keys = ["cache_aws_config_resources", "cache_aws_config_resources_EXPIRATIONS"]
+        red.delete(*keys)
+        now = int(datetime.utcnow().timestamp())
+        old_arn = "arn:aws:sqs:us-east-1:123456789012:old"
+        new_arn = "arn:aws:sqs:us-east-1:123456789012:new"
+        try:
+            self.celery._add_aws_config_resources_to_redis(
+                "cache_aws_config_resources",
+                {
+                    old_arn: json.dumps({"arn": old_arn, "ttl": now - 60}),
+                    new_arn: json.dumps({"arn": new_arn, "ttl": now + 60}),
+                },
+                {old_arn: now - 60, new_arn: now + 60},
+            )
+
+            res = self.celery.cache_resources_from_aws_config_across_accounts(
+                run_subtasks=False
+            )
+            self.assertEqual(res["number_of_expired_resources"], 1)
+            self.assertEqual(res["number_of_resources"], 1)
+            self.assertEqual(red.hkeys("cache_aws_config_resources"), [new_arn])
+
+            # The combined file is streamed from the cache
+            combined = async_to_sync(retrieve_json_data_from_redis_or_s3)(
+                s3_bucket=CONFIG.config.get("consoleme_s3_bucket"),
+                s3_key="cache_aws_config_resources_combined.json.gz",
+            )
+            self.assertEqual(
+                combined, {new_arn: json.dumps({"arn": new_arn, "ttl": now + 60})}
+            )
+        finally:
+            red.delete(*keys)
+            CONFIG.config = old_config
+
     def test_trigger_credential_mapping_refresh_from_role_changes(self):
         res = self.celery.trigger_credential_mapping_refresh_from_role_changes()
         self.assertEqual(
@@ -207,3 +395,63 @@ def test_cache_cloudtrail_denies(self):
                 "num_cloudtrail_denies": 1,
             },
         )
+
+    def test_cache_policies_table_details(self):
+        from consoleme.config.config import CONFIG
+        from consoleme.lib.redis import RedisHandler
+
+        red = RedisHandler().redis_sync()
+        old_config = copy.deepcopy(CONFIG.config)
+        CONFIG.config = {
+            **CONFIG.config,
+            "cache_policies_table_details": {"skip_aws_config_resources": True},
+        }
+        role_arn = "arn:aws:iam::123456789012:role/RoleNumber1"
+        red.hset("TEMPLATED_ROLES_v2", role_arn.lower(), "https://templates/role1")
+        red.hset("S3_BUCKETS", "123456789012", json.dumps(["policies-table-bucket"]))
+
+        self.assertTrue(self.celery.cache_policies_table_details())
+        policies = {
+            policy["arn"]: policy for policy in json.loads(red.get("ALL_POLICIES"))
+        }
+        self.assertEqual(policies[role_arn]["templated"], "https://templates/role1")
+        self.assertIn(
+            "resourceName%3Darn%3Aaws%3Aiam%3A%3A123456789012%3Arole%2FRoleNumber1",
+            policies[role_arn]["config_history_url"],
+        )
+        self.assertEqual(
+            policies["arn:aws:s3:::policies-table-bucket"]["technology"],
+            "AWS::S3::Bucket",
+        )
+        # Markdown columns are rendered by the cache task
+        self.assertEqual(
+            policies[role_arn]["markdown_columns"],
+            {
+                "arn": f"[{role_arn}](/policies/edit/123456789012/iamrole/RoleNumber1)",
+                "templated": "[role1](https://templates/role1)",
+            },
+        )
+
+        red.hdel("TEMPLATED_ROLES_v2", role_arn.lower())
+        red.hdel("S3_BUCKETS", "123456789012")
+        CONFIG.config = old_config
+
+    def test_cache_s3_buckets_for_account(self):
+        from consoleme.config import config
+        from consoleme.lib.redis import RedisHandler
+
+        red = RedisHandler().redis_sync()
+        bucket = config.get("consoleme_s3_bucket")
+        red.hset("S3_BUCKETS", "123456789012", json.dumps(["removed", "moved"]))
+        red.hset(
+            "S3_BUCKET_ACCOUNTS",
+            mapping={"removed": "123456789012", "moved": "223456789012"},
+        )
+
+        self.celery.cache_s3_buckets_for_account("123456789012")
+        self.assertIn(bucket, json.loads(red.hget("S3_BUCKETS", "123456789012")))
+        self.assertEqual(red.hget("S3_BUCKET_ACCOUNTS", bucket), "123456789012")
+        self.assertIsNone(red.hget("S3_BUCKET_ACCOUNTS", "removed"))
+        # The bucket was deleted and created in another account since it was cached
+        self.assertEqual(red.hget("S3_BUCKET_ACCOUNTS", "moved"), "223456789012")
+        red.hdel("S3_BUCKET_ACCOUNTS", "moved")
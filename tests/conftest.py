@@ -7,6 +7,7 @@
 
 import boto3
 import fakeredis
+import fakeredis.aioredis
 import pytest
 from mock import MagicMock, Mock, patch
 from mockredis import mock_strict_redis_client
@@ -654,6 +655,10 @@ def policy_requests_table(dynamodb):
         AttributeDefinitions=[
             {"AttributeName": "request_id", "AttributeType": "S"},
             {"AttributeName": "arn", "AttributeType": "S"},
+            {"AttributeName": "status", "AttributeType": "S"},
+            {"AttributeName": "username", "AttributeType": "S"},
+            {"AttributeName": "principal_arn", "AttributeType": "S"},
+            {"AttributeName": "request_time", "AttributeType": "N"},
         ],
         GlobalSecondaryIndexes=[
             {
@@ -664,7 +669,43 @@ def policy_requests_table(dynamodb):
                     "ReadCapacityUnits": 123,
                     "WriteCapacityUnits": 123,
                 },
-            }
+            },
+            {
+                "IndexName": "status-request_time-index",
+                "KeySchema": [
+                    {"AttributeName": "status", "KeyType": "HASH"},
+                    {"AttributeName": "request_time", "KeyType": "RANGE"},
+                ],
+                "Projection": {"ProjectionType": "ALL"},
+                "ProvisionedThroughput": {
+                    "ReadCapacityUnits": 123,
+                    "WriteCapacityUnits": 123,
+                },
+            },
+            {
+                "IndexName": "username-request_time-index",
+                "KeySchema": [
+                    {"AttributeName": "username", "KeyType": "HASH"},
+                    {"AttributeName": "request_time", "KeyType": "RANGE"},
+                ],
+                "Projection": {"ProjectionType": "ALL"},
+                "ProvisionedThroughput": {
+                    "ReadCapacityUnits": 123,
+                    "WriteCapacityUnits": 123,
+                },
+            },
+            {
+                "IndexName": "principal_arn-request_time-index",
+                "KeySchema": [
+                    {"AttributeName": "principal_arn", "KeyType": "HASH"},
+                    {"AttributeName": "request_time", "KeyType": "RANGE"},
+                ],
+                "Projection": {"ProjectionType": "ALL"},
+                "ProvisionedThroughput": {
+                    "ReadCapacityUnits": 123,
+                    "WriteCapacityUnits": 123,
+                },
+            },
         ],
         ProvisionedThroughput={"ReadCapacityUnits": 10, "WriteCapacityUnits": 10},
     )
@@ -959,7 +1000,10 @@ def redis(session_mocker):
         "consoleme.lib.redis.RedisHandler.redis_sync", return_value=fake_redis
     )
     session_mocker.patch(
-        "consoleme.lib.redis.RedisHandler.redis", return_value=fake_redis
+        "consoleme.lib.redis.RedisHandler.redis",
+        side_effect=lambda *args, **kwargs: fakeredis.aioredis.FakeRedis(
+            server=fakeredis_server, decode_responses=True
+        ),
     )
     return True
 
@@ -29,10 +29,12 @@ def test_policies_api(self):
         self.assertEqual(response.code, 200)
         response_j = json.loads(response.body)
         self.assertEqual(len(response_j), 3)
-        self.assertEqual(len(response_j["data"]), 18)
+        # Includes the IAM user that cache_iam_resources_for_account publishes
+        self.assertEqual(len(response_j["data"]), 19)
         first_entity = response_j["data"][0]
         self.assertEqual(first_entity["account_id"], "123456789012")
         self.assertEqual(first_entity["account_name"], "default_account")
+        self.assertNotIn("markdown_columns", first_entity)
 
     def test_policies_check_api(self):
         from consoleme.config import config
@@ -64,6 +64,88 @@ def test_requestshandler_post(self):
         diff = DeepDiff(json.loads(response.body), expected_response)
         self.assertFalse(diff)
 
+    def test_paginated_requests_post(self):
+        from consoleme.lib.dynamo import UserDynamoHandler
+
+        dynamo = UserDynamoHandler()
+        requests = [
+            {
+                "request_id": f"paginated_request{i}",
+                "username": "paginated_user@example.com",
+                "status": "pending",
+                "request_time": 1000 + i,
+                "principal": {
+                    "principal_arn": f"arn:aws:iam::123456789012:role/paginated{i}",
+                    "principal_type": "AwsResource",
+                },
+            }
+            for i in range(3)
+        ]
+        dynamo.parallel_write_table(dynamo.policy_requests_table, requests)
+
+        headers = {
+            self.config.get("auth.user_header_name"): "user@github.com",
+            self.config.get("auth.groups_header_name"): "groupa,groupb,groupc",
+        }
+        body = {
+            "filters": {"username": "paginated_user@example.com"},
+            "page_size": 2,
+        }
+        try:
+            response = self.fetch(
+                "/api/v2/paginated_requests?markdown=true",
+                method="POST",
+                headers=headers,
+                body=json.dumps(body),
+            )
+            self.assertEqual(response.code, 200)
+            response_j = json.loads(response.body)
+            self.assertEqual(response_j["filteredCount"], 2)
+            self.assertEqual(
+                response_j["data"][0]["request_id"],
+                "[paginated_request2](/policies/request/paginated_request2)",
+            )
+            self.assertTrue(response_j["nextCursor"])
+
+            body["cursor"] = response_j["nextCursor"]
+            response = self.fetch(
+                "/api/v2/paginated_requests",
+                method="POST",
+                headers=headers,
+                body=json.dumps(body),
+            )
+            response_j = json.loads(response.body)
+            self.assertEqual(
+                [request["request_id"] for request in response_j["data"]],
+                ["paginated_request0"],
+            )
+            self.assertIsNone(response_j["nextCursor"])
+
+            body["cursor"] = "invalid"
+            response = self.fetch(
+                "/api/v2/paginated_requests",
+                method="POST",
+                headers=headers,
+                body=json.dumps(body),
+            )
+            self.assertEqual(response.code, 400)
+
+            del body["cursor"]
+            for page_size in [0, -1, "2", 1.5, None, True]:
+                body["page_size"] = page_size
+                response = self.fetch(
+                    "/api/v2/paginated_requests",
+                    method="POST",
+                    headers=headers,
+                    body=json.dumps(body),
+                )
+                self.assertEqual(response.code, 400, page_size)
+        finally:
+            for request in requests:
+                dynamo.policy_requests_table.delete_item(
+                    Key={"request_id": request["request_id"]}
+                )
+
     def test_post_request(self):
         mock_request_data = {
             "justification": "test asdf",
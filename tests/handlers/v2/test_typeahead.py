@@ -189,12 +189,32 @@ def test_cache_self_service_template_and_typeahead(self):
 
         # Now let's mock the web requests
         from consoleme.config import config
+        from consoleme.lib import table_index
 
         headers = {
             config.get("auth.user_header_name"): "user@github.com",
             config.get("auth.groups_header_name"): "groupa,groupb,groupc",
         }
 
+        # The first requests scan the cached entries, and later ones are served from the search index
+        responses = []
+        for _ in range(3):
+            response = self.fetch(
+                "/api/v2/typeahead/self_service_resources?typeahead=rolenumber5",
+                method="GET",
+                headers=headers,
+            )
+            self.assertEqual(response.code, 200)
+            responses.append(json.loads(response.body))
+            pending_build = table_index._pending_builds.get("self_service_typeahead")
+            if pending_build:
+                self.io_loop.run_sync(lambda: pending_build)
+        self.assertIsNotNone(table_index._table_indexes.get("self_service_typeahead"))
+        for response_body in responses:
+            self.assertEqual(
+                [entry["display_text"] for entry in response_body], ["RoleNumber5"]
+            )
+
         response = self.fetch(
             "/api/v2/templated_resource/fake_repo/path/to/file.yaml",
             method="GET",
@@ -117,10 +117,38 @@ def test_get_resource_account(self, mock_aws_config_resources_redis):
             f"Test case failed: " f"{aws_config_resources_test_case['description']}",
         )
 
-    def test_is_member_of_ou(self):
-        from consoleme.lib.aws import _is_member_of_ou
+    def test_get_resource_account_s3_bucket_index(self):
+        from consoleme.lib.aws import get_resource_account
+        from consoleme.lib.redis import RedisHandler
 
+        red = RedisHandler().redis_sync()
+        red.hset("S3_BUCKET_ACCOUNTS", "indexed-bucket", "123456789012")
         loop = asyncio.get_event_loop()
+        try:
+            self.assertEqual(
+                loop.run_until_complete(
+                    get_resource_account("arn:aws:s3:::indexed-bucket")
+                ),
+                "123456789012",
+            )
+            self.assertEqual(
+                loop.run_until_complete(
+                    get_resource_account("arn:aws:s3:::indexed-bucket/path/to/object")
+                ),
+                "123456789012",
+            )
+            self.assertEqual(
+                loop.run_until_complete(
+                    get_resource_account("arn:aws:s3:::unknown-bucket")
+                ),
+                "",
+            )
+        finally:
+            red.hdel("S3_BUCKET_ACCOUNTS", "indexed-bucket")
+
+    def test_build_org_membership_index(self):
+        from consoleme.lib.aws import build_org_membership_index
+
         fake_org = {
             "Id": "r",
             "Children": [
@@ -137,84 +165,106 @@ def test_is_member_of_ou(self):
                 },
             ],
         }
+        membership_index = build_org_membership_index({"r": fake_org})
 
         # Account ID in nested OU
-        result, ous = loop.run_until_complete(_is_member_of_ou("100", fake_org))
-        self.assertTrue(result)
-        self.assertEqual(ous, {"b", "a", "r"})
+        self.assertEqual(membership_index["100"], ["a", "b", "r"])
 
         # OU ID in OU structure
-        result, ous = loop.run_until_complete(_is_member_of_ou("b", fake_org))
-        self.assertTrue(result)
-        self.assertEqual(ous, {"a", "r"})
+        self.assertEqual(membership_index["b"], ["a", "r"])
 
         # ID not in OU structure
-        result, ous = loop.run_until_complete(_is_member_of_ou("101", fake_org))
-        self.assertFalse(result)
-        self.assertEqual(ous, set())
-
-    def test_scp_targets_account_or_ou(self):
-        from consoleme.lib.aws import _scp_targets_account_or_ou
-        from consoleme.models import (
-            ServiceControlPolicyDetailsModel,
-            ServiceControlPolicyModel,
-            ServiceControlPolicyTargetModel,
+        self.assertNotIn("101", membership_index)
+
+    def test_get_scps_for_account_or_ou(self):
+        from consoleme.lib.aws import (
+            build_org_membership_index,
+            build_scp_target_index,
+            get_scps_for_account_or_ou,
         )
+        from consoleme.lib.cache import store_json_results_in_redis_and_s3
+        from consoleme.lib.redis import RedisHandler
 
         loop = asyncio.get_event_loop()
-        blank_scp_details = ServiceControlPolicyDetailsModel(
-            id="",
-            arn="",
-            name="",
-            description="",
-            aws_managed=False,
-            content="",
+        red = RedisHandler().redis_sync()
+        fake_org = {
+            "Id": "r",
+            "Children": [
+                {
+                    "Id": "a",
+                    "Type": "ORGANIZATIONAL_UNIT",
+                    "Children": [
+                        {
+                            "Id": "b",
+                            "Type": "ORGANIZATIONAL_UNIT",
+                            "Children": [{"Id": "100", "Type": "ACCOUNT"}],
+                        },
+                        {"Id": "101", "Type": "ACCOUNT"},
+                    ],
+                },
+                {"Id": "102", "Type": "ACCOUNT"},
+            ],
+        }
+        membership_index = build_org_membership_index({"r": fake_org})
+        self.assertEqual(
+            membership_index,
+            {
+                "a": ["r"],
+                "b": ["a", "r"],
+                "100": ["a", "b", "r"],
+                "101": ["a", "r"],
+                "102": ["r"],
+            },
         )
 
-        # SCP targets account directly
-        scp_targets = [
-            ServiceControlPolicyTargetModel(
-                target_id="100", arn="", name="", type="ACCOUNT"
-            )
-        ]
-        fake_scp = ServiceControlPolicyModel(
-            targets=scp_targets, policy=blank_scp_details
-        )
-        fake_ous = set()
-        result = loop.run_until_complete(
-            _scp_targets_account_or_ou(fake_scp, "100", fake_ous)
-        )
-        self.assertTrue(result)
+        def scp(policy_id, target_ids):
+            return {
+                "targets": [
+                    {"target_id": target_id, "arn": "", "name": "", "type": ""}
+                    for target_id in target_ids
+                ],
+                "policy": {
+                    "id": policy_id,
+                    "arn": "",
+                    "name": "",
+                    "description": "",
+                    "aws_managed": False,
+                    "content": "",
+                },
+            }
 
-        # SCP targets OU of which account is a member
-        scp_targets = [
-            ServiceControlPolicyTargetModel(
-                target_id="abc123", arn="", name="", type="ORGANIZATIONAL_UNIT"
-            )
-        ]
-        fake_scp = ServiceControlPolicyModel(
-            targets=scp_targets, policy=blank_scp_details
+        scp_target_index = build_scp_target_index(
+            {
+                "999": [
+                    scp("p-root", ["r"]),
+                    scp("p-account", ["100", "b"]),
+                    scp("p-other", ["102"]),
+                ]
+            }
         )
-        fake_ous = {"abc123", "def456"}
-        result = loop.run_until_complete(
-            _scp_targets_account_or_ou(fake_scp, "100", fake_ous)
+        self.assertEqual(
+            scp_target_index["targets"], {"r": [0], "100": [1], "b": [1], "102": [2]}
         )
-        self.assertTrue(result)
 
-        # SCP doesn't target account
-        scp_targets = [
-            ServiceControlPolicyTargetModel(
-                target_id="ghi789", arn="", name="", type="ORGANIZATIONAL_UNIT"
+        loop.run_until_complete(
+            store_json_results_in_redis_and_s3(
+                membership_index, redis_key="AWS_ORG_MEMBERSHIP_INDEX"
             )
-        ]
-        fake_scp = ServiceControlPolicyModel(
-            targets=scp_targets, policy=blank_scp_details
         )
-        fake_ous = {"abc123", "def456"}
-        result = loop.run_until_complete(
-            _scp_targets_account_or_ou(fake_scp, "100", fake_ous)
+        loop.run_until_complete(
+            store_json_results_in_redis_and_s3(
+                scp_target_index, redis_key="AWS_SCPS_BY_TARGET"
+            )
         )
-        self.assertFalse(result)
+        try:
+            scps = loop.run_until_complete(get_scps_for_account_or_ou("100"))
+            self.assertEqual(
+                [s.policy.id for s in scps.__root__], ["p-root", "p-account"]
+            )
+            scps = loop.run_until_complete(get_scps_for_account_or_ou("101"))
+            self.assertEqual([s.policy.id for s in scps.__root__], ["p-root"])
+        finally:
+            red.delete("AWS_ORG_MEMBERSHIP_INDEX", "AWS_SCPS_BY_TARGET")
 
     def test_fetch_managed_policy_details(self):
         from consoleme.config import config
@@ -0,0 +1,109 @@
+import json
+from unittest import TestCase
+
+from asgiref.sync import async_to_sync
+
+
+class TestLocalJsonCache(TestCase):
+    def test_get_returns_hit_only_for_matching_version(self):
+        from consoleme.lib.cache import LocalJsonCache
+
+        cache = LocalJsonCache(max_bytes=100)
+        cache.set(("key", "str", None), ("1", "1", 10), {"a": "b"}, 10)
+
+        self.assertEqual(
+            cache.get(("key", "str", None), ("1", "1", 10)), ("hit", {"a": "b"})
+        )
+        self.assertEqual(
+            cache.get(("key", "str", None), ("1", "2", 10)), ("stale", None)
+        )
+        # Stale entries are dropped
+        self.assertEqual(
+            cache.get(("key", "str", None), ("1", "1", 10)), ("miss", None)
+        )
+        self.assertEqual(cache.current_bytes, 0)
+
+    def test_set_evicts_least_recently_used(self):
+        from consoleme.lib.cache import LocalJsonCache
+
+        cache = LocalJsonCache(max_bytes=25)
+        cache.set(("a", "str", None), 1, "a", 10)
+        cache.set(("b", "str", None), 1, "b", 10)
+        # Touch "a" so that "b" becomes the least recently used entry
+        cache.get(("a", "str", None), 1)
+        evicted = cache.set(("c", "str", None), 1, "c", 10)
+
+        self.assertEqual(evicted, 1)
+        self.assertEqual(cache.get(("a", "str", None), 1), ("hit", "a"))
+        self.assertEqual(cache.get(("b", "str", None), 1), ("miss", None))
+        self.assertEqual(cache.get(("c", "str", None), 1), ("hit", "c"))
+        self.assertEqual(cache.current_bytes, 20)
+
+    def test_set_skips_entries_larger_than_cache(self):
+        from consoleme.lib.cache import LocalJsonCache
+
+        cache = LocalJsonCache(max_bytes=5)
+        self.assertEqual(cache.set(("a", "str", None), 1, "a", 10), 0)
+        self.assertEqual(cache.get(("a", "str", None), 1), ("miss", None))
+        self.assertEqual(cache.current_bytes, 0)
+
+
+class TestRetrieveJsonDataFromRedisOrS3(TestCase):
+    def test_retrieve_uses_local_cache_until_data_is_updated(self):
+        from consoleme.lib.cache import (
+            local_cache,
+            retrieve_json_data_from_redis_or_s3,
+            store_json_results_in_redis_and_s3,
+        )
+        from consoleme.lib.redis import RedisHandler
+
+        red = RedisHandler().redis_sync()
+        redis_key = "TEST_LOCAL_CACHE"
+        local_cache.clear()
+        async_to_sync(store_json_results_in_redis_and_s3)(
+            {"version": 1}, redis_key=redis_key
+        )
+
+        first = async_to_sync(retrieve_json_data_from_redis_or_s3)(
+            redis_key, use_local_cache=True
+        )
+        second = async_to_sync(retrieve_json_data_from_redis_or_s3)(
+            redis_key, use_local_cache=True
+        )
+        self.assertEqual(first, {"version": 1})
+        self.assertIs(first, second)
+
+        # The local cache is opt-in, so other callers always decode a fresh copy
+        uncached = async_to_sync(retrieve_json_data_from_redis_or_s3)(redis_key)
+        self.assertEqual(uncached, first)
+        self.assertIsNot(uncached, first)
+
+        # Writes that bypass store_json_results_in_redis_and_s3 are still detected
+        red.set(redis_key, json.dumps({"version": 22}))
+        self.assertEqual(
+            async_to_sync(retrieve_json_data_from_redis_or_s3)(
+                redis_key, use_local_cache=True
+            ),
+            {"version": 22},
+        )
+
+        # Rewrites in the same second with the same length have a new write counter
+        async_to_sync(store_json_results_in_redis_and_s3)(
+            {"version": 3}, redis_key=redis_key
+        )
+        self.assertEqual(
+            async_to_sync(retrieve_json_data_from_redis_or_s3)(
+                redis_key, use_local_cache=True
+            ),
+            {"version": 3},
+        )
+        async_to_sync(store_json_results_in_redis_and_s3)(
+            {"version": 4}, redis_key=redis_key
+        )
+        self.assertEqual(
+            async_to_sync(retrieve_json_data_from_redis_or_s3)(
+                redis_key, use_local_cache=True
+            ),
+            {"version": 4},
+        )
+        red.delete(redis_key)
@@ -37,7 +37,257 @@ async def test_retrieve_credential_authorization_mapping(self):
         pass
 
     async def test_determine_users_authorized_roles(self):
-        pass
+        from consoleme.lib.cloud_credential_authorization_mapping import (
+            CredentialAuthorizationMapping,
+            RoleAuthorizations,
+            generate_and_store_credential_authorization_index,
+        )
+
+        mapping = CredentialAuthorizationMapping()
+        mapping.authorization_index = None
+        await generate_and_store_credential_authorization_index(
+            {
+                "user@example.com": RoleAuthorizations(
+                    authorized_roles={"arn:aws:iam::123456789012:role/roleC"}
+                ),
+                "groupa@example.com": RoleAuthorizations(
+                    authorized_roles={"arn:aws:iam::123456789012:role/roleB"},
+                    authorized_roles_cli_only={"arn:aws:iam::123456789012:role/roleA"},
+                ),
+            }
+        )
+        self.assertEqual(
+            await mapping.determine_users_authorized_roles(
+                "user@example.com", ["groupa@example.com", "unknown@example.com"]
+            ),
+            [
+                "arn:aws:iam::123456789012:role/roleB",
+                "arn:aws:iam::123456789012:role/roleC",
+            ],
+        )
+        first_index = mapping.authorization_index
+
+        # The index is only reloaded when a new version is published
+        mapping.authorization_index_last_check = 0
+        await mapping.determine_users_authorized_roles("user@example.com", [])
+        self.assertIs(mapping.authorization_index, first_index)
+
+        await generate_and_store_credential_authorization_index(
+            {
+                "user@example.com": RoleAuthorizations(
+                    authorized_roles={"arn:aws:iam::123456789012:role/roleD"}
+                ),
+            }
+        )
+        mapping.authorization_index_last_check = 0
+        self.assertEqual(
+            await mapping.determine_users_authorized_roles(
+                "user@example.com", ["groupa@example.com"], include_cli=True
+            ),
+            ["arn:aws:iam::123456789012:role/roleD"],
+        )
+        self.assertIsNot(mapping.authorization_index, first_index)
+        mapping.authorization_index = None
+
+    async def test_apply_role_changes_to_credential_authorization_mapping(self):
+        import ujson as json
+
+        from consoleme.config import config
+        from consoleme.lib.cache import retrieve_json_data_from_redis_or_s3
+        from consoleme.lib.cloud_credential_authorization_mapping import (
+            CompiledAuthorizationIndex,
+            RoleAuthorizationsDecoder,
+            apply_role_changes_to_credential_authorization_mapping,
+            generate_and_store_credential_authorization_index,
+            generate_and_store_credential_authorization_mapping,
+            generate_and_store_reverse_authorization_mapping,
+        )
+        from consoleme.lib.redis import RedisHandler
+
+        async def regenerate():
+            mapping = await generate_and_store_credential_authorization_mapping()
+            reverse_mapping = await generate_and_store_reverse_authorization_mapping(
+                mapping
+            )
+            await generate_and_store_credential_authorization_index(mapping)
+            return mapping, reverse_mapping
+
+        async def stored_mappings():
+            mapping = await retrieve_json_data_from_redis_or_s3(
+                "CREDENTIAL_AUTHORIZATION_MAPPING_V1",
+                json_object_hook=RoleAuthorizationsDecoder,
+            )
+            reverse_mapping = await retrieve_json_data_from_redis_or_s3(
+                "REVERSE_AUTHORIZATION_MAPPING_V1"
+            )
+            return (
+                mapping,
+                {
+                    arn: sorted(identities)
+                    for arn, identities in reverse_mapping.items()
+                },
+            )
+
+        red = RedisHandler().redis_sync()
+        role_cache_key = config.get("aws.iamroles_redis_key", "IAM_ROLE_CACHE")
+        changed_arn = "arn:aws:iam::123456789012:role/RoleNumber1"
+        deleted_arn = "arn:aws:iam::123456789012:role/RoleNumber2"
+        original_entries = {
+            arn: red.hget(role_cache_key, arn) for arn in [changed_arn, deleted_arn]
+        }
+        await regenerate()
+
+        changed_entry = json.loads(original_entries[changed_arn])
+        policy = json.loads(changed_entry["policy"])
+        policy["Tags"] = [
+            {"Key": "authorized_groups", "Value": "group1:newgroup@example.com"}
+        ]
+        changed_entry["policy"] = json.dumps(policy)
+        # Roles are passed as fetch_iam_role returns them, with their policy decoded
+        result = await apply_role_changes_to_credential_authorization_mapping(
+            {
+                changed_arn: {**changed_entry, "policy": policy},
+                deleted_arn: None,
+                "arn:aws:iam::123456789012:role/RoleNumber3": json.loads(
+                    red.hget(
+                        role_cache_key, "arn:aws:iam::123456789012:role/RoleNumber3"
+                    )
+                ),
+            }
+        )
+        self.assertEqual(result["num_roles_changed"], 2)
+        self.assertFalse(result["full_rebuild"])
+
+        mapping, reverse_mapping = await stored_mappings()
+        self.assertEqual(
+            mapping["newgroup@example.com"].authorized_roles, {changed_arn}
+        )
+        self.assertNotIn("group1-cli", mapping)
+        # Authorizations from dynamic config are kept
+        self.assertEqual(
+            mapping["group1@example.com"].authorized_roles,
+            {"arn:aws:iam::123456789012:role/rolename"},
+        )
+        self.assertNotIn("group2", mapping)
+        self.assertEqual(
+            reverse_mapping[changed_arn.lower()], ["group1", "newgroup@example.com"]
+        )
+        self.assertNotIn(deleted_arn.lower(), reverse_mapping)
+        self.assertEqual(
+            CompiledAuthorizationIndex.from_authorization_mapping(mapping).version,
+            red.get("CREDENTIAL_AUTHORIZATION_INDEX_VERSION_V1"),
+        )
+
+        # Regenerating the mappings from every role gives the same result
+        red.hset(role_cache_key, changed_arn, json.dumps(changed_entry))
+        red.hdel(role_cache_key, deleted_arn)
+        try:
+            await regenerate()
+            self.assertEqual(await stored_mappings(), (mapping, reverse_mapping))
+        finally:
+            for arn, entry in original_entries.items():
+                red.hset(role_cache_key, arn, entry)
+            await regenerate()
+
+    async def test_role_authorized_groups(self):
+        import ujson as json
+
+        from consoleme.lib.cloud_credential_authorization_mapping.role_tags import (
+            RoleTagAuthorizationMappingGenerator,
+        )
+
+        policy = {
+            "AssumeRolePolicyDocument": {
+                "Statement": [
+                    {
+                        "Action": "sts:AssumeRole",
+                        "Effect": "Allow",
+                        "Principal": {"Service": "ec2.amazonaws.com"},
+                    }
+                ]
+            },
+            "Tags": [{"Key": "authorized_groups", "Value": "group1:group2"}],
+        }
+        expected = {
+            "authorized_roles": ["group1", "group2"],
+            "authorized_roles_cli_only": [],
+        }
+        generator = RoleTagAuthorizationMappingGenerator()
+        generator.authorized_groups_tags = {"authorized_groups"}
+        # Role cache entries store the policy as JSON, and fetch_iam_role returns it decoded
+        self.assertEqual(
+            generator.role_authorized_groups({"policy": json.dumps(policy)}), expected
+        )
+        self.assertEqual(generator.role_authorized_groups({"policy": policy}), expected)
+
+        # The required trust policy entity is matched against the trust policy's JSON text
+        generator.required_trust_policy_entity = '"service":"ec2.amazonaws.com"'
+        self.assertEqual(generator.role_authorized_groups({"policy": policy}), expected)
+        generator.required_trust_policy_entity = "lambda.amazonaws.com"
+        self.assertEqual(
+            generator.role_authorized_groups({"policy": policy}),
+            {"authorized_roles": [], "authorized_roles_cli_only": []},
+        )
+
+    async def test_compiled_authorization_index(self):
+        from consoleme.lib.cloud_credential_authorization_mapping import (
+            RoleAuthorizations,
+        )
+        from consoleme.lib.cloud_credential_authorization_mapping.index import (
+            CompiledAuthorizationIndex,
+        )
+
+        authorization_mapping = {
+            f"group{i}": RoleAuthorizations(
+                authorized_roles={
+                    f"arn:aws:iam::123456789012:role/role{j}" for j in range(i, 30, 7)
+                },
+                authorized_roles_cli_only={
+                    f"arn:aws:iam::123456789012:role/cli{j}" for j in range(i, 30, 5)
+                },
+            )
+            for i in range(10)
+        }
+        index = CompiledAuthorizationIndex.from_authorization_mapping(
+            authorization_mapping
+        )
+        restored = CompiledAuthorizationIndex.from_dict(index.to_dict())
+        self.assertEqual(restored.version, index.version)
+
+        groups = ["group1", "group4", "group9", "unknown"]
+        for include_cli in [False, True]:
+            expected = set()
+            for group in groups[:3]:
+                expected.update(authorization_mapping[group].authorized_roles)
+                if include_cli:
+                    expected.update(
+                        authorization_mapping[group].authorized_roles_cli_only
+                    )
+            self.assertEqual(
+                restored.authorized_roles_for(groups, include_cli=include_cli),
+                sorted(expected),
+            )
+
+        # Results are cached, and callers can't modify the cached results
+        result = restored.authorized_roles_for(groups)
+        result.append("modified")
+        self.assertEqual(restored.authorized_roles_for(groups), result[:-1])
+        self.assertEqual(len(restored._lookup_cache), 2)
+
+        # The version only changes with the contents of the index
+        self.assertEqual(
+            CompiledAuthorizationIndex.from_authorization_mapping(
+                authorization_mapping
+            ).version,
+            index.version,
+        )
+        del authorization_mapping["group0"]
+        self.assertNotEqual(
+            CompiledAuthorizationIndex.from_authorization_mapping(
+                authorization_mapping
+            ).version,
+            index.version,
+        )
 
     async def test_generate_and_store_credential_authorization_mapping(self):
         from consoleme.lib.cloud_credential_authorization_mapping import (
@@ -0,0 +1,64 @@
+import copy
+import threading
+from unittest import TestCase
+
+import bcrypt
+from asgiref.sync import async_to_sync
+
+
+def _thread_name():
+    return threading.current_thread().name
+
+
+class TestCpuExecutor(TestCase):
+    def test_run_in_process_pool(self):
+        from consoleme.lib import cpu_executor
+
+        password_hash = bcrypt.hashpw(b"password", bcrypt.gensalt(rounds=4))
+        self.assertTrue(
+            async_to_sync(cpu_executor.run_in_process_pool)(
+                bcrypt.checkpw, b"password", password_hash
+            )
+        )
+        self.assertFalse(
+            async_to_sync(cpu_executor.run_in_process_pool)(
+                bcrypt.checkpw, b"wrong", password_hash
+            )
+        )
+        self.assertEqual(cpu_executor._queue_depth[cpu_executor.PROCESS_POOL], 0)
+
+    def test_run_in_thread_pool(self):
+        from consoleme.config.config import CONFIG
+        from consoleme.lib import cpu_executor
+
+        self.assertTrue(
+            async_to_sync(cpu_executor.run_in_thread_pool)(_thread_name).startswith(
+                "cpu_executor"
+            )
+        )
+        self.assertEqual(cpu_executor._queue_depth[cpu_executor.THREAD_POOL], 0)
+
+        old_config = copy.deepcopy(CONFIG.config)
+        CONFIG.config = {
+            **CONFIG.config,
+            "cpu_executor": {"thread_pool": {"enabled": False}},
+        }
+
+        async def run():
+            return await cpu_executor.run_in_thread_pool(_thread_name), _thread_name()
+
+        try:
+            # Work runs inline when the pool is disabled
+            executor_thread, event_loop_thread = async_to_sync(run)()
+            self.assertEqual(executor_thread, event_loop_thread)
+        finally:
+            CONFIG.config = old_config
+
+    def test_validate_and_return_jwt_token(self):
+        from consoleme.lib.jwt import generate_jwt_token, validate_and_return_jwt_token
+
+        token = async_to_sync(generate_jwt_token)("user@example.com", ["group"])
+        result = async_to_sync(validate_and_return_jwt_token)(token)
+        self.assertEqual(result["user"], "user@example.com")
+        self.assertEqual(result["groups"], ["group"])
+        self.assertFalse(async_to_sync(validate_and_return_jwt_token)(token + "x"))
@@ -0,0 +1,349 @@
+import threading
+import time
+from unittest import TestCase
+
+import boto3
+from asgiref.sync import async_to_sync
+from botocore.exceptions import ClientError
+
+from consoleme.config import config
+
+TABLE_NAME = "consoleme_test_parallel_scan"
+
+
+class SegmentedTable:
+    """Scans items by segment like DynamoDB does (moto ignores segments), and records how many scans overlap"""
+
+    def __init__(self, items, delay=0.05):
+        self.items = items
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+
+    def scan(self, Segment, TotalSegments, Limit=10, ExclusiveStartKey=None):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.delay)
+        with self.lock:
+            self.running -= 1
+        segment_items = self.items[Segment::TotalSegments]
+        start = ExclusiveStartKey["position"] if ExclusiveStartKey else 0
+        response = {"Items": segment_items[start : start + Limit]}
+        if start + Limit < len(segment_items):
+            response["LastEvaluatedKey"] = {"position": start + Limit}
+        return response
+
+
+class TestParallelScan(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        from consoleme.lib.dynamo import BaseDynamoHandler
+
+        client = boto3.client(
+            "dynamodb", region_name="us-east-1", **config.get("boto3.client_kwargs", {})
+        )
+        client.create_table(
+            TableName=TABLE_NAME,
+            AttributeDefinitions=[{"AttributeName": "id", "AttributeType": "S"}],
+            KeySchema=[{"AttributeName": "id", "KeyType": "HASH"}],
+            ProvisionedThroughput={"ReadCapacityUnits": 10, "WriteCapacityUnits": 10},
+        )
+        cls.handler = BaseDynamoHandler()
+        cls.table = cls.handler._get_dynamo_table(TABLE_NAME)
+        cls.expected = [
+            {"id": f"item{i:03d}", "number": i, "empty": "", "nested": {"empty": ""}}
+            for i in range(100)
+        ]
+        cls.handler.parallel_write_table(cls.table, cls.expected)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.table.delete()
+
+    def test_parallel_scan_table_converts_every_page(self):
+        items = self.handler.parallel_scan_table(
+            self.table, total_threads=1, dynamodb_kwargs={"Limit": 5}
+        )
+        self.assertEqual(sorted(items, key=lambda item: item["id"]), self.expected)
+        self.assertIsInstance(items[0]["number"], int)
+
+    def test_parallel_scan_table_async(self):
+        items = async_to_sync(self.handler.parallel_scan_table_async)(
+            self.table, total_threads=1, dynamodb_kwargs={"Limit": 5}
+        )
+        self.assertEqual(sorted(items, key=lambda item: item["id"]), self.expected)
+
+    def test_segments_are_scanned_concurrently(self):
+        items = [{"id": str(i)} for i in range(400)]
+        table = SegmentedTable(items)
+        start = time.time()
+        result = async_to_sync(self.handler.parallel_scan_table_async)(
+            table, total_threads=8
+        )
+        # 8 segments of 5 pages each would take 2 seconds one after another
+        self.assertLess(time.time() - start, 1.5)
+        self.assertGreater(table.max_running, 1)
+        self.assertEqual(sorted(result, key=lambda item: int(item["id"])), items)
+
+        table = SegmentedTable(items, delay=0.01)
+        result = self.handler.parallel_scan_table(table, total_threads=8)
+        self.assertGreater(table.max_running, 1)
+        self.assertEqual(len(result), 400)
+
+    def test_parallel_scan_table_iter_can_stop_early(self):
+        async def first_items():
+            items = []
+            async for item in self.handler.parallel_scan_table_iter(
+                self.table, total_segments=4, dynamodb_kwargs={"Limit": 5}
+            ):
+                items.append(item)
+                if len(items) == 12:
+                    break
+            return items
+
+        items = async_to_sync(first_items)()
+        self.assertEqual(len(items), 12)
+        for item in items:
+            self.assertIn(item, self.expected)
+
+    def test_parallel_scan_table_async_raises_segment_errors(self):
+        table = self.handler._get_dynamo_table("consoleme_table_does_not_exist")
+        with self.assertRaises(ClientError):
+            async_to_sync(self.handler.parallel_scan_table_async)(table)
+
+
+POLICY_REQUESTS_TABLE_NAME = "consoleme_test_policy_requests_listing"
+
+
+class TestPolicyRequestsListing(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        from consoleme.lib.dynamo import UserDynamoHandler
+
+        client = boto3.client(
+            "dynamodb", region_name="us-east-1", **config.get("boto3.client_kwargs", {})
+        )
+        client.create_table(
+            TableName=POLICY_REQUESTS_TABLE_NAME,
+            AttributeDefinitions=[
+                {"AttributeName": "request_id", "AttributeType": "S"},
+                {"AttributeName": "status", "AttributeType": "S"},
+                {"AttributeName": "username", "AttributeType": "S"},
+                {"AttributeName": "principal_arn", "AttributeType": "S"},
+                {"AttributeName": "request_time", "AttributeType": "N"},
+            ],
+            KeySchema=[{"AttributeName": "request_id", "KeyType": "HASH"}],
+            GlobalSecondaryIndexes=[
+                {
+                    "IndexName": f"{attribute}-request_time-index",
+                    "KeySchema": [
+                        {"AttributeName": attribute, "KeyType": "HASH"},
+                        {"AttributeName": "request_time", "KeyType": "RANGE"},
+                    ],
+                    "Projection": {"ProjectionType": "ALL"},
+                    "ProvisionedThroughput": {
+                        "ReadCapacityUnits": 10,
+                        "WriteCapacityUnits": 10,
+                    },
+                }
+                for attribute in ["status", "username", "principal_arn"]
+            ],
+            ProvisionedThroughput={"ReadCapacityUnits": 10, "WriteCapacityUnits": 10},
+        )
+        cls.handler = UserDynamoHandler()
+        cls.handler.policy_requests_table = cls.handler._get_dynamo_table(
+            POLICY_REQUESTS_TABLE_NAME
+        )
+        statuses = ["pending", "approved", "rejected", "cancelled"]
+        cls.requests = [
+            {
+                "request_id": f"request{i:03d}",
+                "status": statuses[i % 3 if i % 7 else 3],
+                "username": f"user{i % 4}@example.com",
+                "principal": {
+                    "principal_arn": f"arn:aws:iam::123456789012:role/role{i % 5}",
+                    "principal_type": "AwsResource",
+                },
+                "principal_arn": f"arn:aws:iam::123456789012:role/role{i % 5}",
+                "request_time": 1600000000 + i * 10,
+                "version": "2",
+            }
+            for i in range(60)
+        ]
+        cls.handler.parallel_write_table(
+            cls.handler.policy_requests_table, cls.requests
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.handler.policy_requests_table.delete()
+
+    def _list_all(self, page_size, **kwargs):
+        pages = []
+        cursor = None
+        while True:
+            page, cursor = async_to_sync(self.handler.list_policy_requests)(
+                page_size=page_size, cursor=cursor, **kwargs
+            )
+            pages.append(page)
+            if not cursor:
+                return pages
+
+    def test_list_policy_requests(self):
+        pages = self._list_all(7)
+        self.assertEqual([len(page) for page in pages], [7] * 8 + [4])
+        self.assertEqual(
+            [request["request_id"] for page in pages for request in page],
+            [f"request{i:03d}" for i in reversed(range(60))],
+        )
+
+        pages = self._list_all(25, ascending=True)
+        self.assertEqual(
+            [request["request_id"] for page in pages for request in page],
+            [f"request{i:03d}" for i in range(60)],
+        )
+
+    def test_list_policy_requests_with_filters(self):
+        filters = {
+            "username": "user1@example.com",
+            "status": "approved",
+            "request_time": [1600000000, 1600000400],
+        }
+        pages = self._list_all(2, filters=filters)
+        expected = [
+            request["request_id"]
+            for request in sorted(
+                self.requests, key=lambda r: r["request_time"], reverse=True
+            )
+            if request["username"] == "user1@example.com"
+            and request["status"] == "approved"
+            and request["request_time"] <= 1600000400
+        ]
+        self.assertTrue(expected)
+        self.assertEqual(
+            [request["request_id"] for page in pages for request in page], expected
+        )
+
+        pages = self._list_all(
+            10, filters={"principal_arn": "arn:aws:iam::123456789012:role/role3"}
+        )
+        self.assertEqual(
+            [request["request_id"] for page in pages for request in page],
+            [f"request{i:03d}" for i in reversed(range(60)) if i % 5 == 3],
+        )
+
+    def test_list_policy_requests_cursor_must_match_filters(self):
+        from consoleme.exceptions.exceptions import InvalidRequestParameter
+
+        _, cursor = async_to_sync(self.handler.list_policy_requests)(page_size=5)
+        with self.assertRaises(InvalidRequestParameter):
+            async_to_sync(self.handler.list_policy_requests)(
+                filters={"username": "user1@example.com"}, page_size=5, cursor=cursor
+            )
+        with self.assertRaises(InvalidRequestParameter):
+            async_to_sync(self.handler.list_policy_requests)(
+                page_size=5, cursor="not a cursor"
+            )
+
+    def test_migrate_policy_requests_to_v3(self):
+        table = self.handler.policy_requests_table
+        table.put_item(
+            Item={
+                "request_id": "v2_request",
+                "arn": "arn:aws:iam::123456789012:role/v2role",
+                "status": "pending",
+                "username": "v2user@example.com",
+                "request_time": 1500000000,
+                "version": "2",
+                "extended_request": {
+                    "changes": {
+                        "changes": [
+                            {
+                                "principal_arn": "arn:aws:iam::123456789012:role/v2role",
+                                "version": "2.0",
+                            }
+                        ]
+                    }
+                },
+            }
+        )
+        try:
+            # Requests are converted when they're read, before they're migrated
+            requests = async_to_sync(self.handler.get_policy_requests)(
+                request_id="v2_request"
+            )
+            self.assertEqual(
+                requests[0]["principal"]["principal_arn"],
+                "arn:aws:iam::123456789012:role/v2role",
+            )
+            self.assertIn(
+                "arn", table.get_item(Key={"request_id": "v2_request"})["Item"]
+            )
+
+            self.assertEqual(
+                async_to_sync(self.handler.migrate_policy_requests_to_v3)(), 1
+            )
+            item = table.get_item(Key={"request_id": "v2_request"})["Item"]
+            self.assertNotIn("arn", item)
+            self.assertEqual(
+                item["principal_arn"], "arn:aws:iam::123456789012:role/v2role"
+            )
+            self.assertEqual(
+                item["extended_request"]["changes"]["changes"][0]["version"], "3.0"
+            )
+            # Migrated requests can be listed by principal
+            page, _ = async_to_sync(self.handler.list_policy_requests)(
+                filters={"principal_arn": "arn:aws:iam::123456789012:role/v2role"}
+            )
+            self.assertEqual(
+                [request["request_id"] for request in page], ["v2_request"]
+            )
+            self.assertEqual(
+                async_to_sync(self.handler.migrate_policy_requests_to_v3)(), 0
+            )
+        finally:
+            table.delete_item(Key={"request_id": "v2_request"})
+
+
+class TestCloudTrailDenies(TestCase):
+    def test_update_cloudtrail_denies(self):
+        from consoleme.lib.dynamo import UserDynamoHandler
+
+        handler = UserDynamoHandler()
+        arn = "arn:aws:iam::123456789012:role/cloudtrailDenies"
+        now = int(time.time())
+        deny = {
+            "arn": arn,
+            "request_id": f"{arn}-session-s3:GetObject-*",
+            "event_call": "s3:GetObject",
+            "epoch_event_time": now,
+            "ttl": now + 60,
+            "count": 2,
+        }
+        try:
+            self.assertEqual(handler.update_cloudtrail_denies([deny]), [True])
+            # Counts are added to, and the other attributes are replaced
+            self.assertEqual(
+                handler.update_cloudtrail_denies(
+                    [{**deny, "count": 3, "epoch_event_time": now + 1}]
+                ),
+                [False],
+            )
+            expired_deny = {
+                **deny,
+                "request_id": f"{arn}-session-s3:PutObject-*",
+                "ttl": now - 60,
+            }
+            handler.update_cloudtrail_denies([expired_deny])
+
+            denies = handler.get_cloudtrail_denies_for_arn(arn)
+            self.assertEqual(len(denies), 1)
+            self.assertEqual(denies[0]["count"], 5)
+            self.assertEqual(denies[0]["epoch_event_time"], now + 1)
+        finally:
+            for item in [deny, expired_deny]:
+                handler.cloudtrail_table.delete_item(
+                    Key={"arn": arn, "request_id": item["request_id"]}
+                )
@@ -0,0 +1,111 @@
+import json
+from unittest import TestCase
+
+from asgiref.sync import async_to_sync
+
+ROLE_ARN = "arn:aws:iam::123456789012:role/roleA"
+BUCKET_ARN = "arn:aws:s3:::bucket"
+
+
+class TestErrorsByArn(TestCase):
+    def setUp(self):
+        from consoleme.lib.redis import RedisHandler
+
+        self.red = RedisHandler().redis_sync()
+        self.keys = [
+            "S3_ERRORS",
+            "S3_ERRORS_BY_ARN",
+            "CLOUDTRAIL_ERRORS_BY_ARN",
+            "CLOUDTRAIL_ERRORS_BY_ARN_HASH",
+        ]
+        self.red.delete(*self.keys)
+
+    def tearDown(self):
+        self.red.delete(*self.keys)
+
+    def test_get_s3_errors_for_arn(self):
+        from consoleme.lib.errors_by_arn import (
+            get_s3_errors_for_arn,
+            store_s3_errors_by_arn,
+        )
+
+        s3_errors = {ROLE_ARN: [{"count": 2, "bucket_name": "bucket"}]}
+        # Producers that only write the aggregate are still supported
+        self.red.set("S3_ERRORS", json.dumps(s3_errors))
+        self.assertEqual(
+            async_to_sync(get_s3_errors_for_arn)(ROLE_ARN), s3_errors[ROLE_ARN]
+        )
+        self.assertEqual(async_to_sync(get_s3_errors_for_arn)(BUCKET_ARN), [])
+
+        store_s3_errors_by_arn(s3_errors)
+        self.assertEqual(json.loads(self.red.get("S3_ERRORS")), s3_errors)
+        # The aggregate is no longer read once the hash exists
+        self.red.delete("S3_ERRORS")
+        self.assertEqual(
+            async_to_sync(get_s3_errors_for_arn)(ROLE_ARN), s3_errors[ROLE_ARN]
+        )
+        self.assertEqual(async_to_sync(get_s3_errors_for_arn)(BUCKET_ARN), [])
+
+        # Stored errors replace the previous ones
+        store_s3_errors_by_arn({BUCKET_ARN: [{"count": 1}]})
+        self.assertEqual(self.red.hkeys("S3_ERRORS_BY_ARN"), [BUCKET_ARN])
+
+    def test_get_s3_errors_for_arn_fails_silently(self):
+        from unittest.mock import patch
+
+        from consoleme.lib.errors_by_arn import get_s3_errors_for_arn
+        from consoleme.lib.redis import ConsoleMeAsyncRedis
+
+        # Nothing listens on port 1, so every command raises a ConnectionError
+        async def unreachable_redis(*args, **kwargs):
+            return ConsoleMeAsyncRedis(host="127.0.0.1", port=1, decode_responses=True)
+
+        with patch("consoleme.lib.redis.RedisHandler.redis", unreachable_redis):
+            self.assertEqual(async_to_sync(get_s3_errors_for_arn)(ROLE_ARN), [])
+
+    def test_get_error_counts_for_arns(self):
+        from consoleme.lib.errors_by_arn import (
+            cloudtrail_errors_keys,
+            get_error_counts_for_arns,
+            store_errors_by_arn,
+        )
+
+        store_errors_by_arn(
+            {ROLE_ARN: 3}, expiration_seconds=86400, **cloudtrail_errors_keys()
+        )
+        self.assertGreater(self.red.ttl("CLOUDTRAIL_ERRORS_BY_ARN_HASH"), 0)
+        self.red.set(
+            "S3_ERRORS",
+            json.dumps(
+                {ROLE_ARN: [{"count": "2"}], BUCKET_ARN: [{"count": 1}, {"count": 4}]}
+            ),
+        )
+        self.assertEqual(
+            get_error_counts_for_arns(
+                [ROLE_ARN, BUCKET_ARN, "arn:aws:iam::123456789012:role/roleB"]
+            ),
+            {ROLE_ARN: 5, BUCKET_ARN: 5},
+        )
+
+    def test_update_errors_by_arn(self):
+        from consoleme.lib.errors_by_arn import (
+            cloudtrail_errors_keys,
+            get_error_counts_for_arns,
+            store_errors_by_arn,
+            update_errors_by_arn,
+        )
+
+        role_b = "arn:aws:iam::123456789012:role/roleB"
+        store_errors_by_arn({ROLE_ARN: 3, BUCKET_ARN: 1}, **cloudtrail_errors_keys())
+        # Only the given ARNs change, and ARNs without errors are removed
+        update_errors_by_arn(
+            {ROLE_ARN: 4, role_b: 2, BUCKET_ARN: 0}, **cloudtrail_errors_keys()
+        )
+        self.assertEqual(
+            get_error_counts_for_arns([ROLE_ARN, BUCKET_ARN, role_b]),
+            {ROLE_ARN: 4, role_b: 2},
+        )
+        self.assertEqual(
+            json.loads(self.red.get("CLOUDTRAIL_ERRORS_BY_ARN")),
+            {ROLE_ARN: 4, role_b: 2},
+        )
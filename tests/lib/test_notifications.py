@@ -0,0 +1,98 @@
+import json
+import time
+from unittest import TestCase
+
+from asgiref.sync import async_to_sync
+
+
+def notification(predictable_id, event_time, **kwargs):
+    return {
+        "predictable_id": predictable_id,
+        "type": "cloudtrail_generated_policy",
+        "users_or_groups": [],
+        "event_time": event_time,
+        "expiration": int(time.time()) + 3600,
+        "expired": False,
+        "message": predictable_id,
+        "message_actions": [],
+        "details": {},
+        "read_by_users": [],
+        "hidden_for_users": [],
+        "version": 1,
+        **kwargs,
+    }
+
+
+class TestNotifications(TestCase):
+    def setUp(self):
+        from consoleme.lib.redis import RedisHandler
+
+        self.red = RedisHandler().redis_sync()
+        self.red.delete("ALL_NOTIFICATIONS")
+
+    def tearDown(self):
+        self.red.delete("ALL_NOTIFICATIONS")
+
+    def test_get_notifications_for_user(self):
+        from consoleme.lib.v2.notifications import (
+            RetrieveNotifications,
+            get_notifications_for_user,
+        )
+
+        user = "user@example.com"
+        self.red.hset(
+            "ALL_NOTIFICATIONS",
+            mapping={
+                user: json.dumps(
+                    [
+                        notification("shared", 1, read_by_users=[user]),
+                        notification("hidden", 5, hidden_for_users=[user]),
+                    ]
+                ),
+                "group@example.com": json.dumps(
+                    [
+                        notification("shared", 1),
+                        notification("expired", 6, expiration=1),
+                        notification("old_version", 7, version=2),
+                        *[notification(f"group{i}", 1 + i) for i in range(4)],
+                    ]
+                ),
+            },
+        )
+        res = async_to_sync(get_notifications_for_user)(
+            user, ["group@example.com"], max_notifications=3, force_refresh=True
+        )
+        # Duplicate, hidden, expired and unsupported notifications are left out. The
+        # newest notifications are returned first.
+        self.assertEqual(
+            [n.predictable_id for n in res.notifications],
+            ["group3", "group2", "group1"],
+        )
+        self.assertEqual(res.unread_count, 3)
+
+        res = async_to_sync(get_notifications_for_user)(
+            user, ["group@example.com"], max_notifications=10
+        )
+        self.assertEqual(len(res.notifications), 5)
+        self.assertEqual(res.unread_count, 4)
+        read = [n.predictable_id for n in res.notifications if n.read_for_current_user]
+        self.assertEqual(read, ["shared"])
+        # Per-request state isn't kept in the shared index
+        shared = RetrieveNotifications().notifications_by_user_or_group[user]["shared"]
+        self.assertIsNone(shared.read_for_current_user)
+
+        # Only changed entries are parsed again
+        group_notifications = RetrieveNotifications().notifications_by_user_or_group[
+            "group@example.com"
+        ]
+        self.red.hset("ALL_NOTIFICATIONS", user, json.dumps([notification("new", 10)]))
+        res = async_to_sync(get_notifications_for_user)(
+            user, ["group@example.com"], max_notifications=1, force_refresh=True
+        )
+        self.assertEqual([n.predictable_id for n in res.notifications], ["new"])
+        self.assertIs(
+            RetrieveNotifications().notifications_by_user_or_group[
+                "group@example.com"
+            ],
+            group_notifications,
+        )
@@ -131,3 +131,64 @@ def test_get_resources_from_events(self):
         loop = asyncio.get_event_loop()
         result = loop.run_until_complete(get_resources_from_events(policy_changes))
         self.assertDictEqual(expected, result)
+
+    def test_get_url_for_resource(self):
+        from consoleme.exceptions.exceptions import ResourceNotFound
+        from consoleme.lib.policies import get_url_for_resource
+
+        loop = asyncio.get_event_loop()
+        test_cases = [
+            (
+                "arn:aws:iam::123456789012:role/path/roleName",
+                {},
+                "/policies/edit/123456789012/iamrole/roleName",
+            ),
+            (
+                "arn:aws:iam::123456789012:policy/path/policyName",
+                {"resource_type": "managed_policy"},
+                "/policies/edit/123456789012/managed_policy/path/policyName",
+            ),
+            (
+                "arn:aws:iam::aws:policy/ReadOnlyAccess",
+                {},
+                "/role/aws?redirect=https://console.aws.amazon.com/iam/home?%23/policies/"
+                "arn:aws:iam::aws:policy/ReadOnlyAccess$serviceLevelSummary",
+            ),
+            (
+                "arn:aws:sqs:us-east-1:123456789012:queueName",
+                {"resource_type": "AWS::SQS::Queue"},
+                "/policies/edit/123456789012/sqs/us-east-1/queueName",
+            ),
+            (
+                "arn:aws:ec2:us-west-2:123456789012:subnet/subnet-1234",
+                {},
+                "/role/123456789012?redirect=https://console.aws.amazon.com/vpc/home"
+                "?region=us-west-2%23subnets:search=subnet-1234",
+            ),
+            (
+                "arn:aws:elasticloadbalancing:us-west-2:123456789012:loadbalancer/app/lbName/1234",
+                {"resource_name": "app/lbName/1234"},
+                "/role/123456789012?redirect=https://console.aws.amazon.com/ec2/v2/home"
+                "?region=us-west-2%23LoadBalancers:search=lbName",
+            ),
+            (
+                "arn:aws:lambda:us-west-2:123456789012:function:functionName",
+                {},
+                "/role/123456789012?redirect=https://console.aws.amazon.com/lambda/home"
+                "?region=us-west-2%23/functions/functionName",
+            ),
+            ("arn:aws:kms:us-west-2:123456789012:key/1234", {}, ""),
+        ]
+        for arn, kwargs, expected in test_cases:
+            self.assertEqual(
+                loop.run_until_complete(get_url_for_resource(arn, **kwargs)), expected
+            )
+
+        with patch(
+            "consoleme.lib.policies.get_resource_account",
+            MagicMock(return_value=create_future("")),
+        ):
+            with self.assertRaises(ResourceNotFound):
+                loop.run_until_complete(
+                    get_url_for_resource("arn:aws:s3:::unknown-bucket")
+                )
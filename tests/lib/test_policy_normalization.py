@@ -0,0 +1,152 @@
+from unittest import TestCase
+
+from asgiref.sync import async_to_sync
+
+
+class TestPolicyNormalization(TestCase):
+    def test_remove_superseded_values(self):
+        from consoleme.lib.policy_normalization import remove_superseded_values
+
+        self.assertEqual(
+            remove_superseded_values(
+                {
+                    "s3:getobject",
+                    "s3:get*",
+                    "s3:listbucket",
+                    "sqs:sendmessage",
+                    "ec2:describe[iv]*",
+                    "ec2:describeinstances",
+                }
+            ),
+            ["ec2:describe[iv]*", "s3:get*", "s3:listbucket", "sqs:sendmessage"],
+        )
+        self.assertEqual(remove_superseded_values({"s3:get*", "*"}), ["*"])
+        # Patterns that match each other are both removed
+        self.assertEqual(remove_superseded_values({"s3:g*", "s3:g?"}), [])
+
+    def test_normalize_policies(self):
+        from consoleme.lib.aws import normalize_policies
+
+        self.assertEqual(
+            async_to_sync(normalize_policies)(
+                [
+                    {
+                        "Effect": "Allow",
+                        "Action": ["S3:GetObject", "s3:Get*", "s3:getobject"],
+                        "Resource": "arn:aws:s3:::bucket/*",
+                    },
+                    {
+                        "Effect": "Allow",
+                        "Action": "sqs:*",
+                        "Resource": [
+                            "arn:aws:iam::123456789012:role/Role",
+                            "arn:aws:iam::123456789012:role/role",
+                            "arn:aws:iam::123456789012:role/*",
+                        ],
+                    },
+                ]
+            ),
+            [
+                {
+                    "Effect": "Allow",
+                    "Action": ["s3:get*"],
+                    "Resource": ["arn:aws:s3:::bucket/*"],
+                },
+                {
+                    "Effect": "Allow",
+                    "Action": ["sqs:*"],
+                    "Resource": ["arn:aws:iam::123456789012:role/*"],
+                },
+            ],
+        )
+
+    def test_minimize_iam_policy_statements(self):
+        from consoleme.lib.aws import minimize_iam_policy_statements
+
+        condition = {"StringEquals": {"aws:PrincipalOrgID": ["o-1", "o-2"]}}
+        statements = [
+            {
+                "Sid": "a",
+                "Effect": "Allow",
+                "Action": ["s3:getobject"],
+                "Resource": ["arn:aws:s3:::bucket1/*"],
+            },
+            {
+                "Sid": "b",
+                "Effect": "Allow",
+                "Action": ["s3:getobject"],
+                "Resource": ["arn:aws:s3:::bucket2/*"],
+            },
+            # Merged with the first statement after its resources are merged
+            {
+                "Effect": "Allow",
+                "Action": ["s3:putobject"],
+                "Resource": ["arn:aws:s3:::bucket2/*", "arn:aws:s3:::bucket1/*"],
+            },
+            # Conditions are compared regardless of order
+            {
+                "Effect": "Allow",
+                "Action": ["sqs:sendmessage"],
+                "Resource": ["arn:aws:sqs:us-east-1:123456789012:queue1"],
+                "Condition": condition,
+            },
+            {
+                "Effect": "Allow",
+                "Action": ["sqs:sendmessage"],
+                "Resource": ["arn:aws:sqs:us-east-1:123456789012:queue2"],
+                "Condition": {"StringEquals": {"aws:PrincipalOrgID": ["o-2", "o-1"]}},
+            },
+            {
+                "Effect": "Deny",
+                "Action": ["s3:getobject"],
+                "Resource": ["arn:aws:s3:::bucket2/*"],
+            },
+        ]
+        self.assertEqual(
+            async_to_sync(minimize_iam_policy_statements)(statements),
+            [
+                {
+                    "Action": ["s3:getobject", "s3:putobject"],
+                    "Effect": "Allow",
+                    "Resource": ["arn:aws:s3:::bucket1/*", "arn:aws:s3:::bucket2/*"],
+                },
+                {
+                    "Action": ["sqs:sendmessage"],
+                    "Condition": condition,
+                    "Effect": "Allow",
+                    "Resource": [
+                        "arn:aws:sqs:us-east-1:123456789012:queue1",
+                        "arn:aws:sqs:us-east-1:123456789012:queue2",
+                    ],
+                },
+                {
+                    "Action": ["s3:getobject"],
+                    "Effect": "Deny",
+                    "Resource": ["arn:aws:s3:::bucket2/*"],
+                },
+            ],
+        )
+
+        # Statements with different Sids aren't merged unless the Sid is disregarded
+        statements = [
+            {
+                "Sid": "a",
+                "Effect": "Allow",
+                "Action": ["s3:getobject"],
+                "Resource": "*",
+            },
+            {
+                "Sid": "b",
+                "Effect": "Allow",
+                "Action": ["s3:putobject"],
+                "Resource": "*",
+            },
+        ]
+        self.assertEqual(
+            len(
+                async_to_sync(minimize_iam_policy_statements)(
+                    statements, disregard_sid=False
+                )
+            ),
+            2,
+        )
@@ -0,0 +1,43 @@
+from unittest import TestCase
+
+from asgiref.sync import async_to_sync
+
+
+class TestConsoleMeAsyncRedis(TestCase):
+    def test_disabled_client_fails_silently(self):
+        from consoleme.lib.redis import ConsoleMeAsyncRedis
+
+        red = ConsoleMeAsyncRedis(enabled=False)
+        self.assertIsNone(async_to_sync(red.get)("key"))
+        self.assertIsNone(async_to_sync(red.hget)("key", "field"))
+        self.assertIsNone(async_to_sync(red.hgetall)("key"))
+        self.assertIsNone(async_to_sync(red.exists)("key"))
+        self.assertIsNone(async_to_sync(red.hdel)("key", "field"))
+        self.assertIsNone(async_to_sync(red.zadd)("key", {"member": 1}))
+
+    def test_connection_pools_are_disconnected_with_their_loop(self):
+        from unittest.mock import patch
+
+        import redis.asyncio
+
+        from consoleme.lib.redis import _get_async_connection_pool
+
+        disconnected = []
+
+        async def disconnect(pool, *args, **kwargs):
+            disconnected.append(pool)
+
+        async def get_pool():
+            pool = await _get_async_connection_pool("127.0.0.1", 1, 0)
+            self.assertIs(pool, await _get_async_connection_pool("127.0.0.1", 1, 0))
+            self.assertEqual(disconnected, [])
+            return pool
+
+        with patch.object(
+            redis.asyncio.BlockingConnectionPool, "disconnect", disconnect
+        ):
+            # Each async_to_sync call runs on its own loop, and that loop's pool is disconnected when it shuts down
+            first_pool = async_to_sync(get_pool)()
+            second_pool = async_to_sync(get_pool)()
+        self.assertIsNot(first_pool, second_pool)
+        self.assertEqual(disconnected, [first_pool, second_pool])
@@ -0,0 +1,86 @@
+import copy
+import time
+from unittest import TestCase
+
+from asgiref.sync import async_to_sync
+
+
+class TestRegionFanOut(TestCase):
+    def test_collect_across_regions(self):
+        from consoleme.lib.region_fan_out import collect_across_regions
+
+        def collector(region):
+            if region == "eu-west-1":
+                raise Exception("Region is unavailable")
+            if region == "ap-south-1":
+                time.sleep(3)
+            return [f"arn:aws:sqs:{region}:123456789012:queue"]
+
+        start = time.perf_counter()
+        results = collect_across_regions(
+            collector,
+            ["us-east-1", "us-west-2", "eu-west-1", "ap-south-1"],
+            "test",
+            region_timeout_seconds=1,
+        )
+        # Failed and timed out regions are left out, without waiting for the slow region to finish
+        self.assertLess(time.perf_counter() - start, 3)
+        self.assertEqual(
+            results,
+            {
+                "us-east-1": ["arn:aws:sqs:us-east-1:123456789012:queue"],
+                "us-west-2": ["arn:aws:sqs:us-west-2:123456789012:queue"],
+            },
+        )
+        self.assertEqual(collect_across_regions(collector, [], "test"), {})
+
+    def test_collect_across_regions_excludes_paused_time_from_timeout(self):
+        from consoleme.lib.region_fan_out import (
+            collect_across_regions,
+            exclude_from_region_timeout,
+        )
+
+        def collector(region):
+            # Waiting on a slow consumer doesn't make the region time out
+            with exclude_from_region_timeout():
+                time.sleep(2)
+            return region
+
+        results = collect_across_regions(
+            collector, ["us-east-1", "us-west-2"], "test", region_timeout_seconds=1
+        )
+        self.assertEqual(results, {"us-east-1": "us-east-1", "us-west-2": "us-west-2"})
+
+    def test_get_enabled_regions_for_account(self):
+        from moto import mock_ec2
+
+        from consoleme.config.config import CONFIG
+        from consoleme.lib.aws import get_enabled_regions_for_account
+        from consoleme.lib.redis import RedisHandler
+
+        red = RedisHandler().redis_sync()
+        red.delete("ENABLED_REGIONS")
+        old_config = copy.deepcopy(CONFIG.config)
+        CONFIG.config = {
+            **CONFIG.config,
+            "celery": {**CONFIG.config["celery"], "sync_regions": []},
+        }
+        try:
+            with mock_ec2():
+                regions = async_to_sync(get_enabled_regions_for_account)("123456789012")
+            self.assertIn("us-east-1", regions)
+            self.assertIsNotNone(red.hget("ENABLED_REGIONS", "123456789012"))
+
+            # Later calls are served from the cache
+            red.hset(
+                "ENABLED_REGIONS",
+                "123456789012",
+                '{"value": ["us-east-1"], "ttl": 9999999999}',
+            )
+            self.assertEqual(
+                async_to_sync(get_enabled_regions_for_account)("123456789012"),
+                {"us-east-1"},
+            )
+        finally:
+            red.delete("ENABLED_REGIONS")
+            CONFIG.config = old_config
@@ -0,0 +1,173 @@
+import copy
+import gzip
+import json
+import os
+import time
+from unittest import TestCase
+
+import boto3
+from asgiref.sync import async_to_sync
+
+from consoleme.config import config
+
+BUCKET = config.get("consoleme_s3_bucket")
+DATA = {
+    f"arn:aws:iam::123456789012:role/role{i:04d}": {"RoleName": f"role{i:04d}"}
+    for i in range(500)
+}
+
+
+class TestS3ChunkedJson(TestCase):
+    def setUp(self):
+        self.client = boto3.client("s3", **config.get("boto3.client_kwargs", {}))
+
+    def test_dict_round_trip(self):
+        from consoleme.lib.s3_chunked_json import (
+            put_chunked_json_object,
+            read_chunked_json_object,
+        )
+
+        manifest = put_chunked_json_object(
+            DATA, BUCKET, "chunked/dict.json.gz", int(time.time()), chunk_size=1024
+        )
+        self.assertEqual(manifest["records"], 500)
+        self.assertGreater(len(manifest["chunks"]), 10)
+        self.assertEqual(read_chunked_json_object(manifest, BUCKET), DATA)
+
+        # The data object is a regular gzip file of newline delimited records
+        data_object = self.client.get_object(Bucket=BUCKET, Key=manifest["data_key"])
+        lines = gzip.decompress(data_object["Body"].read()).splitlines()
+        self.assertEqual(len(lines), 500)
+
+    def test_read_keys_downloads_only_needed_chunks(self):
+        from consoleme.lib.s3_chunked_json import (
+            put_chunked_json_object,
+            read_chunked_json_object,
+        )
+
+        manifest = put_chunked_json_object(
+            DATA, BUCKET, "chunked/keys.json.gz", int(time.time()), chunk_size=1024
+        )
+        keys = [
+            "arn:aws:iam::123456789012:role/role0042",
+            "arn:aws:iam::123456789012:role/doesnotexist",
+        ]
+        requested_ranges = []
+        get_object = self.client.get_object
+
+        def recording_get_object(**kwargs):
+            requested_ranges.append(kwargs.get("Range"))
+            return get_object(**kwargs)
+
+        self.client.get_object = recording_get_object
+        result = read_chunked_json_object(
+            manifest, BUCKET, keys=keys, client=self.client
+        )
+        self.assertEqual(result, {keys[0]: DATA[keys[0]]})
+        self.assertEqual(len(requested_ranges), 1)
+        self.assertTrue(requested_ranges[0].startswith("bytes="))
+
+    def test_multipart_upload(self):
+        from consoleme.lib.s3_chunked_json import (
+            MIN_PART_SIZE,
+            put_chunked_json_object,
+            read_chunked_json_object,
+        )
+
+        # Random data doesn't compress, so this spans several parts
+        data = [os.urandom(64 * 1024).hex() for _ in range(100)]
+        manifest = put_chunked_json_object(
+            data, BUCKET, "chunked/list.json.gz", int(time.time())
+        )
+        data_object = self.client.head_object(Bucket=BUCKET, Key=manifest["data_key"])
+        self.assertGreater(data_object["ContentLength"], MIN_PART_SIZE)
+        self.assertEqual(read_chunked_json_object(manifest, BUCKET), data)
+
+    def test_streaming_json_dict_writer(self):
+        from consoleme.lib.cache import retrieve_json_data_from_redis_or_s3
+        from consoleme.lib.s3_chunked_json import StreamingJsonDictWriter
+
+        with StreamingJsonDictWriter(
+            BUCKET, "chunked/streamed.json.gz", 1, part_size=1024
+        ) as writer:
+            for key, value in DATA.items():
+                writer.add(key, value)
+        self.assertEqual(writer.num_items, 500)
+        self.assertEqual(
+            async_to_sync(retrieve_json_data_from_redis_or_s3)(
+                s3_bucket=BUCKET, s3_key="chunked/streamed.json.gz"
+            ),
+            DATA,
+        )
+
+    def test_old_data_objects_are_deleted(self):
+        from consoleme.lib.s3_chunked_json import put_chunked_json_object
+
+        key = "chunked/rewritten.json"
+        manifests = [
+            put_chunked_json_object({"version": version}, BUCKET, key, version)
+            for version in range(3)
+        ]
+        self.assertEqual(manifests[2]["previous_data_key"], manifests[1]["data_key"])
+        listed = self.client.list_objects_v2(Bucket=BUCKET, Prefix=key)
+        self.assertEqual(
+            sorted(o["Key"] for o in listed["Contents"]),
+            sorted([key, manifests[1]["data_key"], manifests[2]["data_key"]]),
+        )
+
+    def test_retrieve_json_data_from_redis_or_s3_reads_chunked_objects(self):
+        from consoleme.lib.cache import retrieve_json_data_from_redis_or_s3
+        from consoleme.lib.s3_chunked_json import put_chunked_json_object
+
+        put_chunked_json_object(DATA, BUCKET, "chunked/retrieve.json.gz", 1)
+        self.assertEqual(
+            async_to_sync(retrieve_json_data_from_redis_or_s3)(
+                s3_bucket=BUCKET, s3_key="chunked/retrieve.json.gz"
+            ),
+            DATA,
+        )
+
+    def test_store_json_results_in_redis_and_s3_streams_dicts(self):
+        from consoleme.config.config import CONFIG
+        from consoleme.lib.cache import (
+            retrieve_json_data_from_redis_or_s3,
+            store_json_results_in_redis_and_s3,
+        )
+
+        data = {key: DATA[key] for key in reversed(list(DATA))}
+        old_config = copy.deepcopy(CONFIG.config)
+        CONFIG.config = {
+            **CONFIG.config,
+            "store_json_results_in_redis_and_s3": {"chunked_s3": {"enabled": True}},
+        }
+        try:
+            async_to_sync(store_json_results_in_redis_and_s3)(
+                data, s3_bucket=BUCKET, s3_key="chunked/streamed_store.json.gz"
+            )
+            async_to_sync(store_json_results_in_redis_and_s3)(
+                list(data.values()),
+                s3_bucket=BUCKET,
+                s3_key="chunked/streamed_store_list.json.gz",
+            )
+        finally:
+            CONFIG.config = old_config
+        # Dictionaries are written in the regular format, in their original order
+        data_object = self.client.get_object(
+            Bucket=BUCKET, Key="chunked/streamed_store.json.gz"
+        )
+        self.assertEqual(
+            list(json.loads(gzip.decompress(data_object["Body"].read()))["data"]),
+            list(data),
+        )
+        self.assertEqual(
+            async_to_sync(retrieve_json_data_from_redis_or_s3)(
+                s3_bucket=BUCKET, s3_key="chunked/streamed_store.json.gz"
+            ),
+            data,
+        )
+        self.assertEqual(
+            async_to_sync(retrieve_json_data_from_redis_or_s3)(
+                s3_bucket=BUCKET, s3_key="chunked/streamed_store_list.json.gz"
+            ),
+            list(data.values()),
+        )
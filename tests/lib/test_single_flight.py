@@ -0,0 +1,124 @@
+import asyncio
+import copy
+import json
+from unittest import TestCase
+
+from asgiref.sync import async_to_sync
+
+
+class TestSingleFlight(TestCase):
+    def test_concurrent_identical_calls_are_coalesced(self):
+        from consoleme.lib.single_flight import single_flight
+
+        calls = []
+
+        @single_flight()
+        async def lookup(account_id, resource_name):
+            calls.append((account_id, resource_name))
+            await asyncio.sleep(0.05)
+            return {"resource": resource_name}
+
+        async def run():
+            return await asyncio.gather(
+                *[lookup("123456789012", "bucket") for _ in range(10)],
+                lookup("123456789012", "other_bucket"),
+            )
+
+        results = async_to_sync(run)()
+        self.assertEqual(
+            calls, [("123456789012", "bucket"), ("123456789012", "other_bucket")]
+        )
+        self.assertEqual(results[0], {"resource": "bucket"})
+        self.assertIs(results[0], results[9])
+
+        # Calls that aren't concurrent aren't coalesced
+        async_to_sync(lookup)("123456789012", "bucket")
+        self.assertEqual(len(calls), 3)
+
+    def test_exceptions_are_raised_to_every_caller(self):
+        from consoleme.lib.single_flight import single_flight
+
+        calls = []
+
+        @single_flight()
+        async def lookup(resource_name):
+            calls.append(resource_name)
+            await asyncio.sleep(0.05)
+            raise ValueError(resource_name)
+
+        async def run():
+            return await asyncio.gather(
+                *[lookup("bucket") for _ in range(3)], return_exceptions=True
+            )
+
+        results = async_to_sync(run)()
+        self.assertEqual(len(calls), 1)
+        for result in results:
+            self.assertIsInstance(result, ValueError)
+
+    def test_copy_result(self):
+        from consoleme.lib.single_flight import single_flight
+
+        @single_flight(copy_result=True)
+        async def lookup(resource_name):
+            await asyncio.sleep(0.05)
+            return {"Policy": {"Statement": []}}
+
+        async def run():
+            return await asyncio.gather(lookup("bucket"), lookup("bucket"))
+
+        first, second = async_to_sync(run)()
+        first["Policy"]["Statement"].append("modified")
+        self.assertEqual(second, {"Policy": {"Statement": []}})
+
+    def test_share_across_processes(self):
+        from consoleme.config.config import CONFIG
+        from consoleme.lib.redis import RedisHandler
+        from consoleme.lib.single_flight import single_flight
+
+        old_config = copy.deepcopy(CONFIG.config)
+        CONFIG.config = {
+            **CONFIG.config,
+            "single_flight": {"redis_lock": {"enabled": True, "timeout": 2}},
+        }
+        red = RedisHandler().redis_sync()
+        calls = []
+
+        @single_flight(share_across_processes=True)
+        async def lookup(resource_arn):
+            calls.append(resource_arn)
+            return True
+
+        function_name = f"{lookup.__module__}.{lookup.__qualname__}"
+        key = json.dumps([["arn:aws:sqs:us-east-1:123456789012:queue"], []])
+        lock_key = f"SINGLE_FLIGHT:LOCK:{function_name}:{key}"
+        result_key = f"SINGLE_FLIGHT:RESULT:{function_name}:{key}"
+
+        async def other_process():
+            # Another process holds the lock, and stores its result after a moment
+            await asyncio.sleep(0.2)
+            red.set(result_key, json.dumps(False))
+            red.delete(lock_key)
+
+        async def run():
+            red.set(lock_key, "other process")
+            result, _ = await asyncio.gather(
+                lookup("arn:aws:sqs:us-east-1:123456789012:queue"), other_process()
+            )
+            return result
+
+        try:
+            self.assertFalse(async_to_sync(run)())
+            self.assertEqual(calls, [])
+
+            # Without a result from another process, the call is made and its result is shared
+            red.delete(result_key)
+            self.assertTrue(
+                async_to_sync(lookup)("arn:aws:sqs:us-east-1:123456789012:queue")
+            )
+            self.assertEqual(len(calls), 1)
+            self.assertEqual(red.get(result_key), "true")
+            self.assertFalse(red.exists(lock_key))
+        finally:
+            red.delete(result_key)
+            CONFIG.config = old_config
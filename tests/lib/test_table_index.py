@@ -0,0 +1,213 @@
+from unittest import TestCase
+
+from asgiref.sync import async_to_sync
+
+ROWS = [
+    {
+        "account_id": str(123456789010 + i % 7),
+        "account_name": f"account_{i % 7}",
+        "arn": arn,
+        "technology": technology,
+        "last_updated": 1600000000 + i,
+    }
+    for i, (technology, arn) in enumerate(
+        [
+            ("AWS::IAM::Role", f"arn:aws:iam::12345678901{i % 7}:role/role_{i}")
+            for i in range(40)
+        ]
+        + [("AWS::S3::Bucket", f"arn:aws:s3:::bucket-{i}-logs") for i in range(20)]
+        + [
+            ("AWS::SQS::Queue", f"arn:aws:sqs:us-east-1:12345678901{i % 7}:Queue{i}")
+            for i in range(20)
+        ]
+    )
+]
+
+FILTERS = [
+    {},
+    {"arn": "role_1"},
+    {"arn": "ROLE_1$"},
+    {"arn": "bucket-1.*-logs"},
+    {"arn": "arn:aws:s3:::bucket-(1|2)-logs"},
+    {"arn": "queue1|role_3"},
+    {"arn": "doesnotexist"},
+    {"arn": "[invalid"},
+    {"technology": "s3"},
+    {"technology": "iam", "account_id": "123456789012"},
+    {"account_name": "account_[12]", "arn": "role"},
+    {"account_id": ""},
+    {"last_updated": [1600000010, 1600000050]},
+    {"last_updated": "1600000001"},
+]
+
+
+class TestTableIndex(TestCase):
+    def test_required_literals(self):
+        from consoleme.lib.table_index import required_literals
+
+        self.assertEqual(
+            required_literals("arn:aws:s3:::bucket-.*-LOGS"),
+            ["arn:aws:s3:::bucket-", "-logs"],
+        )
+        self.assertEqual(required_literals("a|b"), [])
+        self.assertEqual(required_literals("[invalid"), [])
+
+    def test_query_matches_filter_table(self):
+        from consoleme.lib.generic import filter_table
+        from consoleme.lib.table_index import TableIndex
+
+        index = TableIndex(
+            ROWS,
+            indexed_columns=["account_id", "account_name", "technology"],
+            ngram_columns=["arn"],
+        )
+        for filters in FILTERS:
+            expected = ROWS
+            for filter_key, filter_value in filters.items():
+                expected = async_to_sync(filter_table)(
+                    filter_key, filter_value, expected
+                )
+            self.assertEqual(index.query(filters), expected, filters)
+            self.assertEqual(index.query(filters, limit=3), expected[0:3], filters)
+
+    def test_query_sort(self):
+        from consoleme.lib.table_index import TableIndex
+
+        index = TableIndex(
+            ROWS,
+            indexed_columns=["account_name"],
+            ngram_columns=["arn"],
+            sort_columns=["arn"],
+        )
+        for filters in [
+            {},
+            {"arn": "bucket"},
+            {"arn": "role_1"},
+            {"account_name": "account_1", "arn": "bucket"},
+        ]:
+            expected = sorted(
+                index.query(filters), key=lambda row: row["arn"], reverse=True
+            )
+            self.assertEqual(
+                index.query(filters, sort={"key": "arn"}),
+                list(reversed(expected)),
+                filters,
+            )
+            self.assertEqual(
+                index.query(
+                    filters, limit=5, sort={"key": "arn", "direction": "descending"}
+                ),
+                expected[0:5],
+                filters,
+            )
+        # Columns without a precomputed sort order are sorted after filtering
+        expected = sorted(
+            index.query({"arn": "queue"}), key=lambda row: row["account_name"]
+        )
+        self.assertEqual(
+            index.query({"arn": "queue"}, limit=3, sort={"key": "account_name"}),
+            expected[0:3],
+        )
+
+    def test_get_table_index_builds_after_table_is_reused(self):
+        from consoleme.lib import table_index
+
+        rows = list(ROWS)
+
+        async def get_index():
+            first = await table_index.get_table_index(
+                "test", rows, ngram_columns=["arn"]
+            )
+            second = await table_index.get_table_index(
+                "test", rows, ngram_columns=["arn"]
+            )
+            await table_index._pending_builds["test"]
+            third = await table_index.get_table_index(
+                "test", rows, ngram_columns=["arn"]
+            )
+            return first, second, third
+
+        first, second, third = async_to_sync(get_index)()
+        self.assertIsNone(first)
+        self.assertIsNone(second)
+        self.assertIs(third.rows, rows)
+        # A new version of the table isn't served from a stale index, and the stale index is released
+        self.assertIsNone(async_to_sync(table_index.get_table_index)("test", ROWS))
+        self.assertNotIn("test", table_index._table_indexes)
+
+
+ARNS = [
+    "arn:aws:ec2:us-west-2:123456789013:security-group/12345",
+    "arn:aws:sqs:us-east-1:123456789012:rolequeue",
+    "arn:aws:sns:us-east-1:123456789012:RoleTopic",
+    "arn:aws:iam::123456789012:role/role",
+    "arn:aws:iam::123456789012:role/myrole",
+    "arn:aws:iam::123456789012:role/role-admin",
+]
+
+
+class TestTypeaheadIndex(TestCase):
+    def setUp(self):
+        from consoleme.lib.table_index import (
+            TypeaheadIndex,
+            arn_partitions,
+            build_typeahead_document,
+        )
+
+        self.document = build_typeahead_document(
+            ARNS, values=ARNS, partitions=[arn_partitions(arn) for arn in ARNS]
+        )
+        self.index = TypeaheadIndex(self.document)
+
+    def search(self, query, **kwargs):
+        return [self.index.values[i] for i in self.index.search(query, **kwargs)]
+
+    def test_build_typeahead_document(self):
+        self.assertEqual(self.document["keys"][2], ARNS[2].lower())
+        self.assertEqual(
+            self.document["partitions"]["account_id"],
+            {"123456789013": [0], "123456789012": [1, 2, 3, 4, 5]},
+        )
+
+    def test_search_ranks_token_matches_first(self):
+        # Exact tokens, then token prefixes, then shorter ARNs first
+        self.assertEqual(
+            self.search("role"),
+            [ARNS[3], ARNS[4], ARNS[5], ARNS[1], ARNS[2]],
+        )
+        self.assertEqual(self.search("adm"), [ARNS[5]])
+        self.assertEqual(
+            self.search("12345"),
+            [ARNS[0], ARNS[3], ARNS[4], ARNS[5], ARNS[1], ARNS[2]],
+        )
+        self.assertEqual(self.search("ROLETOPIC"), [ARNS[2]])
+        self.assertEqual(self.search("role", limit=2), [ARNS[3], ARNS[4]])
+        self.assertEqual(self.search("doesnotexist"), [])
+
+    def test_search_matches_substrings_like_linear_scan(self):
+        for query in ["", "r", "ro", "arn:aws:", "east-1:1234", "12345"]:
+            self.assertEqual(
+                sorted(self.search(query, limit=100)),
+                sorted(arn for arn in ARNS if query in arn.lower()),
+                query,
+            )
+
+    def test_search_partition_filters(self):
+        self.assertEqual(
+            self.search("", partition_filters={"account_id": "123456789013"}),
+            [ARNS[0]],
+        )
+        self.assertEqual(
+            self.search(
+                "role",
+                partition_filters={
+                    "region": "us-east-1",
+                    "account_id": "123456789012",
+                    "resource_type": None,
+                },
+            ),
+            [ARNS[1], ARNS[2]],
+        )
+        self.assertEqual(
+            self.search("role", partition_filters={"resource_type": "s3"}), []
+        )
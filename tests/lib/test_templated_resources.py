@@ -0,0 +1,82 @@
+import os
+import tempfile
+from unittest import TestCase
+
+
+class TestTemplatedResources(TestCase):
+    def test_summarize_template(self):
+        from consoleme.lib.templated_resources import (
+            _content_matches,
+            summarize_template,
+        )
+
+        directory = tempfile.mkdtemp()
+        template_path = os.path.join(directory, "role.yaml")
+        with open(template_path, "w") as f:
+            f.write(
+                "TemplateName: role_template\n"
+                "Owner: owner@example.com\n"
+                "IncludeAccounts:\n"
+                "  - '*'\n"
+                "ExcludeAccounts:\n"
+                "  - test\n"
+                "RoleName: role\n"
+            )
+        summary = summarize_template(template_path)
+        self.assertEqual(
+            summary,
+            {
+                "name": "role_template",
+                "owner": "owner@example.com",
+                "include_accounts": ["*"],
+                "exclude_accounts": ["test"],
+                "keys": [
+                    "TemplateName",
+                    "Owner",
+                    "IncludeAccounts",
+                    "ExcludeAccounts",
+                    "RoleName",
+                ],
+            },
+        )
+        self.assertTrue(
+            _content_matches(summary, {"file_content": {"includes": ["RoleName"]}})
+        )
+        self.assertFalse(
+            _content_matches(summary, {"file_content": {"excludes": ["RoleName"]}})
+        )
+        self.assertFalse(
+            _content_matches(summary, {"file_content": {"includes": ["UserName"]}})
+        )
+
+        # Invalid templates are summarized with their error
+        with open(template_path, "w") as f:
+            f.write("RoleName: [unterminated\n")
+        self.assertIn("error", summarize_template(template_path))
+        with open(template_path, "w") as f:
+            f.write("- not a mapping\n")
+        self.assertIn("error", summarize_template(template_path))
+
+        # Files that can't be read aren't summarized, so they're parsed again on the next run
+        with self.assertRaises(OSError):
+            summarize_template(os.path.join(directory, "missing.yaml"))
+
+    def test_list_repository_files(self):
+        from git import Repo
+
+        from consoleme.lib.templated_resources import _list_repository_files
+
+        directory = tempfile.mkdtemp()
+        repo = Repo.init(directory)
+        for path in ["role.yaml", "templates/café role.yaml"]:
+            os.makedirs(os.path.dirname(os.path.join(directory, path)), exist_ok=True)
+            with open(os.path.join(directory, path), "w") as f:
+                f.write("RoleName: role\n")
+        repo.index.add(["role.yaml", "templates/café role.yaml"])
+        repo.index.commit("Add templates")
+
+        # Paths with special or non-ASCII characters aren't quoted
+        self.assertEqual(
+            sorted(_list_repository_files(repo)),
+            ["role.yaml", "templates/café role.yaml"],
+        )
@@ -0,0 +1,99 @@
+import copy
+from unittest import TestCase
+
+from asgiref.sync import async_to_sync
+
+
+class TestAwsPlugin(TestCase):
+    def test_get_sts_client_is_pooled(self):
+        from consoleme.default_plugins.plugins.aws.aws import get_sts_client
+
+        self.assertIs(get_sts_client("us-east-1"), get_sts_client("us-east-1"))
+        self.assertIsNot(get_sts_client("us-east-1"), get_sts_client("us-west-2"))
+
+    def test_ip_restriction_session_policy(self):
+        import json
+
+        from consoleme.default_plugins.plugins.aws.aws import (
+            ip_restriction_session_policy,
+        )
+
+        policy = ip_restriction_session_policy(("10.0.0.0/8",))
+        self.assertIs(policy, ip_restriction_session_policy(("10.0.0.0/8",)))
+        statement = json.loads(policy)["Statement"]
+        self.assertEqual(
+            statement[0]["Condition"]["NotIpAddress"], {"aws:SourceIP": ["10.0.0.0/8"]}
+        )
+        self.assertEqual(
+            statement[1], {"Effect": "Allow", "Action": "*", "Resource": "*"}
+        )
+
+    def test_get_credentials_cache(self):
+        from consoleme.config.config import CONFIG
+        from consoleme.default_plugins.plugins.aws import aws as aws_plugin
+        from consoleme.lib.redis import RedisHandler
+
+        old_config = copy.deepcopy(CONFIG.config)
+        role = "arn:aws:iam::123456789012:role/roleA"
+        aws = aws_plugin.Aws()
+        red = RedisHandler().redis_sync()
+
+        try:
+            # Caching is disabled by default
+            first = async_to_sync(aws.get_credentials)("user@example.com", role)
+            second = async_to_sync(aws.get_credentials)("user@example.com", role)
+            self.assertNotEqual(
+                first["Credentials"]["AccessKeyId"],
+                second["Credentials"]["AccessKeyId"],
+            )
+
+            CONFIG.config = {
+                **CONFIG.config,
+                "aws": {
+                    **CONFIG.config.get("aws", {}),
+                    "get_credentials": {
+                        "cache": {"enabled": True, "redis": {"enabled": True}}
+                    },
+                },
+            }
+            first = async_to_sync(aws.get_credentials)("user@example.com", role)
+            # Callers modify the credentials they are given
+            first.pop("ResponseMetadata")
+            second = async_to_sync(aws.get_credentials)("user@example.com", role)
+            self.assertEqual(
+                first["Credentials"]["AccessKeyId"],
+                second["Credentials"]["AccessKeyId"],
+            )
+            self.assertIn("ResponseMetadata", second)
+
+            # Different session policies aren't shared
+            restricted = async_to_sync(aws.get_credentials)(
+                "user@example.com", role, custom_ip_restrictions=["10.0.0.0/8"]
+            )
+            self.assertNotEqual(
+                first["Credentials"]["AccessKeyId"],
+                restricted["Credentials"]["AccessKeyId"],
+            )
+
+            # Other processes retrieve the credentials from Redis
+            aws_plugin._credential_cache.clear()
+            from_redis = async_to_sync(aws.get_credentials)("user@example.com", role)
+            self.assertEqual(
+                first["Credentials"]["AccessKeyId"],
+                from_redis["Credentials"]["AccessKeyId"],
+            )
+
+            # Credentials that will expire soon aren't returned
+            CONFIG.config["aws"]["get_credentials"]["cache"][
+                "min_remaining_lifetime"
+            ] = 7200
+            refreshed = async_to_sync(aws.get_credentials)("user@example.com", role)
+            self.assertNotEqual(
+                first["Credentials"]["AccessKeyId"],
+                refreshed["Credentials"]["AccessKeyId"],
+            )
+        finally:
+            CONFIG.config = old_config
+            aws_plugin._credential_cache.clear()
+            for key in red.scan_iter("GET_CREDENTIALS_CACHE:*"):
+                red.delete(key)